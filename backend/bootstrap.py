@@ -0,0 +1,216 @@
+"""
+Intervalli di confidenza BOOTSTRAP per le statistiche di strategia.
+
+backtest_stable e journal_stats riportano stime puntuali (sharpe, win rate,
+profit factor, media): con 30 trade una media positiva può essere solo
+rumore. Qui si ricampiona la sequenza (trade o rendimenti giornalieri
+mark-to-market) migliaia di volte e si leggono i percentili.
+
+- block bootstrap CIRCOLARE a blocchi mobili: preserva l'autocorrelazione
+  di breve periodo (cluster di volatilità, trade sovrapposti); block=1 è il
+  bootstrap iid classico;
+- tutte le B ricampionature sono UNA matrice di indici (B, n): rendimento,
+  Sharpe e max drawdown si calcolano per riga con operazioni NumPy, nessun
+  loop Python sui ricampionamenti.
+
+Le funzioni accettano liste semplici (JSON) e ritornano dict pronti per le
+API: per ogni statistica {point, low, high, median} + prob_positive.
+"""
+import numpy as np
+
+DEFAULT_RESAMPLES = 2000
+MAX_CELLS = 2_000_000   # celle (ricampionamenti × lunghezza) per blocco di calcolo
+
+
+def default_block_size(n):
+    """Regola pratica n^(1/3) (Hall-Horowitz-Jing) per il block bootstrap."""
+    return max(1, int(round(n ** (1.0 / 3.0))))
+
+
+def check_params(n_resamples, block_size=None):
+    """ValueError se n_resamples < 1 o block_size (None = automatico) < 1."""
+    if int(n_resamples) < 1:
+        raise ValueError(f"n_resamples deve essere >= 1 (ricevuto {n_resamples})")
+    if block_size is not None and int(block_size) < 1:
+        raise ValueError(f"block_size deve essere >= 1 (ricevuto {block_size})")
+
+
+def block_indices(n, n_resamples=DEFAULT_RESAMPLES, block_size=None, seed=None):
+    """
+    Matrice (n_resamples, n) di indici del block bootstrap circolare:
+    ogni riga è una concatenazione di blocchi [s, s+block) mod n con
+    partenze s uniformi, troncata a n.
+    """
+    check_params(n_resamples, block_size)
+    if n < 1:
+        raise ValueError("serie vuota")
+    block = int(block_size if block_size is not None else default_block_size(n))
+    rng = np.random.default_rng(seed)
+    n_blocks = -(-n // block)
+    starts = rng.integers(0, n, size=(n_resamples, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block)[None, None, :]) % n
+    return idx.reshape(n_resamples, n_blocks * block)[:, :n]
+
+
+def _num(v):
+    v = float(v)
+    return round(v, 4) if np.isfinite(v) else None   # niente NaN/inf nel JSON
+
+
+def _interval(samples, point, ci):
+    samples = np.asarray(samples, dtype=float)
+    samples = samples[np.isfinite(samples)]
+    if not len(samples):
+        return None
+    lo, hi = (1 - ci) / 2 * 100, (1 + ci) / 2 * 100
+    q = np.percentile(samples, [lo, 50, hi])
+    return {"point": _num(point), "low": _num(q[0]), "median": _num(q[1]), "high": _num(q[2])}
+
+
+def _chunked(values, n_resamples, block, seed, fn):
+    """
+    Applica fn(matrice ricampionata) a blocchi di righe, per tenere la
+    memoria sotto ~MAX_CELLS celle anche con serie lunghe; concatena i
+    risultati (dict di array 1-D).
+    """
+    n = len(values)
+    rows = max(1, MAX_CELLS // n)
+    rng_seed = np.random.SeedSequence(seed)
+    out = {}
+    done = 0
+    for child in rng_seed.spawn(-(-n_resamples // rows)):
+        b = min(rows, n_resamples - done)
+        part = fn(values[block_indices(n, b, block, child)])
+        for k, v in part.items():
+            out.setdefault(k, []).append(v)
+        done += b
+    return {k: np.concatenate(v) for k, v in out.items()}
+
+
+def _max_drawdown(equity):
+    """Max drawdown % per riga di una matrice di equity (fattori di crescita)."""
+    peak = np.maximum.accumulate(equity, axis=-1)
+    return ((peak - equity) / peak).max(axis=-1) * 100.0
+
+
+def _max_drawdown_additive(cum):
+    """Max drawdown in punti % per curve additive (quota fissa): base 100."""
+    level = 100.0 + cum
+    peak = np.maximum.accumulate(np.maximum(level, 100.0), axis=-1)
+    return (peak - level).max(axis=-1)
+
+
+def _sharpe(r, periods_per_year):
+    std = r.std(axis=-1, ddof=1)
+    mean = r.mean(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        s = np.where(std > 1e-12, mean / std, 0.0)
+    return s * np.sqrt(periods_per_year) if periods_per_year else s
+
+
+def bootstrap_returns(returns, n_resamples=DEFAULT_RESAMPLES, block_size=None,
+                      ci=0.95, seed=None, periods_per_year=252):
+    """
+    CI su una serie di rendimenti giornalieri (frazioni, es. 0.01 = +1%).
+
+    Returns dict: n, block_size, total_return (%), sharpe (annualizzato),
+    max_drawdown (%), prob_positive (quota di ricampionamenti con
+    rendimento totale > 0).
+    """
+    check_params(n_resamples, block_size)
+    r = np.asarray([v for v in returns if v is not None], dtype=float)
+    r = r[np.isfinite(r)]
+    n = len(r)
+    if n < 3:
+        return {"n": n, "error": "serie troppo corta per il bootstrap"}
+    block = int(block_size if block_size is not None else default_block_size(n))
+
+    def stats(R):
+        growth = np.cumprod(1.0 + R, axis=1)
+        return {"total": (growth[:, -1] - 1.0) * 100.0,
+                "sharpe": _sharpe(R, periods_per_year),
+                "dd": _max_drawdown(growth)}
+
+    S = _chunked(r, int(n_resamples), block, seed, stats)
+    point_growth = np.cumprod(1.0 + r)
+    return {
+        "n": n,
+        "block_size": block,
+        "n_resamples": int(n_resamples),
+        "ci": ci,
+        "total_return": _interval(S["total"], (point_growth[-1] - 1) * 100.0, ci),
+        "sharpe": _interval(S["sharpe"], _sharpe(r, periods_per_year), ci),
+        "max_drawdown": _interval(S["dd"], _max_drawdown(point_growth), ci),
+        "prob_positive": round(float((S["total"] > 0).mean()), 4),
+    }
+
+
+def returns_from_equity(equity_curve_pct, start=0):
+    """
+    Rendimenti giornalieri dalla equity_curve di backtest_stable (% vs
+    capitale iniziale, mark-to-market). `start` = prima barra nel range del
+    backtest (prima la curva è ferma a 0 per costruzione, non è track record).
+    """
+    eq = 1.0 + np.asarray(equity_curve_pct[start:], dtype=float) / 100.0
+    if len(eq) < 2:
+        return []
+    return (eq[1:] / eq[:-1] - 1.0).tolist()
+
+
+def bootstrap_trades(trades, n_resamples=DEFAULT_RESAMPLES, block_size=1,
+                     ci=0.95, seed=None, compound=True):
+    """
+    CI sulla sequenza dei trade CHIUSI (dict con pnl_pct, oppure numeri).
+
+    compound=True : capitale reinvestito (come backtest_stable/_strategy)
+    compound=False: quota fissa, P&L sommati (come il forward test)
+
+    Returns dict: n, total_return (%), avg_trade_pct, win_rate (%),
+    profit_factor, sharpe (per trade, non annualizzato), max_drawdown
+    (% o punti % a quota fissa), prob_positive.
+    """
+    check_params(n_resamples, block_size)
+    pnls = []
+    for t in trades or []:
+        if isinstance(t, dict):
+            if t.get("exit_date") == "OPEN" or t.get("status") in ("open", "pending"):
+                continue
+            t = t.get("pnl_pct")
+        if t is not None:
+            pnls.append(float(t))
+    p = np.asarray(pnls, dtype=float)
+    n = len(p)
+    if n < 3:
+        return {"n": n, "error": "troppo pochi trade chiusi per il bootstrap"}
+    block = int(block_size if block_size is not None else default_block_size(n))
+
+    def stats(P):
+        if compound:
+            growth = np.cumprod(1.0 + P / 100.0, axis=1)
+            total, dd = (growth[:, -1] - 1.0) * 100.0, _max_drawdown(growth)
+        else:
+            cum = np.cumsum(P, axis=1)
+            total, dd = cum[:, -1], _max_drawdown_additive(cum)
+        gains = np.where(P > 0, P, 0.0).sum(axis=1)
+        losses = np.where(P <= 0, -P, 0.0).sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pf = np.where(losses > 0, gains / losses, np.nan)
+        return {"total": total, "dd": dd, "pf": pf, "avg": P.mean(axis=1),
+                "wr": (P > 0).mean(axis=1) * 100.0, "sharpe": _sharpe(P, None)}
+
+    S = _chunked(p, int(n_resamples), block, seed, stats)
+    point = stats(p[None, :])
+    return {
+        "n": n,
+        "block_size": block,
+        "n_resamples": int(n_resamples),
+        "ci": ci,
+        "compound": compound,
+        "total_return": _interval(S["total"], point["total"][0], ci),
+        "avg_trade_pct": _interval(S["avg"], point["avg"][0], ci),
+        "win_rate": _interval(S["wr"], point["wr"][0], ci),
+        "profit_factor": _interval(S["pf"], point["pf"][0], ci),
+        "sharpe": _interval(S["sharpe"], point["sharpe"][0], ci),
+        "max_drawdown": _interval(S["dd"], point["dd"][0], ci),
+        "prob_positive": round(float((S["total"] > 0).mean()), 4),
+    }
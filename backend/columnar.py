@@ -0,0 +1,233 @@
+"""
+Formato binario colonnare (opt-in) per le risposte con molte serie storiche.
+
+/scan ripete per ogni ticker un oggetto `history` con 8+ array paralleli di
+756 elementi più le date in stringa; /analyze-batch-stable ripete `dates`
+per ogni ticker. Con `Accept: application/vnd.fpr.columnar` gli stessi
+endpoint rispondono con un contenitore binario; senza, il JSON non cambia.
+
+Layout (little-endian):
+
+    "FPRC" | version u16 | flags u16 | header_len u32 | header JSON UTF-8
+    | padding a 8 byte | buffer delle colonne (ognuno allineato a 8 byte)
+
+L'header contiene:
+- "axis": asse delle date condiviso (unione ordinata di tutte le liste
+  `dates` della risposta, ogni data una sola volta);
+- "columns": descrittori dei buffer {enc, offset (dal corpo), n, lead,
+  trail, scale, base};
+- "data": la risposta originale in cui ogni serie numerica è sostituita da
+  {"$col": i} e ogni lista di date da {"$dates": [lead, start, count]}
+  (fetta contigua dell'asse con `lead` null iniziali) o {"$datecol": i}
+  (colonna di indici nell'asse, NaN = null).
+
+Codifica delle colonne: NaN/±inf in testa e in coda diventano i conteggi
+lead/trail (padding del radar); il resto, se è esattamente k / 10^d con
+d <= MAX_DECIMALS (valori già arrotondati: z-score, prezzi e P&L del radar),
+è quantizzato a interi e salvato come differenze successive in int8/16/32
+("d8"/"d16"/"d32", primo valore in `base`); altrimenti float64 ("f64").
+Nessuna perdita: la decodifica restituisce gli stessi float del JSON. Il
+client (frontend/columnar.js) legge i buffer con Int8Array/Int16Array/
+Float64Array sul corpo e ricostruisce Float64Array con un solo passaggio.
+
+Con Accept-Encoding gzip il corpo è compresso (Content-Encoding: gzip,
+decompressione trasparente nel browser). Arrow IPC non è usato: pyarrow
+non è tra le dipendenze.
+"""
+import gzip
+import json
+import struct
+
+import numpy as np
+from fastapi.responses import Response
+
+import fastjson
+
+MEDIA_TYPE = "application/vnd.fpr.columnar"
+MAGIC = b"FPRC"
+VERSION = 1
+MIN_COLUMN = 16     # liste numeriche più corte restano nell'header JSON
+MAX_DECIMALS = 6
+ALIGN = 8
+GZIP_LEVEL = 6
+
+_PREFIX = struct.Struct("<4sHHI")   # magic, version, flags, header_len
+_INT_MAX = 2 ** 31 - 1
+_DELTA_TYPES = (("d8", "<i1", 127), ("d16", "<i2", 32767), ("d32", "<i4", _INT_MAX))
+
+
+def _pad(n):
+    return -n % ALIGN
+
+
+def _is_number(v):
+    return v is None or (isinstance(v, (int, float)) and not isinstance(v, bool))
+
+
+class _Encoder:
+    def __init__(self):
+        self.columns = []
+        self.buffers = []
+        self.size = 0
+        self.seen = {}          # id(array) -> indice colonna (alias come z_kin_frozen)
+        self.date_refs = []     # (ref da completare, lista date)
+        self.keep = []          # oggetti deduplicati, vivi fino a fine codifica
+
+    def walk(self, obj, key=None, owned=True):
+        """owned=False: obj è un temporaneo creato qui, non un oggetto della risposta."""
+        if isinstance(obj, dict):
+            return {k: self.walk(v, k, owned) for k, v in obj.items()}
+        if isinstance(obj, np.ndarray):
+            if obj.ndim == 1 and obj.dtype.kind in "fiu" and len(obj) >= MIN_COLUMN:
+                return {"$col": self.column(obj, self._alias_key(obj))}
+            # tolist() è un temporaneo: niente deduplica (il suo id verrebbe riusato)
+            return self.walk(obj.tolist(), key, owned=False)
+        if isinstance(obj, (list, tuple)):
+            if len(obj) >= MIN_COLUMN:
+                if key == "dates" and all(v is None or isinstance(v, str) for v in obj):
+                    ref = {}
+                    self.date_refs.append((ref, obj))
+                    return ref
+                if all(_is_number(v) for v in obj):
+                    return {"$col": self.column(obj, self._alias_key(obj) if owned else None)}
+            return [self.walk(v, owned=owned) for v in obj]
+        return obj
+
+    def _alias_key(self, obj):
+        # il riferimento tiene vivo l'oggetto per tutta la codifica: id univoco
+        self.keep.append(obj)
+        return id(obj)
+
+    def column(self, values, key=None):
+        if key is not None and key in self.seen:
+            return self.seen[key]
+        a = np.array([np.nan if v is None else v for v in values] if isinstance(values, (list, tuple))
+                     else values, dtype=float)
+        finite = np.isfinite(a)
+        idx = np.flatnonzero(finite)
+        lead, trail = (int(idx[0]), int(len(a) - 1 - idx[-1])) if len(idx) else (len(a), 0)
+        core = a[lead:len(a) - trail]
+        desc = {"enc": "f64", "n": len(core), "lead": lead, "trail": trail}
+        data = None
+        if len(core) and finite[lead:len(a) - trail].all():
+            for d in range(MAX_DECIMALS + 1):
+                scale = 10 ** d
+                q = np.rint(core * scale)
+                if np.abs(q).max() > _INT_MAX or not np.array_equal(q / scale, core):
+                    continue
+                q = q.astype(np.int64)
+                deltas = np.diff(q, prepend=q[0])
+                m = int(np.abs(deltas).max())
+                fit = next((t for t in _DELTA_TYPES if m <= t[2]), None)
+                if fit is None:     # valori che alternano segno: differenze oltre int32 -> f64
+                    break
+                enc, dtype, _ = fit
+                desc.update(enc=enc, scale=scale, base=int(q[0]))
+                data = deltas.astype(dtype).tobytes()
+                break
+        if data is None:
+            data = np.where(np.isfinite(core), core, np.nan).astype("<f8").tobytes()
+        desc["offset"] = self.size
+        self.columns.append(desc)
+        self.buffers.append(data + b"\0" * _pad(len(data)))
+        self.size += len(data) + _pad(len(data))
+        i = len(self.columns) - 1
+        if key is not None:
+            self.seen[key] = i
+        return i
+
+    def resolve_dates(self):
+        axis = sorted({d for _, dates in self.date_refs for d in dates if d is not None})
+        pos = {d: i for i, d in enumerate(axis)}
+        for ref, dates in self.date_refs:
+            lead = next((i for i, d in enumerate(dates) if d is not None), len(dates))
+            idx = [pos[d] for d in dates[lead:] if d is not None]
+            count = len(dates) - lead
+            if len(idx) == count and idx == list(range(idx[0] if idx else 0, (idx[0] if idx else 0) + count)):
+                ref["$dates"] = [lead, idx[0] if idx else 0, count]
+            else:
+                ref["$datecol"] = self.column([None if d is None else pos[d] for d in dates])
+        return axis
+
+
+def encode(payload):
+    """Risposta (dict/list con array NumPy o liste) -> bytes del formato colonnare."""
+    enc = _Encoder()
+    data = enc.walk(payload)
+    axis = enc.resolve_dates()
+    header = fastjson.dumps({"version": VERSION, "axis": axis, "columns": enc.columns, "data": data})
+    header += b" " * _pad(_PREFIX.size + len(header))
+    return b"".join([_PREFIX.pack(MAGIC, VERSION, 0, len(header)), header] + enc.buffers)
+
+
+def _decode_column(buf, body, c):
+    start = body + c["offset"]
+    if c["enc"] == "f64":
+        core = np.frombuffer(buf, dtype="<f8", count=c["n"], offset=start)
+    else:
+        dtype = next(t[1] for t in _DELTA_TYPES if t[0] == c["enc"])
+        deltas = np.frombuffer(buf, dtype=dtype, count=c["n"], offset=start)
+        core = (c["base"] + np.cumsum(deltas, dtype=np.int64)) / c["scale"]
+    return np.concatenate([np.full(c["lead"], np.nan), core, np.full(c["trail"], np.nan)])
+
+
+def decode(buf):
+    """
+    Decodifica di riferimento (test e strumenti): stessa struttura del JSON,
+    serie come liste con None al posto di NaN.
+    """
+    magic, version, _, header_len = _PREFIX.unpack_from(buf)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"formato colonnare non valido ({magic!r} v{version})")
+    header = json.loads(buf[_PREFIX.size:_PREFIX.size + header_len])
+    body = _PREFIX.size + header_len
+    axis = header["axis"]
+    cols = {}
+
+    def col(i):
+        if i not in cols:
+            cols[i] = fastjson._finite_list(_decode_column(buf, body, header["columns"][i]))
+        return cols[i]
+
+    def walk(obj):
+        if isinstance(obj, dict):
+            if "$col" in obj:
+                return col(obj["$col"])
+            if "$dates" in obj:
+                lead, start, count = obj["$dates"]
+                return [None] * lead + axis[start:start + count]
+            if "$datecol" in obj:
+                return [None if i is None else axis[int(i)] for i in col(obj["$datecol"])]
+            return {k: walk(v) for k, v in obj.items()}
+        if isinstance(obj, list):
+            return [walk(v) for v in obj]
+        return obj
+    return walk(header["data"])
+
+
+def wants_columnar(accept):
+    return bool(accept) and MEDIA_TYPE in accept
+
+
+def columnar_response(payload, accept_encoding=None, status_code=200):
+    body = encode(payload)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if accept_encoding and "gzip" in accept_encoding:
+        body = gzip.compress(body, GZIP_LEVEL, mtime=0)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, status_code=status_code, media_type=MEDIA_TYPE, headers=headers)
+
+
+def negotiate(payload, request=None):
+    """
+    Risposta colonnare se la richiesta la chiede (Accept), altrimenti
+    payload invariato (JSON come prima). request None: chiamata da Python.
+    """
+    if request is None or not wants_columnar(request.headers.get("accept")):
+        return payload
+    return columnar_response(payload, request.headers.get("accept-encoding"))
+
+
+# documentazione OpenAPI del formato alternativo sugli endpoint che lo supportano
+OPENAPI_RESPONSES = {200: {"content": {MEDIA_TYPE: {}},
+                           "description": "JSON, o formato colonnare con Accept: " + MEDIA_TYPE}}
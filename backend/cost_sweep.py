@@ -0,0 +1,251 @@
+"""
+Sensibilità a costi e slippage in una sola chiamata.
+
+Con posizioni decise dal segnale, QUANDO si entra e si esce non dipende dai
+costi: cambiano solo il P/L dei trade e quindi il compounding. Qui il
+motore unificato gira UNA volta (costo 0, columnar) e dagli eventi
+eseguiti (exec_index) si ricava il percorso delle posizioni; il percorso
+viene poi riprezzato per un vettore di livelli con operazioni su matrici
+(livelli × barre):
+
+- P/L con la formula di _pnl_frac, capitale realizzato come prodotto
+  sequenziale (LONG prima di SHORT sulla stessa barra, come nel loop),
+  mark-to-market, drawdown, Sharpe ed exposure;
+- stats identiche a backtest_stable(cost_pct=cost+slippage) per ogni
+  livello (tests/test_cost_sweep.py).
+
+Lo slippage è un costo aggiuntivo PER LATO in percento del prezzo, come
+cost_pct: il livello effettivo eseguito è cost_pct + slippage_pct.
+"""
+import numpy as np
+
+from grid_engine import _range, path_stats
+from records import column
+
+DEFAULT_COSTS = (0.0, 0.05, 0.1, 0.2, 0.5)
+DIRECTIONS = ("LONG", "SHORT")   # ordine di esecuzione sulla stessa barra
+STRATEGIES = ("STABLE", "ARANCIONE", "COMBO")
+MODES = ("LONG", "SHORT", "BOTH")   # solo STABLE; ARANCIONE/COMBO sono sempre LONG
+
+
+def cost_levels(costs=DEFAULT_COSTS, slippages=(0.0,)):
+    """Griglia di livelli (cost_pct, slippage_pct), costo per costo."""
+    levels = [(float(c), float(s)) for c in costs for s in (slippages or (0.0,))]
+    if not levels:
+        raise ValueError("costs non può essere vuoto")
+    if any(c < 0 or s < 0 for c, s in levels):
+        raise ValueError("cost_pct e slippage_pct devono essere >= 0")
+    return levels
+
+
+def check_sweep_args(strategy, mode="LONG", costs=DEFAULT_COSTS, slippages=(0.0,)):
+    """ValueError se strategy/mode non sono supportati o i livelli di costo non sono validi."""
+    if strategy not in STRATEGIES:
+        raise ValueError(f"strategy non valida: {strategy} (attese {STRATEGIES})")
+    if mode not in MODES:
+        raise ValueError(f"mode non valido: {mode} (attesi {MODES})")
+    cost_levels(costs, slippages)
+
+
+def trade_path(signal_events, lo, hi):
+    """
+    Percorso delle posizioni dagli eventi ESEGUITI di backtest_stable (i
+    pendenti, exec_index None, si ignorano).
+
+    Returns {direction: (held, exits, entry)} su hi-lo barre: held[k]
+    posizione aperta a fine barra lo+k, exits[k] trade chiuso su quella
+    barra, entry[k] barra relativa d'ingresso del trade in corso o appena
+    chiuso.
+    """
+    m = hi - lo
+    out = {}
+    rows = list(zip(column(signal_events, "type"), column(signal_events, "direction"),
+                    column(signal_events, "exec_index")))
+    for d in DIRECTIONS:
+        held = np.zeros(m, dtype=bool)
+        exits = np.zeros(m, dtype=bool)
+        entry = np.zeros(m, dtype=int)
+        start = None
+        for typ, direction, i in rows:
+            if direction != d or i is None:
+                continue
+            if typ == "ENTRY":
+                start = i - lo
+            elif start is not None:
+                held[start:i - lo] = True
+                exits[i - lo] = True
+                entry[start:i - lo + 1] = start
+                start = None
+        if start is not None:                     # trade OPEN a fine range
+            held[start:] = True
+            entry[start:] = start
+        out[d] = (held, exits, entry)
+    return out
+
+
+def reprice(dates, prices, signal_events, levels, initial_capital=1000.0,
+            start_date=None, end_date=None):
+    """
+    Stats di backtest_stable per ogni livello (cost_pct, slippage_pct) dal
+    percorso di un'unica esecuzione. Returns: lista di dict stats oppure
+    None se nel range mancano date/prezzi validi (il chiamante ricade sul
+    backtest per livello).
+    """
+    lo, hi = _range(dates, start_date, end_date)
+    m = hi - lo
+    if m < 1 or any(d is None for d in dates[lo:hi]):
+        return None
+    p = np.asarray(prices[lo:hi], dtype=float)
+    if not np.all(np.isfinite(p)) or np.any(p <= 0):
+        return None
+
+    K = len(levels)
+    c = (np.array([cst + slp for cst, slp in levels]) / 100.0)[:, None]
+    init = float(initial_capital)
+    path = trade_path(signal_events, lo, hi)
+
+    # colonne interlacciate (barra, direzione): l'ordine del loop
+    factors = np.ones((K, 2 * m))
+    closed = np.zeros(2 * m, dtype=bool)
+    pnl_all = np.zeros((K, 2 * m))
+    open_pnl = []
+    for slot, d in enumerate(DIRECTIONS):
+        held, exits, entry = path[d]
+        pe = p[entry]
+        if d == "LONG":
+            pnl = (p * (1 - c) - pe * (1 + c)) / (pe * (1 + c))
+        else:
+            pnl = (pe * (1 - c) - p * (1 + c)) / pe
+        factors[:, slot::2] = np.where(exits, 1.0 + pnl, 1.0)
+        closed[slot::2] = exits
+        pnl_all[:, slot::2] = pnl
+        open_pnl.append((held, pnl))
+
+    capital = np.cumprod(np.concatenate([np.full((K, 1), init), factors], axis=1), axis=1)[:, 2::2]
+    mtm = capital
+    for held, pnl in open_pnl:
+        mtm = np.where(held, mtm * (1.0 + pnl), mtm)
+
+    rows, cols = np.nonzero(np.broadcast_to(closed, (K, 2 * m)))
+    pnl_pct = np.array([round(v, 2) for v in (pnl_all[rows, cols] * 100).tolist()])
+    exposure = np.full(K, int((path["LONG"][0] | path["SHORT"][0]).sum()))
+    return path_stats(mtm, init, rows, pnl_pct, exposure, round((p[-1] / p[0] - 1.0) * 100.0, 2))
+
+
+def cost_sweep(dates, prices, slopes, mode="LONG", entry_th=0.0, exit_th=0.0,
+               costs=DEFAULT_COSTS, slippages=(0.0,), execution_lag=1,
+               initial_capital=1000.0, start_date=None, end_date=None):
+    """
+    backtest_stable eseguito una volta e riprezzato per ogni livello.
+
+    Returns dict: levels (cost_pct, slippage_pct, total_cost_pct, stats),
+    n_trades (trade chiusi del percorso, uguali per tutti i livelli).
+    """
+    from stable_strategy import backtest_stable
+
+    levels = cost_levels(costs, slippages)
+    kw = dict(mode=mode, entry_th=entry_th, exit_th=exit_th, execution_lag=execution_lag,
+              initial_capital=initial_capital, start_date=start_date, end_date=end_date)
+    base = backtest_stable(dates, prices, slopes, cost_pct=0.0, columnar=True, **kw)
+    stats = reprice(dates, prices, base["signal_events"], levels,
+                    initial_capital=initial_capital, start_date=start_date, end_date=end_date)
+    if stats is None:
+        stats = [backtest_stable(dates, prices, slopes, cost_pct=cst + slp, columnar=True,
+                                 **kw)["stats"] for cst, slp in levels]
+    return {
+        "levels": [{"cost_pct": cst, "slippage_pct": slp, "total_cost_pct": round(cst + slp, 6),
+                    "stats": st} for (cst, slp), st in zip(levels, stats)],
+        "n_trades": base["stats"]["total_trades"],
+    }
+
+
+def strategy_signal(series, strategy, params, mode="LONG"):
+    """
+    (slopes, mode, entry_th, exit_th) da dare a backtest_stable per una
+    serie di walk_forward.prepare_series: slope STABLE o pseudo-slope
+    (pos-0.5, soglie 0.4/0.0) di ARANCIONE/COMBO. None se manca il potenziale.
+    """
+    from stable_strategy import potential_discharge_positions, combo_positions
+
+    if strategy == "STABLE":
+        return series["slopes"], mode, params.get("entry", 0.0), params.get("exit", 0.0)
+    if "pot" not in series:
+        return None
+    d_pos, _ = potential_discharge_positions(series["prices"], series["pot"], series["F"],
+                                             entry_z=params.get("entry_z", 2.0),
+                                             horizon=params.get("horizon", 21))
+    pos = d_pos if strategy == "ARANCIONE" else combo_positions(
+        series["slopes"], params.get("entry", 0.0), params.get("exit", 0.0), d_pos)
+    return [v - 0.5 for v in pos], "LONG", 0.4, 0.0
+
+
+def universe_cost_sweep(data, strategy="STABLE", params=None, costs=DEFAULT_COSTS,
+                        slippages=(0.0,), mode="LONG", start_date=None, end_date=None,
+                        include_tickers=False):
+    """
+    data : {ticker: serie di walk_forward.prepare_series(px, alpha, strategy)}
+
+    Curva di sensibilità ai costi dell'universo: per livello media/mediana
+    del ritorno, Sharpe e drawdown medi, ticker positivi.
+    """
+    check_sweep_args(strategy, mode, costs, slippages)
+    params = params or {}
+    levels = cost_levels(costs, slippages)
+    per_ticker = {}
+    for ticker, series in data.items():
+        sig = strategy_signal(series, strategy, params, mode)
+        if sig is None:
+            continue
+        slopes, seg_mode, entry_th, exit_th = sig
+        res = cost_sweep(series["dates"], series["prices"], slopes, mode=seg_mode,
+                         entry_th=entry_th, exit_th=exit_th, costs=costs, slippages=slippages,
+                         start_date=start_date, end_date=end_date)
+        per_ticker[ticker] = [lv["stats"] for lv in res["levels"]]
+
+    out_levels = []
+    for k, (cst, slp) in enumerate(levels):
+        st = [v[k] for v in per_ticker.values()]
+        ret = np.array([s["total_return"] for s in st], dtype=float)
+        out_levels.append({
+            "cost_pct": cst, "slippage_pct": slp, "total_cost_pct": round(cst + slp, 6),
+            "avg_return": round(float(ret.mean()), 2) if st else None,
+            "median_return": round(float(np.median(ret)), 2) if st else None,
+            "avg_sharpe": round(float(np.mean([s["sharpe"] for s in st])), 2) if st else None,
+            "avg_max_drawdown": round(float(np.mean([s["max_drawdown"] for s in st])), 2) if st else None,
+            "n_positive": int((ret > 0).sum()),
+            "total": len(st),
+        })
+    out = {"strategy": strategy, "params": params, "levels": out_levels,
+           "n_tickers": len(per_ticker)}
+    if include_tickers:
+        out["tickers"] = {t: [s["total_return"] for s in v] for t, v in per_ticker.items()}
+    return out
+
+
+def reprice_fixed_quota(trades, levels):
+    """
+    Trade chiusi a quota fissa (journal del forward test) riprezzati per
+    livello: stesse chiavi di journal_stats (closed, sum/avg_pnl_pct,
+    win_rate). I trade registrano entry/exit lordi, il costo è solo nel P/L.
+    """
+    closed = [t for t in trades if t.get("status") == "closed"
+              and t.get("entry_price") and t.get("exit_price") is not None]
+    out = []
+    if closed:
+        e = np.array([float(t["entry_price"]) for t in closed])[None, :]
+        x = np.array([float(t["exit_price"]) for t in closed])[None, :]
+        short = np.array([t.get("direction") == "SHORT" for t in closed])[None, :]
+        c = (np.array([cst + slp for cst, slp in levels]) / 100.0)[:, None]
+        pnl = np.where(short, (e * (1 - c) - x * (1 + c)) / e,
+                       (x * (1 - c) - e * (1 + c)) / (e * (1 + c)))
+    for k, (cst, slp) in enumerate(levels):
+        pnls = [round(v, 2) for v in (pnl[k] * 100).tolist()] if closed else []
+        wins = sum(1 for v in pnls if v > 0)
+        out.append({
+            "cost_pct": cst, "slippage_pct": slp, "total_cost_pct": round(cst + slp, 6),
+            "closed": len(pnls),
+            "sum_pnl_pct": round(sum(pnls), 2) if pnls else 0.0,
+            "avg_pnl_pct": round(sum(pnls) / len(pnls), 2) if pnls else 0.0,
+            "win_rate": round(wins / len(pnls) * 100, 1) if pnls else 0.0,
+        })
+    return out
@@ -0,0 +1,683 @@
+"""
+Pipeline dedicata di /scan-daily: stato dei segnali FROZEN e SUM per molti
+ticker, senza passare da analyze_stock.
+
+Prima /scan-daily chiamava analyze_stock (Fourier, ActionPath, indicatori,
+cinque backtest) per ogni ticker da 10 thread: lavoro CPU-bound serializzato
+dal GIL, con scritture concorrenti su TICKER_CACHE. Qui:
+
+1. prezzi in blocco con stable_scanner.download_all_prices (PRICE_CACHE ->
+   TICKER_CACHE -> download a thread) e market cap a thread;
+2. per ticker solo frozen_history + i due backtest (FROZEN e SUM), su un
+   ProcessPoolExecutor;
+3. righe unite e ordinate per market cap, stesso formato di prima.
+
+Troncamento frozen e backtest FROZEN/SUM sono gli stessi di /analyze
+(main._analysis_frame li importa da qui): lo stato di una riga coincide con
+quello del grafico per la stessa serie di prezzi.
+
+Anche la scansione email (scanner.run_market_scan) usa scan_signals; per le
+posizioni del portafoglio refresh_prices riscarica solo le ultime barre.
+
+Backfill: lo stato per ogni data di un intervallo esce da un solo passaggio
+per ticker (segnali causali) e si salva in daily_scan_history.json, per
+rileggere cosa avrebbe detto lo scanner in un giorno passato.
+"""
+import concurrent.futures
+import json
+import os
+import threading
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+import pandas as pd
+
+from records import TRADE_FIELDS
+
+ZSCORE_WINDOW = 252
+SCAN_START_DATE = "2023-01-20"
+
+# Market cap per ticker (yfinance info è lento): riusata tra scansioni
+MARKET_CAP_CACHE = {}
+_market_cap_lock = threading.Lock()
+
+
+# ============================================================
+#  FROZEN (condiviso con /analyze)
+# ============================================================
+
+def truncate_frozen(full_frozen_data, end_date):
+    """
+    Serie frozen point-in-time a end_date: (dates, kin, pot, z_sum).
+
+    Per evitare look-ahead dal filtro si taglia la somma GREZZA (raw_sum) e si
+    rifanno z-score rolling e lowpass sulla serie troncata; senza raw_sum
+    (cache legacy) si tagliano le serie già calcolate.
+    """
+    from logic import causal_lowpass
+
+    trunc_dates = []
+    trunc_kin = []
+    trunc_pot = []
+    trunc_z_sum = []
+
+    if full_frozen_data and "raw_sum" in full_frozen_data:
+        full_raw_sum = full_frozen_data["raw_sum"]
+        # dates è ordinata (YYYY-MM-DD): indice di taglio
+        cut_idx = bisect_right(full_frozen_data["dates"], end_date)
+
+        if cut_idx > 0:
+            trunc_dates = full_frozen_data["dates"][:cut_idx]
+            trunc_kin = full_frozen_data["kin"][:cut_idx]
+            trunc_pot = full_frozen_data["pot"][:cut_idx]
+
+            # Ricalcolo dell'indicatore sulla serie troncata
+            trunc_raw = full_raw_sum[:cut_idx]
+
+            # 1. Rolling Z-Score
+            s_trunc = pd.Series(trunc_raw)
+            roll_mean = s_trunc.rolling(window=252, min_periods=20).mean()
+            roll_std = s_trunc.rolling(window=252, min_periods=20).std()
+            z_trunc = ((s_trunc - roll_mean) / (roll_std + 1e-6)).fillna(0).tolist()
+
+            # 2. Lowpass causale
+            try:
+                if len(z_trunc) > 15:
+                    trunc_z_sum = causal_lowpass(z_trunc)
+                else:
+                    trunc_z_sum = z_trunc
+            except:
+                trunc_z_sum = z_trunc
+
+            trunc_z_sum = [round(x, 2) for x in trunc_z_sum]
+    else:
+        for i, d in enumerate(full_frozen_data["dates"]):
+            if d <= end_date:
+                trunc_dates.append(d)
+                trunc_kin.append(full_frozen_data["kin"][i])
+                trunc_pot.append(full_frozen_data["pot"][i])
+                trunc_z_sum.append(full_frozen_data["z_sum"][i])
+            else:
+                break # Stop appena superiamo la data
+
+    return trunc_dates, trunc_kin, trunc_pot, trunc_z_sum
+
+
+def frozen_pot_zscore(n_prices, frozen_z_pot):
+    """Z-score rolling del Frozen Potential, allineato ai prezzi (0 in testa)."""
+    # La serie frozen è più corta (parte da min_points): padding a 0, valore
+    # neutro più sicuro di NaN per il backtest
+    padding_size = n_prices - len(frozen_z_pot)
+    frozen_pot_series = pd.Series([0] * padding_size + frozen_z_pot).fillna(0)
+    roll_fpot_mean = frozen_pot_series.rolling(window=ZSCORE_WINDOW, min_periods=20).mean()
+    roll_fpot_std = frozen_pot_series.rolling(window=ZSCORE_WINDOW, min_periods=20).std()
+    return ((frozen_pot_series - roll_fpot_mean) / (roll_fpot_std + 1e-6)).fillna(0).values.tolist()
+
+
+def align_frozen_sum(n_prices, frozen_z_sum):
+    """Frozen Sum Z allineato ai prezzi; -999 = nessun dato (niente falsi ingressi)."""
+    return [-999] * (n_prices - len(frozen_z_sum)) + frozen_z_sum
+
+
+def frozen_pot_backtest(prices, dates, frozen_z_pot, start_date=None, end_date=None, z_pot=None):
+    """Strategia FROZEN: trigger z-score Frozen Potential, direzione da Z-ROC."""
+    from logic import backtest_strategy
+
+    if z_pot is None:
+        z_pot = frozen_pot_zscore(len(prices), frozen_z_pot)
+    return backtest_strategy(
+        prices=prices,
+        z_kinetic=z_pot,   # Sostituiamo segnale trigger
+        z_slope=[],        # Non usato (use_z_roc=True)
+        dates=dates,
+        start_date=start_date,
+        end_date=end_date,
+        use_z_roc=True     # Direzione basata su Z-ROC (causale)
+    )
+
+
+def frozen_sum_backtest(prices, dates, frozen_z_sum, start_date=None, end_date=None):
+    """Strategia SUM: trigger Frozen Sum Z (filtrato) a -0.3, direzione da Z-ROC."""
+    from logic import backtest_strategy
+
+    return backtest_strategy(
+        prices=prices,
+        z_kinetic=align_frozen_sum(len(prices), frozen_z_sum),
+        z_slope=[],        # Non usato (use_z_roc=True)
+        dates=dates,
+        start_date=start_date,
+        end_date=end_date,
+        threshold=-0.3,    # Entry/Exit a -0.3 invece di 0
+        use_z_roc=True     # Direzione basata su Z-ROC (causale)
+    )
+
+
+# ============================================================
+#  STATO DEL SEGNALE
+# ============================================================
+
+def signal_state(trades, last_date):
+    """BUY/SELL/HOLD/WAIT dall'ultimo trade del backtest alla data last_date."""
+    if not trades:
+        return {"action": "WAIT", "trade": None}
+
+    last_trade = trades[-1]
+    exit_dt = last_trade.get("exit_date")
+
+    # 1. Posizione aperta
+    if exit_dt is None or exit_dt == "OPEN" or last_trade.get("pnl_pct") is None:
+        if last_trade.get("entry_date", "") == last_date:
+            return {"action": "BUY", "trade": last_trade}
+        return {"action": "HOLD", "trade": last_trade}
+
+    # 2. Chiusa proprio oggi
+    if exit_dt == last_date:
+        return {"action": "SELL", "trade": last_trade}
+
+    # 3. Nessuna posizione attiva
+    return {"action": "WAIT", "trade": last_trade}
+
+
+def scan_ticker(ticker, px, market_cap=0, as_of_date=None, start_date=SCAN_START_DATE,
+                alpha=200.0, beta=1.0, frozen=None):
+    """
+    Riga di /scan-daily per un ticker: frozen_history sulla serie (o `frozen`
+    già calcolata su px), taglio point-in-time ad as_of_date, backtest FROZEN
+    e SUM, stato all'ultima barra.
+    """
+    from logic import frozen_history
+
+    if frozen is None:
+        frozen = frozen_history(px, alpha=alpha, beta=beta, min_points=100, kin_lag=25)
+    if as_of_date:
+        px = px[px.index <= pd.Timestamp(as_of_date)]
+        _, _, frozen_z_pot, frozen_z_sum = truncate_frozen(frozen, as_of_date)
+    else:
+        frozen_z_pot, frozen_z_sum = frozen["pot"], frozen["z_sum"]
+
+    dates = px.index.strftime('%Y-%m-%d').tolist()
+    prices = px.values.tolist()
+    last_date = dates[-1] if dates else ""
+
+    z_pot = frozen_pot_zscore(len(prices), frozen_z_pot)
+    frozen_bt = frozen_pot_backtest(prices, dates, frozen_z_pot, start_date, as_of_date, z_pot=z_pot)
+    sum_bt = frozen_sum_backtest(prices, dates, frozen_z_sum, start_date, as_of_date)
+    frozen_res = signal_state(frozen_bt["trades"], last_date)
+    sum_res = signal_state(sum_bt["trades"], last_date)
+
+    return {
+        "ticker": ticker,
+        "market_cap": market_cap,
+        "last_date": last_date,
+        "frozen": {
+            "strategy": "FROZEN",
+            "action": frozen_res["action"],
+            "value": round(z_pot[-1], 2) if z_pot else 0,
+            "date": last_date,
+            "trade": frozen_res["trade"]
+        },
+        "sum": {
+            "strategy": "SUM",
+            "action": sum_res["action"],
+            "value": round(frozen_z_sum[-1], 2) if frozen_z_sum else 0,
+            "date": last_date,
+            "trade": sum_res["trade"]
+        }
+    }
+
+
+def _scan_job(args):
+    try:
+        return scan_ticker(*args)
+    except Exception as e:
+        print(f"Error scanning {args[0]}: {e}")
+        return None
+
+
+# ============================================================
+#  PIPELINE
+# ============================================================
+
+def fetch_market_caps(tickers, max_workers=8):
+    """
+    Market cap per ticker: TICKER_CACHE (se non saltata), MARKET_CAP_CACHE,
+    altrimenti yfinance a thread (I/O). 0 se non disponibile.
+    """
+    from main import TICKER_CACHE
+
+    caps = {}
+    missing = []
+    for t in tickers:
+        entry = TICKER_CACHE.get(t)
+        if entry is not None and "market_cap" not in entry.get("skipped", ()):
+            caps[t] = entry.get("mkt_cap", 0)
+        elif t in MARKET_CAP_CACHE:
+            caps[t] = MARKET_CAP_CACHE[t]
+        else:
+            missing.append(t)
+    if not missing:
+        return caps
+
+    def fetch_one(ticker):
+        import yfinance as yf
+
+        obj = yf.Ticker(ticker)
+        cap = None
+        try:
+            cap = obj.fast_info.market_cap
+        except:
+            pass
+        if cap is None:
+            try:
+                info = obj.info
+                cap = info.get('marketCap') or info.get('totalAssets')
+            except:
+                pass
+        return cap or 0
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+        for t, cap in zip(missing, executor.map(fetch_one, missing)):
+            with _market_cap_lock:
+                MARKET_CAP_CACHE[t] = cap
+            caps[t] = cap
+    return caps
+
+
+def _cached_frozen(entry, px):
+    """Frozen di TICKER_CACHE se calcolata esattamente sulla serie px."""
+    if not entry or not entry.get("frozen") or "raw_sum" not in entry["frozen"]:
+        return None
+    cached = entry["px"]
+    if len(cached) != len(px) or not cached.index.equals(px.index):
+        return None
+    return entry["frozen"]
+
+
+def _scan_inputs(tickers, start_date, download_workers):
+    """Prezzi in blocco + market cap: (prices, caps, ticker con dati)."""
+    from stable_scanner import download_all_prices
+
+    tickers = list(dict.fromkeys(tickers))
+    prices, failed = download_all_prices(tickers, start_date, max_workers=download_workers)
+    if failed:
+        print(f"   ⚠️ {len(failed)} ticker senza prezzi: {failed[:10]}")
+    todo = [t for t in tickers if t in prices and len(prices[t]) > 0]
+    caps = fetch_market_caps(todo, max_workers=download_workers)
+    return prices, caps, todo
+
+
+def _run_jobs(job, tasks, max_workers, on_progress=None, phase="signals"):
+    """
+    job(task) su un ProcessPoolExecutor (max_workers None = min(4, CPU); <= 1:
+    sequenziale), risultati nell'ordine dei task. on_progress(phase, done,
+    total) opzionale a ogni risultato: se solleva, i task in coda vengono annullati.
+    """
+    if max_workers is None:
+        max_workers = min(4, os.cpu_count() or 1)
+    if max_workers <= 1 or len(tasks) <= 1:
+        out = []
+        for task in tasks:
+            out.append(job(task))
+            if on_progress:
+                on_progress(phase, len(out), len(tasks))
+        return out
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        chunk = max(1, len(tasks) // (max_workers * 4))
+        out = []
+        for res in executor.map(job, tasks, chunksize=chunk):
+            out.append(res)
+            if on_progress:
+                on_progress(phase, len(out), len(tasks))
+    except BaseException:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+    return out
+
+
+def scan_signals(prices, caps=None, as_of_date=None, start_date=SCAN_START_DATE, alpha=200.0,
+                 beta=1.0, max_workers=None, on_progress=None):
+    """
+    Righe FROZEN/SUM (scan_ticker) per {ticker: px} già scaricati, sul pool
+    di processi. La frozen history di TICKER_CACHE si riusa se calcolata
+    sulla stessa serie. Ticker in errore saltati; ordine di `prices`.
+    on_progress("signals", done, total) opzionale (vedi _run_jobs).
+    """
+    from main import TICKER_CACHE
+
+    caps = caps or {}
+    tasks = [(t, px, caps.get(t, 0), as_of_date, start_date, alpha, beta,
+              _cached_frozen(TICKER_CACHE.get(t), px)) for t, px in prices.items() if len(px) > 0]
+    return [r for r in _run_jobs(_scan_job, tasks, max_workers, on_progress) if r]
+
+
+def run_daily_scan(tickers, as_of_date=None, start_date=SCAN_START_DATE, alpha=200.0, beta=1.0,
+                   max_workers=None, download_workers=8):
+    """
+    Scansione giornaliera FROZEN/SUM su `tickers` (formato di /scan-daily).
+
+    Download prezzi e market cap a thread, segnali su un ProcessPoolExecutor
+    (max_workers None = min(4, CPU); <= 1: sequenziale). Ticker senza dati
+    o in errore vengono saltati. Returns: righe ordinate per market cap
+    decrescente.
+    """
+    prices, caps, todo = _scan_inputs(tickers, start_date, download_workers)
+    results = scan_signals({t: prices[t] for t in todo}, caps, as_of_date, start_date,
+                           alpha, beta, max_workers)
+    results.sort(key=lambda x: x['market_cap'], reverse=True)
+    return results
+
+
+# ============================================================
+#  AGGIORNAMENTO INCREMENTALE DEI PREZZI
+# ============================================================
+
+TAIL_DAYS = 10   # giorni di calendario riscaricati per l'aggiornamento incrementale
+
+
+def splice_tail(cached, tail, rtol=1e-6):
+    """
+    Serie in cache + coda appena scaricata. None se non si sovrappongono o
+    se i prezzi comuni differiscono (rettifica dividendi/split: storia da
+    riscaricare per intero).
+    """
+    common = cached.index.intersection(tail.index)
+    if len(common) == 0:
+        return None
+    if not np.allclose(cached.loc[common].values, tail.loc[common].values, rtol=rtol, atol=0):
+        return None
+    return pd.concat([cached[cached.index < tail.index[0]], tail])
+
+
+def refresh_prices(tickers, start_date=SCAN_START_DATE, max_workers=8, on_progress=None):
+    """
+    Aggiornamento incrementale di PRICE_CACHE per `tickers` (l'universo della
+    scansione email): se la serie è già in PRICE_CACHE/TICKER_CACHE si
+    riscaricano solo gli ultimi TAIL_DAYS giorni e si accodano, altrimenti (o
+    se la coda non combacia) storia completa. Le entry di TICKER_CACHE più
+    vecchie della serie aggiornata si scartano, così /analyze le riscarica.
+    on_progress("download", done, total) opzionale; se solleva, gli
+    aggiornamenti in coda vengono annullati.
+
+    Returns: {ticker: "tail" | "full" | "failed"}.
+    """
+    from main import PRICE_CACHE, TICKER_CACHE, _price_cache_lock
+    from logic import MarketData
+
+    def cached_series(t):
+        key = f"{t}|{start_date}"
+        if key in PRICE_CACHE:
+            return PRICE_CACHE[key]
+        if t in TICKER_CACHE:
+            px = TICKER_CACHE[t]["px"]
+            return px[px.index >= pd.Timestamp(start_date)] if start_date else px
+        return None
+
+    def refresh_one(t):
+        cached = cached_series(t)
+        px, how = None, "full"
+        try:
+            if cached is not None and len(cached) > 0:
+                since = (cached.index[-1] - pd.Timedelta(days=TAIL_DAYS)).strftime("%Y-%m-%d")
+                px = splice_tail(cached, MarketData(t, start_date=since).fetch())
+                how = "tail"
+            if px is None:
+                px, how = MarketData(t, start_date=start_date).fetch(), "full"
+        except Exception as e:
+            print(f"   ⚠️ Aggiornamento prezzi {t} fallito: {e}")
+            return t, "failed"
+        with _price_cache_lock:
+            PRICE_CACHE[f"{t}|{start_date}"] = px.copy()
+        entry = TICKER_CACHE.get(t)
+        if entry is not None and entry["px"].index[-1] < px.index[-1]:
+            TICKER_CACHE.pop(t, None)
+        return t, how
+
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return {}
+    out = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(max_workers, len(tickers))) as executor:
+        futures = [executor.submit(refresh_one, t) for t in tickers]
+        try:
+            for done, fut in enumerate(concurrent.futures.as_completed(futures), 1):
+                t, how = fut.result()
+                out[t] = how
+                if on_progress:
+                    on_progress("download", done, len(tickers))
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            raise
+    return {t: out[t] for t in tickers}
+
+
+# ============================================================
+#  BACKFILL STORICO (stato del segnale per ogni data)
+# ============================================================
+#
+# FROZEN e SUM sono causali: i trade del backtest su px[:d] sono il prefisso
+# di quelli su tutta la storia, e lo z della frozen ricalcolato sul taglio a d
+# è il prefisso di quello della storia intera (rolling e lfilter procedono in
+# avanti). Un passaggio per ticker dà quindi lo stato di /scan-daily con
+# as_of_date=d per ogni d: l'unica differenza a d è il trade aperto, chiuso
+# "OPEN" al close di d invece che alla sua uscita reale.
+
+BACKFILL_PATH = os.path.join(os.path.dirname(__file__), "daily_scan_history.json")
+BACKFILL_VERSION = 1
+LOWPASS_MIN_POINTS = 16   # truncate_frozen filtra solo con più di 15 punti frozen
+
+
+def backfill_signature(start_date=SCAN_START_DATE, alpha=200.0, beta=1.0):
+    """Parametri dello storico: uno storico salvato con parametri diversi si riparte da zero."""
+    return json.dumps([BACKFILL_VERSION, start_date, float(alpha), float(beta)])
+
+
+def load_backfill(path=None, signature=None):
+    p = path or BACKFILL_PATH
+    if os.path.exists(p):
+        try:
+            with open(p, "r") as f:
+                store = json.load(f)
+            if signature is None or store.get("signature") == signature:
+                return store
+            print("⚠️ Storico scan con parametri diversi: riparto da zero")
+        except Exception as e:
+            print(f"⚠️ Storico scan illeggibile ({e}): riparto da zero")
+    return {"signature": signature, "tickers": {}}
+
+
+def save_backfill(store, path=None):
+    p = path or BACKFILL_PATH
+    tmp = p + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(store, f)
+    os.replace(tmp, p)
+
+
+def _state_columns(trades, dates, prices, lo, initial_capital=1000.0):
+    """
+    Per ogni barra i >= lo: azione (come signal_state su px[:i+1]) e indice
+    del trade di riferimento (-1 = nessuno). entry: (prezzo d'ingresso non
+    arrotondato, capitale prima del trade) per ricostruire il trade aperto.
+    """
+    index_of = {d: i for i, d in enumerate(dates)}
+    entry = []
+    capital = initial_capital
+    for t in trades:
+        entry.append((prices[index_of[t["entry_date"]]], capital))
+        capital = t["capital_after"]
+
+    actions, refs = [], []
+    j = -1
+    for i in range(lo, len(dates)):
+        d = dates[i]
+        while j + 1 < len(trades) and trades[j + 1]["entry_date"] <= d:
+            j += 1
+        if j < 0:
+            actions.append("WAIT")
+        else:
+            exit_dt = trades[j]["exit_date"]
+            if exit_dt == "OPEN" or exit_dt > d:
+                actions.append("BUY" if trades[j]["entry_date"] == d else "HOLD")
+            elif exit_dt == d:
+                actions.append("SELL")
+            else:
+                actions.append("WAIT")
+        refs.append(j)
+    return actions, refs, entry
+
+
+def ticker_history(ticker, px, from_date=None, to_date=None, start_date=SCAN_START_DATE,
+                   alpha=200.0, beta=1.0, frozen=None):
+    """
+    Stato FROZEN/SUM di /scan-daily per ogni barra in [from_date, to_date]
+    con un solo frozen_history + due backtest. Le barre con meno di
+    LOWPASS_MIN_POINTS punti frozen (SUM non ancora filtrato) sono escluse.
+
+    Returns: record colonnare (dates, close, azioni/valori/trade per
+    strategia) da cui history_rows ricostruisce le righe di /scan-daily.
+    """
+    from logic import frozen_history
+
+    if frozen is None:
+        frozen = frozen_history(px, alpha=alpha, beta=beta, min_points=100, kin_lag=25)
+    if to_date:
+        px = px[px.index <= pd.Timestamp(to_date)]
+    dates = px.index.strftime('%Y-%m-%d').tolist()
+    prices = px.values.tolist()
+    if not dates:
+        return None
+    end = dates[-1]
+    f_dates, _, frozen_z_pot, frozen_z_sum = truncate_frozen(frozen, end)
+
+    lo = bisect_left(dates, from_date) if from_date else 0
+    if len(f_dates) < LOWPASS_MIN_POINTS:
+        lo = len(dates)
+    else:
+        lo = max(lo, bisect_left(dates, f_dates[LOWPASS_MIN_POINTS - 1]))
+
+    z_pot = frozen_pot_zscore(len(prices), frozen_z_pot)
+    z_sum = align_frozen_sum(len(prices), frozen_z_sum)
+    record = {"dates": dates[lo:], "close": prices[lo:]}
+    for key, bt, z in (
+        ("frozen", frozen_pot_backtest(prices, dates, frozen_z_pot, start_date, end, z_pot=z_pot), z_pot),
+        ("sum", frozen_sum_backtest(prices, dates, frozen_z_sum, start_date, end), z_sum),
+    ):
+        trades = list(bt["trades"])
+        actions, refs, entry = _state_columns(trades, dates, prices, lo)
+        record[key] = {
+            "action": actions,
+            "trade": refs,
+            # -999 = SUM senza dati: come /scan-daily, che senza frozen riporta 0
+            "value": [round(v, 2) if v != -999 else 0 for v in z[lo:]],
+            "trades": trades,
+            "entry": entry,
+        }
+    return record
+
+
+def _history_job(args):
+    try:
+        return args[0], ticker_history(*args[1:])
+    except Exception as e:
+        print(f"Error backfilling {args[1]}: {e}")
+        return args[0], None
+
+
+def _trade_at(strat, k, close):
+    """Trade di riferimento alla barra k: chiuso com'è, aperto chiuso 'OPEN' al close di k."""
+    j = strat["trade"][k]
+    if j < 0:
+        return None
+    trade = strat["trades"][j]
+    if strat["action"][k] not in ("BUY", "HOLD"):
+        return trade
+    entry_price, capital = strat["entry"][j]
+    if trade["direction"] == 'LONG':
+        pnl = ((close - entry_price) / entry_price) * 100
+    else:
+        pnl = ((entry_price - close) / entry_price) * 100
+    # come la riga OPEN di backtest_strategy (senza snapshot z)
+    return dict(zip(TRADE_FIELDS, (trade["entry_date"], "OPEN", trade["direction"],
+                                   round(entry_price, 2), round(close, 2),
+                                   round(pnl, 2), round(capital, 2))))
+
+
+def history_rows(store, date, tickers=None):
+    """
+    Righe di /scan-daily con as_of_date=date dallo storico salvato: per ogni
+    ticker l'ultima barra <= date, se date cade nel suo intervallo.
+    Ordinate per market cap decrescente.
+    """
+    rows = []
+    for t, rec in store["tickers"].items():
+        if tickers and t not in tickers:
+            continue
+        dates = rec["dates"]
+        k = bisect_right(dates, date) - 1
+        if k < 0 or date > rec["to_date"]:
+            continue
+        last_date = dates[k]
+        row = {"ticker": t, "market_cap": rec["market_cap"], "last_date": last_date}
+        for key, name in (("frozen", "FROZEN"), ("sum", "SUM")):
+            strat = rec[key]
+            row[key] = {
+                "strategy": name,
+                "action": strat["action"][k],
+                "value": strat["value"][k],
+                "date": last_date,
+                "trade": _trade_at(strat, k, rec["close"][k]),
+            }
+        rows.append(row)
+    rows.sort(key=lambda x: x['market_cap'], reverse=True)
+    return rows
+
+
+def backfill_daily_scan(tickers, from_date, to_date=None, start_date=SCAN_START_DATE,
+                        alpha=200.0, beta=1.0, max_workers=None, download_workers=8,
+                        store=None):
+    """
+    Stato di /scan-daily per ogni (ticker, data) in [from_date, to_date]:
+    prezzi come run_daily_scan, un ticker_history per ticker sul pool di
+    processi. I record vanno in `store` (load_backfill), sostituendo quelli
+    già presenti per gli stessi ticker.
+
+    Returns: (store, riepilogo con date, ticker elaborati, falliti e conteggio
+    delle azioni per strategia).
+    """
+    from main import TICKER_CACHE
+
+    signature = backfill_signature(start_date, alpha, beta)
+    if store is None or store.get("signature") != signature:
+        store = {"signature": signature, "tickers": {}}
+    prices, caps, todo = _scan_inputs(tickers, start_date, download_workers)
+    tasks = [(t, t, prices[t], from_date, to_date, start_date, alpha, beta,
+              _cached_frozen(TICKER_CACHE.get(t), prices[t])) for t in todo]
+
+    counts = {"frozen": {}, "sum": {}}
+    done, failed = [], [t for t in dict.fromkeys(tickers) if t not in prices]
+    all_dates = set()
+    for t, rec in _run_jobs(_history_job, tasks, max_workers):
+        if rec is None or not rec["dates"]:
+            failed.append(t)
+            continue
+        rec["market_cap"] = caps.get(t, 0)
+        rec["to_date"] = to_date or rec["dates"][-1]
+        store["tickers"][t] = rec
+        done.append(t)
+        all_dates.update(rec["dates"])
+        for key in counts:
+            for a in rec[key]["action"]:
+                counts[key][a] = counts[key].get(a, 0) + 1
+
+    dates = sorted(all_dates)
+    return store, {
+        "from_date": dates[0] if dates else None,
+        "to_date": dates[-1] if dates else None,
+        "n_dates": len(dates),
+        "tickers": done,
+        "failed": failed,
+        "actions": counts,
+    }
@@ -0,0 +1,185 @@
+"""
+EVENT STUDY degli onset di "scarico del potenziale" (strategia arancione)
+sull'intero universo.
+
+L'evidenza citata in potential_discharge_positions (2026-07-05: 16 ticker,
+ritorno a 10 gg ~4x la baseline) era un calcolo offline. Qui diventa
+ripetibile su centinaia di ticker in pochi secondi, per rivalidare
+entry_z/horizon regolarmente:
+
+- potenziale point-in-time VETTORIALE: l'ultimo punto dello smoother su
+  [0..t] coincide con il filtro di Kalman in t, quindi
+  pot[t] = 0.5*beta*(x_f[t] - F[t])^2 (identico a kalman_frozen_series,
+  senza lo smoothing RTS all'indietro che serve solo alla cinetica);
+- onset per TUTTE le soglie in una volta: maschera (soglie, barre) degli
+  attraversamenti dal basso con prezzo < F (stessa regola di
+  potential_discharge_onsets);
+- ritorni forward per tutti gli orizzonti con un GATHER:
+  R[t, h] = p[t+lag+h] / p[t+lag] - 1 (NaN oltre la fine della serie);
+  le righe degli onset sono gli eventi, tutte le barre con z valido sono
+  la baseline non condizionata.
+
+Aggregazione sull'universo: per ogni entry_z e orizzonte media, mediana,
+hit rate (% ritorni > 0) degli eventi contro la baseline.
+"""
+import numpy as np
+
+ENTRY_ZS = (1.5, 2.0, 2.5, 3.0)
+HORIZONS = (1, 5, 10, 21)
+
+
+def potential_series(px, alpha=200.0, beta=1.0, lookback_span=20, min_points=100):
+    """
+    pot_raw point-in-time allineato a px (NaN nei primi min_points), come
+    prepare_series del walk-forward / analyze_ticker_signals.
+    """
+    from logic import kalman_local_level
+
+    y = px.ewm(span=int(lookback_span), adjust=False).mean().values.astype(float)
+    x_f, _ = kalman_local_level(y, alpha, beta)
+    pot = 0.5 * float(beta) * (x_f - y) ** 2
+    pot[:int(min_points)] = np.nan
+    return pot
+
+
+def forward_returns(prices, horizons=HORIZONS, execution_lag=0):
+    """
+    Matrice (n, len(horizons)) dei ritorni forward % con ingresso al close
+    di t+execution_lag; NaN dove l'orizzonte esce dalla serie.
+    """
+    p = np.asarray(prices, dtype=float)
+    n = len(p)
+    entry = np.arange(n) + int(execution_lag)
+    exit_ = entry[:, None] + np.asarray(horizons, dtype=int)[None, :]
+    ok = exit_ < n
+    e = np.minimum(entry, n - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        R = (p[np.minimum(exit_, n - 1)] / p[e][:, None] - 1.0) * 100.0
+    return np.where(ok, R, np.nan)
+
+
+def onset_mask(z, prices, F_vals, entry_zs=ENTRY_ZS):
+    """
+    Maschera booleana (len(entry_zs), n): onset per ogni soglia, tutto
+    vettoriale. Equivale a potential_discharge_onsets soglia per soglia.
+    """
+    z = np.asarray(z, dtype=float)
+    p = np.asarray(prices, dtype=float)
+    th = np.asarray(entry_zs, dtype=float)[:, None]
+    with np.errstate(invalid="ignore"):
+        below = p < np.asarray(F_vals, dtype=float)
+    mask = np.zeros((len(th), len(z)), dtype=bool)
+    mask[:, 1:] = (z[1:] > th) & (z[:-1] <= th) & below[1:]
+    return mask
+
+
+def ticker_events(px, alpha=200.0, beta=1.0, entry_zs=ENTRY_ZS, horizons=HORIZONS,
+                  execution_lag=0, zwin=252, min_periods=40):
+    """
+    Event study di un ticker. Returns dict con baseline (matrice ritorni
+    delle barre con z valido) ed events {entry_z: matrice ritorni degli
+    onset}; None se la serie è troppo corta per il potenziale.
+    """
+    from stable_strategy import potential_zscore
+
+    px = px.dropna()
+    pot = potential_series(px, alpha, beta)
+    finite = np.flatnonzero(np.isfinite(pot))
+    if len(finite) < min_periods:
+        return None
+    prices = px.values.astype(float)
+    F = px.ewm(span=20, adjust=False).mean().values
+    z = potential_zscore(pot, zwin=zwin, min_periods=min_periods)
+    R = forward_returns(prices, horizons, execution_lag)
+    mask = onset_mask(z, prices, F, entry_zs)
+    start = finite[0] + min_periods - 1   # prima barra con z definito
+    return {
+        "baseline": R[start:],
+        "events": {float(th): R[mask[k]] for k, th in enumerate(entry_zs)},
+    }
+
+
+def _ticker_job(args):
+    ticker, px, kw = args
+    return ticker, ticker_events(px, **kw)
+
+
+def _summary(M):
+    """Per colonna: n, media, mediana, hit rate (%) dei valori finiti."""
+    out = []
+    for col in np.asarray(M, dtype=float).reshape(-1, M.shape[-1]).T:
+        col = col[np.isfinite(col)]
+        if not len(col):
+            out.append({"n": 0, "mean": None, "median": None, "hit_rate": None})
+            continue
+        out.append({
+            "n": int(len(col)),
+            "mean": round(float(col.mean()), 4),
+            "median": round(float(np.median(col)), 4),
+            "hit_rate": round(float((col > 0).mean() * 100.0), 2),
+        })
+    return out
+
+
+def event_study(prices, alpha=200.0, beta=1.0, entry_zs=ENTRY_ZS, horizons=HORIZONS,
+                execution_lag=0, zwin=252, min_periods=40, max_workers=1):
+    """
+    prices : {ticker: pd.Series prezzi}
+
+    Returns dict: baseline [per orizzonte {horizon, n, mean, median,
+    hit_rate}], curves {entry_z: [per orizzonte stesse statistiche degli
+    eventi + excess (media - media baseline) ed edge_x (rapporto delle
+    medie, se la baseline è positiva)]}, n_events {entry_z: n} e
+    events_by_ticker {ticker: {entry_z: n}}.
+    """
+    import concurrent.futures
+
+    horizons = [int(h) for h in horizons]
+    entry_zs = sorted(set(float(z) for z in entry_zs))   # duplicati contati una volta sola
+    kw = dict(alpha=alpha, beta=beta, entry_zs=entry_zs, horizons=horizons,
+              execution_lag=execution_lag, zwin=zwin, min_periods=min_periods)
+    tasks = [(t, px, kw) for t, px in prices.items()]
+    if max_workers <= 1 or len(tasks) <= 1:
+        results = [_ticker_job(task) for task in tasks]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_ticker_job, tasks,
+                                        chunksize=max(1, len(tasks) // (4 * max_workers))))
+
+    width = len(horizons)
+    base, events, by_ticker = [], {z: [] for z in entry_zs}, {}
+    for ticker, res in results:
+        if res is None:
+            continue
+        base.append(res["baseline"])
+        by_ticker[ticker] = {}
+        for z in entry_zs:
+            events[z].append(res["events"][z])
+            by_ticker[ticker][z] = int(len(res["events"][z]))
+
+    def stack(parts):
+        return np.vstack(parts) if parts else np.empty((0, width))
+
+    base_stats = _summary(stack(base))
+    curves = {}
+    for z in entry_zs:
+        rows = []
+        for h, ev, bs in zip(horizons, _summary(stack(events[z])), base_stats):
+            ok = ev["mean"] is not None and bs["mean"] is not None
+            rows.append({
+                "horizon": h, **ev,
+                "excess": round(ev["mean"] - bs["mean"], 4) if ok else None,
+                "edge_x": round(ev["mean"] / bs["mean"], 2) if ok and bs["mean"] > 0 else None,
+            })
+        curves[z] = rows
+
+    return {
+        "n_tickers": len(by_ticker),
+        "horizons": horizons,
+        "entry_zs": entry_zs,
+        "execution_lag": int(execution_lag),
+        "baseline": [{"horizon": h, **bs} for h, bs in zip(horizons, base_stats)],
+        "curves": curves,
+        "n_events": {z: sum(len(e) for e in events[z]) for z in entry_zs},
+        "events_by_ticker": by_ticker,
+    }
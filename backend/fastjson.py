@@ -0,0 +1,212 @@
+"""
+Serializzazione JSON veloce e NumPy-aware per le risposte grandi.
+
+Un dict restituito da un endpoint FastAPI passa da jsonable_encoder (visita
+ricorsiva in Python di ogni elemento di ogni lista) e poi da json.dumps:
+per /analyze, /scan e i batch è la parte dominante del tempo di risposta.
+Qui:
+
+- le route registrate con response_class=FastJSONResponse (route_class
+  FastJSONRoute dell'app) serializzano il dict restituito con dumps() senza
+  jsonable_encoder; la funzione resta chiamabile da Python e restituisce
+  ancora il dict. fast_json(content) fa lo stesso per una singola risposta;
+- dumps() serializza con orjson se installato (`pip install orjson`, NON è
+  in requirements) con array NumPy nativi, altrimenti con json della
+  libreria standard convertendo gli array con un solo tolist() ciascuno;
+- NaN e ±inf diventano null in entrambi i casi (prima facevano fallire la
+  risposta: JSONResponse usa allow_nan=False);
+- padded_round() arrotonda e allinea una serie in forma vettoriale, al posto
+  delle list comprehension [round(x, 2) ...], con gli stessi valori di
+  round(): l'array resta NumPy fino a dumps.
+
+Selezione del backend:
+    FPR_JSON=auto    orjson se importabile, altrimenti json (default)
+    FPR_JSON=orjson  orjson (avviso e json se manca)
+    FPR_JSON=json    libreria standard
+"""
+import os
+import json
+import math
+import inspect
+import functools
+
+import numpy as np
+from fastapi.responses import Response
+from fastapi.routing import APIRoute
+
+try:
+    import orjson
+except ImportError:  # opzionale
+    orjson = None
+
+ENV_VAR = "FPR_JSON"
+BACKENDS = ("auto", "orjson", "json")
+
+_backend = "json"
+
+
+def set_backend(name):
+    """Seleziona il serializzatore (auto/orjson/json); restituisce quello attivo."""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"{ENV_VAR} non valido: {name!r} (ammessi: {BACKENDS})")
+    if name == "orjson" and orjson is None:
+        print("⚠️ orjson non installato: uso json")
+        name = "json"
+    if name == "auto":
+        name = "orjson" if orjson is not None else "json"
+    _backend = name
+    return _backend
+
+
+def get_backend():
+    return _backend
+
+
+def _finite_list(a):
+    """Array -> lista Python con None al posto di NaN/±inf."""
+    if a.dtype.kind == "f":
+        bad = ~np.isfinite(a)
+        if bad.any():
+            out = a.astype(object)
+            out[bad] = None
+            return out.tolist()
+    return a.tolist()
+
+
+def _clean(obj):
+    """Copia di obj con None al posto dei float non finiti (solo percorso json)."""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _clean(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_clean(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return _finite_list(obj)
+    return obj
+
+
+def _default(o):
+    # tipi non nativi del serializzatore: array, scalari NumPy, date, set
+    if isinstance(o, np.ndarray):
+        if _backend == "orjson" and o.dtype.kind in "fiub":
+            return np.ascontiguousarray(o)   # orjson serializza solo array contigui
+        return _finite_list(o)
+    if isinstance(o, np.generic):
+        v = o.item()
+        return None if isinstance(v, float) and not math.isfinite(v) else v
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    if hasattr(o, "isoformat"):
+        return o.isoformat()
+    return str(o)
+
+
+if orjson is not None:
+    _ORJSON_OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(obj):
+    """obj -> bytes JSON compatti (NaN/inf -> null)."""
+    if _backend == "orjson":
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTS)
+    try:
+        text = json.dumps(obj, default=_default, allow_nan=False, separators=(",", ":"))
+    except ValueError:
+        # float non finiti fuori dagli array: seconda passata con pulizia
+        text = json.dumps(_clean(obj), default=_default, allow_nan=False, separators=(",", ":"))
+    return text.encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content)
+
+
+def fast_json(content, status_code=200):
+    """Response già serializzata: l'endpoint la restituisce al posto del dict."""
+    return FastJSONResponse(content, status_code=status_code)
+
+
+class FastJSONRoute(APIRoute):
+    """
+    Route che, con response_class=FastJSONResponse, avvolge l'endpoint in
+    modo che il valore restituito diventi subito una FastJSONResponse:
+    FastAPI non lo passa più da jsonable_encoder. Le altre route e le
+    Response restituite esplicitamente (503, file, stream) non cambiano.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        if kwargs.get("response_class") is FastJSONResponse:
+            endpoint = _fast_endpoint(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _wrap_result(result):
+    return result if isinstance(result, Response) else FastJSONResponse(result)
+
+
+def _fast_endpoint(fn):
+    # functools.wraps conserva la firma (__wrapped__) per parametri e OpenAPI
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def endpoint(*args, **kwargs):
+            return _wrap_result(await fn(*args, **kwargs))
+    else:
+        @functools.wraps(fn)
+        def endpoint(*args, **kwargs):
+            return _wrap_result(fn(*args, **kwargs))
+    return endpoint
+
+
+_EXACT_LIMIT = 2.0 ** 52   # oltre, x * 10^d non ha più cifre frazionarie affidabili
+_TIE_TOL = 1e-7
+
+
+def round_exact(values, decimals=2):
+    """
+    Array float arrotondato a `decimals` con gli stessi valori di round() di
+    Python (arrotondamento corretto del valore binario). np.round calcola
+    rint(x * 10^d) / 10^d e può sbagliare sui quasi-pareggi (2.675 -> 2.68,
+    round() -> 2.67): quelli, e i valori troppo grandi per la scalatura, sono
+    ricalcolati con round(). Fuori da questi casi i due coincidono.
+    """
+    a = np.asarray(values, dtype=float)
+    scaled = a * 10.0 ** decimals
+    out = np.round(scaled) / 10.0 ** decimals
+    frac = np.abs(scaled - np.trunc(scaled))
+    with np.errstate(invalid="ignore"):
+        redo = np.isfinite(a) & ((np.abs(frac - 0.5) < _TIE_TOL) | (np.abs(scaled) >= _EXACT_LIMIT))
+    for i in np.flatnonzero(redo):
+        out[i] = round(float(a[i]), decimals)
+    return out
+
+
+def padded_round(values, length=None, decimals=2, fill=np.nan, rounding="python"):
+    """
+    Serie/array -> array float arrotondato a `decimals`, allineato a destra
+    su `length` elementi con `fill` a sinistra (NaN -> null nel JSON).
+    Stessi valori di pad_left([round(x, decimals) for x in values], length, None):
+    rounding="python" per x float Python (round_exact), "numpy" per x
+    np.float64, il cui round() è np.round.
+    """
+    if rounding == "numpy":
+        a = np.round(np.asarray(values, dtype=float), decimals)
+    elif rounding == "python":
+        a = round_exact(values, decimals)
+    else:
+        raise ValueError(f"rounding non valido: {rounding!r}")
+    if length is None or len(a) >= length:
+        return a if length is None else a[len(a) - length:]
+    out = np.full(length, fill, dtype=float)
+    out[length - len(a):] = a
+    return out
+
+try:
+    set_backend(os.getenv(ENV_VAR, "auto"))
+except ValueError as e:
+    print(f"⚠️ {e}: uso auto")
+    set_backend("auto")
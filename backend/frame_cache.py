@@ -0,0 +1,164 @@
+"""
+Cache dei frame point-in-time della Time Machine (/analyze con end_date).
+
+Ogni passo di shiftDate rifaceva tutto /analyze: slice di px, ActionPath,
+Fourier, z-sum frozen troncato + lowpass e cinque backtest, anche se due
+date consecutive differiscono di una barra. Qui la risposta completa di un
+frame si conserva per (ticker, parametri, barra):
+
+- la chiave usa l'ultima BARRA di trading <= end_date, non la data
+  richiesta: sabato e domenica cadono sul frame di venerdì (stessa risposta,
+  tutti i tagli e i filtri del backtest sono "<= end_date");
+- ogni frame è legato all'oggetto di TICKER_CACHE da cui è stato calcolato
+  (`source`): quando la storia viene riscaricata o invalidata l'entry cambia
+  identità e i frame vecchi diventano miss, senza hook nei punti che
+  scrivono la cache;
+- LRU con capienza fissa (un frame è qualche centinaio di KB);
+- prefetch in background delle barre vicine (più vicine prima), senza
+  duplicare lavori già in coda o frame già presenti.
+"""
+import threading
+import concurrent.futures
+from bisect import bisect_right
+from collections import OrderedDict
+
+DEFAULT_MAXSIZE = 64
+MAX_PREFETCH = 10           # barre per lato al massimo
+
+
+def frame_key(ticker, bar_date, **params):
+    """Chiave di un frame: ticker, barra e parametri che cambiano la risposta."""
+    return (ticker, bar_date, tuple(sorted(params.items())))
+
+
+def frame_bar(dates, end_date):
+    """
+    Indice e data (YYYY-MM-DD) dell'ultima barra <= end_date in `dates`
+    (lista ordinata di stringhe). (None, None) se end_date precede la serie.
+    """
+    k = bisect_right(dates, end_date) - 1
+    if k < 0:
+        return None, None
+    return k, dates[k]
+
+
+def neighbour_bars(dates, k, n):
+    """Fino a n barre per lato attorno a k, dalla più vicina: k+1, k-1, k+2, ..."""
+    out = []
+    for step in range(1, n + 1):
+        for j in (k + step, k - step):
+            if 0 <= j < len(dates):
+                out.append(dates[j])
+    return out
+
+
+class FrameCache:
+    """
+    LRU thread-safe di frame (dict di risposta) con prefetch in background.
+
+    I frame sono condivisi tra le richieste: chi li legge non li modifica
+    (FastAPI li serializza soltanto).
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE, workers=2):
+        self.maxsize = int(maxsize)
+        self.workers = int(workers)
+        self._frames = OrderedDict()     # key -> (source, frame)
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._pool = None
+        self.hits = self.misses = self.evictions = 0
+        self.prefetched = self.prefetch_errors = 0
+
+    def get(self, key, source):
+        """Frame in cache per key calcolato da `source`, altrimenti None."""
+        with self._lock:
+            item = self._frames.get(key)
+            if item is not None and item[0] is source:
+                self._frames.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:                  # storia cambiata: frame scaduto
+                del self._frames[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, source, frame):
+        with self._lock:
+            self._frames[key] = (source, frame)
+            self._frames.move_to_end(key)
+            while len(self._frames) > self.maxsize:
+                self._frames.popitem(last=False)
+                self.evictions += 1
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._frames
+
+    def __len__(self):
+        return len(self._frames)
+
+    def prefetch(self, jobs):
+        """
+        jobs : iterabile di (key, source, compute) con compute() -> frame.
+        Accoda in background i frame assenti e non già in calcolo.
+        Returns: numero di job accodati.
+        """
+        queued = 0
+        for key, source, compute in jobs:
+            with self._lock:
+                item = self._frames.get(key)
+                if key in self._pending or (item is not None and item[0] is source):
+                    continue
+                self._pending.add(key)
+                if self._pool is None:
+                    self._pool = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix="frame-prefetch")
+                pool = self._pool
+            pool.submit(self._run, key, source, compute)
+            queued += 1
+        return queued
+
+    def _run(self, key, source, compute):
+        try:
+            frame = compute()
+            self.put(key, source, frame)
+            with self._lock:
+                self.prefetched += 1
+        except Exception as e:
+            with self._lock:
+                self.prefetch_errors += 1
+            print(f"⚠️ Prefetch frame {key[0]} {key[1]} fallito: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def wait(self):
+        """Attende che i prefetch in coda finiscano (test e shutdown)."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def invalidate(self, ticker=None):
+        """Svuota la cache (o i soli frame di un ticker). Returns: frame rimossi."""
+        with self._lock:
+            keys = [k for k in self._frames if ticker is None or k[0] == ticker]
+            for k in keys:
+                del self._frames[k]
+            return len(keys)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._frames),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total * 100, 1) if total else 0.0,
+                "evictions": self.evictions,
+                "pending": len(self._pending),
+                "prefetched": self.prefetched,
+                "prefetch_errors": self.prefetch_errors,
+            }
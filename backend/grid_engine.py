@@ -0,0 +1,263 @@
+"""
+Grid search BATCH per ARANCIONE (scarico del potenziale) e COMBO.
+
+backtest_potential_discharge / backtest_combo ricalcolano per ogni cella
+(entry_z, horizon) lo z rolling di pot_raw, gli onset e la posizione, poi
+girano backtest_stable barra per barra: per questo il Lab limita l'optimizer
+a STABLE. Qui, per ticker:
+
+1. z del potenziale UNA volta (potential_zscore) e onset di tutte le soglie
+   in una maschera (event_study.onset_mask);
+2. posizioni di tutte le coppie (entry_z, horizon) con operazioni su array:
+   età dall'ultimo onset (maximum.accumulate) < horizon -> tensore
+   (entry_z, horizon, barre); per COMBO il leg trend (isteresi, sequenziale)
+   si calcola una volta per (entry, exit) e va in OR col satellite;
+3. esecuzione in batch (batch_backtest_long): tutte le celle come righe di
+   una matrice, stessa semantica di backtest_stable LONG con pseudo-slope
+   (esecuzione t+lag, costi per lato, mark-to-market, trade OPEN esclusi
+   dalle stats). Prodotti e somme sono sequenziali come nel loop: le stats
+   coincidono con backtest_stable (tests/test_grid_engine.py).
+
+grid_search replica runGridSearch del Lab (frontend/test_stable.js): split
+train/OOS sul calendario unione, media sui ticker del ritorno train e OOS.
+"""
+import numpy as np
+
+from event_study import onset_mask
+
+
+def discharge_position_grid(z, prices, F_vals, entry_zs, horizons):
+    """
+    Tensore bool (len(entry_zs), len(horizons), n) delle posizioni
+    desiderate; riga per riga == potential_discharge_positions.
+    """
+    mask = onset_mask(z, prices, F_vals, entry_zs)
+    n = mask.shape[1]
+    t = np.arange(n)
+    last = np.maximum.accumulate(np.where(mask, t, -1), axis=1)
+    age = np.where(last >= 0, t - last, n + 1)   # barre dall'ultimo onset
+    return age[:, None, :] < np.asarray(horizons, dtype=int)[None, :, None]
+
+
+def trend_position_grid(slopes, entries, exits):
+    """Matrice bool (len(entries), len(exits), n) del leg trend COMBO."""
+    from stable_strategy import combo_positions
+
+    return np.array([[combo_positions(slopes, e, x, []) for x in exits] for e in entries],
+                    dtype=bool).reshape(len(entries), len(exits), len(slopes))
+
+
+def _range(dates, start_date, end_date):
+    """Barre [lo, hi) nel range date (date ordinate, come in_range)."""
+    from bisect import bisect_left, bisect_right
+
+    lo = bisect_left(dates, start_date) if start_date is not None else 0
+    hi = bisect_right(dates, end_date) if end_date is not None else len(dates)
+    return lo, hi
+
+
+def batch_backtest_long(dates, prices, positions, execution_lag=1, cost_pct=0.0,
+                        initial_capital=1000.0, start_date=None, end_date=None):
+    """
+    Backtest LONG di K serie di posizione desiderata (matrice (K, n) 0/1)
+    con la semantica di backtest_stable(pseudo_slope=pos-0.5,
+    entry_th=0.4, exit_th=0.0). Returns: lista di K dict stats.
+
+    Richiede prezzi validi nel range (serie di prepare_series); altrimenti
+    ricade su backtest_stable cella per cella.
+    """
+    P = np.asarray(positions, dtype=bool).reshape(-1, len(dates))
+    lo, hi = _range(dates, start_date, end_date)
+    p = np.asarray(prices[lo:hi], dtype=float)
+    if hi - lo < 1 or not np.all(np.isfinite(p)) or np.any(p <= 0):
+        from stable_strategy import backtest_stable
+        return [backtest_stable(dates, prices, (row - 0.5).tolist(), mode="LONG",
+                                entry_th=0.4, exit_th=0.0, execution_lag=execution_lag,
+                                cost_pct=cost_pct, initial_capital=initial_capital,
+                                start_date=start_date, end_date=end_date,
+                                columnar=True)["stats"]
+                for row in P.astype(float)]
+
+    K, m = P.shape[0], hi - lo
+    lag = int(execution_lag)
+    c = float(cost_pct) / 100.0
+    init = float(initial_capital)
+
+    # posizione detenuta dopo l'esecuzione della barra i: decisione su j=i-lag
+    # solo se j è nel range (prima delle prime `lag` barre si resta flat)
+    held = np.zeros((K, m), dtype=bool)
+    if lag < m:
+        held[:, lag:] = P[:, lo:hi - lag]
+    prev = np.zeros_like(held)
+    prev[:, 1:] = held[:, :-1]
+    exits = prev & ~held
+
+    k = np.arange(m)
+    last_entry = np.maximum.accumulate(np.where(held & ~prev, k, 0), axis=1)
+    pe = p[last_entry]          # prezzo d'ingresso del trade in corso / appena chiuso
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pnl = (p * (1 - c) - pe * (1 + c)) / (pe * (1 + c))
+
+    # capitale realizzato: prodotto sequenziale (stesso ordine del loop)
+    factors = np.where(exits, 1.0 + pnl, 1.0)
+    capital = np.cumprod(np.concatenate([np.full((K, 1), init), factors], axis=1), axis=1)[:, 1:]
+    mtm = np.where(held, capital * (1.0 + pnl), capital)
+
+    # trade chiusi: pnl_pct arrotondato come nel loop (round Python)
+    rows, cols = np.nonzero(exits)
+    pnl_pct = np.array([round(v, 2) for v in (pnl[rows, cols] * 100).tolist()])
+    return path_stats(mtm, init, rows, pnl_pct, held.sum(axis=1),
+                      round((p[-1] / p[0] - 1.0) * 100.0, 2))
+
+
+def _sharpe_rows(mtm):
+    """Sharpe annualizzato per riga sui rendimenti mark-to-market (come il loop)."""
+    K, m = mtm.shape
+    sharpe = np.zeros(K)
+    if m < 3:
+        return sharpe
+    prev = mtm[:, :-1]
+    if np.all(prev > 0):
+        blocks = [(slice(None), mtm[:, 1:] / prev - 1.0)]
+    else:
+        # capitale <= 0 (short oltre il -100%): il loop salta quei rendimenti
+        blocks = [(slice(r, r + 1), (mtm[r, 1:] / prev[r] - 1.0)[prev[r] > 0][None, :])
+                  for r in range(K)]
+    for rows, R in blocks:
+        nr = R.shape[1]
+        if nr < 2:
+            continue
+        # somme sequenziali (cumsum) come sum() del loop
+        mean_r = np.cumsum(R, axis=1)[:, -1] / nr
+        var_r = np.cumsum((R - mean_r[:, None]) ** 2, axis=1)[:, -1] / (nr - 1)
+        std_r = var_r ** 0.5
+        ok = std_r > 1e-12
+        sharpe[rows] = np.where(ok, mean_r / np.where(ok, std_r, 1.0) * (252 ** 0.5), 0.0)
+    return sharpe
+
+
+def path_stats(mtm, init, rows, pnl_pct, exposure, buy_hold):
+    """
+    Stats di backtest_stable per K percorsi già eseguiti.
+
+    mtm      : (K, m) capitale mark-to-market a fine barra (barre attive)
+    rows     : riga di ogni trade CHIUSO, in ordine di chiusura
+    pnl_pct  : pnl_pct arrotondato di ogni trade chiuso
+    exposure : (K,) barre con almeno una posizione aperta
+    Returns: lista di K dict stats.
+    """
+    K, m = mtm.shape
+    peak = np.maximum(np.maximum.accumulate(mtm, axis=1), init)
+    max_dd = ((peak - mtm) / peak * 100.0).max(axis=1)
+    sharpe = _sharpe_rows(mtm)
+
+    n_closed = np.bincount(rows, minlength=K)
+    pos = pnl_pct > 0 if len(pnl_pct) else np.zeros(0, dtype=bool)
+    wins = np.bincount(rows, weights=pos, minlength=K)
+    win_pnl = np.bincount(rows, weights=np.where(pos, pnl_pct, 0.0), minlength=K)
+    loss_pnl = np.abs(np.bincount(rows, weights=np.where(pos, 0.0, pnl_pct), minlength=K))
+    sum_pnl = np.bincount(rows, weights=pnl_pct, minlength=K)
+
+    out = []
+    for r in range(K):
+        nc, w = int(n_closed[r]), int(wins[r])
+        final_capital = float(mtm[r, -1])
+        if loss_pnl[r] > 0:
+            pf = round(float(win_pnl[r] / loss_pnl[r]), 2)
+        else:
+            pf = 999 if win_pnl[r] > 0 else 0
+        avg = round(float(sum_pnl[r]) / nc, 2) if nc else 0
+        out.append({
+            "final_capital": round(final_capital, 2),
+            "total_return": round((final_capital - init) / init * 100.0, 2),
+            "win_rate": round(w / nc * 100.0, 1) if nc else 0,
+            "total_trades": nc,
+            "avg_trade_pct": avg,
+            "avg_trade": avg,
+            "max_drawdown": round(float(max_dd[r]), 2),
+            "profit_factor": pf,
+            "wins": w,
+            "losses": nc - w,
+            "exposure_pct": round(int(exposure[r]) / m * 100.0, 1),
+            "sharpe": round(float(sharpe[r]), 2),
+            "buy_hold_return": buy_hold,
+        })
+    return out
+
+
+def ticker_grid(series, strategy, entry_zs, horizons, entries=(0.0,), exits=(0.0,),
+                zwin=252, min_periods=40):
+    """
+    Celle e matrice posizioni (K, n) di un ticker preparato con
+    walk_forward.prepare_series. Returns: (cells [dict params], P) oppure
+    None se manca il potenziale.
+    """
+    from stable_strategy import potential_zscore
+
+    if "pot" not in series:
+        return None
+    z = potential_zscore(series["pot"], zwin=zwin, min_periods=min_periods)
+    D = discharge_position_grid(z, series["prices"], series["F"], entry_zs, horizons)
+    if strategy == "ARANCIONE":
+        cells = [{"entry_z": ez, "horizon": h} for ez in entry_zs for h in horizons]
+        return cells, D.reshape(-1, D.shape[-1])
+    T = trend_position_grid(series["slopes"], entries, exits)
+    P = T[:, :, None, None, :] | D[None, None, :, :, :]
+    cells = [{"entry": e, "exit": x, "entry_z": ez, "horizon": h}
+             for e in entries for x in exits for ez in entry_zs for h in horizons]
+    return cells, P.reshape(-1, P.shape[-1])
+
+
+def grid_search(data, strategy="ARANCIONE", entry_zs=(1.5, 2.0, 2.5), horizons=(10, 21, 42),
+                entries=(0.0,), exits=(0.0,), train_frac=0.7, cost_pct=0.0):
+    """
+    data : {ticker: serie di walk_forward.prepare_series(px, alpha, strategy)}
+
+    Come runGridSearch del Lab: split al train_frac del calendario unione,
+    per cella media sui ticker del ritorno TRAIN (fino al giorno prima dello
+    split) e OOS (dallo split in poi).
+
+    Returns dict: split_date, train_end, n_tickers e results (una riga per
+    cella, ordinate per ritorno train decrescente).
+    """
+    if strategy not in ("ARANCIONE", "COMBO"):
+        raise ValueError(f"strategy non valida: {strategy} (attese ARANCIONE, COMBO)")
+    all_dates = sorted({d for s in data.values() for d in s["dates"]})
+    if not all_dates:
+        return {"split_date": None, "train_end": None, "n_tickers": 0, "results": []}
+    split_idx = min(len(all_dates) - 1, int(len(all_dates) * train_frac))
+    split_date = all_dates[split_idx]
+    train_end = all_dates[split_idx - 1] if split_idx > 0 else all_dates[0]
+
+    cells, acc = None, None
+    n_tickers = 0
+    for series in data.values():
+        g = ticker_grid(series, strategy, entry_zs, horizons, entries, exits)
+        if g is None:
+            continue
+        cells, P = g
+        train = batch_backtest_long(series["dates"], series["prices"], P, cost_pct=cost_pct,
+                                    end_date=train_end)
+        oos = batch_backtest_long(series["dates"], series["prices"], P, cost_pct=cost_pct,
+                                  start_date=split_date)
+        cols = np.array([[a["total_return"], a["win_rate"], a["total_trades"], b["total_return"]]
+                         for a, b in zip(train, oos)], dtype=float)
+        part = np.column_stack([cols, cols[:, 0] > 0, cols[:, 3] > 0])
+        acc = part if acc is None else acc + part
+        n_tickers += 1
+
+    if acc is None:
+        return {"split_date": split_date, "train_end": train_end, "n_tickers": 0, "results": []}
+    results = [{
+        **params,
+        "avg_return": round(float(a[0] / n_tickers), 2),
+        "oos_return": round(float(a[3] / n_tickers), 2),
+        "oos_positive": int(a[5]),
+        "avg_win_rate": round(float(a[1] / n_tickers), 1),
+        "avg_trades": round(float(a[2] / n_tickers)),
+        "n_positive": int(a[4]),
+        "total": n_tickers,
+    } for params, a in zip(cells, acc)]
+    results.sort(key=lambda r: -r["avg_return"])
+    return {"strategy": strategy, "split_date": split_date, "train_end": train_end,
+            "n_tickers": n_tickers, "results": results}
@@ -0,0 +1,943 @@
+"""
+Verifica di integrità dei trade (/verify-integrity) — replay INCREMENTALE.
+
+Il vecchio verificatore simulava il tempo così:
+
+    for end_idx in range(start_idx, n):
+        segnale = pipeline(px[:end_idx+1])        # z-score, lowpass, reindex
+        trades  = backtest_strategy(prefisso)      # dalla barra 0
+        confronta trades con tutta la trade_history
+
+cioè O(n²) (minuti per ticker). Per FROZEN e SUM ogni passo della pipeline è
+causale (z-score rolling, causal_lowpass, reindex per data): il segnale
+calcolato sul prefisso coincide con il prefisso del segnale calcolato una
+volta sola. Anche backtest_strategy è causale: lo stato alla barra e non
+dipende dalle barre successive. Quindi:
+
+- il segnale si calcola UNA volta (pipeline sull'ultima barra);
+- StrategyStepper fa avanzare il backtest di una barra per passo e produce
+  la "vista" dei trade che il vecchio loop avrebbe visto al giorno e;
+- TradeHistoryTracker applica le STESSE regole di confronto del vecchio loop
+  (Dir/Exit/Price, DISSOLTO, BLOCCATO, INSTABILE) toccando solo i trade che
+  cambiano al passo corrente, non l'intera storia.
+
+LIVE invece NON è causale (il percorso di minima azione è uno smoother
+bidirezionale), ma i valori cambiano solo nelle ultime barre: l'influenza di
+un nuovo dato decade come C^k lungo lo smoother RTS. LiveKalmanWindow
+ricalcola per ogni giorno solo la finestra finale e replay_live_integrity
+riparte da uno snapshot del backtest al bordo della finestra: O(n·window).
+
+La causalità non è data per scontata: ogni `audit_every` passi la pipeline
+viene ricalcolata davvero sul prefisso e confrontata col segnale globale.
+Se diverge (lookahead), quel passo viene eseguito in modo esatto come nel
+vecchio loop (backtest sul prefisso + confronto completo). Con
+audit_every=1 il risultato è identico al brute-force per qualunque segnale,
+anche non causale (tests/test_integrity_replay.py).
+"""
+import os
+from bisect import bisect_right
+
+import numpy as np
+import pandas as pd
+
+from records import column
+
+# Finestra z-score e partenza della simulazione (2 anni di storia), come
+# nel verificatore originale.
+ZSCORE_WINDOW = 252
+START_IDX = 252 * 2
+
+DISSOLVED = "❌ DISSOLTO"
+UNSTABLE = "⚠️ INSTABILE"
+BLOCKED_FLAGS = ("⚠️ BLOCCATO (Slittato)", "⚠️ BLOCCATO (POS. APERTA)")
+
+
+def strategy_params(strategy):
+    """
+    (threshold, use_z_roc) usati dal verificatore.
+
+    Nota: nel verificatore originale l'assegnazione threshold=-0.3 /
+    use_z_roc=True era indentata fuori dal ramo SUM e si applicava a TUTTE le
+    strategie. Lo manteniamo per non cambiare i risultati esposti.
+    """
+    return -0.3, True
+
+
+# ============================================================
+#  BACKTEST A PASSI (specchio di logic.backtest_strategy)
+# ============================================================
+
+class StrategyStepper:
+    """
+    logic.backtest_strategy come macchina a stati che avanza UNA barra per
+    chiamata. Copre la modalità standard (trigger z > threshold, direzione da
+    Z-ROC o z_slope, nessun filtro date): è l'unica usata da /verify-integrity.
+
+    Dopo k chiamate a step(), trades() restituisce ESATTAMENTE la lista che
+    backtest_strategy ritornerebbe sul prefisso delle prime k barre (trade
+    chiusi + riga OPEN se in posizione). Parità: tests/test_integrity_replay.py.
+    """
+
+    def __init__(self, prices, dates, threshold=0.0, use_z_roc=False,
+                 initial_capital=1000.0, execution_lag=1):
+        self.prices = prices
+        self.dates = dates
+        self.threshold = threshold
+        self.use_z_roc = use_z_roc
+        self.lag = int(execution_lag)
+        self.i = 0
+        self.capital = initial_capital
+        self.in_position = False
+        self.entry_price = None
+        self.entry_date = None
+        self.direction = None
+        self.entry_z = 0
+        self.last_price = None
+
+        self.closed = []          # trade chiusi (dict identici a backtest_strategy)
+        self.skipped = []         # segnali ignorati perché già in posizione
+        self.by_entry = {}        # entry_date -> trade chiuso
+        self.skipped_dates = set()
+        self.skipped_indices = set()
+        self._open_cache = None
+
+    def snapshot(self):
+        """Stato minimo per riprendere il backtest da questa barra (vedi fork)."""
+        return (self.i, self.capital, self.in_position, self.entry_price,
+                self.entry_date, self.direction, self.entry_z, self.last_price)
+
+    def fork(self, snap):
+        """Nuovo stepper che riparte dallo stato `snap`, con liste trade vuote."""
+        other = StrategyStepper(self.prices, self.dates, self.threshold,
+                                self.use_z_roc, execution_lag=self.lag)
+        (other.i, other.capital, other.in_position, other.entry_price,
+         other.entry_date, other.direction, other.entry_z, other.last_price) = snap
+        return other
+
+    def _direction(self, z_kinetic, sig, z_kin, z_sl):
+        z_prev = (z_kinetic[sig - 1]
+                  if sig > 0 and sig - 1 < len(z_kinetic) and z_kinetic[sig - 1] is not None
+                  else 0)
+        if self.use_z_roc:
+            return 'LONG' if (z_kin - z_prev) >= 0 else 'SHORT'
+        return 'LONG' if z_sl > 0 else 'SHORT'
+
+    def step(self, z_kinetic, z_slope):
+        """
+        Elabora la barra self.i. z_kinetic / z_slope sono indicizzati per
+        barra assoluta (basta __getitem__ e __len__).
+
+        Returns: "ENTRY", "EXIT" oppure None.
+        """
+        i = self.i
+        self.i += 1
+        self._open_cache = None
+        price = self.prices[i]
+        sig = i - self.lag
+        has_signal = sig >= 0
+        z_kin = z_kinetic[sig] if has_signal and sig < len(z_kinetic) else 0
+        z_sl = z_slope[sig] if has_signal and sig < len(z_slope) else 0
+
+        if price is None:
+            return None
+        self.last_price = price
+        should_enter = has_signal and z_kin > self.threshold
+        date = self.dates[i]
+
+        if not self.in_position:
+            if should_enter:
+                self.in_position = True
+                self.entry_price = price
+                self.entry_date = date
+                self.direction = self._direction(z_kinetic, sig, z_kin, z_sl)
+                self.entry_z = round(z_kin, 4)
+                return "ENTRY"
+            return None
+
+        if should_enter:
+            self.skipped.append({
+                "date": date,
+                "index": i,
+                "price": price,
+                "direction": self._direction(z_kinetic, sig, z_kin, z_sl),
+                "reason": "ALREADY_INVESTED",
+            })
+            self.skipped_dates.add(date)
+            self.skipped_indices.add(i)
+
+        if not z_kin < self.threshold:
+            return None
+
+        if self.direction == 'LONG':
+            pnl_pct = ((price - self.entry_price) / self.entry_price) * 100
+        else:
+            pnl_pct = ((self.entry_price - price) / self.entry_price) * 100
+        self.capital = self.capital * (1 + pnl_pct / 100)
+        trade = {
+            "entry_date": self.entry_date,
+            "exit_date": date,
+            "direction": self.direction,
+            "entry_price": round(self.entry_price, 2),
+            "exit_price": round(price, 2),
+            "pnl_pct": round(pnl_pct, 2),
+            "capital_after": round(self.capital, 2),
+            "entry_z_value": self.entry_z,
+            "entry_z_roc": 0,
+        }
+        self.closed.append(trade)
+        self.by_entry[self.entry_date] = trade
+        self.in_position = False
+        self.direction = None
+        self.entry_price = None
+        self.entry_date = None
+        return "EXIT"
+
+    def open_trade(self):
+        """Riga OPEN come la produce backtest_strategy a fine prefisso (o None)."""
+        if not self.in_position:
+            return None
+        if self._open_cache is None:
+            final_price = self.prices[self.i - 1]
+            if self.direction == 'LONG':
+                pnl = ((final_price - self.entry_price) / self.entry_price) * 100
+            else:
+                pnl = ((self.entry_price - final_price) / self.entry_price) * 100
+            self._open_cache = {
+                "entry_date": self.entry_date,
+                "exit_date": "OPEN",
+                "direction": self.direction,
+                "entry_price": round(self.entry_price, 2),
+                "exit_price": round(final_price, 2),
+                "pnl_pct": round(pnl, 2),
+                "capital_after": round(self.capital, 2),
+            }
+        return self._open_cache
+
+    def trades(self):
+        op = self.open_trade()
+        return self.closed + [op] if op else list(self.closed)
+
+
+# ============================================================
+#  VISTE: "quali trade vedeva il verificatore al giorno e"
+# ============================================================
+
+def _fuzzy_blocked(entry_date, skipped_dates, skipped_indices, date_to_idx, end_idx):
+    """Regola BLOCCATO del verificatore: segnale saltato (esatto o ±3 barre)."""
+    if entry_date in skipped_dates:
+        return True
+    hist_idx = date_to_idx.get(entry_date)
+    if hist_idx is not None and hist_idx <= end_idx and skipped_indices:
+        for offset in range(-3, 4):
+            if (hist_idx + offset) in skipped_indices:
+                return True
+    return False
+
+
+class _ListView:
+    """Vista da un backtest completo sul prefisso (passi divergenti)."""
+
+    def __init__(self, trades, skipped, date_to_idx, end_idx):
+        self.trades = trades
+        self._by_entry = {t["entry_date"]: t for t in trades}
+        # skipped: lista di dict o RecordLog (solo le colonne, niente dict)
+        self._skipped_dates = set(column(skipped, "date"))
+        self._skipped_indices = {k for k in column(skipped, "index") if k is not None}
+        self._date_to_idx = date_to_idx
+        self._end_idx = end_idx
+
+    def get(self, entry_date):
+        return self._by_entry.get(entry_date)
+
+    def is_blocked(self, entry_date):
+        return _fuzzy_blocked(entry_date, self._skipped_dates, self._skipped_indices,
+                              self._date_to_idx, self._end_idx)
+
+
+class _StepperView:
+    """Vista dallo stato corrente di uno StrategyStepper (passi causali)."""
+
+    def __init__(self, stepper, date_to_idx, end_idx):
+        self.stepper = stepper
+        self._date_to_idx = date_to_idx
+        self._end_idx = end_idx
+
+    @property
+    def trades(self):
+        return self.stepper.trades()
+
+    def get(self, entry_date):
+        t = self.stepper.by_entry.get(entry_date)
+        if t is not None:
+            return t
+        op = self.stepper.open_trade()
+        if op is not None and op["entry_date"] == entry_date:
+            return op
+        return None
+
+    def is_blocked(self, entry_date):
+        return _fuzzy_blocked(entry_date, self.stepper.skipped_dates,
+                              self.stepper.skipped_indices, self._date_to_idx, self._end_idx)
+
+
+class _ForkView:
+    """
+    Vista LIVE: stepper di base (segnale globale) fino alla barra p0, più lo
+    stepper biforcato che ha percorso p0+1..e con il segnale della finestra.
+    """
+
+    def __init__(self, base, n_closed, fork, base_pos, date_to_idx, end_idx, p0):
+        self.base = base
+        self.n_closed = n_closed
+        self.fork = fork
+        self._base_pos = base_pos          # entry_date -> posizione in base.closed
+        self._date_to_idx = date_to_idx
+        self._end_idx = end_idx
+        self._p0 = p0
+
+    @property
+    def trades(self):
+        return self.base.closed[:self.n_closed] + self.fork.trades()
+
+    def get(self, entry_date):
+        t = self.fork.by_entry.get(entry_date)
+        if t is not None:
+            return t
+        op = self.fork.open_trade()
+        if op is not None and op["entry_date"] == entry_date:
+            return op
+        pos = self._base_pos.get(entry_date)
+        if pos is not None and pos < self.n_closed:
+            return self.base.closed[pos]
+        return None
+
+    def _skipped_at(self, k):
+        if k <= self._p0:
+            return k in self.base.skipped_indices
+        return k in self.fork.skipped_indices
+
+    def is_blocked(self, entry_date):
+        # ogni barra ha una data: match esatto sulla data == match sull'indice
+        hist_idx = self._date_to_idx.get(entry_date)
+        if hist_idx is None or hist_idx > self._end_idx:
+            return False
+        return any(self._skipped_at(hist_idx + offset) for offset in (0, -3, -2, -1, 1, 2, 3))
+
+
+# ============================================================
+#  STORIA DEI TRADE (regole di confronto del verificatore)
+# ============================================================
+
+class TradeHistoryTracker:
+    """
+    Storia dei trade osservati giorno per giorno, con le regole del
+    verificatore originale. observe(view, end_date) con volatile=None esegue
+    il confronto COMPLETO (vecchio comportamento, O(storia)); con una lista
+    `volatile` elabora solo i trade cambiati al passo corrente più i record
+    "sotto osservazione" (spariti, dissolti o appena usciti dalla vista):
+    stesso risultato, O(1) ammortizzato per passo su segnali causali.
+    """
+
+    def __init__(self):
+        self.history = {}          # entry_date -> record (ordine di scoperta)
+        self.watch = set()         # record da ricontrollare a ogni passo
+        self.last_volatile = set()
+
+    def _see(self, trade, end_date_str):
+        entry_date = trade['entry_date']
+        record = self.history.get(entry_date)
+        if record is None:
+            self.history[entry_date] = {
+                'first_seen': trade.copy(),
+                'first_seen_at': end_date_str,
+                'changes': [],
+                'disappeared': False,
+            }
+            return
+        original = record['first_seen']
+        changes = []
+        if original['direction'] != trade['direction']:
+            changes.append(f"Dir: {original['direction']}→{trade['direction']}")
+        # OPEN -> data è una chiusura normale; data -> data è un cambio retroattivo
+        if original['exit_date'] != trade['exit_date'] and original['exit_date'] != 'OPEN':
+            changes.append(f"Exit: {original['exit_date']}→{trade['exit_date']}")
+        if abs(original['entry_price'] - trade['entry_price']) > 0.01:
+            changes.append(f"Price: {original['entry_price']}→{trade['entry_price']}")
+        for c in changes:
+            if c not in record['changes']:
+                record['changes'].append(c)
+
+    @staticmethod
+    def _clear_negative_flags(record):
+        for flag in (DISSOLVED,) + BLOCKED_FLAGS:
+            if flag in record['changes']:
+                record['changes'].remove(flag)
+
+    def _check(self, entry_date, record, view, end_date_str):
+        """Controllo presenza/assenza di un record; True se resta da osservare."""
+        if view.get(entry_date) is None:
+            if entry_date <= end_date_str:
+                if view.is_blocked(entry_date):
+                    # segnale valido ma bloccato dalla posizione aperta: non è un fantasma
+                    record['disappeared'] = False
+                    self._clear_negative_flags(record)
+                elif not record['disappeared']:
+                    record['disappeared'] = True
+                    if DISSOLVED not in record['changes']:
+                        record['changes'].append(DISSOLVED)
+            return True
+        if record['disappeared']:
+            # ricomparso: non più dissolto ma instabile
+            record['disappeared'] = False
+            self._clear_negative_flags(record)
+            if UNSTABLE not in record['changes']:
+                record['changes'].append(UNSTABLE)
+        return False
+
+    def observe(self, view, end_date_str, volatile=None):
+        if volatile is None:
+            current = view.trades
+            for trade in current:
+                self._see(trade, end_date_str)
+            self.watch = {d for d, rec in self.history.items()
+                          if self._check(d, rec, view, end_date_str)}
+            self.last_volatile = {t['entry_date'] for t in current}
+            return
+
+        keys = set()
+        for trade in volatile:
+            self._see(trade, end_date_str)
+            keys.add(trade['entry_date'])
+        candidates = self.watch | self.last_volatile | keys
+        watch = set()
+        for d in candidates:
+            if self._check(d, self.history[d], view, end_date_str):
+                watch.add(d)
+        self.watch = watch
+        self.last_volatile = keys
+
+    def corrupted_trades(self):
+        out = []
+        for entry_date, data in self.history.items():
+            if data['changes']:
+                out.append({
+                    'entry_date': entry_date,
+                    'original': data['first_seen'],
+                    'first_seen_at': data['first_seen_at'],
+                    'changes': list(set(data['changes'])),
+                })
+        out.sort(key=lambda x: x['entry_date'], reverse=True)
+        return out
+
+
+# ============================================================
+#  SEGNALI POINT-IN-TIME (pipeline del verificatore)
+# ============================================================
+
+def _rolling_z(s):
+    roll_mean = s.rolling(window=ZSCORE_WINDOW, min_periods=20).mean()
+    roll_std = s.rolling(window=ZSCORE_WINDOW, min_periods=20).std()
+    return ((s - roll_mean) / (roll_std + 1e-6)).fillna(0)
+
+
+def frozen_prefix_signal(strategy, dates, frozen):
+    """
+    Pipeline del segnale FROZEN/SUM come la vedeva il verificatore al
+    giorno e (solo dati con data <= dates[e]).
+
+    Returns: (signal_at(e) -> list | [], frozen_cut(e) -> int)
+      signal_at(e) ha lunghezza e+1 (allineato ai prezzi) oppure è vuoto se
+      al giorno e non esiste ancora alcun dato frozen.
+    """
+    from logic import causal_lowpass
+
+    f_dates = frozen["dates"]
+
+    def frozen_cut(e):
+        return bisect_right(f_dates, dates[e])
+
+    f_vals = frozen.get("pot" if strategy == "FROZEN" else "raw_sum") or []
+
+    def signal_at(e):
+        cut = frozen_cut(e)
+        if cut == 0 or not f_vals:
+            return []
+        target_keys = dates[:e + 1]
+        trunc_dates = f_dates[:cut]
+        if strategy == "FROZEN":
+            # allineamento PRIMA dello z-score (come analyze_stock, Strategia 2)
+            aligned = pd.Series(f_vals[:cut], index=trunc_dates).reindex(target_keys).fillna(0)
+            return _rolling_z(aligned).tolist()
+        z_raw = _rolling_z(pd.Series(f_vals[:cut])).tolist()
+        try:
+            z_short = causal_lowpass(z_raw) if len(z_raw) > 15 else z_raw
+        except Exception:
+            z_short = z_raw
+        return pd.Series(z_short, index=trunc_dates).reindex(target_keys).fillna(0).tolist()
+
+    return signal_at, frozen_cut
+
+
+def live_prefix_signal(px, alpha, beta):
+    """Segnale LIVE: z-score rolling della cinetica di ActionPath(px[:e+1])."""
+    from logic import ActionPath
+
+    def signal_at(e):
+        path = ActionPath(px.iloc[:e + 1], alpha=alpha, beta=beta)
+        kinetic = path.kin_density
+        z = (kinetic - kinetic.rolling(ZSCORE_WINDOW).mean()) / kinetic.rolling(ZSCORE_WINDOW).std()
+        return z.tolist()
+
+    return signal_at
+
+
+def _kin_zscore(kinetic):
+    """z-score LIVE (rolling 252 senza min_periods, come il verificatore)."""
+    return (kinetic - kinetic.rolling(ZSCORE_WINDOW).mean()) / kinetic.rolling(ZSCORE_WINDOW).std()
+
+
+class LiveKalmanWindow:
+    """
+    Segnale LIVE point-in-time senza risolvere ActionPath per ogni giorno.
+
+    Il percorso di minima azione su px[:e+1] è lo smoother RTS del filtro di
+    Kalman local-level (vedi logic.kalman_frozen_series). Lo smoother
+    all'indietro da e contrae le differenze di un fattore C ≈ P/(P+q) per
+    barra: dopo `window` barre il percorso calcolato con i dati fino a e
+    coincide (a meno di C^window) con quello calcolato su TUTTA la serie.
+
+    Quindi per ogni giorno e:
+      - posizioni <= p0 = e - window : valori globali (smoother su tutta la
+        serie, calcolato una volta);
+      - posizioni p0+1..e            : RTS all'indietro per `window` passi dal
+        filtro in e, poi z-score rolling sul segmento (servono le 251
+        cinetiche precedenti, prese dalla parte globale).
+
+    Costo O(window) per giorno invece di una risoluzione tridiagonale O(e).
+    """
+
+    def __init__(self, px, alpha=200.0, beta=1.0, lookback_span=20, window=None, tol=1e-12):
+        from logic import kalman_local_level
+
+        F = px.ewm(span=int(lookback_span), adjust=False).mean()
+        self.px, self.beta, self.span = px, float(beta), int(lookback_span)
+        self.A = float(alpha)
+        self.x_f, P_f = kalman_local_level(F.values.astype(float), alpha, beta)
+        self.n = n = len(self.x_f)
+        self.C = (P_f / (P_f + 1.0 / float(alpha))).tolist()
+        x_f = self.x_f.tolist()
+
+        xs = list(x_f)
+        for k in range(n - 2, -1, -1):
+            xs[k] = x_f[k] + self.C[k] * (xs[k + 1] - x_f[k])
+        kin = np.zeros(n)
+        if n > 1:
+            kin[1:] = 0.5 * self.A * np.diff(np.asarray(xs)) ** 2
+        self.kin = kin
+        z = _kin_zscore(pd.Series(kin))
+        self.z = z.tolist()
+        self.z_slope = (z.diff(5) / 5).fillna(0).tolist()
+
+        if window is None:
+            c = self.C[-1] if n else 0.0
+            window = int(np.ceil(np.log(tol) / np.log(c))) if 0.0 < c < 1.0 else n
+        self.window = max(int(window), 25)
+        self._kin_tails = {}
+
+    def precompute(self, ends):
+        """
+        Code cinetiche di molti giorni in un colpo (logic.action_path_windows:
+        passi RTS vettoriali su tutti i giorni, stessi valori del loop di at).
+        """
+        from logic import action_path_windows
+
+        res = action_path_windows(self.px, ends, self.window, self.A, self.beta, self.span)
+        self._kin_tails = dict(zip(res["t_index"], res["kin"]))
+
+    def at(self, e):
+        """
+        Returns: (p0, z_tail, slope_tail) — z e slope point-in-time per le
+        posizioni p0+1..e; le posizioni <= p0 coincidono con self.z/self.z_slope.
+        """
+        L = min(self.window, e)
+        p0 = e - L
+        if e in self._kin_tails:
+            kin_tail = self._kin_tails[e][self.window - L:]
+        else:
+            x_f, C = self.x_f, self.C
+            seg = [0.0] * (L + 1)          # percorso smoothed su p0..e
+            seg[L] = x_f[e]
+            for j in range(L - 1, -1, -1):
+                k = p0 + j
+                seg[j] = x_f[k] + C[k] * (seg[j + 1] - x_f[k])
+            kin_tail = 0.5 * self.A * np.diff(np.asarray(seg)) ** 2
+
+        # z in p0+1 richiede le 251 cinetiche precedenti, la slope in p0+1
+        # anche lo z di 5 barre prima
+        s = max(0, p0 - (ZSCORE_WINDOW - 2) - 5)
+        kin_seg = pd.Series(np.concatenate([self.kin[s:p0 + 1], kin_tail]))
+        z_seg = _kin_zscore(kin_seg)
+        slope_seg = (z_seg.diff(5) / 5).fillna(0)
+        return p0, z_seg.iloc[-L:].tolist(), slope_seg.iloc[-L:].tolist()
+
+
+class _SplicedSignal:
+    """Segnale valori globali fino a p0, coda point-in-time dopo (sola lettura)."""
+
+    def __init__(self, head, p0, tail):
+        self.head = head
+        self.p0 = p0
+        self.tail = tail
+
+    def __len__(self):
+        return self.p0 + 1 + len(self.tail)
+
+    def __getitem__(self, k):
+        return self.head[k] if k <= self.p0 else self.tail[k - self.p0 - 1]
+
+    def tolist(self):
+        return list(self.head[:self.p0 + 1]) + list(self.tail)
+
+
+def _signal_slope(z_signal):
+    return (pd.Series(z_signal, dtype=float).diff(5) / 5).fillna(0).tolist()
+
+
+def _same_signal(z_pre, z_full, atol=1e-9):
+    m = len(z_pre)
+    if m > len(z_full):
+        return False
+    a = np.asarray(z_pre, dtype=float)
+    b = np.asarray(z_full[:m], dtype=float)
+    return bool(np.allclose(a, b, rtol=0.0, atol=atol, equal_nan=True))
+
+
+# ============================================================
+#  REPLAY
+# ============================================================
+
+def _observe_exact(tracker, prices, dates, z_pre, threshold, use_z_roc, date_to_idx, e):
+    """Passo esatto del vecchio loop: backtest sul prefisso + confronto completo."""
+    from logic import backtest_strategy
+
+    res = backtest_strategy(
+        prices=list(prices[:e + 1]), z_kinetic=z_pre,
+        z_slope=_signal_slope(z_pre), dates=list(dates[:e + 1]),
+        threshold=threshold, use_z_roc=use_z_roc, columnar=True,
+    )
+    view = _ListView(res['trades'].to_dicts(), res['skipped_trades'], date_to_idx, e)
+    tracker.observe(view, dates[e])
+
+
+def replay_integrity(prices, dates, signal_at, threshold, use_z_roc,
+                     start_idx=START_IDX, audit_every=21, force_audit=None, on_progress=None):
+    """
+    Replay incrementale del verificatore.
+
+    prices, dates : serie complete (dates = stringhe YYYY-MM-DD ordinate)
+    signal_at(e)  : pipeline point-in-time sul prefisso [0..e] (lista vuota =
+                    nessun segnale disponibile: il giorno non viene simulato)
+    audit_every   : ogni quanti passi ricalcolare davvero il segnale sul
+                    prefisso per verificarne la causalità (1 = ogni giorno,
+                    risultato identico al brute-force; 0 = mai)
+    force_audit(e): predicato opzionale per passi da ricalcolare sempre
+                    (es. prefissi troppo corti per il lowpass)
+    on_progress   : callback("verify", giorni simulati, totale) opzionale, a
+                    ogni audit; se solleva, il replay si ferma
+
+    Returns dict: total_trades, corrupted_trades, steps, audits, divergent_steps
+    """
+    n = len(dates)
+    tracker = TradeHistoryTracker()
+    date_to_idx = {d: i for i, d in enumerate(dates)}
+
+    z_full = signal_at(n - 1) if n else []
+    z_full_slope = _signal_slope(z_full)
+    stepper = StrategyStepper(prices, dates, threshold=threshold, use_z_roc=use_z_roc)
+
+    steps = audits = divergent = 0
+    resync = True   # al primo passo (e dopo ogni divergenza) confronto completo
+    diverged = False
+    first_observed = None
+
+    for e in range(n):
+        event = stepper.step(z_full, z_full_slope)
+        if e < start_idx:
+            continue
+
+        forced = force_audit is not None and force_audit(e)
+        # dopo una divergenza si ricalcola ogni giorno finché il prefisso
+        # torna a coincidere: il resync dallo stepper è esatto solo lì
+        audit = forced or first_observed is None or diverged or (
+            audit_every and (e - first_observed) % audit_every == 0)
+
+        z_pre = None
+        if audit:
+            if on_progress:
+                on_progress("verify", e - start_idx, n - start_idx)
+            z_pre = signal_at(e)
+            if not z_pre:
+                continue   # nessun segnale ancora disponibile: giorno non simulato
+            audits += 1
+        if first_observed is None:
+            first_observed = e
+        steps += 1
+        end_date_str = dates[e]
+
+        if z_pre is not None and not _same_signal(z_pre, z_full):
+            # Il segnale sul prefisso NON coincide col segnale globale
+            # (lookahead): passo esatto come nel vecchio loop.
+            divergent += 1
+            _observe_exact(tracker, prices, dates, z_pre, threshold, use_z_roc, date_to_idx, e)
+            resync = diverged = True
+            continue
+
+        diverged = False
+        view = _StepperView(stepper, date_to_idx, e)
+        if resync:
+            tracker.observe(view, end_date_str)
+            resync = False
+        else:
+            if event == "ENTRY":
+                volatile = [stepper.open_trade()]
+            elif event == "EXIT":
+                volatile = [stepper.closed[-1]]
+            else:
+                volatile = []
+            tracker.observe(view, end_date_str, volatile=volatile)
+
+    if on_progress:
+        on_progress("verify", max(0, n - start_idx), max(0, n - start_idx))
+    return {
+        "total_trades": len(tracker.history),
+        "corrupted_trades": tracker.corrupted_trades(),
+        "steps": steps,
+        "audits": audits,
+        "divergent_steps": divergent,
+    }
+
+
+def replay_live_integrity(prices, dates, live, signal_at, threshold, use_z_roc,
+                          start_idx=START_IDX, audit_every=21, atol=1e-6, on_progress=None):
+    """
+    Replay LIVE: segnale NON causale, ma diverso dal globale solo nelle
+    ultime `live.window` barre (LiveKalmanWindow).
+
+    Uno stepper di base percorre tutta la serie col segnale globale salvando
+    uno snapshot per barra; per ogni giorno e si riparte dallo snapshot in
+    p0 = e - window e si simulano solo le barre p0+1..e col segnale della
+    finestra. Il confronto con la storia tocca solo i trade della finestra.
+    O(n·window) invece di n risoluzioni ActionPath + n backtest completi.
+
+    Gli audit (ogni `audit_every` giorni) confrontano il segnale della
+    finestra con ActionPath sul prefisso: se la differenza supera `atol` il
+    giorno viene eseguito in modo esatto come nel vecchio loop.
+    on_progress come in replay_integrity.
+    """
+    n = len(dates)
+    tracker = TradeHistoryTracker()
+    date_to_idx = {d: i for i, d in enumerate(dates)}
+
+    base = StrategyStepper(prices, dates, threshold=threshold, use_z_roc=use_z_roc)
+    snaps = []   # per barra b: (stato dopo b, n. trade chiusi fino a b)
+    for _ in range(n):
+        base.step(live.z, live.z_slope)
+        snaps.append((base.snapshot(), len(base.closed)))
+    base_pos = {t["entry_date"]: k for k, t in enumerate(base.closed)}
+    live.precompute(range(start_idx, n))
+
+    steps = audits = divergent = 0
+    resync = True
+    diverged = False
+    first_observed = None
+
+    for e in range(start_idx, n):
+        audit = first_observed is None or diverged or (
+            audit_every and (e - first_observed) % audit_every == 0)
+        if first_observed is None:
+            first_observed = e
+        steps += 1
+
+        p0, z_tail, slope_tail = live.at(e)
+        z_sig = _SplicedSignal(live.z, p0, z_tail)
+        sl_sig = _SplicedSignal(live.z_slope, p0, slope_tail)
+
+        if audit:
+            if on_progress:
+                on_progress("verify", e - start_idx, n - start_idx)
+            audits += 1
+            z_pre = signal_at(e)
+            if not (_same_signal(z_pre, z_sig.tolist(), atol=atol)
+                    and _same_signal(_signal_slope(z_pre), sl_sig.tolist(), atol=atol)):
+                divergent += 1
+                _observe_exact(tracker, prices, dates, z_pre, threshold, use_z_roc, date_to_idx, e)
+                resync = diverged = True
+                continue
+        diverged = False
+
+        snap, n_closed = snaps[p0]
+        fork = base.fork(snap)
+        for _ in range(p0 + 1, e + 1):
+            fork.step(z_sig, sl_sig)
+
+        view = _ForkView(base, n_closed, fork, base_pos, date_to_idx, e, p0)
+        if resync:
+            tracker.observe(view, dates[e])
+            resync = False
+        else:
+            # trade della finestra + chiusi dalla base vicino al bordo p0
+            # (ieri ricadevano ancora nella finestra)
+            settled = snaps[p0 - 2][1] if p0 >= 2 else 0
+            volatile = base.closed[settled:n_closed] + fork.trades()
+            tracker.observe(view, dates[e], volatile=volatile)
+
+    if on_progress:
+        on_progress("verify", max(0, n - start_idx), max(0, n - start_idx))
+    return {
+        "total_trades": len(tracker.history),
+        "corrupted_trades": tracker.corrupted_trades(),
+        "steps": steps,
+        "audits": audits,
+        "divergent_steps": divergent,
+    }
+
+
+def verify_integrity(px, strategy, frozen=None, alpha=200.0, beta=1.0,
+                     audit_every=21, start_idx=START_IDX, on_progress=None):
+    """
+    Verifica completa per un ticker: px serie prezzi, frozen = dati frozen
+    nel formato di TICKER_CACHE[ticker]["frozen"] (richiesti per FROZEN/SUM).
+    on_progress("verify", done, total) opzionale (vedi replay_integrity).
+    """
+    dates = [d.strftime('%Y-%m-%d') for d in px.index]
+    prices = px.tolist()
+    threshold, use_z_roc = strategy_params(strategy)
+
+    if strategy == "LIVE":
+        # Il path di minima azione è uno smoother bidirezionale: i valori
+        # recenti cambiano con i nuovi dati -> finestra Kalman/RTS per giorno
+        live = LiveKalmanWindow(px, alpha, beta)
+        return replay_live_integrity(prices, dates, live, live_prefix_signal(px, alpha, beta),
+                                     threshold, use_z_roc, start_idx=start_idx,
+                                     audit_every=audit_every, on_progress=on_progress)
+
+    signal_at, frozen_cut = frozen_prefix_signal(strategy, dates, frozen)
+    force = None
+    if strategy == "SUM":
+        # sotto i 16 punti il verificatore non applica il lowpass: quei
+        # prefissi sono diversi dal segnale globale per costruzione
+        def force(e):
+            return 0 < frozen_cut(e) <= 15
+    return replay_integrity(prices, dates, signal_at, threshold, use_z_roc,
+                            start_idx=start_idx, audit_every=audit_every,
+                            force_audit=force, on_progress=on_progress)
+
+
+# ============================================================
+#  BATCH (universo intero, process pool)
+# ============================================================
+
+MIN_VERIFY_POINTS = 550   # sotto questa soglia il verificatore ricarica 5 anni
+MAX_BATCH_WORKERS = os.cpu_count() or 4   # tetto ai processi del batch, qualunque max_workers
+
+
+def verify_ticker(ticker, px, strategies, frozen=None, alpha=200.0, beta=1.0,
+                  audit_every=21, include_details=False):
+    """
+    Verifica di un ticker su più strategie (eseguibile in un processo
+    worker: solo argomenti serializzabili, nessuna cache globale).
+    Se i dati frozen mancano li calcola qui (logic.frozen_history), invece di
+    richiedere un /analyze preventivo.
+    """
+    from logic import frozen_history
+
+    out = {"ticker": ticker, "points": len(px), "strategies": {}}
+    if frozen is None and any(s in ("FROZEN", "SUM") for s in strategies):
+        frozen = frozen_history(px, alpha=alpha, beta=beta)
+        out["frozen_computed"] = True
+
+    for strategy in strategies:
+        try:
+            res = verify_integrity(px, strategy, frozen=frozen, alpha=alpha, beta=beta,
+                                   audit_every=audit_every)
+        except Exception as e:
+            out["strategies"][strategy] = {"status": "error", "detail": str(e)}
+            continue
+        row = {
+            "status": "ok",
+            "total_trades": res["total_trades"],
+            "corrupted_count": len(res["corrupted_trades"]),
+            "steps": res["steps"],
+            "divergent_steps": res["divergent_steps"],
+        }
+        if include_details:
+            row["corrupted_trades"] = res["corrupted_trades"]
+        out["strategies"][strategy] = row
+    return out
+
+
+def _verify_ticker_job(args):
+    return verify_ticker(*args)
+
+
+def run_integrity_batch(inputs, strategies, alpha=200.0, beta=1.0, audit_every=21,
+                        max_workers=4, include_details=False, on_result=None, on_progress=None):
+    """
+    Verifica integrità su molti ticker in parallelo (ProcessPoolExecutor:
+    il replay è CPU-bound puro Python, i thread non scalano per il GIL).
+
+    inputs      : {ticker: (px, frozen | None)}
+    on_result   : callback(ticker_result) chiamata a ogni ticker completato
+                  (avanzamento del job); gli errori del singolo ticker non
+                  fermano il batch.
+    on_progress : callback(phase, done, total) con phase "verify"; se una
+                  callback solleva (job annullato) i ticker in coda vengono
+                  annullati e l'eccezione risale.
+    max_workers : limitato a MAX_BATCH_WORKERS e al numero di ticker.
+
+    Returns: lista dei risultati per ticker (ordine di completamento).
+    """
+    import concurrent.futures
+
+    tasks = [(t, px, list(strategies), frozen, alpha, beta, audit_every, include_details)
+             for t, (px, frozen) in inputs.items()]
+    results = []
+
+    def _done(ticker, res=None, err=None):
+        if err is not None:
+            res = {"ticker": ticker, "status": "error", "detail": str(err), "strategies": {}}
+        results.append(res)
+        if on_result:
+            on_result(res)
+        if on_progress:
+            on_progress("verify", len(results), len(tasks))
+
+    max_workers = min(max_workers, MAX_BATCH_WORKERS, len(tasks))
+    if on_progress:
+        on_progress("verify", 0, len(tasks))
+    if max_workers <= 1 or len(tasks) <= 1:
+        for task in tasks:
+            try:
+                res = _verify_ticker_job(task)
+            except Exception as e:
+                _done(task[0], err=e)
+            else:
+                _done(task[0], res)
+        return results
+
+    executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+    futures = {executor.submit(_verify_ticker_job, task): task[0] for task in tasks}
+    try:
+        for fut in concurrent.futures.as_completed(futures):
+            ticker = futures[fut]
+            try:
+                res = fut.result()
+            except Exception as e:
+                _done(ticker, err=e)
+            else:
+                _done(ticker, res)
+    except BaseException:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+    return results
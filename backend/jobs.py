@@ -0,0 +1,205 @@
+"""
+Job in background con avanzamento, risultati parziali e cancellazione.
+
+Le operazioni lunghe (/scan, /analyze-batch-stable, /verify-integrity,
+scansioni STABLE ed email) tenevano aperta la richiesta HTTP per minuti o
+giravano in BackgroundTasks senza modo di fermarle. Qui:
+
+- JobManager.submit(kind, fn, params) esegue fn(job) su un pool di thread
+  dedicato e restituisce subito il Job (id);
+- il motore riporta l'avanzamento con job.progress(phase, done, total) e i
+  risultati parziali con job.add_partial(item): sono le callback
+  on_progress / on_result che i motori accettano già;
+- job.cancel() è cooperativo: alla successiva progress/add_partial il
+  motore riceve JobCancelled, annulla i task ancora in coda e si ferma
+  (niente email a scansione annullata);
+- i job finiti restano consultabili per JOB_TTL secondi, poi vengono
+  scartati (purge a ogni submit/list);
+- submit(..., limit=n) rifiuta (JobLimitReached) un nuovo job se ce ne
+  sono già n dello stesso kind non finiti (batch pesanti come
+  "integrity-batch").
+
+JobCancelled deriva da BaseException come asyncio.CancelledError: i motori
+hanno molti `except Exception` per ticker o per endpoint che altrimenti la
+trasformerebbero in un errore ordinario.
+"""
+import time
+import uuid
+import threading
+import concurrent.futures
+from datetime import datetime
+
+JOB_TTL = 3600          # secondi di conservazione dei job finiti
+MAX_JOB_WORKERS = 4     # job eseguiti in parallelo (gli altri in coda)
+FINAL = ("done", "error", "cancelled")
+
+
+class JobCancelled(BaseException):
+    """Sollevata nel thread del job alla prima progress/add_partial dopo cancel()."""
+
+
+class JobLimitReached(RuntimeError):
+    """submit() con già `limit` job dello stesso kind in coda o in corso."""
+
+
+class Job:
+    def __init__(self, kind, params=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params or {}
+        self.status = "queued"
+        self.phase = None
+        self.done = 0
+        self.total = 0
+        self.partial = []
+        self.result = None
+        self.detail = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self._t0 = None
+        self._elapsed = None
+        self._finished_mono = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self.future = None
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def progress(self, phase, done, total):
+        """Callback on_progress dei motori: aggiorna lo stato o interrompe il job."""
+        self.check()
+        with self._lock:
+            self.phase, self.done, self.total = phase, done, total
+
+    def add_partial(self, item):
+        """Callback on_result dei motori: accoda un risultato parziale."""
+        self.check()
+        with self._lock:
+            self.partial.append(item)
+
+    def cancel(self):
+        """Richiede l'arresto; un job ancora in coda non parte affatto."""
+        self._cancel.set()
+        if self.future is not None and self.future.cancel():
+            self._finish("cancelled")
+
+    def _run(self, fn):
+        with self._lock:
+            if self.status != "queued":
+                return
+            self.status = "running"
+            self.started_at = datetime.now().isoformat()
+            self._t0 = time.perf_counter()
+        try:
+            self.check()
+            result = fn(self)
+        except JobCancelled:
+            self._finish("cancelled")
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            self._finish("error", detail=str(e))
+        else:
+            self._finish("done", result=result)
+        print(f"🧵 Job {self.kind} {self.id}: {self.status} ({self.done}/{self.total})")
+
+    def _finish(self, status, result=None, detail=None):
+        with self._lock:
+            if self.status in FINAL:
+                return
+            self.status, self.result, self.detail = status, result, detail
+            self.finished_at = datetime.now().isoformat()
+            self._finished_mono = time.monotonic()
+            if self._t0 is not None:
+                self._elapsed = time.perf_counter() - self._t0
+
+    def expired(self, ttl, now=None):
+        return self._finished_mono is not None and (now or time.monotonic()) - self._finished_mono > ttl
+
+    def snapshot(self, since=0, include_result=True):
+        """
+        Stato del job (JSON). I parziali partono dall'indice `since` (polling
+        incrementale: il client passa il next_partial della risposta prima).
+        """
+        with self._lock:
+            elapsed = self._elapsed
+            if elapsed is None and self._t0 is not None:
+                elapsed = time.perf_counter() - self._t0
+            out = {
+                "job_id": self.id, "kind": self.kind, "status": self.status,
+                "phase": self.phase, "done": self.done, "total": self.total,
+                "progress": round(self.done / self.total, 4) if self.total else None,
+                "cancel_requested": self.cancelled,
+                "created_at": self.created_at, "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "elapsed_s": round(elapsed, 3) if elapsed is not None else None,
+                "partial_count": len(self.partial),
+            }
+            if since is not None:
+                out["partial"] = self.partial[since:]
+                out["next_partial"] = len(self.partial)
+            if include_result:
+                out["result"] = self.result
+                out["detail"] = self.detail
+        return out
+
+
+class JobManager:
+    def __init__(self, max_workers=MAX_JOB_WORKERS, ttl=JOB_TTL):
+        self.ttl = ttl
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, params=None, limit=None):
+        """
+        Accoda fn(job) e restituisce il Job (status "queued"). limit: numero
+        massimo di job `kind` non finiti, oltre JobLimitReached.
+        """
+        self.purge()
+        job = Job(kind, params)
+        with self._lock:
+            if limit is not None:
+                active = sum(1 for j in self._jobs.values() if j.kind == kind and j.status not in FINAL)
+                if active >= limit:
+                    raise JobLimitReached(f"{active} job {kind} già attivi (massimo {limit})")
+            self._jobs[job.id] = job
+        job.future = self.executor.submit(job._run, fn)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def list(self, kind=None):
+        self.purge()
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [j for j in jobs if kind is None or j.kind == kind]
+
+    def purge(self):
+        """Scarta i job finiti da più di `ttl` secondi."""
+        now = time.monotonic()
+        with self._lock:
+            for job_id in [k for k, j in self._jobs.items() if j.expired(self.ttl, now)]:
+                del self._jobs[job_id]
+
+    def shutdown(self):
+        for job in self.list():
+            job.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
@@ -0,0 +1,371 @@
+"""
+Kernel compilati OPZIONALI per i loop sequenziali del motore.
+
+Alcuni loop sono macchine a stati intrinsecamente sequenziali e restano in
+Python puro: forward pass del Kalman local-level e smoothing RTS a lag
+fisso di kalman_frozen_series, kalman_llt_velocity, loop a barre di
+backtest_stable, onset/holding di potential_discharge_positions e isteresi
+di combo_positions. Qui gli stessi loop sono riscritti su array numpy in
+forma compilabile da numba (njit) e, se numba è installato
+(`pip install numba`, NON è in requirements), compilati al primo uso.
+
+Il codice Python originale resta il riferimento e il fallback: le funzioni
+pubbliche (logic.py, stable_strategy.py) passano ai kernel solo se il
+backend attivo lo richiede. Selezione con la variabile d'ambiente:
+
+    FPR_KERNELS=auto    numba se importabile, altrimenti python (default)
+    FPR_KERNELS=python  sempre il codice di riferimento
+    FPR_KERNELS=numba   kernel compilati (avviso e python se numba manca)
+    FPR_KERNELS=kernel  kernel NON compilati (debug/parità senza numba)
+
+oppure set_backend(...) a runtime. Operazioni floating point identiche e
+nello stesso ordine del riferimento (nessun fastmath): i risultati
+coincidono (tests/test_kernels.py).
+"""
+import os
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:  # dipendenza opzionale
+    numba = None
+
+BACKENDS = ("auto", "python", "numba", "kernel")
+ENV_VAR = "FPR_KERNELS"
+
+_backend = "python"
+_compiled = {}
+
+
+def _resolve(name):
+    name = (name or "auto").strip().lower()
+    if name not in BACKENDS:
+        raise ValueError(f"backend kernel non valido: {name} (attesi {', '.join(BACKENDS)})")
+    if name == "auto":
+        return "numba" if numba is not None else "python"
+    if name == "numba" and numba is None:
+        print(f"⚠️ {ENV_VAR}=numba ma numba non è installato: uso il codice Python")
+        return "python"
+    return name
+
+
+def set_backend(name):
+    """Imposta il backend ('auto', 'python', 'numba', 'kernel'); ritorna il precedente."""
+    global _backend
+    prev = _backend
+    _backend = _resolve(name)
+    return prev
+
+
+def backend():
+    return _backend
+
+
+def enabled():
+    """True se le funzioni pubbliche devono usare i kernel."""
+    return _backend != "python"
+
+
+def kernel(name):
+    """Kernel `name`: compilato con numba (cache su disco) o interpretato."""
+    fn = _KERNELS[name]
+    if _backend != "numba":
+        return fn
+    jit = _compiled.get(name)
+    if jit is None:
+        jit = _compiled[name] = numba.njit(cache=True)(fn)
+    return jit
+
+
+# ============================================================
+#  KERNEL (solo array numpy e scalari: compilabili da numba)
+# ============================================================
+
+def local_level(y, q, r):
+    """Forward pass Kalman local-level (== logic.kalman_local_level)."""
+    n = y.shape[0]
+    x_f = np.zeros(n)
+    P_f = np.zeros(n)
+    if n == 0:
+        return x_f, P_f
+    x_f[0] = y[0]
+    P_f[0] = r
+    for t in range(1, n):
+        P_pred = P_f[t - 1] + q
+        K = P_pred / (P_pred + r)
+        x_f[t] = x_f[t - 1] + K * (y[t] - x_f[t - 1])
+        P_f[t] = (1.0 - K) * P_pred
+    return x_f, P_f
+
+
+def frozen_rts(x_f, P_f, y, q, A, B, min_points, kin_lag):
+    """Smoothing RTS a lag fisso per ogni t >= min_points (kalman_frozen_series)."""
+    n = x_f.shape[0]
+    m = max(n - min_points, 0)
+    pot = np.empty(m)
+    kin = np.empty(m)
+    kin_l = np.empty(m)
+    xs = np.empty(kin_lag + 1)
+    for t in range(min_points, n):
+        L = min(kin_lag, t)
+        xs[0] = x_f[t]
+        for j in range(1, L + 1):
+            k = t - j
+            C = P_f[k] / (P_f[k] + q)
+            xs[j] = x_f[k] + C * (xs[j - 1] - x_f[k])
+        o = t - min_points
+        pot[o] = 0.5 * B * (x_f[t] - y[t]) ** 2
+        kin[o] = 0.5 * A * (x_f[t] - xs[1]) ** 2
+        if t + 1 >= kin_lag:
+            dx_lag = xs[kin_lag - 1] - xs[kin_lag]
+            kin_l[o] = 0.5 * A * dx_lag ** 2
+        else:
+            kin_l[o] = 0.0
+    return pot, kin, kin_l
+
+
+def llt(y, q, r):
+    """Kalman a trend locale livello + velocità (logic.kalman_llt_velocity)."""
+    n = y.shape[0]
+    level = np.empty(n)
+    vel = np.empty(n)
+    l, v = y[0], 0.0
+    P11, P12, P22 = 1e6, 0.0, 1e6
+    level[0] = l
+    vel[0] = v
+    for t_i in range(1, n):
+        l_p = l + v
+        v_p = v
+        A11 = P11 + 2 * P12 + P22
+        A12 = P12 + P22
+        A22 = P22 + q
+        S = A11 + r
+        K1 = A11 / S
+        K2 = A12 / S
+        innov = y[t_i] - l_p
+        l = l_p + K1 * innov
+        v = v_p + K2 * innov
+        P11 = (1 - K1) * A11
+        P12 = (1 - K1) * A12
+        P22 = A22 - K2 * A12
+        level[t_i] = l
+        vel[t_i] = v
+    return level, vel
+
+
+def discharge_onsets(z, px, has_px, F, has_F, entry_z):
+    """Maschera degli onset arancione (potential_discharge_onsets)."""
+    n = px.shape[0]
+    mask = np.zeros(n, dtype=np.bool_)
+    for t in range(1, n):
+        if (z[t] > entry_z and z[t - 1] <= entry_z
+                and has_px[t] and has_F[t] and px[t] < F[t]):
+            mask[t] = True
+    return mask
+
+
+def hold_positions(onsets, horizon):
+    """Posizione 1 per `horizon` barre dall'ultimo onset (potential_discharge_positions)."""
+    n = onsets.shape[0]
+    pos = np.zeros(n, dtype=np.int64)
+    last = -1
+    for t in range(n):
+        if onsets[t]:
+            last = t
+        if last >= 0 and t - last < horizon:
+            pos[t] = 1
+    return pos
+
+
+def hysteresis(slopes, entry_th, exit_th, d_pos):
+    """Leg trend con isteresi OR satellite (combo_positions); NaN = slope mancante."""
+    n = slopes.shape[0]
+    pos = np.zeros(n, dtype=np.int64)
+    in_trend = False
+    for t in range(n):
+        s = slopes[t]
+        if not np.isnan(s):
+            if (not in_trend) and s > entry_th:
+                in_trend = True
+            elif in_trend and s < exit_th:
+                in_trend = False
+        if in_trend or d_pos[t] != 0:
+            pos[t] = 1
+    return pos
+
+
+def stable_bars(px, has_px, sl, act, lag, c, init, use_long, use_short, entry_th, exit_th):
+    """
+    Loop a barre di backtest_stable (decisione su j = i - lag, esecuzione su
+    i, mark-to-market, drawdown). Eventi come righe (tipo 0=ENTRY/1=EXIT,
+    direzione 0=LONG/1=SHORT, j, i); trade chiusi come (direzione, barra
+    d'ingresso, barra d'uscita) + (pnl, capitale dopo). Curve NON
+    arrotondate: l'arrotondamento (round Python) resta al chiamante.
+    """
+    n = px.shape[0]
+    eq = np.zeros(n)
+    tp = np.zeros(n)
+    mtm = np.empty(n)
+    ev = np.empty((4 * n + 4, 4), dtype=np.int64)
+    tr = np.empty((2 * n + 2, 3), dtype=np.int64)
+    trf = np.empty((2 * n + 2, 2))
+    in_l = False
+    in_s = False
+    ep_l = 0.0
+    ep_s = 0.0
+    ei_l = -1
+    ei_s = -1
+    capital = init
+    peak = capital
+    max_dd = 0.0
+    n_ev = 0
+    n_tr = 0
+    exposure = 0
+    active = 0
+    first_i = -1
+    last_i = -1
+    prev_eq = 0.0
+    for i in range(n):
+        if not act[i] or not has_px[i]:
+            eq[i] = prev_eq
+            tp[i] = 0.0
+            continue
+        price = px[i]
+        if first_i < 0:
+            first_i = i
+        last_i = i
+
+        j = i - lag
+        if j >= 0 and act[j] and not np.isnan(sl[j]):
+            s = sl[j]
+            if use_long:
+                if in_l and s < exit_th:
+                    pnl = (price * (1 - c) - ep_l * (1 + c)) / (ep_l * (1 + c))
+                    capital *= (1.0 + pnl)
+                    tr[n_tr, 0] = 0
+                    tr[n_tr, 1] = ei_l
+                    tr[n_tr, 2] = i
+                    trf[n_tr, 0] = pnl
+                    trf[n_tr, 1] = capital
+                    n_tr += 1
+                    ev[n_ev, 0] = 1
+                    ev[n_ev, 1] = 0
+                    ev[n_ev, 2] = j
+                    ev[n_ev, 3] = i
+                    n_ev += 1
+                    in_l = False
+                elif (not in_l) and s > entry_th:
+                    in_l = True
+                    ep_l = price
+                    ei_l = i
+                    ev[n_ev, 0] = 0
+                    ev[n_ev, 1] = 0
+                    ev[n_ev, 2] = j
+                    ev[n_ev, 3] = i
+                    n_ev += 1
+            if use_short:
+                if in_s and s > -exit_th:
+                    pnl = (ep_s * (1 - c) - price * (1 + c)) / ep_s
+                    capital *= (1.0 + pnl)
+                    tr[n_tr, 0] = 1
+                    tr[n_tr, 1] = ei_s
+                    tr[n_tr, 2] = i
+                    trf[n_tr, 0] = pnl
+                    trf[n_tr, 1] = capital
+                    n_tr += 1
+                    ev[n_ev, 0] = 1
+                    ev[n_ev, 1] = 1
+                    ev[n_ev, 2] = j
+                    ev[n_ev, 3] = i
+                    n_ev += 1
+                    in_s = False
+                elif (not in_s) and s < -entry_th:
+                    in_s = True
+                    ep_s = price
+                    ei_s = i
+                    ev[n_ev, 0] = 0
+                    ev[n_ev, 1] = 1
+                    ev[n_ev, 2] = j
+                    ev[n_ev, 3] = i
+                    n_ev += 1
+
+        # mark-to-market di fine barra (LONG poi SHORT, come mtm_capital)
+        cap = capital
+        open_pnl = 0.0
+        if in_l:
+            f = (price * (1 - c) - ep_l * (1 + c)) / (ep_l * (1 + c))
+            cap *= (1.0 + f)
+        if in_s:
+            f = (ep_s * (1 - c) - price * (1 + c)) / ep_s
+            cap *= (1.0 + f)
+        mtm[active] = cap
+        active += 1
+        prev_eq = (cap - init) / init * 100.0
+        eq[i] = prev_eq
+        if in_l:
+            open_pnl += (price * (1 - c) - ep_l * (1 + c)) / (ep_l * (1 + c)) * 100.0
+        if in_s:
+            open_pnl += (ep_s * (1 - c) - price * (1 + c)) / ep_s * 100.0
+        tp[i] = open_pnl
+        if in_l or in_s:
+            exposure += 1
+        if cap > peak:
+            peak = cap
+        dd = (peak - cap) / peak * 100.0
+        if dd > max_dd:
+            max_dd = dd
+
+    legs = np.array([ep_l, ep_s])
+    leg_idx = np.array([ei_l if in_l else -1, ei_s if in_s else -1])
+    counts = np.array([n_ev, n_tr, exposure, active, first_i, last_i])
+    return (eq, tp, mtm[:active], ev[:n_ev], tr[:n_tr], trf[:n_tr],
+            capital, peak, max_dd, legs, leg_idx, counts)
+
+
+_KERNELS = {
+    "local_level": local_level,
+    "frozen_rts": frozen_rts,
+    "llt": llt,
+    "discharge_onsets": discharge_onsets,
+    "hold_positions": hold_positions,
+    "hysteresis": hysteresis,
+    "stable_bars": stable_bars,
+}
+
+try:
+    set_backend(os.getenv(ENV_VAR, "auto"))
+except ValueError as e:
+    print(f"⚠️ {e}: uso auto")
+    set_backend("auto")
+
+
+# ============================================================
+#  CONVERSIONI (lato Python, prima di chiamare i kernel)
+# ============================================================
+
+def as_float(values, n, fill=np.nan):
+    """
+    (array float di lunghezza n, maschera dei valori presenti) da una lista
+    che può contenere None; oltre la fine della lista: `fill`, assente.
+    """
+    arr = np.full(n, fill, dtype=float)
+    has = np.zeros(n, dtype=bool)
+    m = min(n, len(values))
+    if m == 0:
+        return arr, has
+    if isinstance(values, np.ndarray):
+        arr[:m] = values[:m]
+        has[:m] = True
+        return arr, has
+    vals = values[:m]
+    has[:m] = [v is not None for v in vals]
+    arr[:m] = [fill if v is None else v for v in vals]
+    return arr, has
+
+
+def mask_from(indices, n):
+    """Maschera bool di lunghezza n con True agli indici dati."""
+    mask = np.zeros(n, dtype=bool)
+    mask[list(indices)] = True
+    return mask
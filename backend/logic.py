@@ -2,6 +2,9 @@ import numpy as np
 import pandas as pd
 import yfinance as yf
 from scipy.signal import savgol_filter
+from records import RecordLog, TRADE_FIELDS, SKIPPED_FIELDS
+from fastjson import padded_round
+import kernels
 
 # --- 1. Gestione Dati ---
 class MarketData:
@@ -107,6 +110,9 @@ class MarketData:
         return self.data
 
 # --- 2. Motore Fourier ---
+MAX_SCENARIOS = 5000   # tetto dell'ensemble di forecast_bands (matrice scenari × orizzonte)
+
+
 class FourierEngine:
     """
     Esegue l'Analisi Spettrale e la Generazione di Futuri Sintetici.
@@ -137,6 +143,30 @@ class FourierEngine:
         # 3. FFT
         self.freqs = np.fft.rfftfreq(self.N, d=1.0)
         self.F = np.fft.rfft(self.resid)
+        self._select_top()
+
+    @classmethod
+    def from_spectrum(cls, price_window, top_k, coef, F):
+        """
+        Engine da trend lineare (coef come np.polyfit) e DFT del residuo già
+        calcolati sulla finestra `price_window` (es. spectral.SlidingSpectrum):
+        niente polyfit né FFT, stesse componenti e scenari di FourierEngine.
+        """
+        self = cls.__new__(cls)
+        self.px = price_window
+        self.top_k = int(top_k)
+        self.lp = np.log(self.px.astype(float))
+        self.t = np.arange(len(self.lp))
+        self.N = len(self.lp)
+        self.coef = np.asarray(coef, dtype=float)
+        self.trend = np.polyval(self.coef, self.t)
+        self.resid = self.lp.values - self.trend
+        self.freqs = np.fft.rfftfreq(self.N, d=1.0)
+        self.F = np.asarray(F)
+        self._select_top()
+        return self
+
+    def _select_top(self):
         power = np.abs(self.F)
         
         # 4. Filtra le migliori TOP_K frequenze
@@ -198,10 +228,7 @@ class FourierEngine:
         # 4. Generate Future Dates Index
         # We need the FULL index (Past + Future)
         try:
-            last_date = self.px.index[-1]
-            freq = pd.infer_freq(self.px.index)
-            if not freq: freq = 'B'
-            future_dates = pd.date_range(last_date, periods=future_horizon + 1, freq=freq)[1:]
+            future_dates = self._future_dates(future_horizon)
             
             # Combine Past + Future Dates
             full_idx = self.px.index.tolist() + future_dates.tolist()
@@ -210,6 +237,58 @@ class FourierEngine:
 
         return full_idx, scenarios
 
+    def _future_dates(self, future_horizon):
+        last_date = self.px.index[-1]
+        freq = pd.infer_freq(self.px.index)
+        if not freq: freq = 'B'
+        return pd.date_range(last_date, periods=future_horizon + 1, freq=freq)[1:]
+
+    def forecast_bands(self, future_horizon=60, n_scenarios=200, quantiles=(5, 25, 50, 75, 95),
+                       amp_scale=1.0, phase_jitter=0.8):
+        """
+        Ensemble di n_scenarios riassunto in percentili sull'orizzonte futuro.
+
+        Stessa generazione di reconstruct_scenario (scenario i = fasi con
+        jitter dal seed i, deterministico anche oltre i 100), ma calcolata
+        come prodotto di matrici scenari×componenti invece di una lista di
+        serie complete: la risposta ha dimensione costante in n_scenarios.
+
+        Returns: (future_idx, bands, fit) — bands {"p5": lista sull'orizzonte, ...},
+        fit = curva passata con le fasi stimate (senza jitter).
+        """
+        if not 1 <= int(n_scenarios) <= MAX_SCENARIOS:
+            raise ValueError(f"n_scenarios deve essere in [1, {MAX_SCENARIOS}] (ricevuto {n_scenarios})")
+        q = [float(v) for v in quantiles]
+        if not q or any(v < 0 or v > 100 for v in q):
+            raise ValueError("quantiles deve contenere percentili in [0, 100]")
+
+        t_past = np.arange(self.N)
+        t_fut = np.arange(self.N, self.N + int(future_horizon))
+        amps = np.asarray(self.top_amps, dtype=float) * amp_scale
+        w = 2 * np.pi * np.asarray(self.top_freqs, dtype=float)
+        phase = np.asarray(self.top_phase, dtype=float)
+        K = len(amps)
+
+        jitter = np.zeros((int(n_scenarios), K))
+        if phase_jitter > 0 and K:
+            for i in range(int(n_scenarios)):
+                jitter[i] = np.random.default_rng(seed=i).normal(0.0, phase_jitter, size=K)
+        ph = phase[None, :] + jitter
+        # Σ_k A cos(w t + ph) = cos(ph)·A cos(w t) − sin(ph)·A sin(w t)
+        wt = np.outer(w, t_fut)
+        resid = np.cos(ph) @ (amps[:, None] * np.cos(wt)) - np.sin(ph) @ (amps[:, None] * np.sin(wt))
+        paths = np.exp(np.polyval(self.coef, t_fut)[None, :] + resid)
+        pct = np.percentile(paths, q, axis=0) if len(t_fut) else np.zeros((len(q), 0))
+        bands = {f"p{v:g}": pct[j].tolist() for j, v in enumerate(q)}
+
+        fit_resid = (amps[:, None] * np.cos(np.outer(w, t_past) + phase[:, None])).sum(axis=0)
+        fit = np.exp(np.polyval(self.coef, t_past) + fit_resid).tolist()
+        try:
+            future_idx = self._future_dates(int(future_horizon)).tolist()
+        except Exception:
+            future_idx = []
+        return future_idx, bands, fit
+
     def get_components(self):
         if len(self.top_freqs) == 0:
             return []
@@ -382,37 +461,40 @@ def kalman_llt_velocity(px, lam=1e-5):
     r = 1.0
     q = float(lam) * r
 
-    # stato [l, v], transizione F=[[1,1],[0,1]], osservazione H=[1,0]
-    l, v = y[0], 0.0
-    # covarianza: init quasi-diffusa
-    P11, P12, P22 = 1e6, 0.0, 1e6
-
-    level = np.empty(n)
-    vel = np.empty(n)
-    level[0], vel[0] = l, v
-
-    for t_i in range(1, n):
-        # --- predict ---
-        l_p = l + v
-        v_p = v
-        # P_pred = F P F' + Q  (Q = diag(0, q))
-        A11 = P11 + 2 * P12 + P22
-        A12 = P12 + P22
-        A22 = P22 + q
-        # --- update (H=[1,0]) ---
-        S = A11 + r
-        K1 = A11 / S
-        K2 = A12 / S
-        innov = y[t_i] - l_p
-        l = l_p + K1 * innov
-        v = v_p + K2 * innov
-        # P = (I - K H) P_pred
-        P11 = (1 - K1) * A11
-        P12 = (1 - K1) * A12
-        P22 = A22 - K2 * A12
-
-        level[t_i] = l
-        vel[t_i] = v
+    if kernels.enabled():
+        level, vel = kernels.kernel("llt")(y, q, r)
+    else:
+        # stato [l, v], transizione F=[[1,1],[0,1]], osservazione H=[1,0]
+        l, v = y[0], 0.0
+        # covarianza: init quasi-diffusa
+        P11, P12, P22 = 1e6, 0.0, 1e6
+
+        level = np.empty(n)
+        vel = np.empty(n)
+        level[0], vel[0] = l, v
+
+        for t_i in range(1, n):
+            # --- predict ---
+            l_p = l + v
+            v_p = v
+            # P_pred = F P F' + Q  (Q = diag(0, q))
+            A11 = P11 + 2 * P12 + P22
+            A12 = P12 + P22
+            A22 = P22 + q
+            # --- update (H=[1,0]) ---
+            S = A11 + r
+            K1 = A11 / S
+            K2 = A12 / S
+            innov = y[t_i] - l_p
+            l = l_p + K1 * innov
+            v = v_p + K2 * innov
+            # P = (I - K H) P_pred
+            P11 = (1 - K1) * A11
+            P12 = (1 - K1) * A12
+            P22 = A22 - K2 * A12
+
+            level[t_i] = l
+            vel[t_i] = v
 
     with np.errstate(divide="ignore", invalid="ignore"):
         vpct = np.where(np.abs(level) > 1e-12, 100.0 * vel / level, 0.0)
@@ -447,6 +529,37 @@ def causal_lowpass(values, wn=0.05, order=2):
     return y.tolist()
 
 
+def kalman_local_level(y, alpha=200.0, beta=1.0):
+    """
+    Forward pass del filtro di Kalman local-level equivalente al percorso di
+    minima azione (q=1/alpha, r=1/beta, init diffusa — vedi
+    kalman_frozen_series).
+
+    Returns: (x_f, P_f) array numpy — stima filtrata e varianza a ogni t.
+    Lo smoothing RTS all'indietro da t usa il guadagno C[k] = P_f[k]/(P_f[k]+q).
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    q = 1.0 / float(alpha)   # varianza di processo
+    r = 1.0 / float(beta)    # varianza di osservazione
+
+    if kernels.enabled():
+        return kernels.kernel("local_level")(y, q, r)
+
+    x_f = np.zeros(n)
+    P_f = np.zeros(n)
+    if n == 0:
+        return x_f, P_f
+    x_f[0] = y[0]
+    P_f[0] = r
+    for t in range(1, n):
+        P_pred = P_f[t - 1] + q
+        K = P_pred / (P_pred + r)
+        x_f[t] = x_f[t - 1] + K * (y[t] - x_f[t - 1])
+        P_f[t] = (1.0 - K) * P_pred
+    return x_f, P_f
+
+
 def kalman_frozen_series(px, alpha=200.0, beta=1.0, lookback_span=20,
                          min_points=100, kin_lag=25):
     """
@@ -480,22 +593,24 @@ def kalman_frozen_series(px, alpha=200.0, beta=1.0, lookback_span=20,
     n = len(y)
 
     q = 1.0 / float(alpha)   # varianza di processo
-    r = 1.0 / float(beta)    # varianza di osservazione
 
     # --- Forward pass: filtro di Kalman con init diffusa ---
-    x_f = np.zeros(n)
-    P_f = np.zeros(n)
-    x_f[0] = y[0]
-    P_f[0] = r
-    for t in range(1, n):
-        P_pred = P_f[t - 1] + q
-        K = P_pred / (P_pred + r)
-        x_f[t] = x_f[t - 1] + K * (y[t] - x_f[t - 1])
-        P_f[t] = (1.0 - K) * P_pred
+    x_f, P_f = kalman_local_level(y, alpha, beta)
 
     # --- Per ogni t: smoothing RTS all'indietro per kin_lag passi ---
     A = float(alpha)
     B = float(beta)
+    if kernels.enabled():
+        mp = int(min_points)
+        pot, kin, kin_l = kernels.kernel("frozen_rts")(x_f, P_f, y, q, A, B, mp, int(kin_lag))
+        return {
+            "t_index": list(range(mp, n)),
+            "pot_last": pot.tolist(),
+            "kin_last": kin.tolist(),
+            "kin_lag": kin_l.tolist(),
+            "ma_price": x_f[mp:].tolist(),
+        }
+
     t_index, pot_last, kin_last, kin_lagged, ma_price = [], [], [], [], []
 
     for t in range(int(min_points), n):
@@ -530,6 +645,104 @@ def kalman_frozen_series(px, alpha=200.0, beta=1.0, lookback_span=20,
         "ma_price": ma_price,
     }
 
+def action_path_windows(px, ends, window, alpha=200.0, beta=1.0, lookback_span=20):
+    """
+    Ultime `window` barre di ActionPath(px[:t+1]) per molti t in un colpo.
+
+    Stessa identità di kalman_frozen_series: il percorso su [0..t] è lo
+    smoother RTS del filtro di Kalman, che parte dalla stima filtrata in t e
+    torna indietro con C[k] = P_f[k]/(P_f[k]+q). Il filtro gira UNA volta
+    (O(n)); per ogni t servono solo `window` passi all'indietro, eseguiti
+    in parallelo su tutti i t come operazioni vettoriali: O(n + k·window)
+    invece di k risoluzioni tridiagonali O(t). Non è un'approssimazione: i
+    punti della finestra sono quelli dello smoother completo su [0..t].
+
+    Returns: dict con chiavi
+        t_index  : i t richiesti (int)
+        x_star   : matrice k×window, colonna j = posizione t-window+1+j
+                   (== px_star; NaN per posizioni < 0)
+        F        : fondamentale EWMA nelle stesse posizioni
+        dX, kin, pot : == dX, kin_density, pot_density di ActionPath(px[:t+1])
+    """
+    F = px.ewm(span=int(lookback_span), adjust=False).mean()
+    y = F.values.astype(float)
+    n = len(y)
+    W = int(window)
+    ends = np.asarray(list(ends), dtype=int)
+    if W < 1:
+        raise ValueError("window deve essere >= 1")
+    if len(ends) and (ends.min() < 0 or ends.max() >= n):
+        raise ValueError("indici t fuori dalla serie")
+
+    x_f, P_f = kalman_local_level(y, alpha, beta)
+    C = P_f / (P_f + 1.0 / float(alpha))
+
+    # xs[:, j] = smoothed in t-W+j (W+1 colonne: serve anche t-W per dX)
+    k = len(ends)
+    xs = np.full((k, W + 1), np.nan)
+    xs[:, W] = x_f[ends]
+    for j in range(W - 1, -1, -1):
+        pos = ends - (W - j)
+        ok = pos >= 0
+        p = pos[ok]
+        xs[ok, j] = x_f[p] + C[p] * (xs[ok, j + 1] - x_f[p])
+
+    pos = ends[:, None] + np.arange(-W + 1, 1)[None, :]
+    x_star = xs[:, 1:]
+    dX = x_star - xs[:, :-1]
+    dX[pos == 0] = 0.0                        # diff().fillna(0) sulla prima barra
+    F_win = np.where(pos >= 0, y[np.clip(pos, 0, None)], np.nan)
+    return {
+        "t_index": ends.tolist(),
+        "x_star": x_star,
+        "F": F_win,
+        "dX": dX,
+        "kin": 0.5 * float(alpha) * dX ** 2,
+        "pot": 0.5 * float(beta) * (x_star - F_win) ** 2,
+    }
+
+
+def frozen_history(px, alpha=200.0, beta=1.0, min_points=100, kin_lag=25):
+    """
+    Dati "frozen" point-in-time nel formato salvato da analyze_stock in
+    TICKER_CACHE[ticker]["frozen"] (usati da /analyze e /verify-integrity).
+
+    Returns: dict con chiavi dates, kin (T-kin_lag), pot, z_sum (z-score 252
+    + lowpass causale, arrotondato) e raw_sum (kin+pot grezzi).
+    """
+    frozen_res = kalman_frozen_series(
+        px, alpha=alpha, beta=beta,
+        min_points=min_points, kin_lag=kin_lag
+    )
+    f_dates = [px.index[t].strftime('%Y-%m-%d') for t in frozen_res["t_index"]]
+    # 1. Kinetic Frozen (shifted T-25 for prediction comparison)
+    f_kin = [round(v, 2) for v in frozen_res["kin_lag"]]
+    # 2. Potential Frozen (current T)
+    f_pot = [round(v, 2) for v in frozen_res["pot_last"]]
+    # 3. Frozen Sum Index (current kin + current pot, not shifted)
+    f_sum = [k + p for k, p in zip(frozen_res["kin_last"], frozen_res["pot_last"])]
+
+    # Normalize Frozen Sum Index (Rolling Z-Score 252)
+    f_sum_series = pd.Series(f_sum, dtype=float)
+    roll_fsum_mean = f_sum_series.rolling(window=252, min_periods=20).mean()
+    roll_fsum_std = f_sum_series.rolling(window=252, min_periods=20).std()
+    z_frozen_sum = ((f_sum_series - roll_fsum_mean) / (roll_fsum_std + 1e-6)).fillna(0).tolist()
+
+    # [FIX LOOKAHEAD] Low-pass Butterworth CAUSALE (era filtfilt
+    # zero-phase: "senza lag" significava usare il futuro).
+    try:
+        z_frozen_sum = causal_lowpass(z_frozen_sum)
+    except Exception as e:
+        print(f"⚠️ Filter failed (keeping raw): {e}")
+
+    return {
+        "dates": f_dates,
+        "kin": f_kin,
+        "pot": f_pot,
+        "z_sum": [round(x, 2) for x in z_frozen_sum],
+        "raw_sum": f_sum  # valori grezzi per i ricalcoli della verifica integrità
+    }
+
 # --- 4. Market Scanner (Radar) ---
 class MarketScanner:
     """
@@ -539,21 +752,38 @@ class MarketScanner:
     def __init__(self, tickers_list):
         self.tickers = tickers_list
         
-    def scan(self):
+    def scan(self, on_result=None, on_progress=None, collect=True):
+        """
+        on_result(data)                 : opzionale, a ogni titolo analizzato
+        on_progress("scan", done, total): opzionale, a ogni titolo completato;
+                                          se solleva, i titoli in coda vengono annullati
+        collect=False                   : risultati solo via on_result (streaming),
+                                          la lista restituita resta vuota
+        """
         import concurrent.futures
         
         results = []
         with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:  # Limited to 5 to avoid rate limits
             future_to_ticker = {executor.submit(self._analyze_single, t): t for t in self.tickers}
             
-            for future in concurrent.futures.as_completed(future_to_ticker):
-                ticker = future_to_ticker[future]
-                try:
-                    data = future.result()
-                    if data:
-                        results.append(data)
-                except Exception as exc:
-                    print(f'{ticker} generated an exception: {exc}')
+            try:
+                for done, future in enumerate(concurrent.futures.as_completed(future_to_ticker), 1):
+                    ticker = future_to_ticker[future]
+                    try:
+                        data = future.result()
+                        if data:
+                            if collect:
+                                results.append(data)
+                            if on_result:
+                                on_result(data)
+                    except Exception as exc:
+                        print(f'{ticker} generated an exception: {exc}')
+                    if on_progress:
+                        on_progress("scan", done, len(future_to_ticker))
+            except BaseException:
+                for f in future_to_ticker:
+                    f.cancel()
+                raise
                     
         return results
 
@@ -616,8 +846,6 @@ class MarketScanner:
             
             # Converti in lista e padding
             hist_dates = pad_left(segment_px.index.strftime('%Y-%m-%d').tolist(), HISTORY_LEN, None)
-            hist_z_kin = pad_left(segment_z_kin.tolist(), HISTORY_LEN, None)
-            hist_z_pot = pad_left(segment_z_pot.tolist(), HISTORY_LEN, None)
             hist_z_slope = pad_left(segment_z_slope.tolist(), HISTORY_LEN, None)
             hist_z_roc = pad_left(segment_z_roc.tolist(), HISTORY_LEN, None)
             hist_price = pad_left(segment_px.tolist(), HISTORY_LEN, None)
@@ -724,6 +952,7 @@ class MarketScanner:
                  trend_mode='PRICE_VS_CURVE' # New mode
             )
             ma_pnl_curve = strat_ma_res['trade_pnl_curve']
+            z_pot_hist = padded_round(segment_z_pot, HISTORY_LEN)
 
             return {
                 "ticker": ticker,
@@ -737,11 +966,12 @@ class MarketScanner:
                 # Storia Allineata (Tutti len=252)
                 "history": {
                     "dates": hist_dates,
-                    "z_kin": [round(x, 2) if x is not None else None for x in hist_z_kin],
-                    "z_pot": [round(x, 2) if x is not None else None for x in hist_z_pot],
-                    "z_slope": [round(x, 2) if x is not None else None for x in hist_z_slope],
-                    "prices": [round(x, 2) if x is not None else None for x in hist_price],
-                    "z_kin_frozen": [round(x, 2) if x is not None else None for x in hist_z_pot], # Legacy name mapping
+                    # [PERF] array NumPy arrotondati in blocco, padding NaN -> null (fastjson)
+                    "z_kin": padded_round(segment_z_kin, HISTORY_LEN),
+                    "z_pot": z_pot_hist,
+                    "z_slope": padded_round(segment_z_slope, HISTORY_LEN),
+                    "prices": padded_round(segment_px, HISTORY_LEN),
+                    "z_kin_frozen": z_pot_hist, # Legacy name mapping
                     "strategy_pnl": frozen_pnl_curve, # The "Orange Line" content (Cumulative)
                     "sum_pnl": sum_pnl_curve,  # The "SUM Red Line" (Threshold=-0.3)
                     "ma_pnl": ma_pnl_curve # The "Min Action Green Line"
@@ -755,7 +985,7 @@ class MarketScanner:
             return None
 
 # --- 5. Backtesting Strategy ---
-def backtest_strategy(prices: list, z_kinetic: list, z_slope: list, dates: list, initial_capital=1000.0, start_date=None, end_date=None, threshold=0.0, use_z_roc=False, trend_curve=None, trend_mode=None, execution_lag=1):
+def backtest_strategy(prices: list, z_kinetic: list, z_slope: list, dates: list, initial_capital=1000.0, start_date=None, end_date=None, threshold=0.0, use_z_roc=False, trend_curve=None, trend_mode=None, execution_lag=1, columnar=False):
     """
     Esegue il backtest della strategia basata su Z-Scores.
     Filtra le operazioni in base a start_date e end_date.
@@ -766,6 +996,8 @@ def backtest_strategy(prices: list, z_kinetic: list, z_slope: list, dates: list,
     execution_lag: barre tra segnale ed esecuzione (default 1: segnale sul
         close di oggi, esecuzione al close di domani — realistico).
         0 = vecchio comportamento same-bar (ottimista, solo per confronto).
+    columnar: se True trades/skipped_trades restano RecordLog (records.py)
+        invece di liste di dict; default invariato.
     """
     capital = initial_capital
     in_position = False
@@ -773,8 +1005,8 @@ def backtest_strategy(prices: list, z_kinetic: list, z_slope: list, dates: list,
     entry_date = None
     position_direction = None # 'LONG' or 'SHORT'
     
-    trades = []
-    skipped_trades = [] # [NEW] Track signals ignored because already in position
+    trades = RecordLog(TRADE_FIELDS)
+    skipped_trades = RecordLog(SKIPPED_FIELDS) # [NEW] Track signals ignored because already in position
     trade_pnl_curve = [] # Individual trade P/L (0 = not invested)
     equity_curve = [] # Cumulative Strategy P/L % (Equity Curve)
     
@@ -904,13 +1136,8 @@ def backtest_strategy(prices: list, z_kinetic: list, z_slope: list, dates: list,
                      z_roc = z_kin - z_prev
                      potential_direction = 'LONG' if (use_z_roc and z_roc >= 0) or (not use_z_roc and z_sl > 0) else 'SHORT'
                  
-                 skipped_trades.append({
-                     "date": date,
-                     "index": i,  # [NEW] For proximity check
-                     "price": price,
-                     "direction": potential_direction,
-                     "reason": "ALREADY_INVESTED"
-                 })
+                 # index: [NEW] For proximity check
+                 skipped_trades.append(date, i, price, potential_direction, "ALREADY_INVESTED")
             
             # Calculate current open P/L
             if position_direction == 'LONG':
@@ -936,18 +1163,11 @@ def backtest_strategy(prices: list, z_kinetic: list, z_slope: list, dates: list,
                 pnl_pct = current_pnl
                 capital = capital * (1 + pnl_pct / 100)
                 
-                trades.append({
-                    "entry_date": entry_date,
-                    "exit_date": date,
-                    "direction": position_direction,
-                    "entry_price": round(entry_price, 2),
-                    "exit_price": round(price, 2),
-                    "pnl_pct": round(pnl_pct, 2),
-                    "capital_after": round(capital, 2),
-                    # Snapshot data for detecting retroactive changes
-                    "entry_z_value": entry_z_snapshot,
-                    "entry_z_roc": entry_z_roc_snapshot
-                })
+                trades.append(entry_date, date, position_direction,
+                              round(entry_price, 2), round(price, 2),
+                              round(pnl_pct, 2), round(capital, 2),
+                              # Snapshot data for detecting retroactive changes
+                              entry_z_snapshot, entry_z_roc_snapshot)
                 
                 in_position = False
                 position_direction = None
@@ -978,22 +1198,18 @@ def backtest_strategy(prices: list, z_kinetic: list, z_slope: list, dates: list,
         else:
             unrealized_pnl = ((entry_price - final_price) / entry_price) * 100
             
-        trades.append({
-            "entry_date": entry_date,
-            "exit_date": "OPEN", 
-            "direction": position_direction,
-            "entry_price": round(entry_price, 2),
-            "exit_price": round(final_price, 2),
-            "pnl_pct": round(unrealized_pnl, 2),
-            "capital_after": round(capital, 2)
-        })
+        # riga senza snapshot z: le ultime due chiavi mancano anche nel dict
+        trades.append(entry_date, "OPEN", position_direction,
+                      round(entry_price, 2), round(final_price, 2),
+                      round(unrealized_pnl, 2), round(capital, 2))
     
     # Calculate stats
     if len(trades) > 0:
-        wins = sum(1 for t in trades if t['pnl_pct'] > 0)
+        pnls = trades.column("pnl_pct")
+        wins = sum(1 for p in pnls if p > 0)
         win_rate = (wins / len(trades)) * 100
         total_return = ((capital - initial_capital) / initial_capital) * 100
-        avg_trade = sum(t['pnl_pct'] for t in trades) / len(trades)
+        avg_trade = sum(pnls) / len(trades)
     else:
         win_rate = 0
         total_return = 0
@@ -1009,8 +1225,8 @@ def backtest_strategy(prices: list, z_kinetic: list, z_slope: list, dates: list,
     
     return {
         "equity_curve": equity_curve,
-        "trades": trades,
-        "skipped_trades": skipped_trades, # [NEW]
+        "trades": trades if columnar else trades.to_dicts(),
+        "skipped_trades": skipped_trades if columnar else skipped_trades.to_dicts(), # [NEW]
         "trade_pnl_curve": trade_pnl_curve,
         "stats": backtest_stats
     }
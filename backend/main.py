@@ -1,10 +1,10 @@
 import uvicorn
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Literal
 import numpy as np
 import pandas as pd
 import os
@@ -19,9 +19,19 @@ import concurrent.futures
 # This fixes "ModuleNotFoundError: No module named 'logic'" on Railway
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from logic import MarketData, ActionPath, FourierEngine, MarketScanner, compute_stable_kinetic_z, kalman_frozen_series, causal_lowpass
+from logic import MarketData, ActionPath, FourierEngine, MarketScanner, compute_stable_kinetic_z, kalman_frozen_series, causal_lowpass, frozen_history
+from frame_cache import FrameCache, frame_key, frame_bar, neighbour_bars, MAX_PREFETCH
+from daily_scan import truncate_frozen, frozen_pot_backtest, frozen_sum_backtest, align_frozen_sum
+from workers import run_in_pool, EndpointBusy, pool_stats, shutdown_pools
+from jobs import JobManager, JobLimitReached
+from streaming import stream_response, stream_format
+from fastjson import FastJSONResponse, FastJSONRoute, padded_round
+import columnar
 
 app = FastAPI(title="Financial Physics API")
+# [PERF] Le route con response_class=FastJSONResponse serializzano con
+# fastjson.dumps (array NumPy nativi, niente jsonable_encoder)
+app.router.route_class = FastJSONRoute
 
 # --- SCHEDULER ---
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -138,6 +148,11 @@ def scheduler_status():
         "jobs": jobs_info
     }
 
+@app.get("/workers-status")
+def workers_status():
+    """Pool degli endpoint async (workers.py): limiti, richieste in corso, rifiutate."""
+    return {"status": "ok", "pools": pool_stats()}
+
 @app.on_event("startup")
 def start_scheduler():
     scheduler.start()
@@ -150,6 +165,8 @@ def start_scheduler():
 @app.on_event("shutdown")
 def shutdown_scheduler():
     scheduler.shutdown()
+    shutdown_pools()
+    JOBS.shutdown()
 
 # Abilita CORS
 app.add_middleware(
@@ -171,33 +188,442 @@ class AnalysisRequest(BaseModel):
     start_date: Optional[str] = "2023-01-01"
     end_date: Optional[str] = None  # If set, truncate data to this date (simulate past)
     use_cache: bool = False # If True, try to use cached full history
+    use_frame_cache: bool = False # Time Machine: riusa i frame per barra (frame_cache.py)
+    prefetch: int = 0 # Barre vicine da precalcolare in background, per lato (max 10)
+    forecast_mode: Literal["scenarios", "bands"] = "scenarios" # "bands": percentili di un ensemble + curva fittata
+    n_scenarios: int = 200 # Scenari dell'ensemble (solo forecast_mode="bands", max logic.MAX_SCENARIOS)
+    forecast_quantiles: List[float] = [5, 25, 50, 75, 95]
+    fields: Optional[List[str]] = None # Output richiesti (None = risposta completa)
+
+# Output di /analyze -> blocchi di calcolo necessari (ordine della risposta).
+# Blocchi di input: "zigzag" (download orario), "market_cap" (yfinance info).
+ANALYZE_FIELDS = {
+    "avg_abs_kin": ("kin_z",),
+    "market_cap": ("market_cap",),
+    "dates": (),
+    "prices": (),
+    "volume": (),
+    "min_action": ("mechanics",),
+    "fundamentals": ("mechanics",),
+    "energy": ("kin_z",),
+    "indicators": ("mechanics", "stable_slope", "stable_kinetic_z", "roc", "zigzag"),
+    "backtest": ("kin_z",),
+    "frozen_strategy": ("frozen",),
+    "frozen_sum_strategy": ("frozen",),
+    "stable_strategy": ("stable_slope",),
+    "forecast": ("fourier",),
+    "fourier_components": ("fourier",),
+    "frozen": ("frozen",),
+    "min_action_strategy": ("mechanics", "frozen"),   # solo su richiesta
+}
+_BLOCK_DEPS = {"kin_z": ("mechanics",)}
+DEFAULT_ANALYZE_FIELDS = tuple(f for f in ANALYZE_FIELDS if f != "min_action_strategy")
+
+
+def analyze_blocks(fields):
+    """Blocchi da calcolare per gli output `fields` (chiusura delle dipendenze)."""
+    unknown = sorted(set(fields) - set(ANALYZE_FIELDS))
+    if unknown:
+        raise ValueError(f"fields sconosciuti: {unknown} (validi: {list(ANALYZE_FIELDS)})")
+    todo = [b for f in fields for b in ANALYZE_FIELDS[f]]
+    blocks = set()
+    while todo:
+        b = todo.pop()
+        if b not in blocks:
+            blocks.add(b)
+            todo.extend(_BLOCK_DEPS.get(b, ()))
+    return blocks
 
 # Global Cache for Full Ticker History (DataFrame)
 # Key: Ticker, Value: Pandas Series (Full History)
 TICKER_CACHE = {}
 
+# Frame point-in-time di /analyze (Time Machine), legati all'entry di TICKER_CACHE
+FRAME_CACHE = FrameCache(maxsize=64)
+
+# Job in background (/jobs): avanzamento, parziali, cancellazione, TTL
+JOBS = JobManager()
+
 class ScanRequest(BaseModel):
     tickers: List[str]
 
-@app.post("/scan")
-async def scan_market(req: ScanRequest):
+def _busy_response(e):
+    """Pool dell'endpoint saturo: 503 con lo stesso formato d'errore degli endpoint."""
+    return JSONResponse(status_code=503, content={"status": "error", "detail": str(e)})
+
+def _scan_market(tickers, on_result=None, on_progress=None):
     try:
-        print(f"📡 Radar Scan richiesto per {len(req.tickers)} titoli...")
-        scanner = MarketScanner(req.tickers)
-        results = scanner.scan()
+        print(f"📡 Radar Scan richiesto per {len(tickers)} titoli...")
+        scanner = MarketScanner(tickers)
+        results = scanner.scan(on_result=on_result, on_progress=on_progress)
         return {"status": "ok", "results": results}
     except Exception as e:
         print(f"Errore scan: {e}")
         return {"status": "error", "detail": str(e)}
 
-@app.post("/analyze")
+@app.post("/scan", response_class=FastJSONResponse, responses=columnar.OPENAPI_RESPONSES)
+async def scan_market(req: ScanRequest, request: Request):
+    # Download e z-score nel pool "scan": l'event loop resta libero.
+    # Accept: application/vnd.fpr.columnar -> formato binario (columnar.py),
+    # codificato anch'esso nel pool
+    try:
+        return await run_in_pool("scan", lambda: columnar.negotiate(_scan_market(req.tickers), request))
+    except EndpointBusy as e:
+        return _busy_response(e)
+
+@app.post("/scan/stream")
+def scan_market_stream(req: ScanRequest, request: Request, format: Optional[str] = None,
+                       progress: bool = False):
+    """
+    /scan in streaming: un evento "result" per titolo appena calcolato
+    (stesso oggetto di results[] di /scan), poi "end". NDJSON di default,
+    SSE con ?format=sse o Accept: text/event-stream (streaming.py).
+    """
+    try:
+        fmt = stream_format(format, request.headers.get("accept"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def body(stream):
+        print(f"📡 Radar Scan (stream) per {len(req.tickers)} titoli...")
+        MarketScanner(req.tickers).scan(on_result=stream.result, on_progress=stream.progress,
+                                        collect=False)
+        return {"requested": len(req.tickers)}
+    return stream_response("scan", body, fmt, progress)
+
+def _analysis_frame(req, px, full_frozen_data, zigzag_series, volume_series, mkt_cap):
+    """
+    Frame di /analyze a partire dalla storia già caricata (cache o download):
+    taglio point-in-time a end_date, indicatori, backtest e risposta JSON.
+    Usato sia dalla richiesta sia dal prefetch della Time Machine.
+
+    Con req.fields si calcolano solo i blocchi da cui dipendono gli output
+    richiesti (analyze_blocks); la risposta contiene status, ticker e quelli.
+    """
+    fields = DEFAULT_ANALYZE_FIELDS if req.fields is None else req.fields
+    blocks = analyze_blocks(fields)
+
+    # --- SIMULATION TIME TRAVEL (True Point-in-Time Calculation) ---
+    if req.end_date:
+        end_ts = pd.Timestamp(req.end_date)
+        # Slice Prices
+        px = px[px.index <= end_ts]
+
+        # Slice ZigZag (Series)
+        if zigzag_series is not None:
+            zigzag_series = zigzag_series[zigzag_series.index <= end_ts]
+
+        # Slice Volume
+        if volume_series is not None:
+            volume_series = volume_series[volume_series.index <= end_ts]
+
+    if "frozen" in blocks and req.end_date:
+        # Slice Frozen Data
+        # To avoid look-ahead bias from the filter, truncate the RAW SUM to the
+        # target date and re-apply Rolling Z-Score + Filter (daily_scan.truncate_frozen)
+        frozen_dates, frozen_z_kin, frozen_z_pot, frozen_z_sum = truncate_frozen(full_frozen_data, req.end_date)
+    elif "frozen" in blocks:
+        # Dati completi
+        frozen_dates = full_frozen_data["dates"]
+        frozen_z_kin = full_frozen_data["kin"]
+        frozen_z_pot = full_frozen_data["pot"]
+        frozen_z_sum = full_frozen_data["z_sum"]
+
+    if req.end_date:
+        print(f"🕐 Simulating past: data truncated to {req.end_date}")
+
+    # Prepare ZigZag List
+    zigzag_line = zigzag_series.values.tolist() if zigzag_series is not None else []
+
+    # 2. Calcola Minima Azione (Live su dati tranciati)
+    if "mechanics" in blocks:
+        mechanics = ActionPath(px, alpha=req.alpha, beta=req.beta)
+
+    # 3. Calcola Fourier
+    if "fourier" in blocks:
+        fourier = FourierEngine(px, top_k=req.top_k, window_size=req.fourier_days)
+        if req.forecast_mode == "bands":
+            # [PERF] ensemble aggregato lato server: risposta costante in n_scenarios
+            future_idx, future_bands, future_fit = fourier.forecast_bands(
+                future_horizon=req.forecast_days, n_scenarios=req.n_scenarios,
+                quantiles=req.forecast_quantiles)
+        else:
+            future_idx, future_vals = fourier.reconstruct_scenario(future_horizon=req.forecast_days, n_scenarios=5)
+
+    # 4. Prepara Risposta JSON
+    dates_historical = px.index.strftime('%Y-%m-%d').tolist()
+
+    # Prezzi
+    price_real = px.values.tolist()
+    if "mechanics" in blocks:
+        price_min_action = mechanics.px_star.values.tolist()
+
+    # Stable Slope: CAUSAL estimator of stabilized SLOPE
+    # Alpha controls the EMA span for the fundamental curve:
+    #   alpha=100 → span=10 (reactive), alpha=200 → span=20 (default), alpha=400 → span=40 (smooth)
+    # GUARANTEED CAUSAL: EMA only looks backward, never forward
+    # GUARANTEED STABLE: past values NEVER change when new data arrives
+    if "stable_slope" in blocks:
+        ema_span = max(5, int(req.alpha / 10))
+        F_alpha = px.ewm(span=ema_span, adjust=False).mean()
+        dF_alpha = F_alpha.diff().fillna(0)
+        stable_slope_line = dF_alpha.ewm(span=14, adjust=False).mean().values.tolist()
+
+    # Stable Kinetic Z: causal estimator of stabilized Kinetic Z
+    # OPTIMIZED via grid search on 8 market types:
+    #   base=20 (EMA span for dF), no post-smoothing needed
+    #   Hysteresis threshold=0.5 for zero-crossing detection
+    # Results: 82.9% precision, 17.1% FPR, ~11 switches avg
+    # Purely causal: NEVER changes for past dates (verified)
+    SKINZ_THRESHOLD = 0.5
+    if "stable_kinetic_z" in blocks:
+        try:
+            # [FIX] il vecchio blocco inline referenziava una variabile `dF`
+            # inesistente (NameError silenziato) -> pannello sempre vuoto.
+            # Ora il calcolo vive in logic.compute_stable_kinetic_z (testato).
+            stable_kinetic_z_line, stable_kinetic_z_regime = compute_stable_kinetic_z(
+                px, req.alpha, threshold=SKINZ_THRESHOLD
+            )
+            _n_switches = int(np.sum(np.abs(np.diff(stable_kinetic_z_regime)) > 0))
+            print(f"✅ Stable Kinetic Z: {len(stable_kinetic_z_line)} pts | Regime switches: {_n_switches}")
+        except Exception as e:
+            print(f"⚠️ Stable Kinetic Z computation failed: {e}")
+            import traceback
+            traceback.print_exc()
+            stable_kinetic_z_line = []
+            stable_kinetic_z_regime = []
+
+    if "roc" in blocks:
+        # ROC (Rate of Change)
+        ROC_PERIOD = 20
+        roc = ((px - px.shift(ROC_PERIOD)) / px.shift(ROC_PERIOD) * 100).fillna(0)
+
+        # Z-Score del ROC
+        roll_roc_mean = roc.rolling(window=252, min_periods=20).mean()
+        roll_roc_std = roc.rolling(window=252, min_periods=20).std()
+        z_roc = ((roc - roll_roc_mean) / (roll_roc_std + 1e-6)).fillna(0)
+
+    # 5. Backtest Strategy
+    # Calculate ROLLING Z-Scores to avoid look-ahead bias (252-day window)
+    ZSCORE_WINDOW = 252
+
+    if "kin_z" in blocks:
+        kin = mechanics.kin_density
+        roll_kin_mean = kin.rolling(window=ZSCORE_WINDOW, min_periods=20).mean()
+        roll_kin_std = kin.rolling(window=ZSCORE_WINDOW, min_periods=20).std()
+        z_kin_series = ((kin - roll_kin_mean) / (roll_kin_std + 1e-6)).fillna(0).values.tolist()
+
+        slope = mechanics.dX
+        roll_slope_mean = slope.rolling(window=ZSCORE_WINDOW, min_periods=20).mean()
+        roll_slope_std = slope.rolling(window=ZSCORE_WINDOW, min_periods=20).std()
+        z_slope_series = ((slope - roll_slope_mean) / (roll_slope_std + 1e-6)).fillna(0).values.tolist()
+
+    from logic import backtest_strategy
+
+    # --- STRATEGIA 1: LIVE KINETIC (Originale) ---
+    def live_strategy():
+        return backtest_strategy(
+            prices=price_real,
+            z_kinetic=z_kin_series,
+            z_slope=z_slope_series,
+            dates=dates_historical,
+            start_date=req.start_date,
+            end_date=req.end_date
+        )
+
+    # --- STRATEGIA 2: FROZEN POTENTIAL (Richiesta User) ---
+    # Trigger: z-score rolling del Frozen Potential; direzione da Z-ROC
+    # (stesso backtest della pipeline di /scan-daily, daily_scan.py)
+    def frozen_strategy():
+        return frozen_pot_backtest(price_real, dates_historical, frozen_z_pot,
+                                   req.start_date, req.end_date)
+
+    # --- STRATEGIA 3: FROZEN SUM (Nuovo Indicatore Filtrato) ---
+    # Trigger: Frozen Sum Z (Butterworth causale) a -0.3; direzione da Z-ROC
+    def frozen_sum_strategy():
+        return frozen_sum_backtest(price_real, dates_historical, frozen_z_sum,
+                                   req.start_date, req.end_date)
+
+    # --- STRATEGIA 4: MIN ACTION (TREND FOLLOWING) [NEW] ---
+    # Usa la curva di minima azione (price_min_action / px_star) come trend follower.
+    # TIMING: Triggered by Frozen Sum Z > -0.3 (Hybrid Mode)
+    # DIRECTION: Price vs Curve
+    # Solo su richiesta esplicita (fields=["min_action_strategy"]).
+    def min_action_strategy():
+        return backtest_strategy(
+            prices=price_real,
+            z_kinetic=align_frozen_sum(len(price_real), frozen_z_sum), # Trigger signal (same as SUM)
+            z_slope=[],   # Ignorato
+            dates=dates_historical,
+            start_date=req.start_date,
+            end_date=req.end_date,
+            threshold=-0.3, # Trigger Threshold (same as SUM)
+            trend_mode='PRICE_VS_CURVE',
+            trend_curve=price_min_action
+        )
+
+    # --- STRATEGIA 5: STABLE (Stable Slope, linea verde F.Slope) ---
+    # [UNIFICATO] usa il motore condiviso stable_strategy.backtest_stable
+    # (stessa semantica di Lab e email scanner): LONG-only, soglie 0/0,
+    # esecuzione t+1 (segnale sul close di oggi, esecuzione al close di domani).
+    STABLE_ENTRY = 0.0
+    STABLE_EXIT = 0.0
+
+    def stable_strategy():
+        from stable_strategy import backtest_stable
+        return backtest_stable(
+            dates=dates_historical,
+            prices=price_real,
+            slopes=stable_slope_line,
+            mode="LONG",
+            entry_th=STABLE_ENTRY,
+            exit_th=STABLE_EXIT,
+            execution_lag=1,
+            cost_pct=0.0,
+            initial_capital=1000.0,
+            start_date=req.start_date,
+            end_date=req.end_date,
+        )
+
+    # Dati Futuri (Proiezione)
+    def forecast():
+        # Nota: future_idx potrebbe contenere timestamp o interi, convertiamo
+        try:
+            dates_future = [d.strftime('%Y-%m-%d') for d in future_idx]
+        except:
+            # Fallback se non sono date
+            dates_future = [str(d) for d in future_idx]
+
+        if req.forecast_mode == "bands":
+            return {
+                "mode": "bands",
+                "dates": dates_future,            # solo orizzonte futuro
+                "bands": future_bands,            # {"p5": [...], ..., "p95": [...]}
+                "n_scenarios": req.n_scenarios,
+                "fit": {
+                    "dates": fourier.px.index.strftime('%Y-%m-%d').tolist(),
+                    "values": future_fit,
+                },
+            }
+        # future_vals is now a LIST OF LISTS (5 scenarios)
+        # We pass it directly.
+        return {
+            "dates": dates_future,
+            "scenarios": future_vals # Renaming clear to avoiding confusion
+        }
+
+    # [NEW] Market Metrics
+    # 1. Avg Abs Kinetic
+    def avg_abs_kin():
+        value = ((kin - roll_kin_mean) / (roll_kin_std + 1e-6)).fillna(0).abs().mean()
+        return round(float(value), 2)
+
+    # Market Cap already loaded from cache or calculated above
+    # (Legacy block removed)
+
+    # Output -> valore (valutato solo se richiesto), nell'ordine storico
+    outputs = {
+        "avg_abs_kin": avg_abs_kin,
+        "market_cap": lambda: mkt_cap,
+        "dates": lambda: dates_historical,
+        "prices": lambda: price_real,
+        "volume": lambda: volume_series.reindex(px.index).fillna(0).tolist(),
+        "min_action": lambda: price_min_action,
+        "fundamentals": lambda: mechanics.F.values.tolist(),
+        "energy": lambda: {
+            "kinetic": mechanics.kin_density.values.tolist(),
+            "potential": mechanics.pot_density.values.tolist(),
+            "cumulative": mechanics.cumulative_action.values.tolist(),
+            "z_kinetic": z_kin_series,
+            "z_slope": z_slope_series
+        },
+        "indicators": lambda: {
+            "slope": mechanics.dX.values.tolist(),
+            "stable_slope": stable_slope_line,
+            "stable_kinetic_z": stable_kinetic_z_line,
+            "stable_kinetic_z_regime": stable_kinetic_z_regime,
+            "z_residuo": mechanics.z_residuo.values.tolist(),
+            "roc": roc.values.tolist(),
+            "z_roc": z_roc.values.tolist(),
+            "zigzag": zigzag_line   # [NEW] Cumulative Direction
+        },
+        "backtest": live_strategy,                     # Strategia Live
+        "frozen_strategy": frozen_strategy,            # Strategia Frozen Pot
+        "frozen_sum_strategy": frozen_sum_strategy,    # [NEW] Frozen Sum
+        "stable_strategy": stable_strategy,            # [NEW] Stable Indicators
+        "forecast": forecast,
+        "fourier_components": lambda: fourier.get_components(),
+        "frozen": lambda: {
+            "dates": frozen_dates,
+            "z_kinetic": frozen_z_kin,
+            "z_potential": frozen_z_pot,
+            "z_sum": frozen_z_sum
+        },
+        "min_action_strategy": min_action_strategy,
+    }
+
+    response = {"status": "ok", "ticker": req.ticker}
+    for name, build in outputs.items():
+        if name in fields:
+            response[name] = build()
+    return response
+
+
+def _cached_frame(req, source, px, full_frozen_data, zigzag_series, volume_series, mkt_cap):
+    """
+    Frame della barra di req.end_date da FRAME_CACHE (calcolato e salvato se
+    manca) + prefetch in background di req.prefetch barre per lato.
+    None se end_date precede la storia caricata (si usa il percorso normale).
+    """
+    dates = px.index.strftime('%Y-%m-%d').tolist()
+    k, bar = frame_bar(dates, req.end_date)
+    if bar is None:
+        return None
+    params = dict(alpha=req.alpha, beta=req.beta, top_k=req.top_k, forecast_days=req.forecast_days,
+                  fourier_days=req.fourier_days, start_date=req.start_date,
+                  forecast_mode=req.forecast_mode, n_scenarios=req.n_scenarios,
+                  forecast_quantiles=tuple(req.forecast_quantiles),
+                  fields=None if req.fields is None else tuple(req.fields))
+
+    def job(d):
+        sub = req.copy(update={"end_date": d})
+        return (frame_key(req.ticker, d, **params), source,
+                lambda: _analysis_frame(sub, px, full_frozen_data, zigzag_series, volume_series, mkt_cap))
+
+    key, _, compute = job(bar)
+    frame = FRAME_CACHE.get(key, source)
+    if frame is None:
+        frame = compute()
+        FRAME_CACHE.put(key, source, frame)
+    else:
+        print(f"🎞️ FRAME HIT: {req.ticker} @ {bar}")
+    n = min(max(req.prefetch, 0), MAX_PREFETCH)
+    if n:
+        FRAME_CACHE.prefetch(job(d) for d in neighbour_bars(dates, k, n))
+    return frame
+
+
+@app.get("/analyze/frame-cache")
+def frame_cache_status():
+    return {"status": "ok", **FRAME_CACHE.stats()}
+
+
+@app.post("/analyze", response_class=FastJSONResponse)
 def analyze_stock(req: AnalysisRequest):
+    from logic import MAX_SCENARIOS
+    try:
+        blocks = analyze_blocks(DEFAULT_ANALYZE_FIELDS if req.fields is None else req.fields)
+        if req.forecast_mode == "bands" and not 1 <= req.n_scenarios <= MAX_SCENARIOS:
+            raise ValueError(f"n_scenarios deve essere in [1, {MAX_SCENARIOS}] (ricevuto {req.n_scenarios})")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
         print(f"Ricevuta richiesta: {req.dict()}")
         
         # 1. Scarica Dati & Gestione Cache Avanzata
         px = None
         full_frozen_data = None
+        frame_source = None  # entry di TICKER_CACHE da cui derivano i frame
         
         # Check Cache
         use_cache_data = False
@@ -222,9 +648,16 @@ def analyze_stock(req: AnalysisRequest):
                 print(f"⚠️ Cache partial miss (Dati Frozen mancanti). Ricalcolo...")
                 use_cache_data = False
 
+            # Input saltati da una richiesta con fields ridotti (zigzag, market_cap)
+            missing = blocks & set(cached_obj.get("skipped", ()))
+            if use_cache_data and missing:
+                print(f"⚠️ Cache partial miss (Input non scaricati: {sorted(missing)}). Ricalcolo...")
+                use_cache_data = False
+
         if use_cache_data:
             print(f"⚡ CACHE HIT: Uso dati in memoria per {req.ticker}")
             cached_obj = TICKER_CACHE[req.ticker]
+            frame_source = cached_obj
             px = cached_obj["px"]
             full_frozen_data = cached_obj.get("frozen", None)
             # Load ZigZag Series
@@ -282,12 +715,18 @@ def analyze_stock(req: AnalysisRequest):
             else:
                 volume_series = pd.Series([0]*len(px), index=px.index)
 
+            # Input costosi scaricati solo se un output richiesto li usa
+            skipped = [b for b in ("market_cap", "zigzag") if b not in blocks]
+
             # [NEW] Calculate Market Cap Logic (Moved here to avoid UnboundLocalError)
             mkt_cap = None
-            try:
-                mkt_cap = md.ticker_obj.fast_info.market_cap
-            except:
-                pass
+            if "market_cap" not in blocks:
+                mkt_cap = 0
+            else:
+                try:
+                    mkt_cap = md.ticker_obj.fast_info.market_cap
+                except:
+                    pass
             
             if mkt_cap is None:
                 try:
@@ -311,84 +750,53 @@ def analyze_stock(req: AnalysisRequest):
             print(f"📊 {req.ticker} Market Cap = {mkt_cap}")
 
             # [NEW] Calculate Cumulative Direction (ZigZag) - HOURLY AGGREGATED
-            try:
-                # Fetch hourly data for more granular ZigZag
-                print(f"📊 Fetching hourly data for ZigZag...")
-                hourly_data = md.ticker_obj.history(period="2y", interval="1h")
+            if "zigzag" not in blocks:
+                zigzag_series = pd.Series([0]*len(px), index=px.index)
+            else:
+                try:
+                    # Fetch hourly data for more granular ZigZag
+                    print(f"📊 Fetching hourly data for ZigZag...")
+                    hourly_data = md.ticker_obj.history(period="2y", interval="1h")
                 
-                if not hourly_data.empty and 'Open' in hourly_data.columns and 'Close' in hourly_data.columns:
-                    # Calculate hourly direction (+1, -1, 0)
-                    hourly_diff = hourly_data['Close'] - hourly_data['Open']
-                    hourly_signs = hourly_diff.apply(lambda x: 1 if x > 0 else -1 if x < 0 else 0)
+                    if not hourly_data.empty and 'Open' in hourly_data.columns and 'Close' in hourly_data.columns:
+                        # Calculate hourly direction (+1, -1, 0)
+                        hourly_diff = hourly_data['Close'] - hourly_data['Open']
+                        hourly_signs = hourly_diff.apply(lambda x: 1 if x > 0 else -1 if x < 0 else 0)
                     
-                    # Group by date and sum all hourly directions
-                    hourly_signs.index = pd.to_datetime(hourly_signs.index).date
-                    daily_net = hourly_signs.groupby(hourly_signs.index).sum()
+                        # Group by date and sum all hourly directions
+                        hourly_signs.index = pd.to_datetime(hourly_signs.index).date
+                        daily_net = hourly_signs.groupby(hourly_signs.index).sum()
                     
-                    # Align with px dates and cumsum
-                    zigzag_values = []
-                    cumsum = 0
-                    for date in px.index:
-                        date_key = date.date()
-                        if date_key in daily_net.index:
-                            cumsum += daily_net[date_key]
-                        zigzag_values.append(cumsum)
+                        # Align with px dates and cumsum
+                        zigzag_values = []
+                        cumsum = 0
+                        for date in px.index:
+                            date_key = date.date()
+                            if date_key in daily_net.index:
+                                cumsum += daily_net[date_key]
+                            zigzag_values.append(cumsum)
                     
-                    zigzag_series = pd.Series(zigzag_values, index=px.index)
-                    print(f"✅ ZigZag calcolato su {len(hourly_data)} candele orarie")
-                else:
-                    # Fallback to daily if hourly not available
-                    print("⚠️ Hourly data not available, using daily fallback")
-                    d_open = md.df_full['Open']
-                    d_close = md.df_full['Close']
-                    diff = d_close - d_open
-                    signs = diff.apply(lambda x: 1 if x > 0 else -1 if x < 0 else 0)
-                    zigzag_series = signs.cumsum()
-            except Exception as e:
-                print(f"⚠️ Errore calcolo ZigZag: {e}")
-                zigzag_series = pd.Series([0]*len(px), index=px.index)
+                        zigzag_series = pd.Series(zigzag_values, index=px.index)
+                        print(f"✅ ZigZag calcolato su {len(hourly_data)} candele orarie")
+                    else:
+                        # Fallback to daily if hourly not available
+                        print("⚠️ Hourly data not available, using daily fallback")
+                        d_open = md.df_full['Open']
+                        d_close = md.df_full['Close']
+                        diff = d_close - d_open
+                        signs = diff.apply(lambda x: 1 if x > 0 else -1 if x < 0 else 0)
+                        zigzag_series = signs.cumsum()
+                except Exception as e:
+                    print(f"⚠️ Errore calcolo ZigZag: {e}")
+                    zigzag_series = pd.Series([0]*len(px), index=px.index)
             
             # --- PRE-CALCOLO FROZEN HISTORY (point-in-time) ---
             # [PERF] O(n) via filtro di Kalman: valori numericamente identici
             # al vecchio ricalcolo ActionPath(px[:t+1]) per ogni t (O(n²)).
             # Parità dimostrata in tests/test_kalman_frozen.py.
             print(f"🧊 Pre-calcolo Frozen History (Kalman O(n))...")
-            MIN_POINTS = 100
-            frozen_res = kalman_frozen_series(
-                px, alpha=req.alpha, beta=req.beta,
-                min_points=MIN_POINTS, kin_lag=25
-            )
-            f_dates = [px.index[t].strftime('%Y-%m-%d') for t in frozen_res["t_index"]]
-            # 1. Kinetic Frozen (shifted T-25 for prediction comparison)
-            f_kin = [round(v, 2) for v in frozen_res["kin_lag"]]
-            # 2. Potential Frozen (current T)
-            f_pot = [round(v, 2) for v in frozen_res["pot_last"]]
-            # 3. Frozen Sum Index (current kin + current pot, not shifted)
-            f_sum = [k + p for k, p in zip(frozen_res["kin_last"], frozen_res["pot_last"])]
-            
-            # [NEW] Normalize Frozen Sum Index (Rolling Z-Score 252)
-            f_sum_series = pd.Series(f_sum)
-            roll_fsum_mean = f_sum_series.rolling(window=252, min_periods=20).mean()
-            roll_fsum_std = f_sum_series.rolling(window=252, min_periods=20).std()
-            z_frozen_sum = ((f_sum_series - roll_fsum_mean) / (roll_fsum_std + 1e-6)).fillna(0).tolist()
-            
-            # [FIX LOOKAHEAD] Low-pass Butterworth CAUSALE (era filtfilt
-            # zero-phase: "senza lag" significava usare il futuro).
-            try:
-                z_frozen_sum = causal_lowpass(z_frozen_sum)
-            except Exception as e:
-                print(f"⚠️ Filter failed (keeping raw): {e}")
-            
-            # Round for JSON
-            z_frozen_sum = [round(x, 2) for x in z_frozen_sum]
-            
-            full_frozen_data = {
-                "dates": f_dates,
-                "kin": f_kin,
-                "pot": f_pot,
-                "z_sum": z_frozen_sum,
-                "raw_sum": f_sum  # [NEW] Save raw values for integrity check reruns
-            }
+            full_frozen_data = frozen_history(px, alpha=req.alpha, beta=req.beta,
+                                              min_points=100, kin_lag=25)
             
             # Salva tutto in cache
             TICKER_CACHE[req.ticker] = {
@@ -398,357 +806,20 @@ def analyze_stock(req: AnalysisRequest):
                 "volume": volume_series,
                 "mkt_cap": mkt_cap
             }
+            if skipped:
+                TICKER_CACHE[req.ticker]["skipped"] = skipped
+            frame_source = TICKER_CACHE[req.ticker]
 
-        # --- SIMULATION TIME TRAVEL (True Point-in-Time Calculation) ---
-        if req.end_date:
-            end_ts = pd.Timestamp(req.end_date)
-            # Slice Prices
-            px = px[px.index <= end_ts]
-            
-            # Slice ZigZag (Series)
-            if zigzag_series is not None:
-                zigzag_series = zigzag_series[zigzag_series.index <= end_ts]
-                
-            # Slice Volume
-            if volume_series is not None:
-                volume_series = volume_series[volume_series.index <= end_ts]
-            
-            # Slice Frozen Data
-            # To avoid look-ahead bias from the filter, we must:
-            # 1. Slice the RAW SUM to the target date
-            # 2. Re-apply Rolling Z-Score and Filter on the truncated series
-            
-            trunc_dates = []
-            trunc_kin = []
-            trunc_pot = []
-            trunc_z_sum = []
-            
-            if full_frozen_data and "raw_sum" in full_frozen_data:
-                full_dates = full_frozen_data["dates"]
-                full_raw_sum = full_frozen_data["raw_sum"]
-                
-                # Find cut-off index
-                from bisect import bisect_right
-                # full_dates is sorted list of strings YYYY-MM-DD
-                cut_idx = bisect_right(full_dates, req.end_date)
-                
-                if cut_idx > 0:
-                    trunc_dates = full_frozen_data["dates"][:cut_idx]
-                    trunc_kin = full_frozen_data["kin"][:cut_idx]
-                    trunc_pot = full_frozen_data["pot"][:cut_idx]
-                    
-                    # Recalculate Indicator on Truncated Data
-                    trunc_raw = full_raw_sum[:cut_idx]
-                    
-                    # 1. Rolling Z-Score
-                    s_trunc = pd.Series(trunc_raw)
-                    roll_mean = s_trunc.rolling(window=252, min_periods=20).mean()
-                    roll_std = s_trunc.rolling(window=252, min_periods=20).std()
-                    z_trunc = ((s_trunc - roll_mean) / (roll_std + 1e-6)).fillna(0).tolist()
-                    
-                    try:
-                        if len(z_trunc) > 15:
-                            trunc_z_sum = causal_lowpass(z_trunc)
-                        else:
-                            trunc_z_sum = z_trunc
-                    except:
-                        trunc_z_sum = z_trunc
-                    
-                    # Rounding
-                    trunc_z_sum = [round(x, 2) for x in trunc_z_sum]
-                else:
-                    # No data before date
-                    pass
-            else:
-                # Fallback to old simple slicing if raw_sum missing (legacy cache)
-                # But we should have invalidated cache earlier
-                target_date_str = req.end_date
-                for i, d in enumerate(full_frozen_data["dates"]):
-                    if d <= target_date_str:
-                        trunc_dates.append(d)
-                        trunc_kin.append(full_frozen_data["kin"][i])
-                        trunc_pot.append(full_frozen_data["pot"][i])
-                        trunc_z_sum.append(full_frozen_data["z_sum"][i])
-                    else:
-                        break # Stop appena superiamo la data
-            
-            # Override response content
-            full_frozen_data = {
-                "dates": trunc_dates,
-                "kin": trunc_kin,
-                "pot": trunc_pot,
-                "z_sum": trunc_z_sum,
-                "raw_sum": [] # Not needed in frontend
-            }
-            
-            frozen_dates = trunc_dates
-            frozen_z_kin = trunc_kin
-            frozen_z_pot = trunc_pot
-            frozen_z_sum = trunc_z_sum
-            
-            print(f"🕐 Simulating past: data truncated to {req.end_date}")
-        else:
-            # Dati completi
-            frozen_dates = full_frozen_data["dates"]
-            frozen_z_kin = full_frozen_data["kin"]
-            frozen_z_pot = full_frozen_data["pot"]
-            frozen_z_sum = full_frozen_data["z_sum"]
-        
-        # Prepare ZigZag List
-        zigzag_line = zigzag_series.values.tolist() if zigzag_series is not None else []
-        
-        # 2. Calcola Minima Azione (Live su dati tranciati)
-        mechanics = ActionPath(px, alpha=req.alpha, beta=req.beta)
-        
-        # 3. Calcola Fourier
-        fourier = FourierEngine(px, top_k=req.top_k, window_size=req.fourier_days)
-        future_idx, future_vals = fourier.reconstruct_scenario(future_horizon=req.forecast_days, n_scenarios=5)
-        
-        # 4. Prepara Risposta JSON
-        dates_historical = px.index.strftime('%Y-%m-%d').tolist()
-        
-        # Prezzi
-        price_real = px.values.tolist()
-        price_min_action = mechanics.px_star.values.tolist()
-        fundamentals = mechanics.F.values.tolist()
-        
-        # Densità Energia
-        kin_density = mechanics.kin_density.values.tolist()
-        pot_density = mechanics.pot_density.values.tolist()
-        cum_action = mechanics.cumulative_action.values.tolist()
-        
-        # Indicatori Tecnici
-        slope_line = mechanics.dX.values.tolist()
-        z_residuo_line = mechanics.z_residuo.values.tolist()
-
-        # Stable Slope: CAUSAL estimator of stabilized SLOPE
-        # Alpha controls the EMA span for the fundamental curve:
-        #   alpha=100 → span=10 (reactive), alpha=200 → span=20 (default), alpha=400 → span=40 (smooth)
-        # GUARANTEED CAUSAL: EMA only looks backward, never forward
-        # GUARANTEED STABLE: past values NEVER change when new data arrives
-        ema_span = max(5, int(req.alpha / 10))
-        F_alpha = px.ewm(span=ema_span, adjust=False).mean()
-        dF_alpha = F_alpha.diff().fillna(0)
-        stable_slope_line = dF_alpha.ewm(span=14, adjust=False).mean().values.tolist()
-
-        # Stable Kinetic Z: causal estimator of stabilized Kinetic Z
-        # OPTIMIZED via grid search on 8 market types:
-        #   base=20 (EMA span for dF), no post-smoothing needed
-        #   Hysteresis threshold=0.5 for zero-crossing detection
-        # Results: 82.9% precision, 17.1% FPR, ~11 switches avg
-        # Purely causal: NEVER changes for past dates (verified)
-        SKINZ_THRESHOLD = 0.5
-        try:
-            # [FIX] il vecchio blocco inline referenziava una variabile `dF`
-            # inesistente (NameError silenziato) -> pannello sempre vuoto.
-            # Ora il calcolo vive in logic.compute_stable_kinetic_z (testato).
-            stable_kinetic_z_line, stable_kinetic_z_regime = compute_stable_kinetic_z(
-                px, req.alpha, threshold=SKINZ_THRESHOLD
-            )
-            _n_switches = int(np.sum(np.abs(np.diff(stable_kinetic_z_regime)) > 0))
-            print(f"✅ Stable Kinetic Z: {len(stable_kinetic_z_line)} pts | Regime switches: {_n_switches}")
-        except Exception as e:
-            print(f"⚠️ Stable Kinetic Z computation failed: {e}")
-            import traceback
-            traceback.print_exc()
-            stable_kinetic_z_line = []
-            stable_kinetic_z_regime = []
-        
-        # ROC (Rate of Change)
-        ROC_PERIOD = 20
-        roc = ((px - px.shift(ROC_PERIOD)) / px.shift(ROC_PERIOD) * 100).fillna(0)
-        roc_line = roc.values.tolist()
-        
-        # Z-Score del ROC
-        roll_roc_mean = roc.rolling(window=252, min_periods=20).mean()
-        roll_roc_std = roc.rolling(window=252, min_periods=20).std()
-        z_roc = ((roc - roll_roc_mean) / (roll_roc_std + 1e-6)).fillna(0)
-        z_roc_line = z_roc.values.tolist()
-        
-        # 5. Backtest Strategy
-        # Calculate ROLLING Z-Scores to avoid look-ahead bias (252-day window)
-        ZSCORE_WINDOW = 252
-        
-        kin = mechanics.kin_density
-        roll_kin_mean = kin.rolling(window=ZSCORE_WINDOW, min_periods=20).mean()
-        roll_kin_std = kin.rolling(window=ZSCORE_WINDOW, min_periods=20).std()
-        z_kin_series = ((kin - roll_kin_mean) / (roll_kin_std + 1e-6)).fillna(0).values.tolist()
-        
-        slope = mechanics.dX
-        roll_slope_mean = slope.rolling(window=ZSCORE_WINDOW, min_periods=20).mean()
-        roll_slope_std = slope.rolling(window=ZSCORE_WINDOW, min_periods=20).std()
-        z_slope_series = ((slope - roll_slope_mean) / (roll_slope_std + 1e-6)).fillna(0).values.tolist()
-        
-        from logic import backtest_strategy
-        
-        # --- STRATEGIA 1: LIVE KINETIC (Originale) ---
-        backtest_result = backtest_strategy(
-            prices=price_real,
-            z_kinetic=z_kin_series,
-            z_slope=z_slope_series,
-            dates=dates_historical,
-            start_date=req.start_date,
-            end_date=req.end_date
-        )
-        
-        # --- STRATEGIA 2: FROZEN POTENTIAL (Richiesta User) ---
-        # 1. Calcoliamo Z-Score della serie Frozen Potential (che è Raw Density)
-        #    La serie frozen è più corta (parte da MIN_POINTS). Dobbiamo allinearla a Price.
-        
-        # Calculate padding size (difference in length)
-        padding_size = len(price_real) - len(frozen_z_pot)
-        
-        # Prepend zeros/NaNs to align time series
-        # Using 0 as neutral value for Z-score calc is safer than NaN for backtest logic
-        aligned_frozen_pot = [0] * padding_size + frozen_z_pot
-        
-        # Ora è allineato
-        frozen_pot_series = pd.Series(aligned_frozen_pot).fillna(0)
-        
-        # Calculate rolling stats
-        roll_fpot_mean = frozen_pot_series.rolling(window=ZSCORE_WINDOW, min_periods=20).mean()
-        roll_fpot_std = frozen_pot_series.rolling(window=ZSCORE_WINDOW, min_periods=20).std()
-        
-        # Questo è lo Z-Score del Potenziale Frozen Point-in-Time
-        z_frozen_pot_score = ((frozen_pot_series - roll_fpot_mean) / (roll_fpot_std + 1e-6)).fillna(0).values.tolist()
-        
-        # 2. Eseguiamo backtest sostituendo Kinetic con Frozen Potential
-        #    Nota: Usiamo ancora z_slope Live per la direzione (Long/Short)
-        backtest_result_frozen = backtest_strategy(
-            prices=price_real,
-            z_kinetic=z_frozen_pot_score, # Sostituiamo segnale trigger
-            z_slope=z_slope_series,       # Non usato (use_z_roc=True)
-            dates=dates_historical,
-            start_date=req.start_date,
-            end_date=req.end_date,
-            use_z_roc=True  # Direzione basata su Z-ROC (causale)
-        )
-        
-        # --- STRATEGIA 3: FROZEN SUM (Nuovo Indicatore Filtrato) ---
-        # Allineiamo frozen_z_sum (già filtrato con Butterworth) alla lunghezza di price_real
-        padding_sum = len(price_real) - len(frozen_z_sum)
-        aligned_frozen_sum = [-999] * padding_sum + frozen_z_sum  # -999 = no data, prevents false entry
-        
-        backtest_result_frozen_sum = backtest_strategy(
-            prices=price_real,
-            z_kinetic=aligned_frozen_sum,  # Segnale: Frozen Sum Z (Filtrato)
-            z_slope=z_slope_series,        # Non usato (use_z_roc=True)
-            dates=dates_historical,
-            start_date=req.start_date,
-            end_date=req.end_date,
-            threshold=-0.3,  # Entry/Exit a -0.3 invece di 0
-            use_z_roc=True   # Direzione basata su Z-ROC (causale)
-        )
-        
-        # --- STRATEGIA 4: MIN ACTION (TREND FOLLOWING) [NEW] ---
-        # Usa la curva di minima azione (price_min_action / px_star) come trend follower.
-        # TIMING: Triggered by Frozen Sum Z > -0.3 (Hybrid Mode)
-        # DIRECTION: Price vs Curve
-        
-        backtest_result_ma = backtest_strategy(
-            prices=price_real,
-            z_kinetic=aligned_frozen_sum, # Trigger signal (same as SUM)
-            z_slope=[],   # Ignorato
-            dates=dates_historical,
-            start_date=req.start_date,
-            end_date=req.end_date,
-            threshold=-0.3, # Trigger Threshold (same as SUM)
-            trend_mode='PRICE_VS_CURVE',
-            trend_curve=price_min_action 
-        )
-        
-        # --- STRATEGIA 5: STABLE (Stable Slope, linea verde F.Slope) ---
-        # [UNIFICATO] usa il motore condiviso stable_strategy.backtest_stable
-        # (stessa semantica di Lab e email scanner): LONG-only, soglie 0/0,
-        # esecuzione t+1 (segnale sul close di oggi, esecuzione al close di domani).
-        STABLE_ENTRY = 0.0
-        STABLE_EXIT = 0.0
-
-        from stable_strategy import backtest_stable
-        backtest_result_stable = backtest_stable(
-            dates=dates_historical,
-            prices=price_real,
-            slopes=stable_slope_line,
-            mode="LONG",
-            entry_th=STABLE_ENTRY,
-            exit_th=STABLE_EXIT,
-            execution_lag=1,
-            cost_pct=0.0,
-            initial_capital=1000.0,
-            start_date=req.start_date,
-            end_date=req.end_date,
-        )
+        # --- FRAME CACHE (Time Machine) ---
+        # [PERF] Opt-in: i frame point-in-time si riusano per barra e le barre
+        # vicine si precalcolano in background (frame_cache.py).
+        if req.use_frame_cache and req.end_date and frame_source is not None:
+            frame = _cached_frame(req, frame_source, px, full_frozen_data,
+                                  zigzag_series, volume_series, mkt_cap)
+            if frame is not None:
+                return frame
 
-        # Dati Futuri (Proiezione)
-        # Nota: future_idx potrebbe contenere timestamp o interi, convertiamo
-        try:
-            dates_future = [d.strftime('%Y-%m-%d') for d in future_idx]
-        except:
-            # Fallback se non sono date
-            dates_future = [str(d) for d in future_idx]
-            
-        # future_vals is now a LIST OF LISTS (5 scenarios)
-        # We pass it directly.
-        future_scenarios = future_vals
-        
-        # NOTE: Frontend expects 'values' to be array of arrays now? 
-        # Or we keep 'values' for backward compatibility (maybe mean?) and add 'scenarios'?
-        # User asked to REPLACE. So 'values' will become list of lists.
-        # Frontend check is needed.
-        
-        # Componenti Fourier
-        fourier_comps = fourier.get_components()
-        
-        # [NEW] Market Metrics
-        # 1. Avg Abs Kinetic
-        avg_abs_kin = ((kin - roll_kin_mean) / (roll_kin_std + 1e-6)).fillna(0).abs().mean()
-        
-        # Market Cap already loaded from cache or calculated above
-        # (Legacy block removed)
-        
-        return {
-            "status": "ok",
-            "ticker": req.ticker,
-            "avg_abs_kin": round(float(avg_abs_kin), 2),
-            "market_cap": mkt_cap,
-            "dates": dates_historical,
-            "prices": price_real,
-            "volume": volume_series.reindex(px.index).fillna(0).tolist(),
-            "min_action": price_min_action,
-            "fundamentals": fundamentals,
-            "energy": {
-                "kinetic": kin_density,
-                "potential": pot_density,
-                "cumulative": cum_action,
-                "z_kinetic": z_kin_series,
-                "z_slope": z_slope_series
-            },
-            "indicators": {
-                "slope": slope_line,
-                "stable_slope": stable_slope_line,
-                "stable_kinetic_z": stable_kinetic_z_line,
-                "stable_kinetic_z_regime": stable_kinetic_z_regime,
-                "z_residuo": z_residuo_line,
-                "roc": roc_line,
-                "z_roc": z_roc_line,
-                "zigzag": zigzag_line   # [NEW] Cumulative Direction
-            },
-            "backtest": backtest_result,                  # Strategia Live
-            "frozen_strategy": backtest_result_frozen,    # Strategia Frozen Pot
-            "frozen_sum_strategy": backtest_result_frozen_sum,  # [NEW] Frozen Sum
-            "stable_strategy": backtest_result_stable,            # [NEW] Stable Indicators
-            "forecast": {
-                "dates": dates_future,
-                "scenarios": future_scenarios # Renaming clear to avoiding confusion
-            },
-            "fourier_components": fourier_comps,
-            "frozen": {
-                "dates": frozen_dates,
-                "z_kinetic": frozen_z_kin,
-                "z_potential": frozen_z_pot,
-                "z_sum": frozen_z_sum
-            }
-        }
+        return _analysis_frame(req, px, full_frozen_data, zigzag_series, volume_series, mkt_cap)
 
     except Exception as e:
         import traceback
@@ -773,13 +844,44 @@ class BatchStableRequest(BaseModel):
     start_date: Optional[str] = "2023-01-01"
     max_workers: int = 8  # server-side thread pool size
 
-@app.post("/analyze-batch-stable")
-def analyze_batch_stable(req: BatchStableRequest):
+@app.post("/analyze-batch-stable", response_class=FastJSONResponse, responses=columnar.OPENAPI_RESPONSES)
+def analyze_batch_stable(req: BatchStableRequest, request: Request = None):
     """
     Lightweight batch analysis for STABLE strategy.
     Returns only dates, prices, stable_slope for each ticker.
     Uses PRICE_CACHE to download from Yahoo ONCE, then recompute
     mechanics for different alpha values without re-downloading.
+    Con Accept: application/vnd.fpr.columnar risponde nel formato binario
+    colonnare (date su un asse condiviso, columnar.py).
+    """
+    return columnar.negotiate(_analyze_batch_stable(req), request)
+
+@app.post("/analyze-batch-stable/stream")
+def analyze_batch_stable_stream(req: BatchStableRequest, request: Request,
+                                format: Optional[str] = None, progress: bool = False):
+    """
+    /analyze-batch-stable in streaming: un evento "result" per ticker
+    ({"ticker", "dates", "prices", "stable_slope", "pot", "fundamental"}),
+    poi "end" con count_ok/count_err/errors. Formati come /scan/stream.
+    """
+    try:
+        fmt = stream_format(format, request.headers.get("accept"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def body(stream):
+        out = _analyze_batch_stable(req, on_progress=stream.progress, collect=False,
+                                    on_result=lambda t, r: stream.result({"ticker": t, **r}))
+        return {k: out[k] for k in ("errors", "count_ok", "count_err")}
+    return stream_response("analyze-batch-stable", body, fmt, progress)
+
+def _analyze_batch_stable(req: BatchStableRequest, on_progress=None, on_result=None, collect=True):
+    """
+    Corpo di /analyze-batch-stable, usato anche dai job (/jobs) e dallo
+    streaming: on_progress(phase, done, total) per le fasi "download" e
+    "compute", on_result(ticker, result) a ogni ticker calcolato. Se
+    on_progress o on_result sollevano, i task in coda vengono annullati.
+    collect=False: risultati solo via on_result ("results" resta vuoto).
     """
     results = {}
     errors = {}
@@ -842,10 +944,10 @@ def analyze_batch_stable(req: BatchStableRequest):
             ema_span = max(5, int(req.alpha / 10))
             F_alpha = px.ewm(span=ema_span, adjust=False).mean()
             dF_alpha = F_alpha.diff().fillna(0)
-            stable_slope = dF_alpha.ewm(span=14, adjust=False).mean().values.tolist()
+            stable_slope = dF_alpha.ewm(span=14, adjust=False).mean().values
 
             dates = px.index.strftime('%Y-%m-%d').tolist()
-            prices = px.values.tolist()
+            prices = px.values
 
             # [NEW additive] Serie per strategie ARANCIONE/COMBO nel Lab:
             # potenziale causale point-in-time (Kalman O(n), None-padded ai
@@ -856,9 +958,11 @@ def analyze_batch_stable(req: BatchStableRequest):
                 if len(px) > 110:
                     fr = kalman_frozen_series(px, alpha=req.alpha, beta=1.0,
                                               min_points=100, kin_lag=25)
-                    pad = len(prices) - len(fr["pot_last"])
-                    pot_aligned = [None] * pad + [round(v, 6) for v in fr["pot_last"]]
-                    fundamental = px.ewm(span=20, adjust=False).mean().values.tolist()
+                    # NaN nel padding iniziale -> null nel JSON (fastjson); pot_last
+                    # contiene np.float64, arrotondati da sempre con np.round
+                    pot_aligned = padded_round(fr["pot_last"], len(prices), decimals=6,
+                                               rounding="numpy")
+                    fundamental = px.ewm(span=20, adjust=False).mean().values
             except Exception:
                 pot_aligned = []
                 fundamental = []
@@ -885,28 +989,47 @@ def analyze_batch_stable(req: BatchStableRequest):
 
         with concurrent.futures.ThreadPoolExecutor(max_workers=download_workers) as executor:
             futures = {executor.submit(download_one, t): t for t in to_download}
-            for future in concurrent.futures.as_completed(futures):
-                t, ok, err = future.result()
-                if not ok:
-                    errors[t] = err
-                    print(f"  ❌ Download {t}: {err}")
+            try:
+                for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                    t, ok, err = future.result()
+                    if not ok:
+                        errors[t] = err
+                        print(f"  ❌ Download {t}: {err}")
+                    if on_progress:
+                        on_progress("download", done, len(futures))
+            except BaseException:
+                for f in futures:
+                    f.cancel()
+                raise
         print(f"  ✅ Downloads done. Errors: {len(errors)}")
 
     # PHASE 2: Compute slopes for ALL tickers (higher concurrency, no Yahoo)
     tickers_to_compute = [t for t in req.tickers if t not in errors]
+    computed = set()
     print(f"  🧮 Computing slopes for {len(tickers_to_compute)} tickers ({compute_workers} workers, α={req.alpha})...")
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=compute_workers) as executor:
         futures = {executor.submit(analyze_one, t): t for t in tickers_to_compute}
-        for future in concurrent.futures.as_completed(futures):
-            ticker, result, error = future.result()
-            if result:
-                results[ticker] = result
-            else:
-                errors[ticker] = error
-                print(f"  ❌ Compute {ticker}: {error}")
-
-    ok = len(results)
+        try:
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                ticker, result, error = future.result()
+                if result:
+                    computed.add(ticker)
+                    if collect:
+                        results[ticker] = result
+                    if on_result:
+                        on_result(ticker, result)
+                else:
+                    errors[ticker] = error
+                    print(f"  ❌ Compute {ticker}: {error}")
+                if on_progress:
+                    on_progress("compute", done, len(futures))
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            raise
+
+    ok = len(computed)
     err = len(errors)
     print(f"✅ BATCH STABLE completato: {ok} OK, {err} errori (α={req.alpha})")
 
@@ -918,6 +1041,260 @@ def analyze_batch_stable(req: BatchStableRequest):
         "count_err": err
     }
 
+# --- WALK-FORWARD OPTIMIZATION ---
+class WalkForwardRequest(BaseModel):
+    tickers: List[str]
+    strategy: str = "STABLE"  # STABLE, ARANCIONE, COMBO
+    mode: str = "LONG"        # solo STABLE
+    alphas: List[float] = [200.0]
+    entries: List[float] = [0.0]
+    exits: List[float] = [0.0]
+    entry_zs: List[float] = [2.0]
+    horizons: List[int] = [21]
+    start_date: Optional[str] = "2019-01-01"
+    train_bars: int = 504
+    test_bars: int = 126
+    step_bars: Optional[int] = None  # default = test_bars (fold OOS contigui)
+    anchored: bool = False
+    objective: str = "total_return"
+    cost_pct: float = 0.0
+    max_workers: int = 4
+
+@app.post("/walk-forward")
+def run_walk_forward(req: WalkForwardRequest):
+    """
+    Walk-forward sul paniere: selezione in-sample per fold, valutazione OOS,
+    equity OOS concatenata e stabilità dei parametri (walk_forward.py).
+    """
+    from stable_scanner import download_all_prices
+    from walk_forward import walk_forward, check_fold_sizes
+
+    try:
+        check_fold_sizes(req.train_bars, req.test_bars, req.step_bars)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    prices, failed = download_all_prices(req.tickers, req.start_date)
+    if not prices:
+        return {"status": "error", "detail": "Nessun prezzo disponibile", "failed": failed}
+    grid = {"alpha": req.alphas, "entry": req.entries, "exit": req.exits,
+            "entry_z": req.entry_zs, "horizon": req.horizons}
+    try:
+        res = walk_forward(prices, strategy=req.strategy, grid=grid,
+                           train_bars=req.train_bars, test_bars=req.test_bars,
+                           step_bars=req.step_bars, anchored=req.anchored,
+                           objective=req.objective, mode=req.mode,
+                           cost_pct=req.cost_pct, max_workers=req.max_workers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "ok", "failed": failed, **res}
+
+# --- GRID SEARCH ARANCIONE / COMBO (motore batch) ---
+class SatelliteGridRequest(BaseModel):
+    tickers: List[str]
+    strategy: str = "ARANCIONE"  # ARANCIONE o COMBO
+    start_date: Optional[str] = "2023-01-01"
+    alpha: float = 200.0
+    entry_zs: List[float] = [1.5, 2.0, 2.5]
+    horizons: List[int] = [10, 21, 42]
+    entries: List[float] = [0.0]  # solo COMBO (leg trend)
+    exits: List[float] = [0.0]
+    train_frac: float = 0.7
+    cost_pct: float = 0.0
+
+@app.post("/grid-search-satellite")
+def run_satellite_grid(req: SatelliteGridRequest):
+    """
+    Optimizer train/OOS per ARANCIONE e COMBO come quello STABLE del Lab:
+    z e onset una volta per ticker, posizioni e backtest di tutte le celle
+    in batch (grid_engine.py).
+    """
+    from stable_scanner import download_all_prices
+    from walk_forward import prepare_series
+    from grid_engine import grid_search
+
+    if req.strategy not in ("ARANCIONE", "COMBO"):
+        raise HTTPException(status_code=400, detail="strategy deve essere ARANCIONE o COMBO")
+    prices, failed = download_all_prices(req.tickers, req.start_date)
+    if not prices:
+        return {"status": "error", "detail": "Nessun prezzo disponibile", "failed": failed}
+    data = {t: prepare_series(px, req.alpha, req.strategy) for t, px in prices.items()}
+    res = grid_search(data, strategy=req.strategy, entry_zs=req.entry_zs, horizons=req.horizons,
+                      entries=req.entries, exits=req.exits,
+                      train_frac=min(0.95, max(0.3, req.train_frac)), cost_pct=req.cost_pct)
+    return {"status": "ok", "failed": failed, "alpha": req.alpha, **res}
+
+# --- EVENT STUDY (onset scarico del potenziale) ---
+class EventStudyRequest(BaseModel):
+    tickers: Optional[List[str]] = None  # None = intero universo
+    start_date: Optional[str] = "2019-01-01"
+    alpha: float = 200.0
+    beta: float = 1.0
+    entry_zs: List[float] = [1.5, 2.0, 2.5, 3.0]
+    horizons: List[int] = [1, 5, 10, 21]
+    execution_lag: int = 0  # 0 = close dell'onset (event study classico)
+    include_tickers: bool = False  # conteggio eventi per ticker
+    max_workers: int = 4
+
+@app.post("/event-study")
+def run_event_study(req: EventStudyRequest):
+    """
+    Event study degli onset arancione sull'universo: ritorni forward per
+    orizzonte ed entry_z contro la baseline non condizionata (event_study.py).
+    """
+    from stable_scanner import download_all_prices
+    from event_study import event_study
+
+    if not req.entry_zs or not req.horizons or min(req.horizons) < 1:
+        raise HTTPException(status_code=400, detail="entry_zs e horizons (>= 1) obbligatori")
+    tickers = req.tickers
+    if not tickers:
+        from tickers_loader import load_tickers
+        tickers = list(load_tickers().keys())
+    prices, failed = download_all_prices(tickers, req.start_date)
+    if not prices:
+        return {"status": "error", "detail": "Nessun prezzo disponibile", "failed": failed}
+    res = event_study(prices, alpha=req.alpha, beta=req.beta, entry_zs=req.entry_zs,
+                      horizons=req.horizons, execution_lag=req.execution_lag,
+                      max_workers=req.max_workers)
+    if not req.include_tickers:
+        res.pop("events_by_ticker")
+    return {"status": "ok", "failed": failed, **res}
+
+# --- SENSIBILITÀ AI COSTI (commissioni + slippage) ---
+class CostSensitivityRequest(BaseModel):
+    tickers: Optional[List[str]] = None  # None = intero universo
+    strategy: str = "STABLE"  # STABLE, ARANCIONE, COMBO
+    mode: str = "LONG"        # LONG, SHORT, BOTH (solo STABLE)
+    start_date: Optional[str] = "2019-01-01"
+    alpha: float = 200.0
+    entry: float = 0.0
+    exit: float = 0.0
+    entry_z: float = 2.0
+    horizon: int = 21
+    costs: List[float] = [0.0, 0.05, 0.1, 0.2, 0.5]  # % per lato
+    slippages: List[float] = [0.0]                   # % per lato, sommata al costo
+    include_tickers: bool = False  # total_return per ticker e livello
+
+@app.post("/cost-sensitivity")
+def run_cost_sensitivity(req: CostSensitivityRequest):
+    """
+    Curva di sensibilità ai costi dell'universo: il percorso dei segnali
+    gira una volta per ticker e viene riprezzato per ogni livello
+    (cost_sweep.py).
+    """
+    from stable_scanner import download_all_prices
+    from walk_forward import prepare_series
+    from cost_sweep import universe_cost_sweep, check_sweep_args
+
+    try:
+        check_sweep_args(req.strategy, req.mode, req.costs, req.slippages)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    tickers = req.tickers
+    if not tickers:
+        from tickers_loader import load_tickers
+        tickers = list(load_tickers().keys())
+    prices, failed = download_all_prices(tickers, req.start_date)
+    if not prices:
+        return {"status": "error", "detail": "Nessun prezzo disponibile", "failed": failed}
+    data = {t: prepare_series(px, req.alpha, req.strategy) for t, px in prices.items()}
+    params = {"entry": req.entry, "exit": req.exit, "entry_z": req.entry_z, "horizon": req.horizon}
+    try:
+        res = universe_cost_sweep(data, strategy=req.strategy, params=params, costs=req.costs,
+                                  slippages=req.slippages, mode=req.mode,
+                                  include_tickers=req.include_tickers)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "ok", "failed": failed, "alpha": req.alpha, **res}
+
+# --- FOURIER HISTORY (deriva dei cicli) ---
+class FourierHistoryRequest(BaseModel):
+    ticker: str
+    start_date: Optional[str] = "2019-01-01"  # inizio del download
+    from_date: Optional[str] = None  # prima data dello storico (default: prima finestra piena)
+    to_date: Optional[str] = None
+    fourier_days: int = 504
+    top_k: int = 5
+
+@app.post("/fourier-history")
+def run_fourier_history(req: FourierHistoryRequest):
+    """
+    Componenti Fourier top-k point-in-time per ogni data: spettro a
+    finestra mobile (spectral.py) invece di un FourierEngine per giorno.
+    """
+    from stable_scanner import download_all_prices
+    from spectral import spectrum_history
+
+    prices, failed = download_all_prices([req.ticker], req.start_date)
+    px = prices.get(req.ticker)
+    if px is None or len(px) < 3:
+        return {"status": "error", "detail": f"Nessun prezzo disponibile per {req.ticker}", "failed": failed}
+    try:
+        res = spectrum_history(px, window=req.fourier_days, top_k=req.top_k,
+                               start_date=req.from_date, end_date=req.to_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "ok", "ticker": req.ticker, **res}
+
+# --- PORTFOLIO SIZING (simulatore multi-asset) ---
+class SizingRequest(BaseModel):
+    # lista di trade oppure {ticker: [trade, ...]}; servono entry_date,
+    # exit_date, pnl_pct (gli OPEN sono ignorati)
+    trades: list[dict] | dict[str, list[dict]] = []
+    scheme: str = "fixed"  # fixed, fixed_unlimited, compound
+    capital: float = 10000.0
+    stake_pct: float = 10.0
+    cap: int = 10
+
+@app.post("/simulate-sizing")
+def simulate_sizing_endpoint(req: SizingRequest):
+    """Portafoglio su trade di qualunque motore (stessa semantica di simulateSizing JS)."""
+    from portfolio_sim import simulate_sizing
+    try:
+        res = simulate_sizing(req.trades, scheme=req.scheme, capital=req.capital,
+                              stake_pct=req.stake_pct, cap=req.cap)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "ok", **res}
+
+# --- BOOTSTRAP (intervalli di confidenza delle statistiche) ---
+class BootstrapRequest(BaseModel):
+    # una delle tre sorgenti: trade chiusi (pnl_pct), rendimenti giornalieri
+    # (frazioni) oppure equity_curve % di backtest_stable (+ start_index)
+    trades: Optional[list[dict]] = None
+    returns: Optional[list[float]] = None
+    equity_curve: Optional[list[float]] = None
+    start_index: int = 0
+    n_resamples: int = 2000
+    block_size: Optional[int] = None  # None = n^(1/3) sui rendimenti, 1 sui trade
+    ci: float = 0.95
+    seed: Optional[int] = None
+    compound: bool = True  # solo trade: False = quota fissa (forward test)
+
+@app.post("/bootstrap")
+def bootstrap_endpoint(req: BootstrapRequest):
+    """CI bootstrap di rendimento, Sharpe e max drawdown: l'edge è reale o rumore?"""
+    import bootstrap
+    if not 0 < req.ci < 1 or not 100 <= req.n_resamples <= 20000:
+        raise HTTPException(status_code=400, detail="ci in (0,1), n_resamples in [100, 20000]")
+    try:
+        bootstrap.check_params(req.n_resamples, req.block_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    kw = dict(n_resamples=req.n_resamples, ci=req.ci, seed=req.seed)
+    if req.trades is not None:
+        res = bootstrap.bootstrap_trades(req.trades, block_size=1 if req.block_size is None else req.block_size,
+                                         compound=req.compound, **kw)
+    elif req.returns is not None or req.equity_curve is not None:
+        returns = req.returns if req.returns is not None else \
+            bootstrap.returns_from_equity(req.equity_curve, req.start_index)
+        res = bootstrap.bootstrap_returns(returns, block_size=req.block_size, **kw)
+    else:
+        raise HTTPException(status_code=400, detail="servono trades, returns o equity_curve")
+    if "error" in res:
+        raise HTTPException(status_code=400, detail=res["error"])
+    return {"status": "ok", **res}
+
 # --- TRADE INTEGRITY VERIFICATION ---
 class VerifyIntegrityRequest(BaseModel):
     ticker: str
@@ -926,15 +1303,24 @@ class VerifyIntegrityRequest(BaseModel):
     beta: float = 1.0
     start_date: Optional[str] = None
     end_date: Optional[str] = None
+    # ogni quanti giorni ricalcolare il segnale sul prefisso per verificarne
+    # la causalità (1 = ogni giorno, esatto come il vecchio loop O(n²))
+    audit_every: int = 21
 
-@app.post("/verify-integrity")
+@app.post("/verify-integrity", response_class=FastJSONResponse)
 async def verify_trade_integrity(req: VerifyIntegrityRequest):
     """
     Verifica l'integrità dei trade simulando il tempo dal passato al presente.
     Rileva quando i trade cambiano retroattivamente (look-ahead bias).
+    Il replay gira nel pool "verify-integrity", fuori dall'event loop.
     """
     try:
-        from logic import backtest_strategy
+        return await run_in_pool("verify-integrity", _verify_trade_integrity, req)
+    except EndpointBusy as e:
+        return _busy_response(e)
+
+def _verify_trade_integrity(req: VerifyIntegrityRequest, on_progress=None):
+    try:
         from datetime import datetime, timedelta
         
         print(f"🔍 Verifica integrità per {req.ticker} - Strategia: {req.strategy}")
@@ -974,8 +1360,6 @@ async def verify_trade_integrity(req: VerifyIntegrityRequest):
         # Risultato: z_signal sempre vuoto -> la verifica rispondeva sempre
         # "0 trade corrotti" senza testare nulla.
         full_frozen_data = cached_obj.get("frozen") if isinstance(cached_obj, dict) else None
-        full_frozen_dates = full_frozen_data["dates"] if full_frozen_data else []
-        full_raw_sum = full_frozen_data["raw_sum"] if (full_frozen_data and "raw_sum" in full_frozen_data) else []
 
         # Senza dati frozen la verifica FROZEN/SUM sarebbe vacua: meglio un
         # errore esplicito che un falso "tutto ok".
@@ -988,285 +1372,33 @@ async def verify_trade_integrity(req: VerifyIntegrityRequest):
                 ),
             }
         
-        # Determine date range
-        all_dates = full_px.index.tolist()
-        start_idx = 252 * 2  # Start after 2 years of data for Z-Score
-        step_every = 1  # Check EVERY day for maximum precision
-        
-        # Track trades across time
-        trade_history = {}  # entry_date -> {first_seen_data, changes: [], disappeared: False}
-        corrupted_trades = []
-        
-        print(f"⏳ Inizio simulazione integrità ({len(all_dates) - start_idx} passi)...")
-        
-        for end_idx in range(start_idx, len(all_dates), step_every):
-            end_date_obj = all_dates[end_idx]
-            end_date_str = end_date_obj.strftime('%Y-%m-%d')
-            
-            # Simulate analysis at this point in time
-            truncated_px = full_px.iloc[:end_idx+1]
-            dates_historical = [d.strftime('%Y-%m-%d') for d in truncated_px.index]
-            price_real = truncated_px.tolist()
-            
-            # Run backtest based on strategy
-            if req.strategy == "LIVE":
-                # Recalculate dynamic path (Live is always fresh)
-                path = ActionPath(truncated_px, alpha=req.alpha, beta=req.beta)
-                kinetic = path.kin_density
-                
-                # Calculate Z-scores
-                z_kin_series = (kinetic - kinetic.rolling(252).mean()) / kinetic.rolling(252).std()
-                z_signal = z_kin_series.tolist()
-                threshold = 0.0
-                use_z_roc = False
-                
-            elif req.strategy == "FROZEN":
-                # [FIXED LOGIC] Use Frozen Point-in-Time Data
-                # Retrieve from separate cache key loaded at start
-                
-                # Check if we have frozen data
-                if full_frozen_data and "pot" in full_frozen_data:
-                    # We have pre-calculated point-in-time data
-                    
-                    # Find subset of data available at time 'end_date_str'
-                    # It includes all points with date <= end_date_str
-                    
-                    end_date_str = end_date_obj.strftime('%Y-%m-%d')
-
-                    
-                    # Find index in frozen list corresponding to end_date_str
-                    # Optimized: Since we iterate step_every=1, we can track index. But binary search is safer.
-                    # Dates are sorted strings YYYY-MM-DD
-                    
-                    # Find subset of raw_sum available at time 'end_date_str'
-                    # It includes all points with date <= end_date_str
-                    
-                    # Optim: bisect_right for strings works
-                    from bisect import bisect_right
-                    cut_idx = bisect_right(full_frozen_dates, end_date_str)
-                    
-                    if cut_idx == 0:
-                        # No frozen data available yet at this time
-                        z_signal = []
-                    else:
-                        # [FIX] FROZEN strategy uses POTENTIAL (not Sum), and aligns BEFORE Z-Score
-                        # This matches analyze_stock logic for the "Frozen" tab (Strategy 2)
-                        trunc_pot_raw = full_frozen_data["pot"][:cut_idx]
-                        trunc_dates = full_frozen_dates[:cut_idx]
-                        
-                        # ALIGNMENT First (Raw Pot to Truncated Prices)
-                        # Create Series map: Date(str) -> Raw Value
-                        pot_map = pd.Series(trunc_pot_raw, index=trunc_dates)
-                        target_keys = [d.strftime('%Y-%m-%d') for d in truncated_px.index]
-                        
-                        # Reindex fills with 0 (assuming Pot=0 for missing data)
-                        aligned_pot = pot_map.reindex(target_keys).fillna(0)
-                        
-                        # Apply Rolling Z-Score ON ALIGNED DATA (Matches analyze_stock)
-                        roll_mean = aligned_pot.rolling(window=252, min_periods=20).mean()
-                        roll_std = aligned_pot.rolling(window=252, min_periods=20).std()
-                        # Use z_signal directly from potential z-score
-                        z_signal = ((aligned_pot - roll_mean) / (roll_std + 1e-6)).fillna(0).tolist()
-
-                else:
-                    # Fallback if cache missing
-                    z_signal = []
-                
-                threshold = 0.0
-                use_z_roc = True
-                
-                
-            else:  # SUM
-                # SUM Strategy typically uses the same underlying Frozen Sum Z signal in the frontend
-                # So we reuse the logic but with correct variables
-                 
-                if full_frozen_data and "raw_sum" in full_frozen_data:
-                    full_raw_sum = full_frozen_data["raw_sum"]
-                    # full_frozen_dates is already loaded at top scope (line 629)
-                    
-                    from bisect import bisect_right
-                    cut_idx = bisect_right(full_frozen_dates, end_date_str)
-                    
-                    if cut_idx == 0:
-                        z_signal = []
-                    else:
-                        trunc_raw_sum = full_raw_sum[:cut_idx]
-                        trunc_dates = full_frozen_dates[:cut_idx]
-                        s_sum = pd.Series(trunc_raw_sum)
-                        roll_mean = s_sum.rolling(window=252, min_periods=20).mean()
-                        roll_std = s_sum.rolling(window=252, min_periods=20).std()
-                        z_frozen_raw = ((s_sum - roll_mean) / (roll_std + 1e-6)).fillna(0).tolist()
-                        
-                        try:
-                            if len(z_frozen_raw) > 15:
-                                z_signal_short = causal_lowpass(z_frozen_raw)
-                            else:
-                                z_signal_short = z_frozen_raw
-                        except:
-                             z_signal_short = z_frozen_raw
-                             
-                        # [CRITICAL] ALIGNMENT & PADDING for SUM
-                        # Align by Date Map first
-                        z_series_map = pd.Series(z_signal_short, index=trunc_dates)
-                        target_keys = [d.strftime('%Y-%m-%d') for d in truncated_px.index]
-                        
-                        # Reindex fills missing dates with 0 (or previous? No, signal is discrete)
-                        z_signal = z_series_map.reindex(target_keys).fillna(0).tolist()
-                        
-                else:
-                    z_signal = []
+        # Replay incrementale (integrity.py): il segnale point-in-time si
+        # calcola una volta e il backtest avanza di una barra per giorno
+        # simulato, con audit periodici della causalità del segnale.
+        from integrity import verify_integrity
+
+        print(f"⏳ Inizio simulazione integrità ({len(full_px) - 252 * 2} passi)...")
+        result = verify_integrity(
+            full_px, req.strategy, frozen=full_frozen_data,
+            alpha=req.alpha, beta=req.beta, audit_every=req.audit_every,
+            on_progress=on_progress,
+        )
+        corrupted_trades = result["corrupted_trades"]
 
-            threshold = -0.3
-            use_z_roc = True
-            
-            # Common backtest call
-            if not z_signal:
-                 continue # Skip if no signal generated yet
-            
-            # Calculate slope consistently for all strategies
-            # Z-ROC requires slope of the signal being traded
-            z_signal_series = pd.Series(z_signal)
-            z_slope_series = z_signal_series.diff(5) / 5
-            z_slope_list = z_slope_series.fillna(0).tolist()
-
-            backtest_result = backtest_strategy(
-                prices=price_real,
-                z_kinetic=z_signal,
-                z_slope=z_slope_list,
-                dates=dates_historical,
-                threshold=threshold,
-                use_z_roc=use_z_roc
-            )
-            
-            skipped_trades_current = backtest_result.get('skipped_trades', []) 
-            current_trades = backtest_result['trades']
-            current_trade_dates = set()
-            skipped_trade_dates = {t['date'] for t in skipped_trades_current} # Exact match
-            skipped_trade_indices = {t['index'] for t in skipped_trades_current if 'index' in t} # Index match
-            
-            # Map date string to index for fuzzy matching
-            date_to_idx = {d: i for i, d in enumerate(dates_historical)}
+        print(f"✅ Verifica completata: {len(corrupted_trades)} trade corrotti trovati "
+              f"({result['steps']} passi, {result['audits']} audit, "
+              f"{result['divergent_steps']} divergenti)")
 
-            # Compare with previously seen trades
-            for trade in current_trades:
-                entry_date = trade['entry_date']
-                current_trade_dates.add(entry_date)
-                
-                if entry_date not in trade_history:
-                    # First time seeing this trade - store it
-                    trade_history[entry_date] = {
-                        'first_seen': trade.copy(),
-                        'first_seen_at': end_date_str,
-                        'changes': [],
-                        'disappeared': False
-                    }
-                else:
-                    # Already seen - check for changes
-                    record = trade_history[entry_date]
-                    original = record['first_seen']
-                    changes = []
-                    
-                    if original['direction'] != trade['direction']:
-                        changes.append(f"Dir: {original['direction']}→{trade['direction']}")
-                    
-                    # Only flag exit_date change if original was not OPEN
-                    # OPEN -> Date is normal closure. Date -> Date is retroactive change.
-                    if original['exit_date'] != trade['exit_date'] and original['exit_date'] != 'OPEN':
-                        changes.append(f"Exit: {original['exit_date']}→{trade['exit_date']}")
-                    
-                    if abs(original['entry_price'] - trade['entry_price']) > 0.01:
-                        changes.append(f"Price: {original['entry_price']}→{trade['entry_price']}")
-
-                    if changes:
-                        # Append unique changes only
-                        for c in changes:
-                            if c not in record['changes']:
-                                record['changes'].append(c)
-            
-            # CHECK FOR DISAPPEARED TRADES
-            # Rules: Trade exists in history, is NOT in current_trades, and its entry_date is <= current sim date
-            for hist_entry_date, record in trade_history.items():
-                if hist_entry_date not in current_trade_dates:
-                    # Trade is missing from current simulation
-                    # Ensure we are simulating a time AFTER the trade should have started
-                    if hist_entry_date <= end_date_str:
-                         
-                         # [NEW LOGIC] Check if it was skipped due to position already open
-                         # If it matches exact or fuzzy, it means the SIGNAL IS VALID but blocked.
-                         # In this case, we treat it as "Not Disappeared" (Hide it from error list).
-                         is_blocked = False
-                         
-                         # 1. Exact Match
-                         if hist_entry_date in skipped_trade_dates:
-                             is_blocked = True
-                         
-                         # 2. Fuzzy Match
-                         elif hist_entry_date in date_to_idx and skipped_trade_indices:
-                             hist_idx = date_to_idx[hist_entry_date]
-                             for offset in range(-3, 4):
-                                 if (hist_idx + offset) in skipped_trade_indices:
-                                     is_blocked = True
-                                     break
-                         
-                         if is_blocked:
-                             # It's a valid signal blocked by position. 
-                             # User doesn't want to see "Ghosts". So we consider it NOT disappeared.
-                             # If it was previously marked disappeared, clear it.
-                             record['disappeared'] = False
-                             if "❌ DISSOLTO" in record['changes']:
-                                 record['changes'].remove("❌ DISSOLTO")
-                             if "⚠️ BLOCCATO (Slittato)" in record['changes']:
-                                 record['changes'].remove("⚠️ BLOCCATO (Slittato)")
-                             if "⚠️ BLOCCATO (POS. APERTA)" in record['changes']:
-                                 record['changes'].remove("⚠️ BLOCCATO (POS. APERTA)")
-                         
-                         else:
-                             # It is NOT blocked, so the signal must be gone.
-                             if not record['disappeared']:
-                                 record['disappeared'] = True
-                                 if "❌ DISSOLTO" not in record['changes']:
-                                     record['changes'].append("❌ DISSOLTO")
-                                     
-                else:
-                    # Trade is PRESENT in current simulation
-                    # Check if it was previously marked as disappeared (Resurrection)
-                    if record['disappeared']:
-                        record['disappeared'] = False
-                        
-                        # Remove negative flags if it reappears
-                        if "❌ DISSOLTO" in record['changes']:
-                            record['changes'].remove("❌ DISSOLTO")
-                        if "⚠️ BLOCCATO (POS. APERTA)" in record['changes']:
-                            record['changes'].remove("⚠️ BLOCCATO (POS. APERTA)")
-                        if "⚠️ BLOCCATO (Slittato)" in record['changes']:
-                            record['changes'].remove("⚠️ BLOCCATO (Slittato)")
-                            
-                        # Mark as Unstable/Flickering instead
-                        if "⚠️ INSTABILE" not in record['changes']:
-                            record['changes'].append("⚠️ INSTABILE")
-
-        # Collect corrupted trades
-        for entry_date, data in trade_history.items():
-            if data['changes']:
-                corrupted_trades.append({
-                    'entry_date': entry_date,
-                    'original': data['first_seen'],
-                    'first_seen_at': data['first_seen_at'],
-                    'changes': list(set(data['changes']))
-                })
-        
-        # Sort by entry date
-        corrupted_trades.sort(key=lambda x: x['entry_date'], reverse=True)
-        
-        print(f"✅ Verifica completata: {len(corrupted_trades)} trade corrotti trovati")
-        
         return {
             "status": "ok",
             "ticker": req.ticker,
             "strategy": req.strategy,
-            "total_trades": len(trade_history),
+            "total_trades": result["total_trades"],
             "corrupted_count": len(corrupted_trades),
-            "corrupted_trades": corrupted_trades
+            "corrupted_trades": corrupted_trades,
+            "steps": result["steps"],
+            "audits": result["audits"],
+            "divergent_steps": result["divergent_steps"],
         }
         
     except Exception as e:
@@ -1276,144 +1408,199 @@ async def verify_trade_integrity(req: VerifyIntegrityRequest):
         return {"status": "error", "detail": str(e)}
 
 
+# --- BATCH INTEGRITY (universo, process pool) ---
+class IntegrityBatchRequest(BaseModel):
+    tickers: list[str] = []  # vuoto = tutto l'universo di tickers.js
+    strategies: list[str] = ["FROZEN", "SUM", "LIVE"]
+    alpha: float = 200.0
+    beta: float = 1.0
+    audit_every: int = 21
+    max_workers: int = 4           # limitato a integrity.MAX_BATCH_WORKERS
+    include_details: bool = False  # True = lista corrupted_trades per strategia
+
+INTEGRITY_STRATEGIES = ("LIVE", "FROZEN", "SUM")
+MAX_INTEGRITY_BATCHES = 1   # batch integrità attivi insieme (ognuno usa un pool di processi)
+
+
+def _integrity_batch_tickers(req: IntegrityBatchRequest):
+    """Ticker del batch (vuoto = universo di tickers.js); ValueError su strategie non valide."""
+    bad = [s for s in req.strategies if s not in INTEGRITY_STRATEGIES]
+    if bad:
+        raise ValueError(f"Strategie non valide: {bad}")
+    if req.tickers:
+        return list(req.tickers)
+    from tickers_loader import load_tickers
+    return list(load_tickers().keys())
+
+
+def _job_integrity_batch(job, req: IntegrityBatchRequest):
+    """
+    Job "integrity-batch" (jobs.py): fasi "download" e "verify" in
+    job.progress, un parziale per ticker verificato, annullabile.
+    """
+    from integrity import run_integrity_batch, MIN_VERIFY_POINTS
+    from datetime import timedelta
+
+    tickers = _integrity_batch_tickers(req)
+    # 1. Prezzi + frozen: dalla cache se sufficienti, altrimenti 5 anni
+    #    scaricati qui (i frozen mancanti li calcola il worker)
+    inputs = {}
+    to_download = []
+    for t in tickers:
+        cached = TICKER_CACHE.get(t)
+        if isinstance(cached, dict) and len(cached.get("px", [])) >= MIN_VERIFY_POINTS:
+            inputs[t] = (cached["px"].copy(), cached.get("frozen"))
+        else:
+            to_download.append(t)
+
+    start_date_long = (datetime.now() - timedelta(days=365 * 5)).strftime('%Y-%m-%d')
+
+    def fetch(t):
+        return t, MarketData(t, start_date=start_date_long).fetch()
+
+    job.progress("download", 0, len(to_download))
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+    try:
+        futures = [executor.submit(fetch, t) for t in to_download]
+        for i, fut in enumerate(concurrent.futures.as_completed(futures), 1):
+            try:
+                t, px = fut.result()
+            except Exception as e:
+                print(f"⚠️ Download fallito: {e}")
+            else:
+                if px is not None and len(px) >= MIN_VERIFY_POINTS:
+                    inputs[t] = (px, None)
+            job.progress("download", i, len(to_download))
+    except BaseException:
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+    errors = [t for t in tickers if t not in inputs]
+
+    # 2. Verifica in parallelo con avanzamento per ticker
+    results = run_integrity_batch(inputs, req.strategies, alpha=req.alpha, beta=req.beta,
+                                  audit_every=req.audit_every, max_workers=req.max_workers,
+                                  include_details=req.include_details,
+                                  on_result=job.add_partial, on_progress=job.progress)
+    results.sort(key=lambda r: -sum(
+        s.get("corrupted_count", 0) for s in r.get("strategies", {}).values()))
+    return {"requested": len(tickers), "total": len(inputs), "done": len(results),
+            "results": results, "errors": errors}
+
+
+@app.post("/verify-integrity/batch")
+def start_integrity_batch(req: IntegrityBatchRequest):
+    """
+    Avvia la verifica integrità su una lista di ticker (o sull'universo) per
+    più strategie, in background (job "integrity-batch" di /jobs, al più
+    MAX_INTEGRITY_BATCHES insieme: oltre 503).
+    Avanzamento e risultati con GET /verify-integrity/batch/{job_id} o
+    GET /jobs/{job_id}; arresto con POST /jobs/{job_id}/cancel.
+    """
+    try:
+        tickers = _integrity_batch_tickers(req)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    res = submit_job(JobRequest(kind="integrity-batch", params={**req.dict(), "tickers": tickers}))
+    return {"status": "ok", "job_id": res["job_id"], "requested": len(tickers)}
+
+
+@app.get("/verify-integrity/batch/{job_id}", response_class=FastJSONResponse)
+def get_integrity_batch(job_id: str):
+    """
+    Stato del batch nella forma storica: status running/done/error/cancelled,
+    phase, done/total, results (parziali finché il job è in corso), errors.
+    """
+    job = JOBS.get(job_id)
+    if job is None or job.kind != "integrity-batch":
+        raise HTTPException(status_code=404, detail="Job non trovato")
+    snap = job.snapshot(since=0)
+    result = snap["result"] or {}
+    requested = len(job.params.get("tickers", []))
+    return {
+        "job_id": job.id,
+        "status": "running" if snap["status"] == "queued" else snap["status"],
+        "phase": snap["phase"] or "download",
+        "strategies": job.params.get("strategies"),
+        "requested": requested,
+        "total": result.get("total", snap["total"] if snap["phase"] == "verify" else requested),
+        "done": result.get("done", snap["done"] if snap["phase"] == "verify" else 0),
+        "results": result.get("results", snap["partial"]),
+        "errors": result.get("errors", []),
+        "detail": snap["detail"],
+        "started_at": snap["started_at"] or snap["created_at"],
+        "finished_at": snap["finished_at"],
+    }
+
+
 class DailyScanRequest(BaseModel):
     tickers: list[str] = []
     as_of_date: str | None = None  # Optional: simulate this date as "today"
+    max_workers: Optional[int] = None  # Processi per i segnali (None = min(4, CPU), 1 = sequenziale)
 
 @app.post("/scan-daily")
 def scan_daily_signals(req: DailyScanRequest):
     """
     Scans a list of tickers for actionable signals (BUY/SELL) for the CURRENT day.
     Checks both FROZEN and SUM strategies.
+
+    [PERF] Pipeline dedicata (daily_scan.py): prezzi in blocco, solo i
+    backtest FROZEN/SUM su un pool di processi, righe ordinate per market
+    cap. Stessi backtest di /analyze, senza toccare TICKER_CACHE.
     """
     try:
-        import concurrent.futures
-        
-        tickers = req.tickers
-        as_of_date = req.as_of_date  # Time travel date
-        results = []
-        
-        # Helper function for checking signals
-        def check_ticker_signal(ticker):
-            """
-            Call the /analyze endpoint internally to get backtest results,
-            then extract the current signal state from the trades.
-            This ensures 100% consistency with the main chart!
-            """
-            try:
-                import requests
-                
-                # Call analyze endpoint internally
-                analyze_req = {
-                    "ticker": ticker,
-                    "alpha": 200.0,
-                    "beta": 1.0,
-                    "start_date": "2023-01-20",
-                    "end_date": as_of_date,  # Time travel
-                    "use_cache": True
-                }
-                
-                # Since we're in the same process, call the function directly
-                # First, create an AnalysisRequest object
-                req_obj = AnalysisRequest(**analyze_req)
-                
-                # Call the analyze function directly
-                result = analyze_stock(req_obj)
-                
-                if "error" in result:
-                    return None
-                
-                # Extract backtest data
-                frozen_bt = result.get("frozen_strategy", {})
-                sum_bt = result.get("frozen_sum_strategy", {})
-                
-                frozen_trades = frozen_bt.get("trades", [])
-                sum_trades = sum_bt.get("trades", [])
-                
-                # Get last price date
-                dates = result.get("dates", [])
-                last_date = dates[-1] if dates else ""
-                
-                # Get Z-values from frozen series
-                frozen_data = result.get("frozen_data", {})
-                z_frozen_pot = frozen_data.get("pot", [])
-                z_frozen_sum = frozen_data.get("z_sum", [])
-                
-                last_z_pot = z_frozen_pot[-1] if z_frozen_pot else 0
-                last_z_sum = z_frozen_sum[-1] if z_frozen_sum else 0
-                
-                # Determine current state from trades
-                def get_signal_state(trades):
-                    """Determine BUY/SELL/HOLD/WAIT from backtest trades."""
-                    if not trades:
-                        return {"action": "WAIT", "trade": None}
-                        
-                    last_trade = trades[-1]
-                    exit_dt = last_trade.get("exit_date")
-                    
-                    # 1. OPEN POSITION
-                    if exit_dt is None or exit_dt == "OPEN" or last_trade.get("pnl_pct") is None:
-                        entry_date = last_trade.get("entry_date", "")
-                        if entry_date == last_date:
-                            return {"action": "BUY", "trade": last_trade}
-                        else:
-                            return {"action": "HOLD", "trade": last_trade}
-                    
-                    # 2. CLOSED POSITION (Check if just closed)
-                    if exit_dt == last_date:
-                        return {"action": "SELL", "trade": last_trade}
-                    
-                    # 3. NO ACTIVE POSITION
-                    return {"action": "WAIT", "trade": last_trade}
-                
-                frozen_res = get_signal_state(frozen_trades)
-                sum_res = get_signal_state(sum_trades)
-                
-                # Get market cap
-                market_cap = result.get("market_cap", 0)
-                
-                return {
-                    "ticker": ticker,
-                    "market_cap": market_cap,
-                    "last_date": last_date,
-                    "frozen": {
-                        "strategy": "FROZEN", 
-                        "action": frozen_res["action"], 
-                        "value": round(last_z_pot, 2), 
-                        "date": last_date,
-                        "trade": frozen_res["trade"]
-                    },
-                    "sum": {
-                        "strategy": "SUM", 
-                        "action": sum_res["action"], 
-                        "value": round(last_z_sum, 2), 
-                        "date": last_date,
-                        "trade": sum_res["trade"]
-                    }
-                }
-                
-            except Exception as e:
-                print(f"Error scanning {ticker}: {e}")
-                return None
-
-        # PARALLEL EXECUTION
-        with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-            futures = [executor.submit(check_ticker_signal, t) for t in tickers]
-            for f in concurrent.futures.as_completed(futures):
-                res = f.result()
-                if res:
-                    results.append(res)
-        
-        # Sort by Market Cap desc
-        results.sort(key=lambda x: x['market_cap'], reverse=True)
-        
-        return results
+        from daily_scan import run_daily_scan
+        return run_daily_scan(req.tickers, as_of_date=req.as_of_date,
+                              max_workers=req.max_workers)
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+class DailyBackfillRequest(BaseModel):
+    tickers: list[str] = []
+    from_date: str
+    to_date: str | None = None
+    max_workers: Optional[int] = None
+    save: bool = True  # Salva in daily_scan_history.json (daily_scan.BACKFILL_PATH)
 
+@app.post("/scan-daily/backfill")
+def backfill_daily_scan_endpoint(req: DailyBackfillRequest):
+    """
+    Stato di /scan-daily (BUY/SELL/HOLD/WAIT FROZEN e SUM) per ogni
+    (ticker, data) in [from_date, to_date], un passaggio per ticker.
+    Le righe di un giorno si rileggono con GET /scan-daily/history/{date}.
+    """
+    try:
+        from daily_scan import backfill_daily_scan, load_backfill, save_backfill, backfill_signature
+        store = load_backfill(signature=backfill_signature()) if req.save else None
+        store, summary = backfill_daily_scan(req.tickers, req.from_date, to_date=req.to_date,
+                                             max_workers=req.max_workers, store=store)
+        if req.save:
+            save_backfill(store)
+        return {"status": "ok", **summary}
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/scan-daily/history")
+def daily_scan_history_index():
+    """Ticker nello storico salvato e intervallo di date coperto da ciascuno."""
+    from daily_scan import load_backfill, backfill_signature
+    store = load_backfill(signature=backfill_signature())
+    return {"status": "ok",
+            "tickers": {t: [rec["dates"][0], rec["dates"][-1]] for t, rec in store["tickers"].items()}}
+
+@app.get("/scan-daily/history/{date}")
+def daily_scan_history(date: str, tickers: Optional[str] = None):
+    """Righe di /scan-daily con as_of_date=date dallo storico (tickers: lista separata da virgole)."""
+    from daily_scan import load_backfill, backfill_signature, history_rows
+    store = load_backfill(signature=backfill_signature())
+    wanted = set(tickers.split(",")) if tickers else None
+    return history_rows(store, date, wanted)
+
 # --- PORTFOLIO API ---
 PORTFOLIO_FILE = "portfolio.json"
 
@@ -1566,14 +1753,14 @@ class PortfolioManager:
 
 
 @app.post("/scan/email")
-def trigger_email_scan(background_tasks: BackgroundTasks):
+def trigger_email_scan():
     """
     Triggers a full market scan of all tickers and sends results via email.
-    Runs in background to avoid timeout.
+    Runs in background (job "scan-email": avanzamento e annullamento su /jobs/{job_id}).
     """
-    from scanner import run_market_scan
-    background_tasks.add_task(run_market_scan, send_email=True)
-    return {"status": "started", "message": "📩 Scansione avviata! Riceverai l'email al termine (circa 5-10 min)."}
+    job = JOBS.submit("scan-email", lambda j: _job_scan_email(j, EmailJobParams()), {"send_email": True})
+    return {"status": "started", "job_id": job.id,
+            "message": "📩 Scansione avviata! Riceverai l'email al termine (circa 5-10 min)."}
 
 @app.post("/scan/test-email")
 def test_email_config():
@@ -1625,6 +1812,9 @@ class StableAlertConfig(BaseModel):
     entry_z: float = 2.0
     horizon: int = 21
     forward_test: bool = True
+    # scansione incrementale (signal_state.py): scarica da start_date
+    # (ancora fissa) invece della finestra mobile di 6/24 mesi
+    incremental_state: bool = False
 
 @app.get("/stable-alert/config")
 def get_stable_alert_config():
@@ -1664,11 +1854,11 @@ def save_stable_alert_config(cfg: StableAlertConfig):
     return {"status": "ok" if ok else "error", "config": config_dict}
 
 @app.post("/stable-alert/trigger")
-def trigger_stable_alert(background_tasks: BackgroundTasks):
-    """Manually trigger STABLE alert email (runs in background)."""
-    from stable_scanner import run_stable_scan
-    background_tasks.add_task(run_stable_scan, send_email=True)
-    return {"status": "started", "message": "🔬 STABLE scan avviata! Riceverai l'email al termine."}
+def trigger_stable_alert():
+    """Manually trigger STABLE alert email (runs in background, job "stable-alert")."""
+    job = JOBS.submit("stable-alert", lambda j: _job_stable_alert(j, EmailJobParams()), {"send_email": True})
+    return {"status": "started", "job_id": job.id,
+            "message": "🔬 STABLE scan avviata! Riceverai l'email al termine."}
 
 @app.post("/stable-alert/test")
 def test_stable_alert():
@@ -1684,6 +1874,92 @@ def trigger_stable_with_result():
     result = run_stable_scan(send_email=True)
     return result
 
+# =============================================
+#  BACKGROUND JOBS (jobs.py)
+# =============================================
+# POST /jobs {kind, params} -> job_id; GET /jobs/{job_id} per stato,
+# avanzamento, parziali (da ?since=) e risultato; POST /jobs/{job_id}/cancel.
+# params = corpo dell'endpoint sincrono corrispondente.
+
+class EmailJobParams(BaseModel):
+    send_email: bool = True
+
+class JobRequest(BaseModel):
+    kind: str
+    params: dict = {}
+
+def _job_scan(job, req: ScanRequest):
+    return _scan_market(req.tickers, on_result=job.add_partial, on_progress=job.progress)
+
+def _job_batch_stable(job, req: BatchStableRequest):
+    return _analyze_batch_stable(req, on_progress=job.progress,
+                                 on_result=lambda t, r: job.add_partial({"ticker": t, **r}))
+
+def _job_verify_integrity(job, req: VerifyIntegrityRequest):
+    return _verify_trade_integrity(req, on_progress=job.progress)
+
+def _job_stable_alert(job, req: EmailJobParams):
+    from stable_scanner import run_stable_scan
+    return run_stable_scan(send_email=req.send_email, on_progress=job.progress)
+
+def _job_scan_email(job, req: EmailJobParams):
+    from scanner import run_market_scan
+    return run_market_scan(send_email=req.send_email, on_progress=job.progress)
+
+# kind -> (modello dei params, runner(job, params))
+JOB_KINDS = {
+    "scan": (ScanRequest, _job_scan),
+    "analyze-batch-stable": (BatchStableRequest, _job_batch_stable),
+    "verify-integrity": (VerifyIntegrityRequest, _job_verify_integrity),
+    "stable-alert": (EmailJobParams, _job_stable_alert),
+    "scan-email": (EmailJobParams, _job_scan_email),
+    "integrity-batch": (IntegrityBatchRequest, _job_integrity_batch),
+}
+
+# kind -> massimo di job non finiti insieme (gli altri kind: solo la coda di JOBS)
+JOB_LIMITS = {"integrity-batch": MAX_INTEGRITY_BATCHES}
+
+@app.post("/jobs")
+def submit_job(req: JobRequest):
+    """Avvia un'operazione lunga in background e restituisce subito il job_id."""
+    if req.kind not in JOB_KINDS:
+        raise HTTPException(status_code=400, detail=f"kind sconosciuto: {req.kind} (ammessi: {sorted(JOB_KINDS)})")
+    model, runner = JOB_KINDS[req.kind]
+    try:
+        params = model(**req.params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        job = JOBS.submit(req.kind, lambda j: runner(j, params), req.params, limit=JOB_LIMITS.get(req.kind))
+    except JobLimitReached as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"status": "ok", "job_id": job.id, "kind": req.kind}
+
+@app.get("/jobs")
+def list_jobs(kind: Optional[str] = None):
+    """Job noti (in corso e finiti da meno di JOB_TTL), senza parziali né risultati."""
+    return {"status": "ok", "jobs": [j.snapshot(since=None, include_result=False) for j in JOBS.list(kind)]}
+
+@app.get("/jobs/{job_id}", response_class=FastJSONResponse)
+def get_job(job_id: str, since: int = 0, result: bool = True):
+    """
+    Stato del job: status (queued/running/done/error/cancelled), phase,
+    done/total, elapsed_s, parziali da `since` (next_partial per il polling
+    successivo) e, a job finito, result/detail.
+    """
+    job = JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job non trovato")
+    return job.snapshot(since=max(0, since), include_result=result)
+
+@app.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """Richiede l'arresto cooperativo: il job si ferma al prossimo punto di avanzamento."""
+    job = JOBS.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job non trovato")
+    return job.snapshot(since=None, include_result=False)
+
 # =============================================
 #  FORWARD TEST (paper trading dei segnali reali)
 # =============================================
@@ -1693,8 +1969,21 @@ def forward_test_status():
     """Track record del forward test: stats + trades del journal."""
     from forward_test import load_journal, journal_stats
     j = load_journal()
+    try:
+        # CI del track record a quota fissa; seed fisso = numeri stabili tra refresh
+        from bootstrap import bootstrap_trades
+        ci = bootstrap_trades([t for t in j.get("trades", []) if t.get("status") == "closed"],
+                              seed=0, compound=False)
+    except Exception as e:
+        ci = {"error": str(e)}
+    try:
+        # stesso track record riprezzato a costi diversi da quello del journal
+        from cost_sweep import reprice_fixed_quota, cost_levels, DEFAULT_COSTS
+        costs = reprice_fixed_quota(j.get("trades", []), cost_levels(DEFAULT_COSTS))
+    except Exception as e:
+        costs = {"error": str(e)}
     return {"stats": journal_stats(j), "config": j.get("config", {}),
-            "trades": j.get("trades", [])}
+            "trades": j.get("trades", []), "bootstrap": ci, "cost_sensitivity": costs}
 
 @app.post("/forward-test/reset")
 def forward_test_reset():
@@ -0,0 +1,128 @@
+"""
+Simulatore di PORTAFOGLIO multi-asset (money management) lato backend.
+
+Replica di simulateSizing (frontend/stable_engine.js, tab Forward del Lab)
+con la stessa semantica, ma usabile da scan, report e job su migliaia di
+trade provenienti da qualunque motore (backtest_stable, backtest_strategy,
+ARANCIONE/COMBO, forward journal): basta entry_date, exit_date, pnl_pct.
+La parità con il JS è verificata da tests/test_portfolio_sim.py.
+
+Schemi di sizing:
+- fixed           : stake = capital * stake_pct% fisso, max `cap` posizioni,
+                    entry saltata se la cassa non basta
+- fixed_unlimited : stake fisso, nessun tetto né vincolo di cassa
+- compound        : stake = equity corrente (cassa + investito) * stake_pct%
+
+Differenze di implementazione rispetto al JS (stesso risultato):
+- coda eventi a HEAP: le entry sono heapificate in O(n), l'uscita viene
+  inserita solo quando l'entry è accettata (le entry saltate non generano
+  eventi di uscita);
+- cassa e investito sono totali correnti, non si risomma la mappa delle
+  posizioni aperte a ogni evento: O(E log E) invece di O(E × aperte).
+"""
+import heapq
+import math
+
+SCHEMES = ("fixed", "fixed_unlimited", "compound")
+
+
+def _flatten(trades):
+    """Lista di trade oppure {ticker: [trade, ...]} (universo)."""
+    if isinstance(trades, dict):
+        out = []
+        for ticker, items in trades.items():
+            for t in items or []:
+                if t:
+                    out.append(t if "ticker" in t else {**t, "ticker": ticker})
+        return out
+    return list(trades or [])
+
+
+def simulate_sizing(trades, scheme="fixed", capital=10000.0, stake_pct=10.0, cap=10):
+    """
+    Simula il portafoglio sui trade CHIUSI (gli OPEN sono ignorati).
+
+    A parità di data le USCITE precedono le entrate (liberano slot e cassa);
+    a parità di data e tipo vale l'ordine di input (come il sort stabile JS).
+    L'equity è valutata con le posizioni al costo.
+
+    capital > 0, stake_pct in (0, 100] e cap >= 1, altrimenti ValueError.
+
+    Returns: dict con final_capital, return_pct, max_dd, skipped,
+    max_concurrent, n_trades e curve [{date, equity, cash, invested}] (un
+    punto per evento elaborato).
+    """
+    if scheme not in SCHEMES:
+        raise ValueError(f"scheme non valido: {scheme} (attesi {SCHEMES})")
+    capital0 = float(capital)
+    if not math.isfinite(capital0) or capital0 <= 0:
+        raise ValueError(f"capital deve essere > 0 (ricevuto {capital})")
+    if not 0 < float(stake_pct) <= 100:
+        raise ValueError(f"stake_pct deve essere in (0, 100] (ricevuto {stake_pct})")
+    if int(cap) < 1:
+        raise ValueError(f"cap deve essere >= 1 posizione (ricevuto {cap})")
+    closed = [t for t in _flatten(trades)
+              if t and t.get("entry_date") and t.get("exit_date")
+              and t["exit_date"] != "OPEN" and t.get("pnl_pct") is not None]
+
+    # chiave evento: (data, tipo 0=uscita/1=entrata, sequenza di input)
+    heap = [(t["entry_date"], 1, 2 * k, k) for k, t in enumerate(closed)]
+    heapq.heapify(heap)
+
+    fixed_stake = capital0 * stake_pct / 100
+    compound = scheme == "compound"
+    limited = scheme != "fixed_unlimited"
+    cash = capital0
+    invested = 0.0
+    stakes = {}          # indice trade -> stake delle posizioni aperte
+    skipped = 0
+    max_concurrent = 0
+    peak = capital0
+    max_dd = 0.0
+    curve = []
+
+    while heap:
+        date, kind, seq, k = heapq.heappop(heap)
+        t = closed[k]
+        if kind == 0:
+            stake = stakes.pop(k)
+            cash += stake * (1 + t["pnl_pct"] / 100)
+            invested = invested - stake if stakes else 0.0
+        else:
+            stake = (cash + invested) * stake_pct / 100 if compound else fixed_stake
+            if limited and (len(stakes) >= cap or stake > cash + 1e-9):
+                skipped += 1
+                continue
+            cash -= stake
+            invested += stake
+            stakes[k] = stake
+            max_concurrent = max(max_concurrent, len(stakes))
+            exit_key = (t["exit_date"], 0, 2 * k + 1, k)
+            # uscita ordinata PRIMA dell'entrata (dati incoerenti): nel JS
+            # viene scartata e la posizione resta aperta; idem qui
+            if exit_key > (date, kind, seq, k):
+                heapq.heappush(heap, exit_key)
+
+        equity = cash + invested
+        curve.append({
+            "date": date,
+            "equity": round(equity, 2),
+            "cash": round(cash, 2),
+            "invested": round(invested, 2),
+        })
+        if equity > peak:
+            peak = equity
+        dd = (peak - equity) / peak * 100
+        if dd > max_dd:
+            max_dd = dd
+
+    final_capital = round(cash, 2)   # a fine eventi tutto è chiuso
+    return {
+        "final_capital": final_capital,
+        "return_pct": round((final_capital / capital0 - 1) * 100, 2),
+        "max_dd": round(max_dd, 2),
+        "skipped": skipped,
+        "max_concurrent": max_concurrent,
+        "n_trades": len(closed),
+        "curve": curve,
+    }
@@ -0,0 +1,116 @@
+"""
+Registri compatti di trade ed eventi per i motori di backtest.
+
+backtest_stable e backtest_strategy producevano un dict per trade e per
+evento: su scansioni dell'universo, walk-forward e grid search sono
+centinaia di migliaia di piccoli dict (~10 chiavi, hash table propria)
+che quasi sempre vengono buttati dopo aver letto le stats. Qui ogni riga è
+una TUPLA nell'ordine di un campo fisso condiviso (`fields`):
+
+- una tupla di 9 scalari occupa ~1/4 di un dict con le stesse chiavi e,
+  contenendo solo atomi, esce dal tracking del garbage collector;
+- le colonne (pnl_pct, exit_date, ...) si leggono senza costruire dict;
+- i dict nella forma storica si materializzano SOLO al confine dell'API
+  (to_dicts, iterazione, indicizzazione) — `RecordLog == lista di dict`
+  confronta per contenuto.
+
+Una riga può omettere i campi finali: la chiave manca anche nel dict
+(es. riga OPEN di backtest_strategy senza gli snapshot z).
+"""
+
+TRADE_FIELDS = ("entry_date", "exit_date", "direction", "entry_price", "exit_price",
+                "pnl_pct", "capital_after", "entry_z_value", "entry_z_roc")
+EVENT_FIELDS = ("type", "direction", "signal_date", "signal_index", "exec_date",
+                "exec_index", "price_at_signal", "slope_at_signal")
+SKIPPED_FIELDS = ("date", "index", "price", "direction", "reason")
+
+
+class RecordLog:
+    """
+    Sequenza di record a campi fissi memorizzati come tuple.
+
+    append(*valori) nell'ordine di `fields`; nei loop caldi i motori legano
+    `rows.append` a una variabile locale e passano direttamente la tupla.
+    """
+
+    __slots__ = ("fields", "rows", "_pos")
+
+    def __init__(self, fields, rows=None):
+        self.fields = tuple(fields)
+        self.rows = [] if rows is None else rows
+        self._pos = {f: k for k, f in enumerate(self.fields)}
+
+    def append(self, *values):
+        self.rows.append(values)
+
+    def add(self, row):
+        """Aggiunge una riga già in forma di tupla."""
+        self.rows.append(row)
+
+    def _dict(self, row):
+        return dict(zip(self.fields, row))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __bool__(self):
+        return bool(self.rows)
+
+    def __iter__(self):
+        fields = self.fields
+        for row in self.rows:
+            yield dict(zip(fields, row))
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self._dict(r) for r in self.rows[idx]]
+        return self._dict(self.rows[idx])
+
+    def __eq__(self, other):
+        if isinstance(other, RecordLog):
+            return self.to_dicts() == other.to_dicts()
+        if isinstance(other, list):
+            return self.to_dicts() == other
+        return NotImplemented
+
+    def __repr__(self):
+        return f"RecordLog({len(self.rows)} righe, campi={list(self.fields)})"
+
+    def column(self, name, default=None):
+        """Valori di un campo, riga per riga (default se la riga lo omette)."""
+        k = self._pos[name]
+        return [r[k] if k < len(r) else default for r in self.rows]
+
+    def where(self, **equals):
+        """Dict delle sole righe con campo == valore per ogni condizione."""
+        conds = [(self._pos[f], v) for f, v in equals.items()]
+        return [self._dict(r) for r in self.rows
+                if all(k < len(r) and r[k] == v for k, v in conds)]
+
+    def to_dicts(self):
+        """Lista di dict nella forma storica dei motori (confine dell'API)."""
+        fields = self.fields
+        return [dict(zip(fields, r)) for r in self.rows]
+
+
+def column(records, name, default=None):
+    """Colonna da RecordLog o da lista di dict (trade/eventi già materializzati)."""
+    if isinstance(records, RecordLog):
+        return records.column(name, default)
+    return [r.get(name, default) for r in records]
+
+
+def select(records, **equals):
+    """Righe (dict) con campo == valore, da RecordLog o da lista di dict."""
+    if isinstance(records, RecordLog):
+        return records.where(**equals)
+    return [r for r in records if all(f in r and r[f] == v for f, v in equals.items())]
+
+
+def materialize(res, keys=("trades", "skipped_trades", "signal_events")):
+    """Converte in place i RecordLog di un risultato di backtest in liste di dict."""
+    for k in keys:
+        v = res.get(k)
+        if isinstance(v, RecordLog):
+            res[k] = v.to_dicts()
+    return res
@@ -5,17 +5,32 @@ from notifications import NotificationManager
 from tickers_loader import load_tickers
 import datetime
 
-def run_market_scan(send_email=True):
-    from main import analyze_stock, AnalysisRequest, PortfolioManager, TICKER_CACHE
+def run_market_scan(send_email=True, max_workers=None, on_progress=None):
+    """
+    Scansione email a stadi:
+    1. prezzi: aggiornamento in blocco di tutto l'universo (più le
+       posizioni aperte del portafoglio) con daily_scan.refresh_prices:
+       coda recente accodata alle serie in cache, storia completa per le
+       altre. Le cache non restano mai ferme al giorno della prima scansione;
+    2. segnali FROZEN/SUM su pool di processi (daily_scan.scan_signals);
+    3. liste BUY/SELL, stato del portafoglio ed email.
+    I tempi dei tre stadi sono nel risultato ("timings").
+    on_progress(phase, done, total) opzionale (fasi "download", "signals",
+    "email"): se solleva, la scansione si ferma prima dell'email.
+    """
+    import time
+    from main import PortfolioManager
+    from stable_scanner import download_all_prices
+    from daily_scan import refresh_prices, scan_signals, SCAN_START_DATE
     
     tickers_map = load_tickers()
     tickers = list(tickers_map.keys())
+    timings = {}
+    t_stage = time.perf_counter()
     
     print(f"🔄 Avvio scansione email per {len(tickers)} ticker...")
     
-    # --- CRITICAL: Invalidate cache for portfolio tickers ---
-    # This ensures HOLD/SELL recommendations use FRESH data, not stale cache.
-    # Also merges portfolio tickers into scan list to prevent false SELL signals.
+    # --- Portfolio tickers: merged into scan list to prevent false SELL signals ---
     portfolio_tickers = set()
     try:
         pf_mgr = PortfolioManager()
@@ -24,22 +39,35 @@ def run_market_scan(send_email=True):
             p["ticker"] for p in pf_data.get("positions", [])
             if p.get("status") == "OPEN"
         )
-        invalidated = 0
         added = 0
         for t in portfolio_tickers:
-            if t in TICKER_CACHE:
-                del TICKER_CACHE[t]
-                invalidated += 1
             # Ensure portfolio ticker is in scan list (may not be in tickers.js)
             if t not in tickers_map:
                 tickers_map[t] = "Portfolio"
                 tickers.append(t)
                 added += 1
-        print(f"🗑️ Cache invalidata per {invalidated}/{len(portfolio_tickers)} ticker del portafoglio")
         if added > 0:
             print(f"➕ Aggiunti {added} ticker del portafoglio non presenti in tickers.js")
     except Exception as e:
-        print(f"⚠️ Errore invalidazione cache portafoglio: {e}")
+        print(f"⚠️ Errore lettura portafoglio: {e}")
+    
+    # STADIO 1: prezzi in blocco, sempre aggiornati (coda incrementale se in
+    # cache); download_all_prices legge poi PRICE_CACHE appena rinfrescata
+    refreshed = refresh_prices(tickers, SCAN_START_DATE, on_progress=on_progress)
+    n_tail = sum(1 for v in refreshed.values() if v == "tail")
+    print(f"🔄 Prezzi aggiornati: {n_tail} incrementali, "
+          f"{len(refreshed) - n_tail} completi/falliti su {len(tickers)}")
+    prices, failed = download_all_prices(tickers, SCAN_START_DATE)
+    timings["prices"] = round(time.perf_counter() - t_stage, 2)
+    t_stage = time.perf_counter()
+    
+    # STADIO 2: segnali FROZEN/SUM (stesso backtest di /analyze) sui processi
+    rows = {r["ticker"]: r for r in scan_signals(prices, max_workers=max_workers, on_progress=on_progress)}
+    timings["signals"] = round(time.perf_counter() - t_stage, 2)
+    t_stage = time.perf_counter()
+    print(f"   📈 Segnali calcolati per {len(rows)}/{len(tickers)} ticker")
+    if on_progress:
+        on_progress("email", 0, 1)
     
     # LISTE SEPARATE
     buy_today = []
@@ -57,96 +85,76 @@ def run_market_scan(send_email=True):
     # NEW: Track current prices for portfolio valuation
     ticker_prices = {}
     
-    for i, ticker in enumerate(tickers):
+    # Helper date diff
+    def get_days_diff(date_str):
         try:
-            if i % 20 == 0:
-                print(f"   Progresso: {i}/{len(tickers)}...")
-            
-            # Clean category
-            raw_cat = tickers_map.get(ticker, "Other")
-            category = raw_cat.replace("⭐ ", "").replace("🏛️ ", "").replace("💻 ", "").replace("🏦 ", "").replace("⚡ ", "")
-            
-            # ANALISI
-            req = AnalysisRequest(
-                ticker=ticker,
-                alpha=200.0,
-                beta=1.0,
-                start_date="2023-01-20",
-                end_date=None,
-                use_cache=True
-            )
-            result = analyze_stock(req)
-            if "error" in result: continue
+            d = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
+            return (today_real - d).days
+        except:
+            return 999
+    
+    # STADIO 3: liste ed email (ordine dell'universo)
+    for ticker in tickers:
+        row = rows.get(ticker)
+        if row is None:
+            continue
+        
+        # Clean category
+        raw_cat = tickers_map.get(ticker, "Other")
+        category = raw_cat.replace("⭐ ", "").replace("🏛️ ", "").replace("💻 ", "").replace("🏦 ", "").replace("⚡ ", "")
+        
+        # Capture Current Price
+        ticker_prices[ticker] = float(prices[ticker].iloc[-1])
+        
+        # CHECK SIGNALS (ultimo trade della strategia)
+        def check_signals(last_trade, strat_name):
+            if not last_trade: return
             
-            # Capture Current Price
-            if result.get("prices"):
-                ticker_prices[ticker] = result["prices"][-1]
+            exit_dt = last_trade.get("exit_date")
+            entry_date = last_trade.get("entry_date", "")
+            direction = last_trade.get("direction", "LONG")
             
-            frozen_trades = result.get("frozen_strategy", {}).get("trades", [])
-            sum_trades = result.get("frozen_sum_strategy", {}).get("trades", [])
+            # --- ACTIVE STRATEGY CHECK ---
+            # If trade is OPEN, record it as active
+            if exit_dt is None or exit_dt == "OPEN":
+                active_strategies.add((ticker, strat_name))
             
-            # Helper date diff
-            def get_days_diff(date_str):
-                try:
-                    d = datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
-                    return (today_real - d).days
-                except:
-                    return 999
-
-            # CHECK SIGNALS
-            def check_signals(trades, strat_name):
-                if not trades: return
+            # --- BUY CHECK ---
+            if exit_dt is None or exit_dt == "OPEN":
+                diff = get_days_diff(entry_date)
                 
-                last_trade = trades[-1]
-                exit_dt = last_trade.get("exit_date")
-                entry_date = last_trade.get("entry_date", "")
-                entry_date = last_trade.get("entry_date", "")
-                direction = last_trade.get("direction", "LONG")
+                item = {
+                    "ticker": ticker,
+                    "category": category,
+                    "strategy": strat_name,
+                    "direction": direction,
+                    "price": last_trade.get("entry_price", 0),
+                    "date": entry_date,
+                    "days_ago": diff
+                }
                 
-                # --- ACTIVE STRATEGY CHECK ---
-                # If trade is OPEN, record it as active
-                if exit_dt is None or exit_dt == "OPEN":
-                    active_strategies.add((ticker, strat_name))
-                
-                # --- BUY CHECK ---
-                if exit_dt is None or exit_dt == "OPEN":
-                    diff = get_days_diff(entry_date)
-                    
-                    item = {
+                if diff == 0:
+                    buy_today.append(item)
+                elif diff <= 5:
+                    buy_recent.append(item)
+            
+            # --- SELL CHECK ---
+            if exit_dt and exit_dt != "OPEN":
+                 diff_exit = get_days_diff(exit_dt)
+                 if diff_exit == 0:
+                    sell_today.append({
                         "ticker": ticker,
                         "category": category,
                         "strategy": strat_name,
                         "direction": direction,
-                        "price": last_trade.get("entry_price", 0),
-                        "date": entry_date,
-                        "days_ago": diff
-                    }
-                    
-                    if diff == 0:
-                        buy_today.append(item)
-                    elif diff <= 5:
-                        buy_recent.append(item)
-                
-                # --- SELL CHECK ---
-                if exit_dt and exit_dt != "OPEN":
-                     diff_exit = get_days_diff(exit_dt)
-                     if diff_exit == 0:
-                        sell_today.append({
-                            "ticker": ticker,
-                            "category": category,
-                            "strategy": strat_name,
-                            "direction": direction,
-                            "price": last_trade.get("exit_price", 0),
-                            "pnl": last_trade.get("pnl_pct", 0),
-                            "date": exit_dt
-                        })
-
-            # Esegui check (NO MA - user requested it only in frontend scanner)
-            check_signals(frozen_trades, "Frozen Strategy")
-            check_signals(sum_trades, "Sum Strategy")
+                        "price": last_trade.get("exit_price", 0),
+                        "pnl": last_trade.get("pnl_pct", 0),
+                        "date": exit_dt
+                    })
 
-        except Exception as e:
-            continue
+        # Esegui check (NO MA - user requested it only in frontend scanner)
+        check_signals(row["frozen"]["trade"], "Frozen Strategy")
+        check_signals(row["sum"]["trade"], "Sum Strategy")
     
     # --- PORTFOLIO STATUS CHECK ---
     portfolio_status = []
@@ -292,6 +300,9 @@ def run_market_scan(send_email=True):
         if send_email:
              notifier.send_email(f"Report {today_real}", "<p>Nessun segnale rilevante oggi.</p>")
 
+    timings["email"] = round(time.perf_counter() - t_stage, 2)
+    print(f"⏱️ Stadi scansione email: {timings}")
+
     return {
         "buy_today": buy_today, 
         "buy_recent": buy_recent, 
@@ -302,7 +313,8 @@ def run_market_scan(send_email=True):
             "buy_recent": n_recent,
             "sell_today": n_sell,
             "portfolio": n_portfolio
-        }
+        },
+        "timings": timings
     }
 
 
@@ -0,0 +1,369 @@
+"""
+Stato PERSISTENTE del motore dei segnali per la scansione giornaliera
+INCREMENTALE (stable_scanner.analyze_ticker_signals con state_store).
+
+Ogni sera la scansione rigirava backtest_stable / backtest_combo su 6-24
+mesi di storia solo per trovare gli ENTRY degli ultimi 5 giorni e i trade
+OPEN. Qui, per ticker, si salva lo stato completo del motore dopo l'ultima
+barra elaborata:
+
+- feature causali: EMA del fondamentale e dello slope, EMA20 (F), filtro di
+  Kalman (x_f, P_f) del potenziale, ultimi 251 valori di pot per lo z
+  rolling, ultimo z, isteresi trend COMBO, ultimo onset;
+- esecutore (stessa semantica di backtest_stable senza start/end): leg
+  LONG/SHORT con prezzo e data d'ingresso, capitale, decisioni in attesa
+  di esecuzione (ultime `lag` barre) e signal_events.
+
+Il file non cresce con la storia: si tengono solo i signal_events delle
+ultime TAIL barre e gli onset che possono ancora qualificarli (TAIL +
+horizon barre); i trade chiusi non si salvano (il report legge solo gli
+OPEN, ricostruiti dalle leg). Il report dei segnali recenti (recent_days
+di calendario) deve quindi stare entro TAIL barre.
+
+La sera dopo si elaborano SOLO le barre nuove: costo proporzionale alle
+barre nuove, non alla storia. La prima costruzione (o la ricostruzione se i
+prezzi storici sono cambiati, es. rettifica dividendi) è un replay completo
+della serie scaricata. Le EMA e il filtro sono bit-identici al calcolo
+vettoriale; lo z del potenziale è ricalcolato sulla finestra di 252 barre
+(differenze ~1e-12 rispetto al rolling sull'intera serie).
+
+Lo stato equivale al replay completo della STESSA serie, dalla stessa
+prima barra: se la prima barra di px cambia (finestra mobile che avanza)
+lo stato si ricostruisce. Per questo la scansione incrementale
+(run_stable_scan con incremental_state) scarica da una data FISSA, lo
+start_date della config, e non dalla finestra mobile di 6/24 mesi della
+scansione normale: incrementale e replay partono dalla stessa ancora.
+"""
+import os
+import json
+import math
+
+STATE_PATH = os.path.join(os.path.dirname(__file__), "stable_signal_state.json")
+STATE_VERSION = 2         # 2: eventi/onset limitati alla coda, niente trade chiusi
+TAIL = 32                 # barre di slope/z conservate per il report dei segnali recenti
+ZWIN, Z_MIN_PERIODS = 252, 40
+POT_MIN_POINTS = 100      # warmup Kalman come kalman_frozen_series
+
+
+def state_signature(strategy="STABLE", alpha=200, mode="LONG", entry_threshold=0.0,
+                    exit_threshold=0.0, entry_z=2.0, horizon=21,
+                    execution_lag=1, cost_pct=0.0):
+    """Chiave dei parametri: uno stato salvato con parametri diversi si ricostruisce."""
+    return json.dumps([STATE_VERSION, strategy, float(alpha), mode, float(entry_threshold),
+                       float(exit_threshold), float(entry_z), int(horizon),
+                       int(execution_lag), float(cost_pct)])
+
+
+def load_states(path=None):
+    p = path or STATE_PATH
+    if os.path.exists(p):
+        try:
+            with open(p, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Stato segnali illeggibile ({e}): replay completo")
+    return {}
+
+
+def save_states(states, path=None):
+    p = path or STATE_PATH
+    tmp = p + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(states, f)
+    os.replace(tmp, p)
+
+
+def _ewm_step(prev, x, a):
+    """Un passo di pandas ewm(adjust=False): stesse operazioni, stesso risultato."""
+    old = 1.0 - a
+    if prev != x:
+        return (old * prev + a * x) / (old + a)
+    return prev
+
+
+class _Tail:
+    """Sequenza indicizzata per indice GLOBALE di barra, con solo le ultime barre."""
+
+    def __init__(self, values, n):
+        self.values, self.n = values, n
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.n
+        k = i - (self.n - len(self.values))
+        return self.values[k] if 0 <= k < len(self.values) else float("nan")
+
+
+# ------------------------------------------------------------------
+#  Esecutore: replica del loop di backtest_stable (range completo)
+# ------------------------------------------------------------------
+
+def _execute(st, i, date, price, sig):
+    """Barra i: decisione sulla barra j = i - lag, esecuzione al close di i."""
+    ex = st["exec"]
+    rec = ex["recent"]
+    rec.append([i, date, price, sig])
+    lag = ex["lag"]
+    if len(rec) > lag:
+        j, j_date, j_price, s = rec[-1 - lag]
+        c = ex["cost"]
+        for direction in ("LONG", "SHORT"):
+            if direction not in ex["directions"]:
+                continue
+            leg = ex["legs"][direction]
+            if direction == "LONG":
+                do_exit, do_entry = s < ex["exit_th"], s > ex["entry_th"]
+            else:
+                do_exit, do_entry = s > -ex["exit_th"], s < -ex["entry_th"]
+            event = {"type": None, "direction": direction,
+                     "signal_date": j_date, "signal_index": j,
+                     "exec_date": date, "exec_index": i,
+                     "price_at_signal": j_price, "slope_at_signal": s}
+            if leg["in"] and do_exit:
+                from stable_strategy import _pnl_frac
+                pnl = _pnl_frac(direction, leg["entry_price"], price, c)
+                ex["capital"] *= (1.0 + pnl)
+                ex["events"].append({**event, "type": "EXIT"})
+                leg["in"] = False
+            elif (not leg["in"]) and do_entry:
+                leg.update({"in": True, "entry_price": price, "entry_date": date})
+                ex["events"].append({**event, "type": "ENTRY"})
+    if len(rec) > lag:
+        del rec[:len(rec) - lag]
+
+
+def _pending_events(ex):
+    """Segnali PENDENTI delle ultime `lag` barre (come backtest_stable)."""
+    out = []
+    logged = set()
+    for j, j_date, j_price, s in ex["recent"]:
+        for direction in ("LONG", "SHORT"):
+            if direction not in ex["directions"] or direction in logged:
+                continue
+            leg = ex["legs"][direction]
+            if direction == "LONG":
+                do_exit, do_entry = s < ex["exit_th"], s > ex["entry_th"]
+            else:
+                do_exit, do_entry = s > -ex["exit_th"], s < -ex["entry_th"]
+            kind = "EXIT" if leg["in"] and do_exit else (
+                "ENTRY" if (not leg["in"]) and do_entry else None)
+            if kind:
+                out.append({"type": kind, "direction": direction,
+                            "signal_date": j_date, "signal_index": j,
+                            "exec_date": None, "exec_index": None,
+                            "price_at_signal": j_price, "slope_at_signal": s})
+                logged.add(direction)
+    return out
+
+
+# ------------------------------------------------------------------
+#  Segnale per barra (STABLE / ARANCIONE / COMBO)
+# ------------------------------------------------------------------
+
+def _bar(st, date, price, slope, z=None, f20=None):
+    """Posizione desiderata / slope della barra, poi esecuzione."""
+    i = st["n"]
+    f = st["feat"]
+    p = st["params"]
+    sig = slope
+    if p["strategy"] != "STABLE":
+        if (i >= 1 and z > p["entry_z"] and f["z"] <= p["entry_z"]
+                and price is not None and f20 is not None and price < f20):
+            f["last_onset"] = i
+            st["onsets"].append(i)
+        lo = f["last_onset"]
+        d = 1 if (lo is not None and i - lo < p["horizon"]) else 0
+        pos = d
+        if p["strategy"] == "COMBO":
+            if (not f["in_trend"]) and slope > p["entry_threshold"]:
+                f["in_trend"] = True
+            elif f["in_trend"] and slope < p["exit_threshold"]:
+                f["in_trend"] = False
+            pos = 1 if (f["in_trend"] or d) else 0
+        sig = pos - 0.5
+        f["z"] = z
+    _execute(st, i, date, price, sig)
+    st["tail"].append([slope, z if z is not None else 0.0])
+    del st["tail"][:-TAIL]
+    _trim(st, i + 1)
+    st["n"] = i + 1
+    st["last_date"], st["last_price"] = date, price
+
+
+def _trim(st, n):
+    """Eventi delle ultime TAIL barre e onset entro TAIL + horizon (in ordine di indice)."""
+    events, onsets = st["exec"]["events"], st["onsets"]
+    k = 0
+    while k < len(events) and events[k]["signal_index"] < n - TAIL:
+        k += 1
+    del events[:k]
+    k = 0
+    while k < len(onsets) and onsets[k] < n - TAIL - st["params"]["horizon"]:
+        k += 1
+    del onsets[:k]
+
+
+def build_state(px, strategy="STABLE", alpha=200, mode="LONG", entry_threshold=0.0,
+                exit_threshold=0.0, entry_z=2.0, horizon=21, execution_lag=1, cost_pct=0.0):
+    """Replay completo di px (feature vettoriali come analyze_ticker_signals)."""
+    from stable_strategy import potential_zscore
+
+    params = {"strategy": strategy, "alpha": float(alpha), "mode": mode,
+              "entry_threshold": float(entry_threshold), "exit_threshold": float(exit_threshold),
+              "entry_z": float(entry_z), "horizon": int(horizon)}
+    if strategy != "STABLE":
+        mode, entry_th, exit_th = "LONG", 0.4, 0.0
+    else:
+        entry_th, exit_th = float(entry_threshold), float(exit_threshold)
+    st = {
+        "signature": state_signature(strategy, alpha, params["mode"], entry_threshold,
+                                     exit_threshold, entry_z, horizon, execution_lag, cost_pct),
+        "params": params,
+        "n": 0, "first_date": None, "last_date": None, "last_price": None,
+        "onsets": [], "tail": [],
+        "feat": {"z": 0.0, "last_onset": None, "in_trend": False},
+        "exec": {
+            "lag": int(execution_lag), "cost": float(cost_pct) / 100.0,
+            "entry_th": entry_th, "exit_th": exit_th,
+            "directions": [d for d in ("LONG", "SHORT")
+                           if mode == d or mode == "BOTH"],
+            "legs": {d: {"in": False, "entry_price": 0.0, "entry_date": None}
+                     for d in ("LONG", "SHORT")},
+            "capital": 1000.0, "recent": [], "events": [],
+        },
+    }
+
+    ema_span = max(5, int(alpha / 10))
+    F_alpha = px.ewm(span=ema_span, adjust=False).mean()
+    slopes = F_alpha.diff().fillna(0).ewm(span=14, adjust=False).mean()
+    dates = [d.strftime("%Y-%m-%d") for d in px.index]
+    prices = [float(v) for v in px.values]
+    st["first_date"] = dates[0] if dates else None
+    f = st["feat"]
+    f.update({"F": float(F_alpha.iloc[-1]), "slope": float(slopes.iloc[-1])})
+
+    if strategy == "STABLE":
+        for t in range(len(prices)):
+            _bar(st, dates[t], prices[t], float(slopes.iloc[t]))
+        return st
+
+    from logic import kalman_local_level
+    F20 = px.ewm(span=20, adjust=False).mean()
+    x_f, P_f = kalman_local_level(F20.values.astype(float), alpha, 1.0)
+    pot = [float("nan")] * min(POT_MIN_POINTS, len(prices)) + [
+        0.5 * 1.0 * (x_f[t] - F20.values[t]) ** 2 for t in range(POT_MIN_POINTS, len(prices))]
+    z = potential_zscore(pot, zwin=ZWIN, min_periods=Z_MIN_PERIODS)
+    F20v = F20.values.tolist()
+    f["z"] = 0.0
+    for t in range(len(prices)):
+        _bar(st, dates[t], prices[t], float(slopes.iloc[t]), float(z[t]), F20v[t])
+    f.update({"F20": F20v[-1], "x": float(x_f[-1]), "P": float(P_f[-1]),
+              "pot_buf": [float(v) for v in pot[-(ZWIN - 1):]]})
+    return st
+
+
+def _advance_bar(st, date, price):
+    """Feature incrementali di una barra nuova (stesse operazioni del vettoriale)."""
+    from stable_strategy import potential_zscore
+
+    f = st["feat"]
+    p = st["params"]
+    a_F = 2.0 / (max(5, int(p["alpha"] / 10)) + 1.0)
+    F = _ewm_step(f["F"], price, a_F)
+    slope = _ewm_step(f["slope"], F - f["F"], 2.0 / 15.0)
+    f["F"], f["slope"] = F, slope
+    if p["strategy"] == "STABLE":
+        _bar(st, date, price, slope)
+        return
+
+    y = _ewm_step(f["F20"], price, 2.0 / 21.0)
+    q, r = 1.0 / p["alpha"], 1.0
+    P_pred = f["P"] + q
+    K = P_pred / (P_pred + r)
+    x = f["x"] + K * (y - f["x"])
+    f["x"], f["P"], f["F20"] = x, (1.0 - K) * P_pred, y
+    pot = 0.5 * 1.0 * (x - y) ** 2 if st["n"] >= POT_MIN_POINTS else float("nan")
+    window = f["pot_buf"] + [pot]
+    z = float(potential_zscore(window, zwin=ZWIN, min_periods=Z_MIN_PERIODS)[-1])
+    f["pot_buf"] = window[-(ZWIN - 1):]
+    _bar(st, date, price, slope, z, y)
+
+
+def advance_state(st, px):
+    """
+    Elabora solo le barre di px successive a st["last_date"].
+    Returns: lo stato aggiornato, oppure None se serve un replay completo
+    (prima barra di px diversa dall'ancora dello stato, ultima barra
+    elaborata assente da px o con prezzo diverso).
+    """
+    def day(t):
+        return px.index[t].strftime("%Y-%m-%d")
+
+    if not len(px) or day(0) != st.get("first_date"):
+        return None
+    # a ritroso dalla fine: si toccano solo le barre nuove
+    k = len(px) - 1
+    while k >= 0 and day(k) > st["last_date"]:
+        k -= 1
+    if k < 0 or day(k) != st["last_date"]:
+        return None
+    if not math.isclose(float(px.iloc[k]), st["last_price"], rel_tol=1e-9, abs_tol=1e-12):
+        return None
+    for t in range(k + 1, len(px)):
+        _advance_bar(st, day(t), float(px.iloc[t]))
+    return st
+
+
+def resume_or_build(st, px, **params):
+    """Riprende lo stato salvato se compatibile, altrimenti replay completo."""
+    if st and st.get("signature") == state_signature(
+            params.get("strategy", "STABLE"), params.get("alpha", 200),
+            params.get("mode", "LONG"), params.get("entry_threshold", 0.0),
+            params.get("exit_threshold", 0.0), params.get("entry_z", 2.0),
+            params.get("horizon", 21), params.get("execution_lag", 1),
+            params.get("cost_pct", 0.0)):
+        resumed = advance_state(st, px)
+        if resumed is not None:
+            return resumed
+    return build_state(px, **params)
+
+
+def state_view(st):
+    """
+    Vista "res-like" dello stato per il report dei segnali: signal_events
+    delle ultime TAIL barre (inclusi i PENDENTI) e trades OPEN come
+    backtest_stable, più slopes/z (solo coda, indice globale), onsets
+    recenti e n barre.
+    """
+    ex = st["exec"]
+    events = list(ex["events"]) + _pending_events(ex)
+    trades = []
+    final_capital = ex["capital"]
+    if st["last_price"] is not None:
+        from stable_strategy import _pnl_frac
+        for direction in ("LONG", "SHORT"):
+            leg = ex["legs"][direction]
+            if leg["in"]:
+                pnl = _pnl_frac(direction, leg["entry_price"], st["last_price"], ex["cost"])
+                final_capital *= (1.0 + pnl)
+                trades.append({
+                    "entry_date": leg["entry_date"], "exit_date": "OPEN",
+                    "direction": direction,
+                    "entry_price": round(leg["entry_price"], 2),
+                    "exit_price": round(st["last_price"], 2),
+                    "pnl_pct": round(pnl * 100, 2),
+                    "capital_after": round(final_capital, 2),
+                    "entry_z_value": 0, "entry_z_roc": 0,
+                })
+    n = st["n"]
+    return {
+        "res": {"signal_events": events, "trades": trades},
+        "slopes": _Tail([v[0] for v in st["tail"]], n),
+        "z_pot": _Tail([v[1] for v in st["tail"]], n) if st["params"]["strategy"] != "STABLE" else [],
+        "onsets": list(st["onsets"]),
+        "n": n,
+        "last_price": st["last_price"],
+    }
@@ -0,0 +1,181 @@
+"""
+Spettro a finestra mobile per FourierEngine (Time Machine e deriva dei cicli).
+
+FourierEngine rifà polyfit, rfft completa e argsort a ogni richiesta, anche
+quando la finestra di `fourier_days` barre si sposta di una sola barra. Lo
+spettro del log-prezzo detrendato si può invece far scorrere:
+
+- DFT grezza della finestra con la ricorsione della sliding DFT
+  Y'(k) = w_k · (Y(k) − y_uscente + y_entrante), w_k = e^{2πik/N};
+- retta OLS (come np.polyfit grado 1) dalle somme Σy e Σn·y, aggiornate in
+  O(1) (Σn·y' = Σn·y − Σy + y_uscente + (N−1)·y_entrante);
+- DFT del residuo per linearità: R = Y − a·DFT(1) − b·DFT(n).
+
+Per una storia di date la ricorsione è srotolata in blocchi vettoriali
+(cumsum complessa per blocco) con una FFT completa di ancoraggio ogni
+ANCHOR_EVERY passi: l'errore resta ~1e-10 sulle ampiezze (le componenti
+coincidono con FourierEngine sul prefisso, tests/test_spectral.py).
+"""
+from collections import deque
+
+import numpy as np
+
+ANCHOR_EVERY = 256   # passi tra due FFT complete (deriva numerica limitata)
+
+
+def _basis(N):
+    """DFT di 1 e di n sulla finestra, Σn e Σn² (costanti per N)."""
+    n = np.arange(N, dtype=float)
+    return np.fft.rfft(np.ones(N)), np.fft.rfft(n), n.sum(), (n * n).sum()
+
+
+def _linear_fit(S0, S1, N, sn, snn):
+    """Retta y = a + b·n dalle somme S0 = Σy, S1 = Σn·y (minimi quadrati)."""
+    b = (N * S1 - sn * S0) / (N * snn - sn * sn)
+    a = (S0 - b * sn) / N
+    return a, b
+
+
+class SlidingSpectrum:
+    """
+    DFT del log-prezzo detrendato su `window` barre, aggiornata una barra
+    alla volta in O(N) (una rfft completa ogni `anchor_every` passi).
+
+    engine(price_window, top_k) restituisce un FourierEngine con le stesse
+    componenti e gli stessi scenari di FourierEngine(price_window).
+    """
+
+    def __init__(self, window=504, anchor_every=ANCHOR_EVERY):
+        self.N = int(window)
+        if self.N < 3:
+            raise ValueError("window deve essere >= 3")
+        self.anchor_every = int(anchor_every)
+        self._D, self._T, self._sn, self._snn = _basis(self.N)
+        k = np.arange(len(self._D))
+        self._w = np.exp(2j * np.pi * k / self.N)
+        self.buf = deque(maxlen=self.N)
+        self.Y = None
+
+    def reset(self, log_prices):
+        """Ancoraggio: rfft completa sulle ultime N barre di log_prices."""
+        y = np.asarray(log_prices, dtype=float)[-self.N:]
+        if len(y) < self.N:
+            raise ValueError(f"servono almeno {self.N} barre")
+        self.buf.clear()
+        self.buf.extend(y.tolist())
+        self.Y = np.fft.rfft(y)
+        self.S0 = float(y.sum())
+        self.S1 = float((np.arange(self.N) * y).sum())
+        self._since_anchor = 0
+
+    def push(self, log_price):
+        """Sposta la finestra di una barra (nuovo log-prezzo in coda)."""
+        if self.Y is None:
+            raise ValueError("reset() prima di push()")
+        y_in = float(log_price)
+        y_out = self.buf[0]
+        self.buf.append(y_in)
+        self._since_anchor += 1
+        if self._since_anchor >= self.anchor_every:
+            self.reset(np.fromiter(self.buf, dtype=float, count=self.N))
+            return
+        self.S1 = self.S1 - self.S0 + y_out + (self.N - 1) * y_in
+        self.S0 = self.S0 - y_out + y_in
+        self.Y = self._w * (self.Y - y_out + y_in)
+
+    def coef(self):
+        """[pendenza, intercetta] come np.polyfit(n, y, 1)."""
+        a, b = _linear_fit(self.S0, self.S1, self.N, self._sn, self._snn)
+        return np.array([b, a])
+
+    def residual_spectrum(self):
+        b, a = self.coef()
+        return self.Y - a * self._D - b * self._T
+
+    def engine(self, price_window, top_k=5):
+        """FourierEngine sulla finestra corrente senza polyfit né FFT."""
+        from logic import FourierEngine
+
+        if len(price_window) != self.N:
+            raise ValueError("price_window deve avere esattamente window barre")
+        return FourierEngine.from_spectrum(price_window, top_k, self.coef(),
+                                           self.residual_spectrum())
+
+
+def _components(freqs, amps, phases):
+    """Formato di FourierEngine.get_components (ampiezza decrescente)."""
+    comps = [{"frequency": float(f), "period": int(1 / max(f, 1e-12)),
+              "amplitude": float(a), "phase": float(p)}
+             for f, a, p in zip(freqs, amps, phases)]
+    comps.sort(key=lambda x: x["amplitude"], reverse=True)
+    return comps
+
+
+def spectrum_history(px, window=504, top_k=5, start_date=None, end_date=None,
+                     anchor_every=ANCHOR_EVERY):
+    """
+    Componenti top-k di FourierEngine(px[:t+1], top_k, window) per ogni
+    data t in [start_date, end_date] (default: dalla prima finestra piena).
+
+    Le date con meno di `window` barre di storia usano FourierEngine diretto
+    (finestra più corta, come /analyze). Returns dict: window, top_k, dates,
+    components (lista per data, formato get_components), dominant_period.
+    """
+    from logic import FourierEngine
+
+    N, K = int(window), int(top_k)
+    if N < 3 or K < 1:
+        raise ValueError("window >= 3 e top_k >= 1")
+    dates = px.index.strftime("%Y-%m-%d").tolist()
+    lp = np.log(px.values.astype(float))
+    n = len(lp)
+    if start_date:
+        lo = next((i for i, d in enumerate(dates) if d >= start_date), n)
+    else:
+        lo = min(N - 1, n)
+    hi = n if not end_date else next((i for i, d in enumerate(dates) if d > end_date), n)
+    lo = max(lo, 2)
+
+    comps = []
+    for t in range(lo, min(hi, N - 1)):        # finestra ancora incompleta
+        comps.append(FourierEngine(px.iloc[:t + 1], top_k=K, window_size=N).get_components())
+
+    first = max(lo, N - 1)
+    if first < hi:
+        D, T, sn, snn = _basis(N)
+        k = np.arange(len(D))
+        freqs = k / N
+        c0 = np.concatenate([[0.0], np.cumsum(lp)])
+        c1 = np.concatenate([[0.0], np.cumsum(np.arange(n) * lp)])
+        for b0 in range(first, hi, anchor_every):
+            ts = np.arange(b0, min(b0 + anchor_every, hi))
+            s0 = b0 - N + 1                          # inizio della finestra ancora
+            Y0 = np.fft.rfft(lp[s0:s0 + N])
+            steps = np.arange(len(ts))
+            d = lp[s0 + N + steps[:-1]] - lp[s0 + steps[:-1]]
+            rot = np.exp(-2j * np.pi * np.outer(steps[:-1], k) / N)
+            acc = np.vstack([np.zeros(len(k)), np.cumsum(d[:, None] * rot, axis=0)])
+            Y = np.exp(2j * np.pi * np.outer(steps, k) / N) * (Y0[None, :] + acc)
+
+            starts = ts - N + 1
+            S0 = c0[ts + 1] - c0[starts]
+            S1 = (c1[ts + 1] - c1[starts]) - starts * S0
+            a, b = _linear_fit(S0, S1, N, sn, snn)
+            R = Y - a[:, None] * D[None, :] - b[:, None] * T[None, :]
+
+            power = np.abs(R[:, 1:])
+            top = np.sort(np.argsort(power, axis=1)[:, ::-1][:, :K] + 1, axis=1)
+            sel = np.take_along_axis(R, top, axis=1)
+            amps = (2.0 / N) * np.abs(sel)
+            phases = np.angle(sel)
+            for r in range(len(ts)):
+                comps.append(_components(freqs[top[r]], amps[r], phases[r]))
+
+    out_dates = dates[lo:hi]
+    return {
+        "window": N,
+        "top_k": K,
+        "dates": out_dates,
+        "components": comps,
+        "dominant_period": [c[0]["period"] if c else None for c in comps],
+    }
@@ -17,6 +17,7 @@ import pandas as pd
 import numpy as np
 
 from notifications import NotificationManager
+from records import select
 
 # --- CONFIG FILE ---
 STABLE_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "stable_alert_config.json")
@@ -48,6 +49,11 @@ DEFAULT_CONFIG = {
     # Forward test: registra i segnali reali nel journal persistente
     # (paper trading a quota fissa, esecuzione t+1).
     "forward_test": True,
+    # Scansione INCREMENTALE: riprende lo stato salvato del motore per
+    # ticker (signal_state.py) ed elabora solo le barre nuove. Scarica da
+    # start_date (ancora fissa, identica per stato e replay) invece che
+    # dalla finestra mobile di 6/24 mesi della scansione normale.
+    "incremental_state": False,
 }
 
 def load_config():
@@ -75,12 +81,14 @@ def save_config(cfg):
 #  DOWNLOAD: reuse main.py system (MarketData + caches)
 # ============================================================
 
-def download_all_prices(tickers, start_date, max_workers=8):
+def download_all_prices(tickers, start_date, max_workers=8, on_progress=None):
     """
     Download prices using the SAME system as the rest of the app:
     PRICE_CACHE → TICKER_CACHE → MarketData (yfinance single ticker).
 
     This is the system that already works for analysis.
+    on_progress("download", done, total): opzionale, a ogni download
+    completato; se solleva, i download in coda vengono annullati.
     """
     from main import PRICE_CACHE, TICKER_CACHE, _price_cache_lock
     from logic import MarketData
@@ -135,14 +143,21 @@ def download_all_prices(tickers, start_date, max_workers=8):
     with concurrent.futures.ThreadPoolExecutor(max_workers=n_workers) as executor:
         futures = {executor.submit(fetch_one, t): t for t in to_download}
         done = 0
-        for future in concurrent.futures.as_completed(futures):
-            done += 1
-            if done % 50 == 0:
-                print(f"      Download: {done}/{len(to_download)}...")
-            try:
-                future.result()
-            except Exception:
-                pass
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                done += 1
+                if done % 50 == 0:
+                    print(f"      Download: {done}/{len(to_download)}...")
+                try:
+                    future.result()
+                except Exception:
+                    pass
+                if on_progress:
+                    on_progress("download", done, len(to_download))
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            raise
 
     print(f"   📦 Download completato: {len(all_prices)} OK, {len(failed)} falliti")
     return all_prices, failed
@@ -180,11 +195,16 @@ def drop_partial_last_bar(px, today=None, now=None):
 
 def analyze_ticker_signals(ticker, px, today, alpha=200, mode="LONG",
                            entry_threshold=0.0, exit_threshold=0.0, recent_days=5,
-                           strategy="STABLE", entry_z=2.0, horizon=21):
+                           strategy="STABLE", entry_z=2.0, horizon=21,
+                           state_store=None):
     """
     Segnali per un ticker, derivati dal MOTORE UNIFICATO — stessa semantica
     del Lab (level-based, SHORT speculare, esecuzione t+1).
 
+    state_store: dict {ticker: stato} opzionale (signal_state.py). Se dato,
+    lo stato salvato del motore viene ripreso ed elaborate solo le barre
+    nuove; lo stato aggiornato viene riscritto nel dict.
+
     strategy: "STABLE" (trend) | "ARANCIONE" (scarico del potenziale)
               | "COMBO" (trend OR arancione)
 
@@ -205,6 +225,19 @@ def analyze_ticker_signals(ticker, px, today, alpha=200, mode="LONG",
     if len(px) < min_len:
         return {"entries": [], "active": []}
 
+    if state_store is not None:
+        from signal_state import resume_or_build, state_view
+        st = resume_or_build(state_store.get(ticker), px, strategy=strategy, alpha=alpha,
+                             mode=mode if strategy == "STABLE" else "LONG",
+                             entry_threshold=entry_threshold, exit_threshold=exit_threshold,
+                             entry_z=entry_z, horizon=horizon)
+        state_store[ticker] = st
+        view = state_view(st)
+        res, slopes, z_pot, onset_idx = view["res"], view["slopes"], view["z_pot"], view["onsets"]
+        current_price, n_bars = view["last_price"], view["n"]
+        return _signals_report(ticker, today, res, slopes, z_pot, onset_idx, current_price,
+                               n_bars, strategy, entry_threshold, horizon, recent_days)
+
     ema_span = max(5, int(alpha / 10))
     F_alpha = px.ewm(span=ema_span, adjust=False).mean()
     dF_alpha = F_alpha.diff().fillna(0)
@@ -223,21 +256,31 @@ def analyze_ticker_signals(ticker, px, today, alpha=200, mode="LONG",
         if strategy == "ARANCIONE":
             res = backtest_potential_discharge(dates, prices, pot, F20,
                                                entry_z=entry_z, horizon=horizon,
-                                               execution_lag=1, cost_pct=0.0)
+                                               execution_lag=1, cost_pct=0.0, columnar=True)
         else:
             res = backtest_combo(dates, prices, slopes, pot, F20,
                                  entry_th=entry_threshold, exit_th=exit_threshold,
                                  entry_z=entry_z, horizon=horizon,
-                                 execution_lag=1, cost_pct=0.0)
+                                 execution_lag=1, cost_pct=0.0, columnar=True)
     else:
         res = backtest_stable(dates, prices, slopes, mode=mode,
                               entry_th=entry_threshold, exit_th=exit_threshold,
-                              execution_lag=1, cost_pct=0.0)
+                              execution_lag=1, cost_pct=0.0, columnar=True)
+
+    return _signals_report(ticker, today, res, slopes, z_pot, onset_idx, prices[-1],
+                           len(prices), strategy, entry_threshold, horizon, recent_days)
 
-    current_price = prices[-1]
+
+def _signals_report(ticker, today, res, slopes, z_pot, onset_idx, current_price, n_bars,
+                    strategy, entry_threshold, horizon, recent_days):
+    """
+    entries/active di analyze_ticker_signals dal risultato del motore
+    (RecordLog columnar o liste di dict dello stato incrementale): si
+    materializzano solo gli ENTRY e i trade OPEN.
+    """
     current_slope = slopes[-1]
     onset_set = set(onset_idx)
-    last_idx = len(prices) - 1
+    last_idx = n_bars - 1
     last_onset = onset_idx[-1] if onset_idx else None
     # barre rimanenti dell'holding arancione (se la finestra è attiva)
     days_left = None
@@ -245,9 +288,7 @@ def analyze_ticker_signals(ticker, px, today, alpha=200, mode="LONG",
         days_left = int(horizon - (last_idx - last_onset))
 
     entries = []
-    for ev in res["signal_events"]:
-        if ev["type"] != "ENTRY":
-            continue
+    for ev in select(res["signal_events"], type="ENTRY"):
         sig_date = datetime.date.fromisoformat(ev["signal_date"])
         days_ago = (today - sig_date).days
         if days_ago < 0 or days_ago > recent_days:
@@ -277,9 +318,7 @@ def analyze_ticker_signals(ticker, px, today, alpha=200, mode="LONG",
         })
 
     active = []
-    for tr in res["trades"]:
-        if tr["exit_date"] != "OPEN":
-            continue
+    for tr in select(res["trades"], exit_date="OPEN"):
         active.append({
             "ticker": ticker,
             "direction": tr["direction"],
@@ -298,7 +337,7 @@ def compute_stable_signals(tickers, alpha=200, start_date=None, mode="LONG",
                             entry_threshold=0.0, exit_threshold=0.0, max_workers=8,
                             skip_partial_today=True,
                             strategy="STABLE", entry_z=2.0, horizon=21,
-                            price_sink=None):
+                            price_sink=None, state_store=None, on_progress=None):
     """
     Compute signals for all tickers (strategia configurabile).
 
@@ -308,6 +347,12 @@ def compute_stable_signals(tickers, alpha=200, start_date=None, mode="LONG",
         ancora aperti (vedi drop_partial_last_bar).
     price_sink: dict opzionale — viene riempito con {ticker: (dates, closes)}
         delle barre COMPLETE usate per i segnali (serve al forward test).
+    state_store: dict opzionale {ticker: stato del motore} per la scansione
+        incrementale (vedi analyze_ticker_signals); aggiornato in place.
+        Riprende lo stato solo se la serie parte dalla stessa barra: va
+        usato con uno start_date fisso.
+    on_progress: callback(phase, done, total) opzionale, fasi "download" e
+        "signals"; se solleva, la scansione si ferma.
     """
     today = datetime.date.today()
     today_str = today.strftime("%Y-%m-%d")
@@ -325,7 +370,8 @@ def compute_stable_signals(tickers, alpha=200, start_date=None, mode="LONG",
     print(f"🔬 STABLE Scanner: {len(tickers)} tickers (α={alpha}, mode={mode}, "
           f"entry>{entry_threshold}, exit<{exit_threshold}, from={start_date})")
 
-    all_prices, failed = download_all_prices(tickers, start_date, max_workers=max_workers)
+    all_prices, failed = download_all_prices(tickers, start_date, max_workers=max_workers,
+                                             on_progress=on_progress)
     errors_list = [{"ticker": t, "error": "Download fallito"} for t in failed]
 
     # --- PHASE 2: Compute signals (CPU-only, motore unificato) ---
@@ -341,6 +387,7 @@ def compute_stable_signals(tickers, alpha=200, start_date=None, mode="LONG",
                 ticker, px, today, alpha=alpha, mode=mode,
                 entry_threshold=entry_threshold, exit_threshold=exit_threshold,
                 strategy=strategy, entry_z=entry_z, horizon=horizon,
+                state_store=state_store,
             )
             with _lock:
                 for e in res["entries"]:
@@ -375,15 +422,22 @@ def compute_stable_signals(tickers, alpha=200, start_date=None, mode="LONG",
     with concurrent.futures.ThreadPoolExecutor(max_workers=n_workers) as executor:
         futures = {executor.submit(analyze_ticker, t, px): t for t, px in all_prices.items()}
         done = 0
-        for future in concurrent.futures.as_completed(futures):
-            done += 1
-            if done % 100 == 0:
-                print(f"      Calcolo: {done}/{len(all_prices)}...")
-            try:
-                future.result()
-            except Exception as e:
-                t = futures[future]
-                errors_list.append({"ticker": t, "error": str(e)})
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                done += 1
+                if done % 100 == 0:
+                    print(f"      Calcolo: {done}/{len(all_prices)}...")
+                try:
+                    future.result()
+                except Exception as e:
+                    t = futures[future]
+                    errors_list.append({"ticker": t, "error": str(e)})
+                if on_progress:
+                    on_progress("signals", done, len(all_prices))
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            raise
 
     entries_recent.sort(key=lambda x: x["days_ago"])
 
@@ -573,7 +627,13 @@ def build_stable_email(scan_result):
 #  MAIN ENTRY POINT
 # ============================================================
 
-def run_stable_scan(send_email=True):
+def run_stable_scan(send_email=True, on_progress=None):
+    """
+    Scansione STABLE/ARANCIONE/COMBO configurata in stable_alert_config.json,
+    forward test ed email. on_progress(phase, done, total) opzionale (fasi
+    "download", "signals", poi "email" o "report"): se solleva, niente
+    stato, journal né email.
+    """
     print("=" * 60)
     print("🔬 STABLE Strategy Scanner — Avvio scansione...")
     print("=" * 60)
@@ -602,11 +662,18 @@ def run_stable_scan(send_email=True):
     strategy = cfg.get("strategy", "STABLE")
     horizon = int(cfg.get("horizon", 21))
     price_sink = {} if cfg.get("forward_test", True) else None
+    state_store = None
+    start_date = None  # auto: 6 mesi (STABLE) / 24 mesi (ARANCIONE/COMBO)
+    if cfg.get("incremental_state", False):
+        from signal_state import load_states
+        state_store = load_states()
+        # ancora fissa: con la finestra mobile lo stato andrebbe ricostruito ogni sera
+        start_date = cfg.get("start_date") or DEFAULT_CONFIG["start_date"]
 
     result = compute_stable_signals(
         tickers=tickers,
         alpha=cfg.get("alpha", 200),
-        start_date=None,  # auto: 6 mesi (STABLE) / 24 mesi (ARANCIONE/COMBO)
+        start_date=start_date,
         mode=cfg.get("mode", "LONG"),
         entry_threshold=cfg.get("entry_threshold", 0.0),
         exit_threshold=cfg.get("exit_threshold", 0.0),
@@ -616,7 +683,17 @@ def run_stable_scan(send_email=True):
         entry_z=cfg.get("entry_z", 2.0),
         horizon=horizon,
         price_sink=price_sink,
+        state_store=state_store,
+        on_progress=on_progress,
     )
+    if on_progress:
+        on_progress("email" if send_email else "report", 0, 1)
+    if state_store is not None:
+        try:
+            from signal_state import save_states
+            save_states(state_store)
+        except Exception as e:
+            print(f"⚠️ Salvataggio stato segnali fallito: {e}")
 
     # --- FORWARD TEST: registra i segnali reali nel journal persistente ---
     if price_sink is not None:
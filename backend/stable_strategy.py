@@ -17,7 +17,25 @@ Semantica (condivisa da Strategia 5 in main.py, STABLE Lab e email scanner):
 - BOTH:  leg LONG e SHORT indipendenti in parallelo, capitale condiviso
 - costi: cost_pct in percento PER LATO (0.05 = 0.05% a entrare, idem a uscire)
 - win_rate / avg_trade / profit_factor calcolati SOLO sui trade chiusi
+- columnar=True: trades/signal_events restano RecordLog (records.py, tuple
+  compatte) invece di liste di dict — per optimizer e scansioni che leggono
+  solo stats o poche righe; default invariato (liste di dict per l'API)
+- i loop sequenziali (barre, onset/holding, isteresi) hanno un kernel
+  compilato opzionale in kernels.py (FPR_KERNELS): questo codice resta il
+  riferimento di parità e il fallback
 """
+import kernels
+from records import RecordLog, TRADE_FIELDS, EVENT_FIELDS, SKIPPED_FIELDS
+
+
+def potential_zscore(pot_raw, zwin=252, min_periods=40):
+    """z-score rolling causale del potenziale (0 finché la finestra non è pronta)."""
+    import pandas as pd
+
+    s = pd.Series(pot_raw, dtype=float)
+    mean = s.rolling(zwin, min_periods=min_periods).mean()
+    std = s.rolling(zwin, min_periods=min_periods).std()
+    return ((s - mean) / (std + 1e-9)).fillna(0).values
 
 
 def potential_discharge_onsets(prices, pot_raw, F_vals,
@@ -30,13 +48,13 @@ def potential_discharge_onsets(prices, pot_raw, F_vals,
     Ritorna anche la serie z (utile per email/diagnostica).
     Returns: (onset_indices: list[int], z: list[float])
     """
-    import pandas as pd
-
     n = len(prices)
-    s = pd.Series(pot_raw, dtype=float)
-    mean = s.rolling(zwin, min_periods=min_periods).mean()
-    std = s.rolling(zwin, min_periods=min_periods).std()
-    z = ((s - mean) / (std + 1e-9)).fillna(0).values
+    z = potential_zscore(pot_raw, zwin=zwin, min_periods=min_periods)
+    if kernels.enabled():
+        px, has_px = kernels.as_float(prices, n)
+        F, has_F = kernels.as_float(F_vals, n)
+        mask = kernels.kernel("discharge_onsets")(z, px, has_px, F, has_F, float(entry_z))
+        return mask.nonzero()[0].tolist(), z.tolist()
 
     onsets = []
     for t in range(1, n):
@@ -60,7 +78,8 @@ def potential_discharge_positions(prices, pot_raw, F_vals,
 
     Evidenza (event study 2026-07-05, 16 ticker 2022-2026): dopo questi
     onset il ritorno a 10 gg è ~4x la baseline; gli spike con prezzo sopra
-    F non hanno edge, per questo il filtro direzionale.
+    F non hanno edge, per questo il filtro direzionale. Da rivalidare
+    sull'universo con event_study.py (POST /event-study).
 
     Returns: (positions list[0/1], n_onsets)
     """
@@ -68,6 +87,10 @@ def potential_discharge_positions(prices, pot_raw, F_vals,
     onsets, _ = potential_discharge_onsets(prices, pot_raw, F_vals,
                                            entry_z=entry_z, zwin=zwin,
                                            min_periods=min_periods)
+    if kernels.enabled():
+        positions = kernels.kernel("hold_positions")(kernels.mask_from(onsets, n), horizon)
+        return positions.tolist(), len(onsets)
+
     positions = [0] * n
     oi = 0
     last_onset = None
@@ -85,7 +108,7 @@ def backtest_potential_discharge(dates, prices, pot_raw, F_vals,
                                  execution_lag=1, cost_pct=0.0,
                                  initial_capital=1000.0,
                                  start_date=None, end_date=None,
-                                 zwin=252, min_periods=40):
+                                 zwin=252, min_periods=40, columnar=False):
     """
     Backtest della strategia "scarico del potenziale" usando il motore
     unificato come esecutore: la serie di posizione desiderata viene
@@ -101,7 +124,8 @@ def backtest_potential_discharge(dates, prices, pot_raw, F_vals,
                           entry_th=0.4, exit_th=0.0,
                           execution_lag=execution_lag, cost_pct=cost_pct,
                           initial_capital=initial_capital,
-                          start_date=start_date, end_date=end_date)
+                          start_date=start_date, end_date=end_date,
+                          columnar=columnar)
     res["n_onsets"] = n_onsets
     return res
 
@@ -115,6 +139,11 @@ def combo_positions(slopes, entry_th, exit_th, discharge_pos):
     (durante i panici lo slope è negativo): i due leg sono complementari.
     """
     n = len(slopes)
+    if kernels.enabled():
+        sl, _ = kernels.as_float(slopes, n)
+        d_pos, _ = kernels.as_float(discharge_pos, n, fill=0.0)
+        return kernels.kernel("hysteresis")(sl, float(entry_th), float(exit_th), d_pos).tolist()
+
     pos = [0] * n
     in_trend = False
     for t in range(n):
@@ -135,7 +164,7 @@ def backtest_combo(dates, prices, slopes, pot_raw, F_vals,
                    execution_lag=1, cost_pct=0.0,
                    initial_capital=1000.0,
                    start_date=None, end_date=None,
-                   zwin=252, min_periods=40):
+                   zwin=252, min_periods=40, columnar=False):
     """
     Backtest COMBO = STABLE (trend, core) + Scarico del Potenziale
     (satellite, alpha nei panici). Evidenza OOS 2026-07-05: Sharpe
@@ -156,7 +185,8 @@ def backtest_combo(dates, prices, slopes, pot_raw, F_vals,
                           entry_th=0.4, exit_th=0.0,
                           execution_lag=execution_lag, cost_pct=cost_pct,
                           initial_capital=initial_capital,
-                          start_date=start_date, end_date=end_date)
+                          start_date=start_date, end_date=end_date,
+                          columnar=columnar)
     res["n_onsets"] = n_onsets
     return res
 
@@ -169,11 +199,46 @@ def _pnl_frac(direction, entry, exit_price, c):
     return (entry * (1 - c) - exit_price * (1 + c)) / entry
 
 
+def _bars_kernel(dates, prices, slopes, n, lag, c, init, use_long, use_short,
+                 entry_th, exit_th, in_range, legs, add_trade, add_event,
+                 equity_curve, trade_pnl_curve):
+    """
+    Loop a barre di backtest_stable su kernels.stable_bars: riempie trade,
+    eventi, curve e leg aperti come il loop Python. Returns: (capital,
+    peak, max_dd, exposure_bars, active_bars, first_price, last_price,
+    mtm_series).
+    """
+    px, has_px = kernels.as_float(prices, n)
+    sl, _ = kernels.as_float(slopes, n)
+    act = kernels.mask_from([i for i in range(n) if in_range(i)], n)
+    (eq, tp, mtm, ev, tr, trf, capital, peak, max_dd, _, leg_idx, counts) = kernels.kernel(
+        "stable_bars")(px, has_px, sl, act, lag, c, float(init), use_long, use_short,
+                       float(entry_th), float(exit_th))
+
+    kinds, dirs = ("ENTRY", "EXIT"), ("LONG", "SHORT")
+    for typ, d, j, i in ev.tolist():
+        add_event((kinds[typ], dirs[d], dates[j], j, dates[i], i, prices[j], slopes[j]))
+    for (d, ei, xi), (pnl, cap) in zip(tr.tolist(), trf.tolist()):
+        add_trade((dates[ei], dates[xi], dirs[d], round(prices[ei], 2), round(prices[xi], 2),
+                   round(pnl * 100, 2), round(cap, 2), 0, 0))
+    for d, ei in zip(dirs, leg_idx.tolist()):
+        if ei >= 0:
+            legs[d].update({"in": True, "entry_price": prices[ei], "entry_date": dates[ei]})
+    # curve arrotondate qui (round Python, come nel loop)
+    equity_curve.extend(round(v, 2) for v in eq.tolist())
+    trade_pnl_curve.extend(round(v, 2) for v in tp.tolist())
+
+    _, _, exposure, active, first_i, last_i = counts.tolist()
+    return (float(capital), float(peak), float(max_dd), exposure, active,
+            prices[first_i] if first_i >= 0 else None,
+            prices[last_i] if last_i >= 0 else None, mtm.tolist())
+
+
 def backtest_stable(dates, prices, slopes, mode="LONG",
                     entry_th=0.0, exit_th=0.0,
                     execution_lag=1, cost_pct=0.0,
                     initial_capital=1000.0,
-                    start_date=None, end_date=None):
+                    start_date=None, end_date=None, columnar=False):
     """
     Returns dict:
       equity_curve     : % vs capitale iniziale, mark-to-market, len == len(dates)
@@ -181,6 +246,7 @@ def backtest_stable(dates, prices, slopes, mode="LONG",
       trades           : lista trade (exit_date == 'OPEN' se ancora aperto)
       skipped_trades   : [] (compatibilità con backtest_strategy)
       signal_events    : eventi ENTRY/EXIT, inclusi PENDENTI (exec_date None)
+      (con columnar=True trades/skipped_trades/signal_events sono RecordLog)
       stats            : final_capital, total_return, win_rate, total_trades,
                          avg_trade_pct, avg_trade, max_drawdown, profit_factor,
                          wins, losses, exposure_pct, sharpe, buy_hold_return
@@ -208,8 +274,10 @@ def backtest_stable(dates, prices, slopes, mode="LONG",
         "SHORT": {"in": False, "entry_price": 0.0, "entry_date": None},
     }
 
-    trades = []
-    signal_events = []
+    trades = RecordLog(TRADE_FIELDS)
+    signal_events = RecordLog(EVENT_FIELDS)
+    add_trade = trades.rows.append
+    add_event = signal_events.rows.append
     equity_curve = []
     trade_pnl_curve = []
 
@@ -230,113 +298,88 @@ def backtest_stable(dates, prices, slopes, mode="LONG",
                 cap *= (1.0 + _pnl_frac(direction, leg["entry_price"], price, c))
         return cap
 
-    for i in range(n):
-        active = in_range(i)
-        price = prices[i] if i < len(prices) else None
-
-        if not active or price is None:
-            equity_curve.append(equity_curve[-1] if equity_curve else 0.0)
-            trade_pnl_curve.append(0.0)
-            continue
-
-        active_bars += 1
-        if first_price is None:
-            first_price = price
-        last_price_in_range = price
-
-        # --- Decisione sulla barra j = i - lag, esecuzione su questa barra ---
-        j = i - lag
-        if j >= 0 and in_range(j) and j < len(slopes) and slopes[j] is not None:
-            s = slopes[j]
-
-            # LONG leg
-            if use_long:
-                leg = legs["LONG"]
-                if leg["in"] and s < exit_th:
-                    pnl = _pnl_frac("LONG", leg["entry_price"], price, c)
-                    capital *= (1.0 + pnl)
-                    trades.append({
-                        "entry_date": leg["entry_date"], "exit_date": dates[i],
-                        "direction": "LONG",
-                        "entry_price": round(leg["entry_price"], 2),
-                        "exit_price": round(price, 2),
-                        "pnl_pct": round(pnl * 100, 2),
-                        "capital_after": round(capital, 2),
-                        "entry_z_value": 0, "entry_z_roc": 0,
-                    })
-                    signal_events.append({
-                        "type": "EXIT", "direction": "LONG",
-                        "signal_date": dates[j], "signal_index": j,
-                        "exec_date": dates[i], "exec_index": i,
-                        "price_at_signal": prices[j], "slope_at_signal": s,
-                    })
-                    leg["in"] = False
-                elif (not leg["in"]) and s > entry_th:
-                    leg["in"] = True
-                    leg["entry_price"] = price
-                    leg["entry_date"] = dates[i]
-                    signal_events.append({
-                        "type": "ENTRY", "direction": "LONG",
-                        "signal_date": dates[j], "signal_index": j,
-                        "exec_date": dates[i], "exec_index": i,
-                        "price_at_signal": prices[j], "slope_at_signal": s,
-                    })
-
-            # SHORT leg (soglie speculari)
-            if use_short:
-                leg = legs["SHORT"]
-                if leg["in"] and s > -exit_th:
-                    pnl = _pnl_frac("SHORT", leg["entry_price"], price, c)
-                    capital *= (1.0 + pnl)
-                    trades.append({
-                        "entry_date": leg["entry_date"], "exit_date": dates[i],
-                        "direction": "SHORT",
-                        "entry_price": round(leg["entry_price"], 2),
-                        "exit_price": round(price, 2),
-                        "pnl_pct": round(pnl * 100, 2),
-                        "capital_after": round(capital, 2),
-                        "entry_z_value": 0, "entry_z_roc": 0,
-                    })
-                    signal_events.append({
-                        "type": "EXIT", "direction": "SHORT",
-                        "signal_date": dates[j], "signal_index": j,
-                        "exec_date": dates[i], "exec_index": i,
-                        "price_at_signal": prices[j], "slope_at_signal": s,
-                    })
-                    leg["in"] = False
-                elif (not leg["in"]) and s < -entry_th:
-                    leg["in"] = True
-                    leg["entry_price"] = price
-                    leg["entry_date"] = dates[i]
-                    signal_events.append({
-                        "type": "ENTRY", "direction": "SHORT",
-                        "signal_date": dates[j], "signal_index": j,
-                        "exec_date": dates[i], "exec_index": i,
-                        "price_at_signal": prices[j], "slope_at_signal": s,
-                    })
-
-        # --- Mark-to-market di fine barra ---
-        cap_now = mtm_capital(price)
-        mtm_series.append(cap_now)
-        eq_pct = (cap_now - initial_capital) / initial_capital * 100.0
-        equity_curve.append(round(eq_pct, 2))
-
-        open_pnl = 0.0
-        any_open = False
-        for direction in ("LONG", "SHORT"):
-            leg = legs[direction]
-            if leg["in"]:
-                any_open = True
-                open_pnl += _pnl_frac(direction, leg["entry_price"], price, c) * 100.0
-        trade_pnl_curve.append(round(open_pnl, 2))
-        if any_open:
-            exposure_bars += 1
-
-        if cap_now > peak_capital:
-            peak_capital = cap_now
-        dd = (peak_capital - cap_now) / peak_capital * 100.0
-        if dd > max_dd:
-            max_dd = dd
+    if kernels.enabled():
+        (capital, peak_capital, max_dd, exposure_bars, active_bars, first_price,
+         last_price_in_range, mtm_series) = _bars_kernel(
+            dates, prices, slopes, n, lag, c, capital, use_long, use_short,
+            entry_th, exit_th, in_range, legs, add_trade, add_event,
+            equity_curve, trade_pnl_curve)
+    else:
+        for i in range(n):
+            active = in_range(i)
+            price = prices[i] if i < len(prices) else None
+
+            if not active or price is None:
+                equity_curve.append(equity_curve[-1] if equity_curve else 0.0)
+                trade_pnl_curve.append(0.0)
+                continue
+
+            active_bars += 1
+            if first_price is None:
+                first_price = price
+            last_price_in_range = price
+
+            # --- Decisione sulla barra j = i - lag, esecuzione su questa barra ---
+            j = i - lag
+            if j >= 0 and in_range(j) and j < len(slopes) and slopes[j] is not None:
+                s = slopes[j]
+
+                # LONG leg
+                if use_long:
+                    leg = legs["LONG"]
+                    if leg["in"] and s < exit_th:
+                        pnl = _pnl_frac("LONG", leg["entry_price"], price, c)
+                        capital *= (1.0 + pnl)
+                        add_trade((leg["entry_date"], dates[i], "LONG",
+                                   round(leg["entry_price"], 2), round(price, 2),
+                                   round(pnl * 100, 2), round(capital, 2), 0, 0))
+                        add_event(("EXIT", "LONG", dates[j], j, dates[i], i, prices[j], s))
+                        leg["in"] = False
+                    elif (not leg["in"]) and s > entry_th:
+                        leg["in"] = True
+                        leg["entry_price"] = price
+                        leg["entry_date"] = dates[i]
+                        add_event(("ENTRY", "LONG", dates[j], j, dates[i], i, prices[j], s))
+
+                # SHORT leg (soglie speculari)
+                if use_short:
+                    leg = legs["SHORT"]
+                    if leg["in"] and s > -exit_th:
+                        pnl = _pnl_frac("SHORT", leg["entry_price"], price, c)
+                        capital *= (1.0 + pnl)
+                        add_trade((leg["entry_date"], dates[i], "SHORT",
+                                   round(leg["entry_price"], 2), round(price, 2),
+                                   round(pnl * 100, 2), round(capital, 2), 0, 0))
+                        add_event(("EXIT", "SHORT", dates[j], j, dates[i], i, prices[j], s))
+                        leg["in"] = False
+                    elif (not leg["in"]) and s < -entry_th:
+                        leg["in"] = True
+                        leg["entry_price"] = price
+                        leg["entry_date"] = dates[i]
+                        add_event(("ENTRY", "SHORT", dates[j], j, dates[i], i, prices[j], s))
+
+            # --- Mark-to-market di fine barra ---
+            cap_now = mtm_capital(price)
+            mtm_series.append(cap_now)
+            eq_pct = (cap_now - initial_capital) / initial_capital * 100.0
+            equity_curve.append(round(eq_pct, 2))
+
+            open_pnl = 0.0
+            any_open = False
+            for direction in ("LONG", "SHORT"):
+                leg = legs[direction]
+                if leg["in"]:
+                    any_open = True
+                    open_pnl += _pnl_frac(direction, leg["entry_price"], price, c) * 100.0
+            trade_pnl_curve.append(round(open_pnl, 2))
+            if any_open:
+                exposure_bars += 1
+
+            if cap_now > peak_capital:
+                peak_capital = cap_now
+            dd = (peak_capital - cap_now) / peak_capital * 100.0
+            if dd > max_dd:
+                max_dd = dd
 
     # --- Segnali PENDENTI: decisione presa ma barra di esecuzione non ancora
     # disponibile (es. segnale sull'ultima barra, esecuzione "domani") ---
@@ -348,38 +391,18 @@ def backtest_stable(dates, prices, slopes, mode="LONG",
         if use_long and not pending_logged["LONG"]:
             leg = legs["LONG"]
             if leg["in"] and s < exit_th:
-                signal_events.append({
-                    "type": "EXIT", "direction": "LONG",
-                    "signal_date": dates[j], "signal_index": j,
-                    "exec_date": None, "exec_index": None,
-                    "price_at_signal": prices[j], "slope_at_signal": s,
-                })
+                add_event(("EXIT", "LONG", dates[j], j, None, None, prices[j], s))
                 pending_logged["LONG"] = True
             elif (not leg["in"]) and s > entry_th:
-                signal_events.append({
-                    "type": "ENTRY", "direction": "LONG",
-                    "signal_date": dates[j], "signal_index": j,
-                    "exec_date": None, "exec_index": None,
-                    "price_at_signal": prices[j], "slope_at_signal": s,
-                })
+                add_event(("ENTRY", "LONG", dates[j], j, None, None, prices[j], s))
                 pending_logged["LONG"] = True
         if use_short and not pending_logged["SHORT"]:
             leg = legs["SHORT"]
             if leg["in"] and s > -exit_th:
-                signal_events.append({
-                    "type": "EXIT", "direction": "SHORT",
-                    "signal_date": dates[j], "signal_index": j,
-                    "exec_date": None, "exec_index": None,
-                    "price_at_signal": prices[j], "slope_at_signal": s,
-                })
+                add_event(("EXIT", "SHORT", dates[j], j, None, None, prices[j], s))
                 pending_logged["SHORT"] = True
             elif (not leg["in"]) and s < -entry_th:
-                signal_events.append({
-                    "type": "ENTRY", "direction": "SHORT",
-                    "signal_date": dates[j], "signal_index": j,
-                    "exec_date": None, "exec_index": None,
-                    "price_at_signal": prices[j], "slope_at_signal": s,
-                })
+                add_event(("ENTRY", "SHORT", dates[j], j, None, None, prices[j], s))
                 pending_logged["SHORT"] = True
 
     # --- Posizioni ancora aperte: riga OPEN (mark-to-market, esclusa dalle stats) ---
@@ -390,22 +413,16 @@ def backtest_stable(dates, prices, slopes, mode="LONG",
             if leg["in"]:
                 pnl = _pnl_frac(direction, leg["entry_price"], last_price_in_range, c)
                 final_capital *= (1.0 + pnl)
-                trades.append({
-                    "entry_date": leg["entry_date"], "exit_date": "OPEN",
-                    "direction": direction,
-                    "entry_price": round(leg["entry_price"], 2),
-                    "exit_price": round(last_price_in_range, 2),
-                    "pnl_pct": round(pnl * 100, 2),
-                    "capital_after": round(final_capital, 2),
-                    "entry_z_value": 0, "entry_z_roc": 0,
-                })
+                add_trade((leg["entry_date"], "OPEN", direction,
+                           round(leg["entry_price"], 2), round(last_price_in_range, 2),
+                           round(pnl * 100, 2), round(final_capital, 2), 0, 0))
 
     # --- Stats (solo trade CHIUSI per win rate / avg / profit factor) ---
-    closed = [t for t in trades if t["exit_date"] != "OPEN"]
-    wins = sum(1 for t in closed if t["pnl_pct"] > 0)
+    closed = [r[5] for r in trades.rows if r[1] != "OPEN"]   # pnl_pct dei trade chiusi
+    wins = sum(1 for p in closed if p > 0)
     losses = len(closed) - wins
-    win_pnl = sum(t["pnl_pct"] for t in closed if t["pnl_pct"] > 0)
-    loss_pnl = abs(sum(t["pnl_pct"] for t in closed if t["pnl_pct"] <= 0))
+    win_pnl = sum(p for p in closed if p > 0)
+    loss_pnl = abs(sum(p for p in closed if p <= 0))
     total_return = (final_capital - initial_capital) / initial_capital * 100.0
 
     if loss_pnl > 0:
@@ -433,7 +450,7 @@ def backtest_stable(dates, prices, slopes, mode="LONG",
         buy_hold = round((last_price_in_range / first_price - 1.0) * 100.0, 2)
 
     exposure_pct = round(exposure_bars / active_bars * 100.0, 1) if active_bars else 0.0
-    avg_trade = round(sum(t["pnl_pct"] for t in closed) / len(closed), 2) if closed else 0
+    avg_trade = round(sum(closed) / len(closed), 2) if closed else 0
 
     stats = {
         "final_capital": round(final_capital, 2),
@@ -454,8 +471,8 @@ def backtest_stable(dates, prices, slopes, mode="LONG",
     return {
         "equity_curve": equity_curve,
         "trade_pnl_curve": trade_pnl_curve,
-        "trades": trades,
-        "skipped_trades": [],
-        "signal_events": signal_events,
+        "trades": trades if columnar else trades.to_dicts(),
+        "skipped_trades": RecordLog(SKIPPED_FIELDS) if columnar else [],
+        "signal_events": signal_events if columnar else signal_events.to_dicts(),
         "stats": stats,
     }
@@ -0,0 +1,133 @@
+"""
+Risposte in streaming (NDJSON o Server-Sent Events) per gli endpoint batch.
+
+/scan e /analyze-batch-stable raccolgono i risultati di tutti i ticker e
+rispondono solo alla fine con un unico JSON. Le varianti /stream emettono
+ogni ticker appena pronto:
+
+- il motore gira nel pool dell'endpoint (workers.py) e consegna i risultati
+  con la callback on_result -> ResultStream.result;
+- la coda tra motore e risposta è limitata (STREAM_QUEUE): se il client
+  legge lentamente il motore si ferma ad aspettare invece di accumulare,
+  e i motori sono chiamati con collect=False (nessuna lista completa);
+- se il client si disconnette lo stream viene chiuso e il motore riceve
+  JobCancelled alla successiva callback (task in coda annullati).
+
+Eventi: "result" (un ticker), "progress" (solo con progress=True), "end"
+(riepilogo finale), "error" (errore del batch). In NDJSON ogni riga è
+{"type": ..., "data": ...}; in SSE `event: <type>` + `data: <json>`.
+"""
+import queue
+import asyncio
+import threading
+
+from fastapi.responses import StreamingResponse
+
+import fastjson
+from jobs import JobCancelled
+from workers import run_in_pool, EndpointBusy
+
+STREAM_QUEUE = 64   # eventi in attesa tra motore e client (backpressure)
+POLL_S = 0.25       # intervallo di controllo di chiusura/fine del motore
+
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+
+class ResultStream:
+    """Ponte thread-safe tra un motore sincrono (callback) e la risposta async."""
+
+    def __init__(self, maxsize=STREAM_QUEUE, progress=False):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.closed = threading.Event()
+        self.with_progress = progress
+        self.count = 0
+
+    def _put(self, event):
+        while True:
+            if self.closed.is_set():
+                raise JobCancelled("stream chiuso dal client")
+            try:
+                self.queue.put(event, timeout=POLL_S)
+                return
+            except queue.Full:
+                continue
+
+    def result(self, item):
+        """Callback on_result: un evento "result" per ticker."""
+        self.count += 1
+        self._put(("result", item))
+
+    def progress(self, phase, done, total):
+        """Callback on_progress: interrompe il motore a stream chiuso."""
+        if self.closed.is_set():
+            raise JobCancelled("stream chiuso dal client")
+        if self.with_progress:
+            self._put(("progress", {"phase": phase, "done": done, "total": total}))
+
+    def run(self, body):
+        """Esegue body(stream) e accoda "end" col riepilogo (o "error")."""
+        try:
+            summary = body(self)
+        except JobCancelled:
+            return
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            self._put(("error", {"status": "error", "detail": str(e)}))
+        else:
+            self._put(("end", {"status": "ok", "count": self.count, **(summary or {})}))
+
+    def close(self):
+        self.closed.set()
+
+
+def encode_event(kind, data, fmt="ndjson"):
+    # array/scalari NumPy e date dei motori: fastjson (NaN/inf -> null)
+    payload = fastjson.dumps(data).decode("utf-8")
+    if fmt == "sse":
+        return f"event: {kind}\ndata: {payload}\n\n"
+    return f'{{"type":"{kind}","data":{payload}}}\n'
+
+
+def stream_format(fmt=None, accept=None):
+    """Formato esplicito (?format=) o dall'header Accept; default NDJSON."""
+    if fmt:
+        if fmt not in MEDIA_TYPES:
+            raise ValueError(f"format non valido: {fmt} (ammessi: {sorted(MEDIA_TYPES)})")
+        return fmt
+    return "sse" if accept and "text/event-stream" in accept else "ndjson"
+
+
+async def event_stream(pool_name, body, fmt="ndjson", progress=False):
+    """
+    Generatore async degli eventi codificati: body(stream) gira nel pool
+    `pool_name` di workers.py; alla chiusura (fine, disconnessione del
+    client, aclose) lo stream viene chiuso e il motore si ferma.
+    """
+    stream = ResultStream(progress=progress)
+    task = asyncio.ensure_future(run_in_pool(pool_name, stream.run, body))
+    try:
+        while True:
+            try:
+                kind, data = await asyncio.to_thread(stream.queue.get, True, POLL_S)
+            except queue.Empty:
+                if task.done():
+                    if task.exception() is not None:
+                        err = task.exception()
+                        detail = str(err) if isinstance(err, EndpointBusy) else f"{type(err).__name__}: {err}"
+                        yield encode_event("error", {"status": "error", "detail": detail}, fmt)
+                        return
+                    if stream.queue.empty():
+                        return
+                continue
+            yield encode_event(kind, data, fmt)
+            if kind in ("end", "error"):
+                return
+    finally:
+        stream.close()
+
+
+def stream_response(pool_name, body, fmt="ndjson", progress=False):
+    return StreamingResponse(
+        event_stream(pool_name, body, fmt, progress), media_type=MEDIA_TYPES[fmt],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,34 @@
+#!/usr/bin/env node
+/**
+ * Runner per test_columnar.py: decodifica con frontend/columnar.js una
+ * risposta colonnare binaria e stampa su stdout la forma JSON
+ * (columnarToPlain), più i tipi dei buffer delle serie e l'esito di
+ * fetchColumnar (usata dal radar in app.js) su una fetch simulata.
+ *
+ * Uso: node columnar_runner.cjs <file.bin>
+ */
+const fs = require('fs');
+const path = require('path');
+const { COLUMNAR_MEDIA_TYPE, decodeColumnar, columnarToPlain, fetchColumnar } = require(path.join(__dirname, '..', '..', 'frontend', 'columnar.js'));
+
+const bytes = fs.readFileSync(process.argv[2]);
+const buffer = bytes.buffer.slice(bytes.byteOffset, bytes.byteOffset + bytes.byteLength);
+const decoded = decodeColumnar(buffer);
+
+const types = new Set();
+(function collect(obj) {
+    if (obj instanceof Float64Array) { types.add('Float64Array'); return; }
+    if (obj && typeof obj === 'object') Object.values(obj).forEach(collect);
+})(decoded);
+
+const data = columnarToPlain(decoded);
+
+// fetch simulata: risposta colonnare -> fetchColumnar la decodifica da sola
+global.fetch = async (url, init) => ({
+    headers: { get: () => (init.headers.Accept.startsWith(COLUMNAR_MEDIA_TYPE) ? COLUMNAR_MEDIA_TYPE : 'application/json') },
+    arrayBuffer: async () => buffer,
+});
+fetchColumnar('/scan', {}).then((res) => {
+    const fetched = JSON.stringify(columnarToPlain(res)) === JSON.stringify(data);
+    process.stdout.write(JSON.stringify({ data, types: [...types], fetched }));
+});
@@ -0,0 +1,105 @@
+"""
+Test per le finestre point-in-time di ActionPath (logic.action_path_windows).
+
+Proprietà verificate:
+1. Per molti t in un'unica chiamata, le ultime `window` barre di x_star,
+   F, dX, kin e pot coincidono con ActionPath(px[:t+1]) (alpha 1..5000),
+   anche per t < window (posizioni < 0 = NaN, dX = 0 sulla prima barra).
+2. LiveKalmanWindow.precompute dà le stesse code di at() barra per barra.
+3. Costo: tempo del batch su tutti i giorni contro le risoluzioni
+   tridiagonali per giorno (solo stampato).
+4. Argomenti non validi -> ValueError.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_action_path_windows.py
+"""
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+
+def _px(seed=1, n=900):
+    rng = np.random.default_rng(seed)
+    return pd.Series(50 * np.exp(np.cumsum(rng.normal(0.0002, 0.02, n))),
+                     index=pd.date_range("2021-01-04", periods=n, freq="B"))
+
+
+def test_parity(action_path_windows, ActionPath):
+    px = _px()
+    ends = [2, 3, 10, 59, 60, 61, 250, 600, len(px) - 1]
+    W = 60
+    worst = 0.0
+    for alpha in (1.0, 200.0, 5000.0):
+        res = action_path_windows(px, ends, W, alpha=alpha, beta=1.0)
+        assert res["t_index"] == ends and res["x_star"].shape == (len(ends), W)
+        for i, t in enumerate(ends):
+            ref = ActionPath(px[:t + 1], alpha=alpha, beta=1.0)
+            m = min(W, t + 1)
+            for key, series in (("x_star", ref.px_star), ("F", ref.F), ("dX", ref.dX),
+                                ("kin", ref.kin_density), ("pot", ref.pot_density)):
+                got, exp = res[key][i, -m:], series.values[-m:]
+                err = np.max(np.abs(got - exp) / (1.0 + np.abs(exp)))
+                assert err < 1e-9, f"alpha={alpha} t={t} {key}: {err:.2e}"
+                worst = max(worst, err)
+            assert np.all(np.isnan(res["x_star"][i, :W - m]))
+    print(f"  OK {len(ends)} t × 3 alpha == ActionPath sul prefisso (errore max {worst:.1e})")
+
+
+def test_live_window(action_path_windows):
+    from integrity import LiveKalmanWindow
+
+    px = _px(seed=2, n=700)
+    loop = LiveKalmanWindow(px, 200.0, 1.0)
+    batch = LiveKalmanWindow(px, 200.0, 1.0)
+    batch.precompute(range(1, len(px)))
+    for e in range(1, len(px)):
+        a, b = loop.at(e), batch.at(e)
+        assert a[0] == b[0]
+        for x, y in zip(a[1:], b[1:]):
+            assert np.array_equal(np.asarray(x), np.asarray(y), equal_nan=True), e
+    print(f"  OK LiveKalmanWindow.precompute == at() su {len(px) - 1} giorni (window {loop.window})")
+
+
+def test_cost(action_path_windows, ActionPath):
+    px = _px(seed=3, n=1500)
+    ends = list(range(300, len(px)))
+    t0 = time.perf_counter()
+    action_path_windows(px, ends, 60, alpha=200.0)
+    t_batch = time.perf_counter() - t0
+    sample = ends[::25]
+    t0 = time.perf_counter()
+    for t in sample:
+        ActionPath(px[:t + 1], alpha=200.0)
+    t_solve = (time.perf_counter() - t0) * len(ends) / len(sample)
+    print(f"  OK {len(ends)} giorni: batch {t_batch * 1000:.0f} ms vs ~{t_solve * 1000:.0f} ms "
+          f"di risoluzioni per giorno")
+
+
+def test_errors(action_path_windows):
+    px = _px(n=50)
+    for ends, W in (([10], 0), ([50], 5), ([-1], 5)):
+        try:
+            action_path_windows(px, ends, W)
+        except ValueError:
+            continue
+        raise AssertionError(f"atteso ValueError per ends={ends} window={W}")
+    assert action_path_windows(px, [], 5)["x_star"].shape == (0, 5)
+    print("  OK argomenti non validi -> ValueError")
+
+
+def main():
+    from logic import action_path_windows, ActionPath  # RED: non esiste ancora
+
+    test_parity(action_path_windows, ActionPath)
+    test_live_window(action_path_windows)
+    test_cost(action_path_windows, ActionPath)
+    test_errors(action_path_windows)
+    print("OK test_action_path_windows — finestre == ActionPath sul prefisso, O(n + k·W)")
+
+
+if __name__ == "__main__":
+    main()
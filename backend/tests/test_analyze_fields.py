@@ -0,0 +1,168 @@
+"""
+Test per gli output selezionabili di /analyze (AnalysisRequest.fields).
+
+Proprietà verificate:
+1. fields=None: risposta completa con le stesse chiavi di sempre;
+   min_action_strategy solo su richiesta esplicita.
+2. Sottoinsieme (campi dello scan email e di /scan-daily, anche con
+   end_date): valori identici a quelli della risposta completa, solo le
+   chiavi richieste, nessun ActionPath/Fourier/ZigZag (tempi stampati).
+3. Campo sconosciuto -> HTTP 400.
+4. Download fresco con fields ridotti: niente ZigZag orario né market cap,
+   input saltati annotati in TICKER_CACHE; una richiesta completa successiva
+   li tratta come cache miss e riscarica.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_analyze_fields.py
+"""
+import sys
+import os
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+SCAN = ["prices", "frozen_strategy", "frozen_sum_strategy"]
+DAILY = ["dates", "frozen_strategy", "frozen_sum_strategy", "market_cap"]
+
+
+def _px(seed=7, n=800):
+    rng = np.random.default_rng(seed)
+    return pd.Series(60 * np.exp(np.cumsum(rng.normal(0.0003, 0.016, n))),
+                     index=pd.date_range("2022-01-03", periods=n, freq="B"))
+
+
+def _entry(px):
+    from logic import frozen_history
+
+    return {
+        "px": px,
+        "frozen": frozen_history(px, alpha=200.0, beta=1.0, min_points=100, kin_lag=25),
+        "zigzag": pd.Series(np.arange(len(px)) % 5, index=px.index),
+        "volume": pd.Series(1000, index=px.index),
+        "mkt_cap": 2e9,
+    }
+
+
+def _dump(x):
+    return json.dumps(x, sort_keys=True, default=str)
+
+
+def test_subset(backend_main):
+    from main import analyze_stock, AnalysisRequest
+
+    px = _px()
+    backend_main.TICKER_CACHE["TESTFIELDS"] = _entry(px)
+    base = dict(ticker="TESTFIELDS", start_date="2022-01-03", use_cache=True)
+    past = px.index[600].strftime("%Y-%m-%d")
+
+    full = analyze_stock(AnalysisRequest(**base))
+    assert list(full)[2:] == list(backend_main.DEFAULT_ANALYZE_FIELDS)
+    assert "min_action_strategy" not in full
+    ma = analyze_stock(AnalysisRequest(**base, fields=["min_action_strategy"]))
+    assert set(ma) == {"status", "ticker", "min_action_strategy"} and "trades" in ma["min_action_strategy"]
+
+    for end in (None, past):
+        ref = analyze_stock(AnalysisRequest(**base, end_date=end))
+        for fields in (SCAN, DAILY):
+            got = analyze_stock(AnalysisRequest(**base, end_date=end, fields=fields))
+            assert list(got) == ["status", "ticker"] + [f for f in ref if f in fields]
+            for f in fields:
+                assert _dump(got[f]) == _dump(ref[f]), (end, f)
+
+    blocks = backend_main.analyze_blocks(SCAN)
+    assert blocks == {"frozen"}, blocks
+    assert backend_main.analyze_blocks(["energy"]) == {"kin_z", "mechanics"}
+
+    def timed(**kw):
+        t0 = time.perf_counter()
+        for _ in range(3):
+            analyze_stock(AnalysisRequest(**base, **kw))
+        return (time.perf_counter() - t0) / 3
+
+    t_full, t_scan = timed(), timed(fields=SCAN)
+    del backend_main.TICKER_CACHE["TESTFIELDS"]
+    print(f"  OK sottoinsiemi == risposta completa; scan {t_scan * 1000:.0f} ms "
+          f"vs completa {t_full * 1000:.0f} ms")
+
+
+def test_unknown(backend_main):
+    from fastapi import HTTPException
+    from main import analyze_stock, AnalysisRequest
+
+    try:
+        analyze_stock(AnalysisRequest(ticker="X", fields=["prices", "nope"]))
+    except HTTPException as e:
+        assert e.status_code == 400 and "nope" in e.detail
+    else:
+        raise AssertionError("atteso HTTP 400")
+    print("  OK campo sconosciuto -> 400")
+
+
+class _FakeTicker:
+    def __init__(self, calls):
+        self.calls = calls
+
+    @property
+    def fast_info(self):
+        self.calls.append("market_cap")
+        return type("FI", (), {"market_cap": 5e9})()
+
+    def history(self, **kw):
+        self.calls.append("hourly")
+        return pd.DataFrame()
+
+
+def test_skipped_inputs(backend_main):
+    from main import analyze_stock, AnalysisRequest
+
+    px = _px(seed=8)
+    calls = []
+
+    class FakeMarketData:
+        def __init__(self, ticker, start_date=None, end_date=None):
+            self.ticker_obj = _FakeTicker(calls)
+            self.df_full = pd.DataFrame({"Open": px, "Close": px, "Volume": 1000})
+
+        def fetch(self):
+            calls.append("fetch")
+            return px
+
+    real = backend_main.MarketData
+    backend_main.MarketData = FakeMarketData
+    try:
+        base = dict(ticker="TESTSKIP", start_date="2022-01-03", use_cache=True)
+        out = analyze_stock(AnalysisRequest(**base, fields=SCAN))
+        assert calls == ["fetch"], calls
+        entry = backend_main.TICKER_CACHE["TESTSKIP"]
+        assert sorted(entry["skipped"]) == ["market_cap", "zigzag"] and entry["mkt_cap"] == 0
+
+        analyze_stock(AnalysisRequest(**base, fields=SCAN))      # hit: nessun download
+        assert calls == ["fetch"], calls
+
+        full = analyze_stock(AnalysisRequest(**base))            # servono zigzag e market cap
+        assert calls[0] == "fetch" and calls[1:].count("fetch") == 1
+        assert "hourly" in calls and "market_cap" in calls
+        assert "skipped" not in backend_main.TICKER_CACHE["TESTSKIP"]
+        assert full["market_cap"] == 5e9
+        assert _dump(full["frozen_strategy"]) == _dump(out["frozen_strategy"])
+    finally:
+        backend_main.MarketData = real
+        backend_main.TICKER_CACHE.pop("TESTSKIP", None)
+    print("  OK input saltati annotati in cache, richiesta completa -> riscarica")
+
+
+def main():
+    import main as backend_main
+    assert hasattr(backend_main, "analyze_blocks")  # RED: non esiste ancora
+
+    test_subset(backend_main)
+    test_unknown(backend_main)
+    test_skipped_inputs(backend_main)
+    print("OK test_analyze_fields — output selezionabili con dipendenze, scan leggeri")
+
+
+if __name__ == "__main__":
+    main()
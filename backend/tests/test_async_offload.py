@@ -0,0 +1,143 @@
+"""
+Test per l'esecuzione fuori dall'event loop di /scan e /verify-integrity (workers.py).
+
+Proprietà verificate:
+1. Durante una /scan lenta /health risponde mentre la scansione è ancora
+   in corso (event loop libero); la latenza viene solo stampata.
+2. Limite per endpoint: N richieste /scan concorrenti, al massimo `limit`
+   in esecuzione insieme, tutte completate.
+3. Pool saturo (in esecuzione + coda) -> 503 con {"status": "error"},
+   contato in /workers-status.
+4. /verify-integrity via pool == corpo sincrono chiamato direttamente.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_async_offload.py
+"""
+import sys
+import os
+import json
+import time
+import asyncio
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+import httpx
+
+
+def _client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test", timeout=30)
+
+
+def _slow_scanner(delay, live):
+    class SlowScanner:
+        def __init__(self, tickers):
+            self.tickers = tickers
+
+        def scan(self, on_result=None, on_progress=None):
+            with live["lock"]:
+                live["now"] += 1
+                live["max"] = max(live["max"], live["now"])
+            time.sleep(delay)
+            with live["lock"]:
+                live["now"] -= 1
+            return [{"ticker": t} for t in self.tickers]
+    return SlowScanner
+
+
+def _live():
+    return {"lock": threading.Lock(), "now": 0, "max": 0}
+
+
+async def _health_during_scan(backend_main):
+    async with _client(backend_main.app) as c:
+        scan = asyncio.create_task(c.post("/scan", json={"tickers": ["A", "B"]}))
+        await asyncio.sleep(0.05)
+        t0 = time.perf_counter()
+        health = await c.get("/health")
+        t_health = time.perf_counter() - t0
+        res = await scan
+    return res, health, t_health
+
+
+def test_health(backend_main):
+    backend_main.MarketScanner = _slow_scanner(0.8, _live())
+    res, health, t_health = asyncio.run(_health_during_scan(backend_main))
+    assert res.json() == {"status": "ok", "results": [{"ticker": "A"}, {"ticker": "B"}]}
+    assert health.json() == {"status": "running"}
+    print(f"  OK /health in {t_health * 1000:.0f} ms durante una /scan di 800 ms")
+
+
+async def _burst(backend_main, n):
+    async with _client(backend_main.app) as c:
+        return await asyncio.gather(*(c.post("/scan", json={"tickers": [f"T{i}"]}) for i in range(n)))
+
+
+def test_limit(backend_main, workers):
+    live = _live()
+    backend_main.MarketScanner = _slow_scanner(0.15, live)
+    limit = workers.endpoint_pool("scan").limit
+    res = asyncio.run(_burst(backend_main, limit + 3))
+    assert all(r.status_code == 200 and r.json()["status"] == "ok" for r in res)
+    assert live["max"] == limit, live
+    print(f"  OK {limit + 3} /scan concorrenti, al massimo {live['max']} in esecuzione")
+
+    workers.shutdown_pools()
+    workers._POOLS["scan"] = workers.EndpointPool("scan", limit=1, max_queued=1)
+    res = asyncio.run(_burst(backend_main, 4))
+    codes = sorted(r.status_code for r in res)
+    assert codes == [200, 200, 503, 503], codes
+    busy = next(r for r in res if r.status_code == 503).json()
+    assert busy["status"] == "error" and "scan" in busy["detail"]
+
+    async def status():
+        async with _client(backend_main.app) as c:
+            return (await c.get("/workers-status")).json()
+    pools = asyncio.run(status())["pools"]
+    assert pools["scan"]["rejected"] == 2 and pools["scan"]["pending"] == 0
+    workers.shutdown_pools()
+    print("  OK pool saturo -> 503 {status: error}, rifiuti in /workers-status")
+
+
+def test_verify(backend_main):
+    from logic import frozen_history
+    from main import VerifyIntegrityRequest
+
+    rng = np.random.default_rng(11)
+    px = pd.Series(50 * np.exp(np.cumsum(rng.normal(0.0003, 0.018, 620))),
+                   index=pd.date_range("2023-01-02", periods=620, freq="B"))
+    backend_main.TICKER_CACHE["TESTOFFLOAD"] = {
+        "px": px, "frozen": frozen_history(px, alpha=200.0, beta=1.0, min_points=100, kin_lag=25)}
+    try:
+        body = {"ticker": "TESTOFFLOAD", "strategy": "FROZEN", "audit_every": 63}
+
+        async def call():
+            async with _client(backend_main.app) as c:
+                return (await c.post("/verify-integrity", json=body)).json()
+        got = asyncio.run(call())
+        ref = backend_main._verify_trade_integrity(VerifyIntegrityRequest(**body))
+        assert got["status"] == "ok" and got["steps"] > 0
+        assert json.dumps(got, sort_keys=True) == json.dumps(ref, sort_keys=True, default=str)
+    finally:
+        backend_main.TICKER_CACHE.pop("TESTOFFLOAD", None)
+    print(f"  OK /verify-integrity via pool == sincrono ({got['steps']} passi)")
+
+
+def main():
+    import main as backend_main
+    import workers  # RED: non esiste ancora
+
+    real = backend_main.MarketScanner
+    try:
+        test_health(backend_main)
+        test_limit(backend_main, workers)
+        test_verify(backend_main)
+    finally:
+        backend_main.MarketScanner = real
+        workers.shutdown_pools()
+    print("OK test_async_offload — lavoro CPU nei pool per endpoint, event loop libero")
+
+
+if __name__ == "__main__":
+    main()
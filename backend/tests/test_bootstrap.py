@@ -0,0 +1,122 @@
+"""
+Test per gli intervalli di confidenza bootstrap (bootstrap.py).
+
+Proprietà verificate:
+1. Matrice di indici (B, n): blocchi circolari contigui, seed deterministico.
+2. Stime puntuali == statistiche di backtest_stable (total_return, sharpe,
+   max_drawdown dalla equity_curve; trade composti e a quota fissa).
+3. CI sensati: l'intervallo contiene la stima puntuale, prob_positive ~1
+   con edge forte, CI dello Sharpe a cavallo di 0 con media nulla; niente NaN nel JSON.
+4. Scala: 2000 ricampionamenti × 1000 giorni deterministici (tempo stampato).
+
+Esecuzione: backend/venv/bin/python backend/tests/test_bootstrap.py
+"""
+import sys
+import os
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+
+def test_indices(bs):
+    idx = bs.block_indices(50, n_resamples=200, block_size=7, seed=3)
+    assert idx.shape == (200, 50)
+    steps = (np.diff(idx, axis=1) % 50)[:, :6]   # primo blocco: indici consecutivi
+    assert (steps == 1).all(), "blocco non contiguo"
+    assert (idx == bs.block_indices(50, 200, 7, seed=3)).all(), "seed non deterministico"
+    assert idx.min() >= 0 and idx.max() < 50
+    bad = [lambda: bs.block_indices(50, 200, 0), lambda: bs.block_indices(50, 200, -3),
+           lambda: bs.block_indices(50, 0, 7), lambda: bs.bootstrap_returns([0.01] * 20, block_size=0),
+           lambda: bs.bootstrap_trades([1.0, -1.0, 2.0], n_resamples=-5)]
+    for call in bad:
+        try:
+            call()
+        except ValueError:
+            continue
+        raise AssertionError("block_size/n_resamples < 1 accettati")
+
+    from fastapi import HTTPException
+    from main import bootstrap_endpoint, BootstrapRequest
+    try:
+        bootstrap_endpoint(BootstrapRequest(returns=[0.01, -0.02] * 20, block_size=-1))
+    except HTTPException as e:
+        assert e.status_code == 400, e
+    else:
+        raise AssertionError("block_size negativo: atteso 400")
+    print("  OK indici block bootstrap circolare (200 × 50, blocco 7), blocco/ricampionamenti < 1 -> 400")
+
+
+def test_point_estimates(bs):
+    from stable_strategy import backtest_stable
+
+    rng = np.random.default_rng(11)
+    n = 800
+    px = pd.Series(100 * np.exp(np.cumsum(rng.normal(0.0004, 0.015, n))),
+                   index=pd.date_range("2021-01-01", periods=n, freq="B"))
+    slopes = px.ewm(span=20, adjust=False).mean().diff().fillna(0).ewm(span=14, adjust=False).mean()
+    dates = [d.strftime("%Y-%m-%d") for d in px.index]
+    res = backtest_stable(dates, px.tolist(), slopes.tolist(), start_date=dates[200])
+    st = res["stats"]
+
+    r = bs.bootstrap_returns(bs.returns_from_equity(res["equity_curve"], 199), seed=1)
+    assert abs(r["total_return"]["point"] - res["equity_curve"][-1]) < 0.02
+    assert abs(r["sharpe"]["point"] - st["sharpe"]) < 0.05, (r["sharpe"], st["sharpe"])
+    assert abs(r["max_drawdown"]["point"] - st["max_drawdown"]) < 0.1, (r["max_drawdown"], st["max_drawdown"])
+
+    closed = [t for t in res["trades"] if t["exit_date"] != "OPEN"]
+    t = bs.bootstrap_trades(res["trades"], seed=1)
+    assert t["n"] == len(closed)
+    wins = sum(1 for x in closed if x["pnl_pct"] > 0)
+    assert abs(t["win_rate"]["point"] - wins / len(closed) * 100) < 1e-3
+    prod = np.prod([1 + x["pnl_pct"] / 100 for x in closed])
+    assert abs(t["total_return"]["point"] - (prod - 1) * 100) < 1e-3
+    flat = bs.bootstrap_trades(res["trades"], seed=1, compound=False)
+    assert abs(flat["total_return"]["point"] - sum(x["pnl_pct"] for x in closed)) < 1e-3
+    for k in ("total_return", "sharpe", "max_drawdown"):
+        assert r[k]["low"] <= r[k]["median"] <= r[k]["high"]
+    print(f"  OK stime puntuali == backtest_stable (ret {r['total_return']}, {t['n']} trade)")
+
+
+def test_intervals(bs):
+    rng = np.random.default_rng(5)
+    strong = bs.bootstrap_returns(rng.normal(0.003, 0.01, 750), seed=2)
+    noise = bs.bootstrap_returns(rng.normal(0.0, 0.01, 750), seed=2)
+    assert strong["prob_positive"] > 0.99, strong["prob_positive"]
+    assert strong["sharpe"]["low"] > 0
+    assert noise["sharpe"]["low"] < 0 < noise["sharpe"]["high"]
+    for k in ("total_return", "sharpe"):
+        assert strong[k]["low"] <= strong[k]["point"] <= strong[k]["high"]
+
+    # solo vincite: profit factor infinito nei campioni -> null, non NaN
+    t = bs.bootstrap_trades([1.0, 2.0, 3.0, 0.5], seed=0)
+    json.dumps(t, allow_nan=False)
+    assert t["profit_factor"] is None and t["prob_positive"] == 1.0
+    assert "error" in bs.bootstrap_trades([{"pnl_pct": 1.0, "exit_date": "OPEN"}])
+    print(f"  OK CI: edge forte P(+)={strong['prob_positive']}, rumore P(+)={noise['prob_positive']}")
+
+
+def test_scale(bs):
+    r = np.random.default_rng(0).normal(0.0005, 0.01, 1000)
+    t0 = time.perf_counter()
+    a = bs.bootstrap_returns(r, n_resamples=2000, seed=7)
+    ms = (time.perf_counter() - t0) * 1000
+    assert a == bs.bootstrap_returns(r, n_resamples=2000, seed=7), "seed non deterministico"
+    print(f"  OK 2000 ricampionamenti × 1000 giorni in {ms:.0f} ms")
+
+
+def main():
+    import bootstrap as bs  # RED: non esiste ancora
+
+    test_indices(bs)
+    test_point_estimates(bs)
+    test_intervals(bs)
+    test_scale(bs)
+    print("OK test_bootstrap — indici a blocchi, stime puntuali, CI, scala")
+
+
+if __name__ == "__main__":
+    main()
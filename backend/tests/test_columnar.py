@@ -0,0 +1,205 @@
+"""
+Test per il formato binario colonnare (columnar.py, frontend/columnar.js).
+
+Proprietà verificate:
+1. encode/decode senza perdita: la risposta decodificata è identica al JSON
+   (z-score, prezzi e P&L quantizzati in delta int, serie non arrotondate
+   in float64, padding NaN -> null, date non contigue, alias deduplicati).
+2. /scan con Accept: application/vnd.fpr.columnar -> stesso contenuto di
+   /scan JSON; senza Accept il JSON non cambia; gzip se accettato.
+3. Radar: date una sola volta sull'asse condiviso, payload molte volte più
+   piccolo del JSON (più ancora con gzip).
+4. /analyze-batch-stable colonnare == JSON, con le date per ticker come
+   fetta dell'asse condiviso.
+5. Il decoder del browser (frontend/columnar.js, node) restituisce
+   Float64Array e la stessa struttura del JSON; fetchColumnar (radar di
+   app.js) negozia il formato e decodifica la risposta.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_columnar.py
+(la parte 5 richiede node nel PATH)
+"""
+import sys
+import os
+import json
+import gzip
+import shutil
+import asyncio
+import subprocess
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+import httpx
+
+ACCEPT = {"Accept": "application/vnd.fpr.columnar"}
+
+
+def _series(seed, n=900):
+    rng = np.random.default_rng(seed)
+    return pd.Series(30 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, n))),
+                     index=pd.date_range("2022-01-03", periods=n, freq="B"))
+
+
+def _fake_market_data():
+    class FakeMarketData:
+        def __init__(self, ticker, start_date=None, end_date=None):
+            self.ticker = ticker
+
+        def fetch(self):
+            return _series(int(self.ticker[4:]))
+    return FakeMarketData
+
+
+def _as_json(fastjson, obj):
+    return json.loads(fastjson.dumps(obj))
+
+
+async def _post(app, path, body, headers=None):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as c:
+        return await c.post(path, json=body, headers=headers or {})
+
+
+def _header(buf):
+    n = int.from_bytes(buf[8:12], "little")
+    return json.loads(buf[12:12 + n])
+
+
+def test_roundtrip(columnar, fastjson):
+    shared = np.round(np.random.default_rng(1).normal(0, 1.5, 300), 2)
+    payload = {
+        "status": "ok",
+        "z": np.concatenate([np.full(40, np.nan), shared]),
+        "alias": None,
+        "raw": np.random.default_rng(2).normal(0, 1, 50),           # non arrotondato -> f64
+        "holes": [1.5, None, 2.25] * 10,                            # NaN interni -> f64
+        "big": np.arange(20) * 1e12,                                # oltre int32 -> f64
+        "ints": list(range(100, 140)),
+        "short": [1.0, 2.0],                                        # resta nell'header
+        "empty": [None] * 20,
+        "dates": [None] * 3 + [f"2024-01-{d:02d}" for d in range(1, 21)],
+        "gaps": {"dates": [f"2024-01-{d:02d}" for d in (2, 1, 3, 5)] * 5},
+        "trades": [{"entry": "2024-01-02", "pnl": float("nan")}],
+    }
+    payload["alias"] = payload["z"]
+    buf = columnar.encode(payload)
+    assert buf[:4] == b"FPRC"
+    assert columnar.decode(buf) == _as_json(fastjson, payload)
+    header = _header(buf)
+    encs = [c["enc"] for c in header["columns"]]
+    assert header["data"]["alias"] == header["data"]["z"]                 # stessa colonna
+    assert header["columns"][header["data"]["z"]["$col"]]["lead"] == 40
+    assert header["data"]["short"] == [1.0, 2.0] and "$datecol" in header["data"]["gaps"]["dates"]
+    assert header["axis"][0] == "2024-01-01" and len(header["axis"]) == 20
+    assert {"f64", "d8", "d16"} <= set(encs), encs
+
+    # array object/2-D convertiti con tolist(): temporanei distinti, mai scambiati
+    temps = {"a": np.arange(20).astype(object), "b": (np.arange(20) * 3).astype(object),
+             "m": np.arange(40.0).reshape(2, 20), "n": -np.arange(40.0).reshape(2, 20)}
+    got = columnar.decode(columnar.encode(temps))
+    assert got == _as_json(fastjson, temps) and got["a"] != got["b"], got
+    # differenze oltre int32 (segno alternato): f64, nessun errore
+    wide = {"x": [2000.123456, -2000.123456] * 8, "y": [2e9, -2e9] * 8}
+    buf_wide = columnar.encode(wide)
+    assert columnar.decode(buf_wide) == _as_json(fastjson, wide)
+    assert {c["enc"] for c in _header(buf_wide)["columns"]} == {"f64"}
+    print(f"  OK encode/decode senza perdita ({len(encs)} colonne: {sorted(set(encs))}), "
+          f"temporanei non deduplicati, differenze oltre int32 -> f64")
+    return buf, fastjson.dumps(payload)
+
+
+def test_scan(backend_main, columnar, fastjson):
+    from logic import MarketScanner
+
+    tickers = [f"TCOL{i}" for i in range(30)]
+    out = {"status": "ok", "results": MarketScanner(tickers).scan()}
+    as_json = fastjson.dumps(out)
+    buf = columnar.encode(out)
+    assert columnar.decode(buf) == json.loads(as_json)
+    header = _header(buf)
+    hist = header["data"]["results"][0]["history"]
+    assert "$dates" in hist["dates"] and hist["z_kin_frozen"] == hist["z_pot"]
+    assert len(header["axis"]) == len(set(d for r in out["results"] for d in r["history"]["dates"]))
+    z_encs = {header["columns"][hist[k]["$col"]]["enc"] for k in ("z_kin", "z_pot", "z_slope")}
+    assert z_encs <= {"d8", "d16"}, z_encs
+    zipped = gzip.compress(buf, columnar.GZIP_LEVEL, mtime=0)
+    ratio, ratio_gz = len(as_json) / len(buf), len(as_json) / len(zipped)
+    assert ratio > 3.5 and ratio_gz > 7, (ratio, ratio_gz)
+
+    small = {"tickers": tickers[:4]}
+    ref = asyncio.run(_post(backend_main.app, "/scan", small)).json()
+    res = asyncio.run(_post(backend_main.app, "/scan", small, ACCEPT))
+    assert res.headers["content-type"] == columnar.MEDIA_TYPE
+    assert res.headers["content-encoding"] == "gzip" and "Accept" in res.headers["vary"]
+    got = columnar.decode(res.content)
+    by_ticker = {r["ticker"]: r for r in ref["results"]}
+    assert got["status"] == "ok" and all(r == by_ticker[r["ticker"]] for r in got["results"])
+    res = asyncio.run(_post(backend_main.app, "/scan", small,
+                            {**ACCEPT, "Accept-Encoding": "identity"}))
+    assert "content-encoding" not in res.headers and res.content[:4] == b"FPRC"
+    print(f"  OK /scan colonnare == JSON; radar 30 titoli {len(as_json) // 1024} KB -> "
+          f"{len(buf) // 1024} KB ({ratio:.1f}x), gzip {len(zipped) // 1024} KB ({ratio_gz:.1f}x)")
+    return buf, as_json
+
+
+def test_batch(backend_main, columnar):
+    from main import analyze_batch_stable, BatchStableRequest
+
+    tickers = [f"TCOL{i}" for i in range(5)]
+    body = {"tickers": tickers, "start_date": "2022-01-03", "max_workers": 3}
+    ref = asyncio.run(_post(backend_main.app, "/analyze-batch-stable", body)).json()
+    res = asyncio.run(_post(backend_main.app, "/analyze-batch-stable", body, ACCEPT))
+    assert res.headers["content-type"] == columnar.MEDIA_TYPE
+    assert columnar.decode(res.content) == ref
+    header = _header(res.content)
+    assert len(header["axis"]) == len(ref["results"][tickers[0]]["dates"])
+    assert all("$dates" in r["dates"] for r in header["data"]["results"].values())
+    assert isinstance(analyze_batch_stable(BatchStableRequest(**body)), dict)
+    for t in tickers:
+        backend_main.PRICE_CACHE.pop(f"{t}|2022-01-03", None)
+    print(f"  OK /analyze-batch-stable colonnare == JSON, {len(tickers)} liste di date -> 1 asse")
+
+
+def test_js(cases):
+    if shutil.which("node") is None:
+        print("  SKIP decoder JS: node non disponibile")
+        return
+    runner = os.path.join(os.path.dirname(__file__), "columnar_runner.cjs")
+    for buf, as_json in cases:
+        with tempfile.NamedTemporaryFile("wb", suffix=".bin", delete=False) as f:
+            f.write(buf)
+            path = f.name
+        try:
+            proc = subprocess.run(["node", runner, path], capture_output=True, text=True, timeout=60)
+            assert proc.returncode == 0, f"runner JS fallito:\n{proc.stderr}"
+            out = json.loads(proc.stdout)
+        finally:
+            os.unlink(path)
+        assert out["types"] == ["Float64Array"] and out["fetched"], "fetchColumnar != decodeColumnar"
+        assert out["data"] == json.loads(as_json)
+    print(f"  OK frontend/columnar.js: Float64Array, stessa struttura del JSON, fetchColumnar "
+          f"({len(cases)} payload)")
+
+
+def main():
+    import main as backend_main
+    import logic
+    import fastjson
+    import columnar  # RED: non esiste ancora
+
+    real = (logic.MarketData, backend_main.MarketData)
+    logic.MarketData = backend_main.MarketData = _fake_market_data()
+    try:
+        edge = test_roundtrip(columnar, fastjson)
+        radar = test_scan(backend_main, columnar, fastjson)
+        test_batch(backend_main, columnar)
+        test_js([edge, radar])
+    finally:
+        logic.MarketData, backend_main.MarketData = real
+    print("OK test_columnar — formato binario opt-in senza perdita, date condivise, decoder JS")
+
+
+if __name__ == "__main__":
+    main()
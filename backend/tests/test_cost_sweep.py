@@ -0,0 +1,156 @@
+"""
+Test per la sensibilità a costi e slippage (cost_sweep.py).
+
+Proprietà verificate:
+1. cost_sweep (un'esecuzione + riprezzamento) == backtest_stable con
+   cost_pct = costo + slippage per ogni livello: STABLE LONG/SHORT/BOTH,
+   ARANCIONE e COMBO, con start_date/end_date; prezzi mancanti -> fallback.
+2. universe_cost_sweep == aggregato brute-force (tempo contro il loop per
+   livello stampato).
+3. strategy/mode/costi non validi -> 400 da POST /cost-sensitivity
+   prima di scaricare i prezzi.
+4. reprice_fixed_quota al costo del journal == journal_stats.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_cost_sweep.py
+"""
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+COSTS, SLIPS = (0.0, 0.05, 0.2, 1.0), (0.0, 0.03)
+
+
+def _px(seed, n=700, vol=0.025):
+    rng = np.random.default_rng(seed)
+    return pd.Series(50 * np.exp(np.cumsum(rng.normal(0.0002, vol, n))),
+                     index=pd.date_range("2022-01-03", periods=n, freq="B"))
+
+
+def _check(cs, dates, prices, slopes, **kw):
+    from stable_strategy import backtest_stable
+
+    res = cs.cost_sweep(dates, prices, slopes, costs=COSTS, slippages=SLIPS, **kw)
+    assert len(res["levels"]) == len(COSTS) * len(SLIPS)
+    for lv in res["levels"]:
+        ref = backtest_stable(dates, prices, slopes, cost_pct=lv["cost_pct"] + lv["slippage_pct"], **kw)
+        assert lv["stats"] == ref["stats"], f"{kw} {lv['cost_pct']}+{lv['slippage_pct']}: {lv['stats']} vs {ref['stats']}"
+    return res
+
+
+def test_single(cs):
+    from walk_forward import prepare_series
+
+    n_levels = 0
+    for seed in (1, 2):
+        s = prepare_series(_px(seed), 200.0, "COMBO")
+        d, p = s["dates"], s["prices"]
+        for kw in ({"mode": "LONG"}, {"mode": "SHORT", "entry_th": 0.01},
+                   {"mode": "BOTH", "entry_th": 0.01, "exit_th": -0.01, "start_date": d[150]},
+                   {"mode": "BOTH", "end_date": d[500], "execution_lag": 2}):
+            n_levels += len(_check(cs, d, p, s["slopes"], **kw)["levels"])
+        for strategy in ("ARANCIONE", "COMBO"):
+            slopes, mode, en, ex = cs.strategy_signal(s, strategy, {"entry_z": 1.5, "horizon": 10})
+            n_levels += len(_check(cs, d, p, slopes, mode=mode, entry_th=en, exit_th=ex)["levels"])
+
+    # short in un rally violento: capitale sotto zero, rendimenti saltati come nel loop
+    d = _px(5, n=60).index.strftime("%Y-%m-%d").tolist()
+    up = np.linspace(10, 40, 60) * (1 + 0.01 * np.sin(np.arange(60)))
+    res = _check(cs, d, up.tolist(), [-1.0] * 60, mode="SHORT")
+    assert res["levels"][0]["stats"]["final_capital"] < 0
+    # prezzo mancante: fallback al backtest per livello
+    s = prepare_series(_px(3), 200.0)
+    prices = list(s["prices"])
+    prices[300] = None
+    _check(cs, s["dates"], prices, s["slopes"], mode="BOTH")
+    print(f"  OK riprezzamento == backtest_stable su {n_levels} livelli (+ short estremo, fallback)")
+
+
+def test_universe(cs):
+    from walk_forward import prepare_series
+    from stable_strategy import backtest_stable
+
+    data = {f"C{k}": prepare_series(_px(20 + k), 200.0, "COMBO") for k in range(6)}
+    params = {"entry_z": 2.0, "horizon": 21, "entry": 0.0, "exit": 0.0}
+    t0 = time.perf_counter()
+    res = cs.universe_cost_sweep(data, "COMBO", params, costs=COSTS, slippages=SLIPS,
+                                 include_tickers=True)
+    t_sweep = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for k, lv in enumerate(res["levels"]):
+        rets = []
+        for t, s in data.items():
+            slopes, mode, en, ex = cs.strategy_signal(s, "COMBO", params)
+            r = backtest_stable(s["dates"], s["prices"], slopes, mode=mode, entry_th=en, exit_th=ex,
+                                cost_pct=lv["cost_pct"] + lv["slippage_pct"])["stats"]["total_return"]
+            assert res["tickers"][t][k] == r
+            rets.append(r)
+        assert lv["avg_return"] == round(float(np.mean(rets)), 2)
+        assert lv["n_positive"] == sum(1 for r in rets if r > 0) and lv["total"] == len(data)
+    t_loop = time.perf_counter() - t0
+    first, last = res["levels"][0], res["levels"][-1]
+    assert last["avg_return"] <= first["avg_return"]
+    print(f"  OK universo {res['n_tickers']} ticker × {len(res['levels'])} livelli: ritorno medio "
+          f"{first['avg_return']}% -> {last['avg_return']}%; sweep {t_sweep * 1000:.0f} ms "
+          f"vs loop {t_loop * 1000:.0f} ms")
+
+
+def test_validation(cs):
+    from fastapi import HTTPException
+    import main
+
+    calls = []
+    import stable_scanner
+    dl = stable_scanner.download_all_prices
+    stable_scanner.download_all_prices = lambda *a, **k: calls.append(a) or ({}, [])
+    try:
+        for kw in ({"strategy": "stable"}, {"mode": "long"}, {"costs": [-0.1]}, {"costs": []}):
+            try:
+                main.run_cost_sensitivity(main.CostSensitivityRequest(tickers=["X"], **kw))
+            except HTTPException as e:
+                assert e.status_code == 400, (kw, e)
+            else:
+                raise AssertionError(f"atteso 400 per {kw}")
+    finally:
+        stable_scanner.download_all_prices = dl
+    assert not calls, "download avviato prima della validazione"
+    print("  OK strategy/mode/costi non validi -> 400 prima del download")
+
+
+def test_journal(cs):
+    from forward_test import update_journal, journal_stats
+
+    px = _px(9, n=120)
+    dates = [d.strftime("%Y-%m-%d") for d in px.index]
+    closes = px.tolist()
+    sigs = [{"ticker": "J", "signal_date": dates[k], "direction": "SHORT" if k % 3 else "LONG"}
+            for k in range(0, 90, 7)]
+    j = update_journal({"trades": []}, {"J": (dates, closes)}, sigs, horizon=10, cost_pct=0.05)
+    st = journal_stats(j)
+    lv = cs.reprice_fixed_quota(j["trades"], cs.cost_levels((0.0, 0.05), (0.0,)))
+    assert lv[1]["closed"] == st["closed"] > 0
+    for k in ("sum_pnl_pct", "avg_pnl_pct", "win_rate"):
+        assert lv[1][k] == st[k], k
+    assert lv[0]["avg_pnl_pct"] >= lv[1]["avg_pnl_pct"]
+    assert cs.reprice_fixed_quota([], cs.cost_levels((0.1,)))[0]["closed"] == 0
+    print(f"  OK journal {st['closed']} trade: avg {lv[0]['avg_pnl_pct']}% senza costi, "
+          f"{lv[1]['avg_pnl_pct']}% allo 0.05%")
+
+
+def main():
+    import cost_sweep as cs  # RED: non esiste ancora
+
+    test_single(cs)
+    test_universe(cs)
+    test_validation(cs)
+    test_journal(cs)
+    print("OK test_cost_sweep — riprezzamento per livello == backtest, universo, journal")
+
+
+if __name__ == "__main__":
+    main()
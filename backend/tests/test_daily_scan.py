@@ -0,0 +1,108 @@
+"""
+Test per la pipeline dedicata di /scan-daily (daily_scan.py).
+
+Proprietà verificate:
+1. scan_ticker == stato ricavato da analyze_stock (trade e azioni FROZEN/SUM,
+   last_date, market cap) per la stessa serie, oggi e con as_of_date.
+2. run_daily_scan: pool di processi == sequenziale, righe ordinate per
+   market cap, ticker senza dati saltati, TICKER_CACHE non modificata.
+3. Frozen history di TICKER_CACHE riusata solo se calcolata sulla stessa
+   serie; stampa il tempo in un solo processo contro il vecchio percorso
+   (analyze_stock completo per ticker).
+
+Esecuzione: backend/venv/bin/python backend/tests/test_daily_scan.py
+"""
+import sys
+import os
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+START = "2023-01-20"
+
+
+def _entry(seed, n=650):
+    from logic import frozen_history
+
+    rng = np.random.default_rng(seed)
+    px = pd.Series(40 * np.exp(np.cumsum(rng.normal(0.0004, 0.018, n))),
+                   index=pd.date_range(START, periods=n, freq="B"))
+    return {
+        "px": px,
+        "frozen": frozen_history(px, alpha=200.0, beta=1.0, min_points=100, kin_lag=25),
+        "zigzag": pd.Series(0, index=px.index), "volume": pd.Series(0, index=px.index),
+        "mkt_cap": 1e9 * (seed % 7 + 1),
+    }
+
+
+def _dump(x):
+    return json.dumps(x, sort_keys=True, default=str)
+
+
+def test_parity(ds, backend_main):
+    from main import analyze_stock, AnalysisRequest
+
+    entry = _entry(3)
+    backend_main.TICKER_CACHE["TESTDAILY"] = entry
+    dates = entry["px"].index.strftime("%Y-%m-%d").tolist()
+    for as_of in (None, dates[420], dates[600]):
+        ref = analyze_stock(AnalysisRequest(
+            ticker="TESTDAILY", start_date=START, end_date=as_of, use_cache=True,
+            fields=["dates", "frozen_strategy", "frozen_sum_strategy", "market_cap"]))
+        row = ds.scan_ticker("TESTDAILY", entry["px"], entry["mkt_cap"], as_of_date=as_of)
+        last = ref["dates"][-1]
+        assert row["last_date"] == last and row["market_cap"] == ref["market_cap"]
+        for key, strat in (("frozen", "frozen_strategy"), ("sum", "frozen_sum_strategy")):
+            state = ds.signal_state(ref[strat]["trades"], last)
+            assert row[key]["action"] == state["action"], (as_of, key)
+            assert _dump(row[key]["trade"]) == _dump(state["trade"]), (as_of, key)
+    del backend_main.TICKER_CACHE["TESTDAILY"]
+    print("  OK scan_ticker == stato da analyze_stock (oggi e as_of_date)")
+
+
+def test_pipeline(ds, backend_main):
+    tickers = [f"TESTDS{i}" for i in range(16)]
+    for i, t in enumerate(tickers):
+        backend_main.TICKER_CACHE[t] = _entry(20 + i)
+    backend_main.TICKER_CACHE["TESTDSEMPTY"] = {**_entry(99), "px": pd.Series(dtype=float, index=pd.DatetimeIndex([]))}
+    snapshot = {t: id(backend_main.TICKER_CACHE[t]) for t in backend_main.TICKER_CACHE}
+    as_of = backend_main.TICKER_CACHE[tickers[0]]["px"].index[500].strftime("%Y-%m-%d")
+
+    try:
+        par = ds.run_daily_scan(tickers + ["TESTDSEMPTY"], as_of_date=as_of, max_workers=2)
+        t0 = time.perf_counter()
+        seq = ds.run_daily_scan(tickers, as_of_date=as_of, max_workers=1)
+        t_seq = time.perf_counter() - t0
+        assert _dump(par) == _dump(seq) and len(par) == len(tickers)
+        caps = [r["market_cap"] for r in par]
+        assert caps == sorted(caps, reverse=True)
+        assert {t: id(backend_main.TICKER_CACHE[t]) for t in backend_main.TICKER_CACHE} == snapshot
+
+        from main import analyze_stock, AnalysisRequest
+        t0 = time.perf_counter()
+        for t in tickers:
+            analyze_stock(AnalysisRequest(ticker=t, start_date=START, end_date=as_of, use_cache=True))
+        t_old = time.perf_counter() - t0
+    finally:
+        for t in tickers + ["TESTDSEMPTY"]:
+            backend_main.TICKER_CACHE.pop(t, None)
+            backend_main.PRICE_CACHE.pop(f"{t}|{START}", None)
+    print(f"  OK pool == sequenziale, ordinato per market cap, cache intatta; "
+          f"{len(tickers)} ticker in {t_seq * 1000:.0f} ms (1 processo) vs {t_old * 1000:.0f} ms")
+
+
+def main():
+    import main as backend_main
+    import daily_scan as ds  # RED: non esiste ancora
+
+    test_parity(ds, backend_main)
+    test_pipeline(ds, backend_main)
+    print("OK test_daily_scan — segnali FROZEN/SUM dedicati, pool di processi")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Test per l'event study degli onset di scarico del potenziale (event_study.py).
+
+Proprietà verificate:
+1. potential_series vettoriale == pot di kalman_frozen_series (via
+   prepare_series del walk-forward).
+2. onset_mask (tutte le soglie insieme) == potential_discharge_onsets
+   soglia per soglia; forward_returns == loop esplicito (con lag).
+3. Aggregato sull'universo == concatenazione brute-force degli eventi;
+   process pool == sequenziale; soglie duplicate contate una volta sola.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_event_study.py
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+
+def _universe(n_tickers=6, n=700):
+    out = {}
+    for k in range(n_tickers):
+        rng = np.random.default_rng(40 + k)
+        vals = 50 * np.exp(np.cumsum(rng.normal(0.0002, 0.02, n)))
+        out[f"ES{k}"] = pd.Series(vals, index=pd.date_range("2021-01-04", periods=n, freq="B"))
+    return out
+
+
+def test_potential(es):
+    from walk_forward import prepare_series
+
+    px = _universe(1)["ES0"]
+    ref = np.asarray(prepare_series(px, 200.0, "ARANCIONE")["pot"], dtype=float)
+    pot = es.potential_series(px, 200.0)
+    assert np.array_equal(np.isnan(pot), np.isnan(ref))
+    assert np.nanmax(np.abs(pot - ref)) < 1e-9
+    print("  OK potenziale vettoriale == kalman_frozen_series")
+
+
+def test_onsets_and_returns(es):
+    from stable_strategy import potential_discharge_onsets, potential_zscore
+
+    px = _universe(2)["ES1"]
+    prices = px.tolist()
+    F = px.ewm(span=20, adjust=False).mean().tolist()
+    pot = es.potential_series(px)
+    zs = (1.0, 2.0, 3.0)
+    mask = es.onset_mask(potential_zscore(pot), prices, F, zs)
+    for k, th in enumerate(zs):
+        ref, _ = potential_discharge_onsets(prices, pot, F, entry_z=th)
+        assert np.flatnonzero(mask[k]).tolist() == ref, f"onset diversi per entry_z={th}"
+
+    H = (1, 5, 10)
+    R = es.forward_returns(prices, H, execution_lag=1)
+    for t in (0, 300, len(prices) - 12, len(prices) - 6, len(prices) - 1):
+        for j, h in enumerate(H):
+            if t + 1 + h < len(prices):
+                assert abs(R[t, j] - (prices[t + 1 + h] / prices[t + 1] - 1) * 100) < 1e-9
+            else:
+                assert np.isnan(R[t, j])
+    print(f"  OK onset per {len(zs)} soglie in una maschera, gather dei ritorni forward")
+
+
+def test_universe(es):
+    prices = _universe()
+    zs, H = (1.5, 2.0), (5, 10)
+    res = es.event_study(prices, entry_zs=zs, horizons=H)
+    assert res == es.event_study(prices, entry_zs=zs, horizons=H, max_workers=2), "pool != sequenziale"
+
+    ev = {z: [] for z in zs}
+    for px in prices.values():
+        r = es.ticker_events(px, entry_zs=zs, horizons=H)
+        for z in zs:
+            ev[z].extend(r["events"][z][:, 1].tolist())
+    for z in zs:
+        vals = np.array([v for v in ev[z] if np.isfinite(v)])
+        row = res["curves"][z][1]
+        assert row["horizon"] == 10 and row["n"] == len(vals)
+        assert abs(row["mean"] - vals.mean()) < 1e-3
+        assert abs(row["hit_rate"] - (vals > 0).mean() * 100) < 0.01
+        assert abs(row["excess"] - (row["mean"] - res["baseline"][1]["mean"])) < 1e-3
+    assert res["n_events"][2.0] == sum(c[2.0] for c in res["events_by_ticker"].values())
+    assert es.event_study(prices, entry_zs=(2.0, 1.5, 2, 2.0), horizons=H) == res, "soglie duplicate"
+    print(f"  OK universo {res['n_tickers']} ticker, eventi {res['n_events']}, "
+          f"baseline 10gg {res['baseline'][1]['mean']}%")
+
+
+def main():
+    import event_study as es  # RED: non esiste ancora
+
+    test_potential(es)
+    test_onsets_and_returns(es)
+    test_universe(es)
+    print("OK test_event_study — potenziale, onset vettoriali, ritorni forward, aggregato universo")
+
+
+if __name__ == "__main__":
+    main()
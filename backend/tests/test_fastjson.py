@@ -0,0 +1,215 @@
+"""
+Test per la serializzazione JSON NumPy-aware (fastjson.py).
+
+Proprietà verificate:
+1. dumps: array e scalari NumPy nativi, NaN/±inf -> null (anche fuori dagli
+   array), date -> isoformat; backend json e orjson (se installato) danno
+   lo stesso JSON.
+2. padded_round == pad_left([round(x, d) ...], None) esattamente, anche
+   sui quasi-pareggi in cui np.round differisce da round().
+3. Route con response_class=FastJSONResponse: stesso contenuto di prima via
+   HTTP (null nel padding di pot), la funzione Python restituisce ancora
+   il dict, le route non marcate non cambiano.
+4. Serializzazione di /scan (radar, array NumPy) == json.dumps sulle liste;
+   tempi contro jsonable_encoder + json.dumps stampati per confronto.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_fastjson.py
+"""
+import sys
+import os
+import json
+import time
+import asyncio
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+import httpx
+
+
+def _series(seed, n=900):
+    rng = np.random.default_rng(seed)
+    return pd.Series(30 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, n))),
+                     index=pd.date_range("2022-01-03", periods=n, freq="B"))
+
+
+def _fake_market_data():
+    class FakeMarketData:
+        def __init__(self, ticker, start_date=None, end_date=None):
+            self.ticker = ticker
+
+        def fetch(self):
+            return _series(int(self.ticker[4:]))
+    return FakeMarketData
+
+
+def _best(fn, n=3):
+    times = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def test_dumps(fastjson):
+    obj = {
+        "a": np.array([1.5, np.nan, np.inf, -2.0]),
+        "i": np.arange(3, dtype=np.int32),
+        "s": np.float32(0.5), "n": np.int64(7), "b": np.bool_(True),
+        "x": float("nan"), "y": [1.0, float("-inf")], "d": date(2024, 1, 2),
+        "nested": {"z": np.zeros((2, 2))}, 3: "k",
+    }
+    expected = {"a": [1.5, None, None, -2.0], "i": [0, 1, 2], "s": 0.5, "n": 7, "b": True,
+                "x": None, "y": [1.0, None], "d": "2024-01-02",
+                "nested": {"z": [[0.0, 0.0], [0.0, 0.0]]}, "3": "k"}
+    backends = ["json"] + (["orjson"] if fastjson.orjson is not None else [])
+    active = fastjson.get_backend()
+    try:
+        for name in backends:
+            fastjson.set_backend(name)
+            out = fastjson.dumps(obj)
+            assert isinstance(out, bytes) and b"NaN" not in out and b"Infinity" not in out
+            assert json.loads(out) == expected, (name, out)
+    finally:
+        fastjson.set_backend(active)
+    try:
+        fastjson.set_backend("xml")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("backend sconosciuto accettato")
+    print(f"  OK dumps NumPy/NaN/date identico con backend {backends}")
+
+
+def _pad_left_round(values, length, decimals):
+    # baseline storica: pad_left([round(x, d) for x in values], length, None)
+    ref = [round(float(v), decimals) for v in values]
+    return ref if length is None else ([None] * (length - len(ref)) + ref)[-length:]
+
+
+def test_padded_round(fastjson):
+    rng = np.random.default_rng(3)
+    # quasi-pareggi scritti in decimale (x.yz5): qui np.round da solo sbaglia
+    ties = np.array([float(f"{i}.{j:02d}5") for i in range(-30, 30) for j in range(100)])
+    values = np.concatenate([rng.normal(0, 2, 500), ties, [2.675, 10.555, -0.015, 1e17, 0.5, 2.5]])
+    for length, decimals in ((7000, 2), (500, 2), (300, 6), (None, 2), (None, 0), (None, 3)):
+        got = fastjson.padded_round(values, length, decimals)
+        assert fastjson._finite_list(got) == _pad_left_round(values, length, decimals), (length, decimals)
+    assert fastjson.padded_round([2.675, 10.555, -0.015], decimals=2).tolist() == [2.67, 10.55, -0.01]
+    assert not np.array_equal(np.round(ties, 2), [round(float(v), 2) for v in ties])   # il caso esiste davvero
+    # elementi np.float64: round() è np.round, rounding="numpy" lo conserva
+    got = fastjson.padded_round(list(ties), 7000, 2, rounding="numpy")
+    assert fastjson._finite_list(got) == [None] * 1000 + [round(v, 2) for v in ties]
+    print("  OK padded_round == pad_left([round(x, d)]) esatto, pareggi compresi")
+
+
+async def _post(app, path, body):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as c:
+        return await c.post(path, json=body)
+
+
+def _plain(fastjson, obj):
+    # riferimento "vecchio stile": liste Python, NaN -> None
+    return json.loads(json.dumps(fastjson._clean(obj), default=fastjson._default))
+
+
+def test_routes(backend_main, fastjson):
+    from fastapi.encoders import jsonable_encoder
+    from logic import frozen_history
+    from main import analyze_stock, AnalysisRequest, BatchStableRequest, analyze_batch_stable
+
+    px = _series(5)
+    backend_main.TICKER_CACHE["TESTFJ"] = {
+        "px": px, "frozen": frozen_history(px, alpha=200.0, beta=1.0, min_points=100, kin_lag=25),
+        "zigzag": pd.Series(0, index=px.index), "volume": pd.Series(1000, index=px.index),
+        "mkt_cap": 1e9}
+    try:
+        body = {"ticker": "TESTFJ", "start_date": "2022-01-03", "use_cache": True}
+        ref = analyze_stock(AnalysisRequest(**body))
+        assert isinstance(ref, dict) and ref["status"] == "ok"
+        res = asyncio.run(_post(backend_main.app, "/analyze", body))
+        assert res.status_code == 200 and res.headers["content-type"] == "application/json"
+        assert res.json() == _plain(fastjson, ref)
+
+        old = lambda: json.dumps(jsonable_encoder(ref))
+        new = lambda: fastjson.dumps(ref)
+        t_old, t_new = _best(old), _best(new)
+        print(f"  OK /analyze via HTTP == dict; serializzazione {t_old * 1000:.1f} -> {t_new * 1000:.1f} ms")
+    finally:
+        backend_main.TICKER_CACHE.pop("TESTFJ", None)
+
+    tickers = [f"TSFJ{i}" for i in range(4)]
+    body = {"tickers": tickers, "start_date": "2022-01-03", "max_workers": 2}
+    ref = analyze_batch_stable(BatchStableRequest(**body))
+    pot = ref["results"][tickers[0]]["pot"]
+    assert isinstance(pot, np.ndarray) and np.isnan(pot[0]) and not np.isnan(pot[-1])
+    from logic import kalman_frozen_series
+    fr = kalman_frozen_series(_series(0)[lambda s: s.index >= "2022-01-03"], alpha=200.0, beta=1.0,
+                              min_points=100, kin_lag=25)
+    baseline = [None] * (len(pot) - len(fr["pot_last"])) + [round(v, 6) for v in fr["pot_last"]]
+    assert fastjson._finite_list(pot) == baseline          # valori identici al codice storico
+    got = asyncio.run(_post(backend_main.app, "/analyze-batch-stable", body)).json()
+    assert got == _plain(fastjson, ref) and got["results"][tickers[0]]["pot"][0] is None
+    for t in tickers:
+        backend_main.PRICE_CACHE.pop(f"{t}|2022-01-03", None)
+
+    health = asyncio.run(_health(backend_main.app))
+    assert health == {"status": "running"}
+    print("  OK /analyze-batch-stable (pot con padding null), route non marcate invariate")
+
+
+async def _health(app):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        return (await c.get("/health")).json()
+
+
+def test_scan_speed(backend_main, fastjson):
+    from fastapi.encoders import jsonable_encoder
+    from logic import MarketScanner
+
+    tickers = [f"TSFJ{i}" for i in range(30)]
+    results = MarketScanner(tickers).scan()
+    assert len(results) == len(tickers)
+    assert isinstance(results[0]["history"]["z_kin"], np.ndarray)
+    lists = fastjson._clean(results)          # come prima: liste Python per ogni serie
+    hist_len = 756                            # HISTORY_LEN di MarketScanner._analyze_single
+    r0 = next(r for r in results if r["ticker"] == tickers[0])
+    seg = _series(0).iloc[-hist_len:].tolist()
+    assert fastjson._finite_list(r0["history"]["prices"]) == _pad_left_round(seg, hist_len, 2)
+
+    t_old = _best(lambda: json.dumps(jsonable_encoder(lists)))
+    t_new = _best(lambda: fastjson.dumps(results))
+    assert json.loads(fastjson.dumps(results)) == json.loads(json.dumps(lists))
+
+    res = asyncio.run(_post(backend_main.app, "/scan", {"tickers": tickers[:5]})).json()
+    by_ticker = {r["ticker"]: r for r in json.loads(json.dumps(lists))}
+    assert res["status"] == "ok" and len(res["results"]) == 5
+    assert all(r == by_ticker[r["ticker"]] for r in res["results"])
+    print(f"  OK /scan 30 titoli: {t_old * 1000:.0f} -> {t_new * 1000:.0f} ms "
+          f"(backend {fastjson.get_backend()}), HTTP == risultati")
+
+
+def main():
+    import main as backend_main
+    import logic
+    import fastjson  # RED: non esiste ancora
+
+    real = (logic.MarketData, backend_main.MarketData)
+    logic.MarketData = backend_main.MarketData = _fake_market_data()
+    try:
+        test_dumps(fastjson)
+        test_padded_round(fastjson)
+        test_routes(backend_main, fastjson)
+        test_scan_speed(backend_main, fastjson)
+    finally:
+        logic.MarketData, backend_main.MarketData = real
+    print("OK test_fastjson — array NumPy fino alla risposta, NaN -> null, serializzazione molto più veloce")
+
+
+if __name__ == "__main__":
+    main()
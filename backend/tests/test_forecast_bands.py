@@ -0,0 +1,122 @@
+"""
+Test per il ventaglio di percentili della proiezione Fourier
+(FourierEngine.forecast_bands + /analyze forecast_mode="bands").
+
+Proprietà verificate:
+1. forecast_bands == np.percentile sugli scenari di reconstruct_scenario
+   (stessi seed) sull'orizzonte futuro; fit == scenario senza jitter sul
+   passato; date future identiche.
+2. Percentili ordinati (p5 <= p25 <= p50 <= p75 <= p95) e deterministici
+   anche oltre i 100 scenari.
+3. /analyze: default invariato (5 scenari completi); con "bands" la
+   risposta ha dimensione costante al crescere di n_scenarios.
+4. Argomenti non validi -> ValueError.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_forecast_bands.py
+"""
+import sys
+import os
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+Q = (5, 25, 50, 75, 95)
+
+
+def _px(seed=1, n=700):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n)
+    lp = np.cumsum(rng.normal(0.0002, 0.015, n)) + 0.04 * np.sin(2 * np.pi * t / 40)
+    return pd.Series(50 * np.exp(lp), index=pd.date_range("2021-01-04", periods=n, freq="B"))
+
+
+def test_engine(FourierEngine):
+    f = FourierEngine(_px(), top_k=5, window_size=504)
+    full_idx, scen = f.reconstruct_scenario(future_horizon=60, n_scenarios=80)
+    fut_idx, bands, fit = f.forecast_bands(future_horizon=60, n_scenarios=80, quantiles=Q)
+    ref = np.percentile(np.array(scen)[:, f.N:], Q, axis=0)
+    for j, q in enumerate(Q):
+        assert np.allclose(bands[f"p{q}"], ref[j], rtol=1e-12, atol=0), q
+    assert fut_idx == full_idx[f.N:]
+    _, flat = f.reconstruct_scenario(future_horizon=60, n_scenarios=1, phase_jitter=0.0)
+    assert np.allclose(fit, flat[0][:f.N], rtol=1e-12, atol=0) and len(fit) == f.N
+
+    _, big, _ = f.forecast_bands(future_horizon=60, n_scenarios=500, quantiles=Q)
+    _, again, _ = f.forecast_bands(future_horizon=60, n_scenarios=500, quantiles=Q)
+    assert big == again
+    stack = np.array([big[f"p{q}"] for q in Q])
+    assert np.all(np.diff(stack, axis=0) >= 0)
+    print("  OK bande == percentili degli scenari, fit == scenario senza jitter, deterministiche")
+
+
+def test_analyze():
+    import main as backend_main
+    from main import analyze_stock, AnalysisRequest
+    from logic import frozen_history
+
+    px = _px(seed=2)
+    backend_main.TICKER_CACHE["TESTBANDS"] = {
+        "px": px, "frozen": frozen_history(px, 200.0, 1.0),
+        "zigzag": pd.Series(0, index=px.index), "volume": pd.Series(0, index=px.index),
+        "mkt_cap": 0,
+    }
+    base = dict(ticker="TESTBANDS", start_date="2021-01-04", use_cache=True)
+    default = analyze_stock(AnalysisRequest(**base))["forecast"]
+    assert set(default) == {"dates", "scenarios"} and len(default["scenarios"]) == 5
+
+    sizes = []
+    for n in (50, 400):
+        fc = analyze_stock(AnalysisRequest(**base, forecast_mode="bands", n_scenarios=n))["forecast"]
+        assert fc["mode"] == "bands" and sorted(fc["bands"]) == sorted(f"p{q}" for q in Q)
+        assert len(fc["dates"]) == 60 and fc["dates"] == default["dates"][-60:]
+        assert fc["fit"]["dates"] == default["dates"][:-60]
+        sizes.append(len(json.dumps(fc)))
+    full = len(json.dumps(default))
+    assert abs(sizes[0] - sizes[1]) < 0.05 * sizes[0] and sizes[1] < full
+    del backend_main.TICKER_CACHE["TESTBANDS"]
+    print(f"  OK /analyze: default 5 scenari ({full / 1e3:.0f} KB), bande {sizes[0] / 1e3:.0f} KB "
+          f"con 50 e {sizes[1] / 1e3:.0f} KB con 400 scenari")
+
+
+def test_errors(FourierEngine):
+    f = FourierEngine(_px(n=300), top_k=3, window_size=252)
+    for kw in ({"n_scenarios": 0}, {"n_scenarios": 10 ** 7}, {"quantiles": ()}, {"quantiles": (5, 120)}):
+        try:
+            f.forecast_bands(**kw)
+        except ValueError:
+            continue
+        raise AssertionError(f"atteso ValueError per {kw}")
+
+    from fastapi import HTTPException
+    from pydantic import ValidationError
+    from main import analyze_stock, AnalysisRequest
+    try:
+        analyze_stock(AnalysisRequest(ticker="TESTBANDS", forecast_mode="bands", n_scenarios=10 ** 7))
+    except HTTPException as e:
+        assert e.status_code == 400, e
+    else:
+        raise AssertionError("n_scenarios oltre il tetto accettato")
+    try:
+        AnalysisRequest(ticker="TESTBANDS", forecast_mode="band")
+    except ValidationError:
+        pass
+    else:
+        raise AssertionError("forecast_mode sconosciuto accettato")
+    print("  OK argomenti non validi -> ValueError, n_scenarios oltre il tetto -> 400, forecast_mode validato")
+
+
+def main():
+    from logic import FourierEngine
+    assert hasattr(FourierEngine, "forecast_bands")  # RED: non esiste ancora
+
+    test_engine(FourierEngine)
+    test_analyze()
+    test_errors(FourierEngine)
+    print("OK test_forecast_bands — percentili dell'ensemble, fit, risposta costante")
+
+
+if __name__ == "__main__":
+    main()
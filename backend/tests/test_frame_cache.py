@@ -0,0 +1,121 @@
+"""
+Test per la cache dei frame della Time Machine (frame_cache.py + /analyze).
+
+Proprietà verificate:
+1. FrameCache: LRU con eviction, frame legato all'entry sorgente (entry
+   sostituita -> miss), barre vicine dalla più vicina, barra di un weekend =
+   venerdì precedente.
+2. /analyze con use_frame_cache: risposta identica al calcolo senza cache,
+   il secondo passo sulla stessa barra (anche di sabato) è un hit.
+3. prefetch: le barre vicine finiscono in cache in background e coincidono
+   con il calcolo diretto; dopo il prefetch lo scrubbing è solo hit.
+4. Storia riscaricata (nuova entry in TICKER_CACHE): i frame vecchi non
+   vengono serviti.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_frame_cache.py
+"""
+import sys
+import os
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+
+def _entry(seed=4, n=700):
+    from logic import frozen_history
+
+    rng = np.random.default_rng(seed)
+    px = pd.Series(80 * np.exp(np.cumsum(rng.normal(0.0003, 0.015, n))),
+                   index=pd.date_range("2022-01-03", periods=n, freq="B"))
+    return {
+        "px": px,
+        "frozen": frozen_history(px, alpha=200.0, beta=1.0, min_points=100, kin_lag=25),
+        "zigzag": pd.Series(np.cumsum(rng.choice([-1, 0, 1], n)), index=px.index),
+        "volume": pd.Series(rng.integers(1000, 5000, n), index=px.index),
+        "mkt_cap": 1e9,
+    }
+
+
+def _same(a, b):
+    return json.dumps(a, sort_keys=True, default=str) == json.dumps(b, sort_keys=True, default=str)
+
+
+def test_cache(fc):
+    c = fc.FrameCache(maxsize=3)
+    src, other = {}, {}
+    for k in range(4):
+        c.put(("T", f"d{k}", ()), src, {"k": k})
+    assert len(c) == 3 and ("T", "d0", ()) not in c and c.stats()["evictions"] == 1
+    assert c.get(("T", "d1", ()), src) == {"k": 1}
+    c.put(("T", "d4", ()), src, {"k": 4})               # d1 appena usato: esce d2
+    assert ("T", "d1", ()) in c and ("T", "d2", ()) not in c
+    assert c.get(("T", "d1", ()), other) is None          # sorgente diversa: scaduto
+    assert ("T", "d1", ()) not in c
+    assert c.invalidate("T") == 2 and len(c) == 0
+
+    dates = ["2024-05-02", "2024-05-03", "2024-05-06", "2024-05-07"]
+    assert fc.frame_bar(dates, "2024-05-05") == (1, "2024-05-03")
+    assert fc.frame_bar(dates, "2024-05-01") == (None, None)
+    assert fc.neighbour_bars(dates, 1, 2) == ["2024-05-06", "2024-05-02", "2024-05-07"]
+    assert fc.frame_key("T", "d", alpha=1, beta=2) == fc.frame_key("T", "d", beta=2, alpha=1)
+    print("  OK LRU, sorgente, barre vicine, weekend")
+
+
+def test_analyze(fc):
+    import main as backend_main
+    from main import analyze_stock, AnalysisRequest
+
+    cache = backend_main.FRAME_CACHE
+    cache.invalidate()
+    backend_main.TICKER_CACHE["TESTFRAME"] = _entry()
+    dates = backend_main.TICKER_CACHE["TESTFRAME"]["px"].index.strftime("%Y-%m-%d").tolist()
+    base = dict(ticker="TESTFRAME", start_date="2022-01-03", use_cache=True)
+    friday = next(d for d in dates[500:] if pd.Timestamp(d).dayofweek == 4)
+    k = dates.index(friday)
+
+    t0 = time.perf_counter()
+    ref = analyze_stock(AnalysisRequest(**base, end_date=friday))
+    t_full = time.perf_counter() - t0
+    first = analyze_stock(AnalysisRequest(**base, end_date=friday, use_frame_cache=True))
+    assert _same(first, ref) and cache.stats()["misses"] == 1
+    saturday = (pd.Timestamp(friday) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    t0 = time.perf_counter()
+    hit = analyze_stock(AnalysisRequest(**base, end_date=saturday, use_frame_cache=True))
+    t_hit = time.perf_counter() - t0
+    assert hit is first and cache.stats()["hits"] == 1
+
+    # prefetch: 2 barre per lato
+    analyze_stock(AnalysisRequest(**base, end_date=friday, use_frame_cache=True, prefetch=2))
+    cache.wait()
+    assert cache.stats()["prefetched"] == 4 and cache.stats()["prefetch_errors"] == 0
+    for d in (dates[k - 2], dates[k - 1], dates[k + 1], dates[k + 2]):
+        before = cache.stats()["hits"]
+        got = analyze_stock(AnalysisRequest(**base, end_date=d, use_frame_cache=True))
+        assert cache.stats()["hits"] == before + 1, d
+        assert _same(got, analyze_stock(AnalysisRequest(**base, end_date=d))), d
+    assert backend_main.frame_cache_status()["size"] == 5
+
+    # storia riscaricata: nuova entry -> niente frame vecchi
+    backend_main.TICKER_CACHE["TESTFRAME"] = _entry(seed=5)
+    fresh = analyze_stock(AnalysisRequest(**base, end_date=friday, use_frame_cache=True))
+    assert fresh is not first and not _same(fresh, first)
+    assert _same(fresh, analyze_stock(AnalysisRequest(**base, end_date=friday)))
+    del backend_main.TICKER_CACHE["TESTFRAME"]
+    print(f"  OK /analyze: hit == calcolo, prefetch di 4 barre, invalidazione; "
+          f"frame {t_full * 1000:.0f} ms -> hit {t_hit * 1000:.1f} ms")
+
+
+def main():
+    import frame_cache as fc  # RED: non esiste ancora
+
+    test_cache(fc)
+    test_analyze(fc)
+    print("OK test_frame_cache — LRU, frame identici, prefetch, invalidazione")
+
+
+if __name__ == "__main__":
+    main()
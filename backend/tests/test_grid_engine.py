@@ -0,0 +1,110 @@
+"""
+Test per il grid search batch ARANCIONE/COMBO (grid_engine.py).
+
+Proprietà verificate:
+1. Posizioni del tensore (entry_z, horizon) == potential_discharge_positions
+   cella per cella; COMBO == combo_positions.
+2. batch_backtest_long == backtest_potential_discharge / backtest_combo
+   (stats identiche) su tutta la griglia, con start_date, end_date e costi.
+3. grid_search == media brute-force train/OOS per cella; tempi del batch e
+   del loop cella per cella stampati.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_grid_engine.py
+"""
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+EZ, HZ, EN, EX = (1.0, 1.5, 2.0), (5, 10, 21), (0.0, 0.02), (0.0, -0.02)
+
+
+def _px(seed, n=800):
+    rng = np.random.default_rng(seed)
+    return pd.Series(50 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, n))),
+                     index=pd.date_range("2021-01-04", periods=n, freq="B"))
+
+
+def test_positions(ge):
+    from walk_forward import prepare_series
+    from stable_strategy import potential_discharge_positions, combo_positions
+
+    s = prepare_series(_px(1), 200.0, "COMBO")
+    cells, P = ge.ticker_grid(s, "COMBO", EZ, HZ, EN, EX)
+    assert P.shape == (len(EN) * len(EX) * len(EZ) * len(HZ), len(s["dates"]))
+    for c, row in zip(cells, P):
+        d_pos, _ = potential_discharge_positions(s["prices"], s["pot"], s["F"],
+                                                 entry_z=c["entry_z"], horizon=c["horizon"])
+        assert row.astype(int).tolist() == combo_positions(s["slopes"], c["entry"], c["exit"], d_pos), c
+    print(f"  OK {len(cells)} celle COMBO: posizioni == loop di riferimento")
+
+
+def test_batch_backtest(ge):
+    from walk_forward import prepare_series
+    from stable_strategy import backtest_potential_discharge, backtest_combo
+
+    n_cells = 0
+    for seed in (2, 3):
+        for strategy in ("ARANCIONE", "COMBO"):
+            s = prepare_series(_px(seed), 200.0, strategy)
+            cells, P = ge.ticker_grid(s, strategy, EZ, HZ, EN, EX)
+            for kw in ({}, {"start_date": s["dates"][300]},
+                       {"end_date": s["dates"][600], "cost_pct": 0.1}):
+                batch = ge.batch_backtest_long(s["dates"], s["prices"], P, **kw)
+                for c, st in zip(cells, batch):
+                    if strategy == "ARANCIONE":
+                        ref = backtest_potential_discharge(
+                            s["dates"], s["prices"], s["pot"], s["F"],
+                            entry_z=c["entry_z"], horizon=c["horizon"], **kw)
+                    else:
+                        ref = backtest_combo(
+                            s["dates"], s["prices"], s["slopes"], s["pot"], s["F"],
+                            entry_th=c["entry"], exit_th=c["exit"],
+                            entry_z=c["entry_z"], horizon=c["horizon"], **kw)
+                    assert st == ref["stats"], f"{strategy} {c} {kw}: {st} vs {ref['stats']}"
+                    n_cells += 1
+    print(f"  OK batch == backtest di riferimento su {n_cells} celle")
+
+
+def test_grid_search(ge):
+    from walk_forward import prepare_series
+    from stable_strategy import backtest_potential_discharge
+
+    data = {f"G{k}": prepare_series(_px(10 + k), 200.0, "ARANCIONE") for k in range(4)}
+    t0 = time.perf_counter()
+    res = ge.grid_search(data, "ARANCIONE", EZ, HZ, train_frac=0.6)
+    t_batch = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for row in res["results"]:
+        train, oos = [], []
+        for s in data.values():
+            kw = dict(entry_z=row["entry_z"], horizon=row["horizon"])
+            train.append(backtest_potential_discharge(s["dates"], s["prices"], s["pot"], s["F"],
+                                                      end_date=res["train_end"], **kw)["stats"]["total_return"])
+            oos.append(backtest_potential_discharge(s["dates"], s["prices"], s["pot"], s["F"],
+                                                    start_date=res["split_date"], **kw)["stats"]["total_return"])
+        assert row["avg_return"] == round(float(np.mean(train)), 2), row
+        assert row["oos_return"] == round(float(np.mean(oos)), 2), row
+        assert row["oos_positive"] == sum(1 for v in oos if v > 0)
+    t_loop = time.perf_counter() - t0
+    assert res["results"][0]["avg_return"] >= res["results"][-1]["avg_return"]
+    print(f"  OK grid_search == brute-force ({len(res['results'])} celle × {res['n_tickers']} ticker): "
+          f"batch {t_batch * 1000:.0f} ms vs loop {t_loop * 1000:.0f} ms")
+
+
+def main():
+    import grid_engine as ge  # RED: non esiste ancora
+
+    test_positions(ge)
+    test_batch_backtest(ge)
+    test_grid_search(ge)
+    print("OK test_grid_engine — posizioni a tensore, backtest batch, grid train/OOS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Test per la verifica integrità batch (integrity.run_integrity_batch e
+POST /verify-integrity/batch).
+
+Proprietà verificate:
+1. Process pool == esecuzione sequenziale == verify_integrity ticker per
+   ticker (conteggi identici), con i frozen calcolati dal worker.
+2. frozen_history (estratto da analyze_stock) produce il formato cache.
+3. Endpoint: job in background con avanzamento, ticker senza storia
+   sufficiente riportati in errors, nessun /analyze preventivo richiesto.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_integrity_batch.py
+"""
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+
+def _px(seed, n=620):
+    rng = np.random.default_rng(seed)
+    vals = 40 * np.exp(np.cumsum(rng.normal(0.0003, 0.013, n)))
+    return pd.Series(vals, index=pd.date_range("2021-01-04", periods=n, freq="B"))
+
+
+def _counts(results):
+    return {r["ticker"]: {s: (v["total_trades"], v["corrupted_count"])
+                          for s, v in r["strategies"].items()} for r in results}
+
+
+def test_pool_matches_sequential(run_integrity_batch, verify_integrity, frozen_history):
+    inputs = {f"T{k}": (_px(k), None) for k in range(3)}
+    strategies = ["FROZEN", "SUM", "LIVE"]
+    seen = []
+    # max_workers fuori scala: limitato a MAX_BATCH_WORKERS e al numero di ticker
+    pooled = run_integrity_batch(inputs, strategies, max_workers=10_000, on_result=seen.append)
+    seq = run_integrity_batch(inputs, strategies, max_workers=1)
+    assert len(seen) == 3, "on_result deve essere chiamata per ogni ticker"
+    assert _counts(pooled) == _counts(seq), "process pool != sequenziale"
+
+    px = inputs["T1"][0]
+    frozen = frozen_history(px)
+    assert set(frozen) == {"dates", "kin", "pot", "z_sum", "raw_sum"}
+    for s in strategies:
+        ref = verify_integrity(px, s, frozen=frozen)
+        got = _counts(seq)["T1"][s]
+        assert got == (ref["total_trades"], len(ref["corrupted_trades"])), f"{s}: {got}"
+    print(f"  OK pool == sequenziale == verify_integrity: {_counts(pooled)}")
+
+
+def test_endpoint():
+    import main as backend_main
+    from fastapi import HTTPException
+    from main import start_integrity_batch, get_integrity_batch, IntegrityBatchRequest
+
+    backend_main.TICKER_CACHE["BATCHA"] = {"px": _px(7)}          # senza frozen
+    backend_main.TICKER_CACHE["BATCHB"] = {"px": _px(8)}
+    res = start_integrity_batch(IntegrityBatchRequest(
+        tickers=["BATCHA", "BATCHB"], strategies=["SUM", "FROZEN"], max_workers=2))
+    job_id = res["job_id"]
+    for _ in range(600):
+        job = get_integrity_batch(job_id)
+        if job["status"] != "running":
+            break
+        time.sleep(0.1)
+    assert job["status"] == "done", job
+    assert job["done"] == job["total"] == 2
+    for r in job["results"]:
+        for s in ("SUM", "FROZEN"):
+            assert r["strategies"][s]["total_trades"] > 0, f"{r['ticker']} {s}: verifica vacua"
+        assert r.get("frozen_computed"), "i frozen mancanti vanno calcolati dal job"
+
+    # stesso job sul gestore condiviso: parziali per ticker, fase verify completa
+    shared = backend_main.JOBS.get(job_id).snapshot()
+    assert shared["kind"] == "integrity-batch" and shared["partial_count"] == 2
+    assert (shared["phase"], shared["done"], shared["total"]) == ("verify", 2, 2)
+    assert not hasattr(backend_main, "INTEGRITY_JOBS")
+    try:
+        start_integrity_batch(IntegrityBatchRequest(tickers=["BATCHA"], strategies=["XXX"]))
+    except HTTPException as e:
+        assert e.status_code == 400
+    else:
+        raise AssertionError("strategia non valida accettata")
+
+    # annullamento via /jobs: il batch si ferma e non resta un processo orfano;
+    # finché è attivo un secondo batch è rifiutato (503)
+    res = start_integrity_batch(IntegrityBatchRequest(
+        tickers=["BATCHA", "BATCHB"], strategies=["SUM", "FROZEN"], max_workers=1))
+    try:
+        start_integrity_batch(IntegrityBatchRequest(tickers=["BATCHA"], strategies=["SUM"]))
+    except HTTPException as e:
+        assert e.status_code == 503, e
+    else:
+        raise AssertionError("batch concorrente accettato")
+    backend_main.cancel_job(res["job_id"])
+    for _ in range(600):
+        stopped = get_integrity_batch(res["job_id"])
+        if stopped["status"] != "running":
+            break
+        time.sleep(0.1)
+    assert stopped["status"] == "cancelled", stopped
+    print(f"  OK endpoint: job {job_id} {job['done']}/{job['total']} ticker su JOBS, annullabile")
+
+
+def main():
+    from integrity import run_integrity_batch, verify_integrity  # RED: non esiste ancora
+    from logic import frozen_history
+
+    test_pool_matches_sequential(run_integrity_batch, verify_integrity, frozen_history)
+    test_endpoint()
+    print("OK test_integrity_batch — process pool, frozen calcolati dal job, avanzamento")
+
+
+if __name__ == "__main__":
+    main()
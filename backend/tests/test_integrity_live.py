@@ -0,0 +1,93 @@
+"""
+Test per la verifica di integrità LIVE con finestra Kalman/RTS (integrity.py).
+
+Il vecchio verificatore LIVE risolveva ActionPath(px[:e+1]) per OGNI giorno
+simulato. LiveKalmanWindow ricava lo stesso segnale dal filtro di Kalman
+(forward una volta) + smoother RTS limitato alle ultime `window` barre.
+
+Proprietà verificate:
+1. Il segnale della finestra (z e slope) coincide con ActionPath sul
+   prefisso a meno di 1e-9, su più giorni e più alpha.
+2. replay_live_integrity senza audit == loop brute-force O(n²) (stessi
+   trade, stessi trade corrotti), con soglie/direzioni diverse.
+3. Finestra volutamente troppo corta: gli audit rilevano la divergenza e
+   ricadono sul passo esatto (risultato ancora identico al brute-force).
+
+Esecuzione: backend/venv/bin/python backend/tests/test_integrity_live.py
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+import pandas as pd
+
+from test_integrity_replay import _brute_force, _assert_same
+
+
+def _series(seed, n=660):
+    rng = np.random.default_rng(seed)
+    px = 60 * np.exp(np.cumsum(rng.normal(0.0002, 0.015, n)))
+    return pd.Series(px, index=pd.date_range("2020-01-01", periods=n, freq="B"))
+
+
+def test_window_signal(LiveKalmanWindow, live_prefix_signal, signal_slope):
+    px = _series(4)
+    for alpha in (50.0, 200.0):
+        live = LiveKalmanWindow(px, alpha, 1.0)
+        signal_at = live_prefix_signal(px, alpha, 1.0)
+        worst = 0.0
+        for e in (300, 504, 580, len(px) - 1):
+            p0, z_tail, slope_tail = live.at(e)
+            z_pre = np.array(signal_at(e))
+            z_win = np.array(live.z[:p0 + 1] + z_tail)
+            sl_win = np.array(live.z_slope[:p0 + 1] + slope_tail)
+            assert np.array_equal(np.isnan(z_pre), np.isnan(z_win)), f"NaN diversi in e={e}"
+            err = max(np.nanmax(np.abs(z_pre - z_win)),
+                      np.max(np.abs(np.array(signal_slope(list(z_pre))) - sl_win)))
+            assert err < 1e-9, f"alpha={alpha} e={e}: finestra != ActionPath (err {err:.2e})"
+            worst = max(worst, err)
+        print(f"  OK alpha={alpha}: finestra {live.window} barre, max err {worst:.1e}")
+
+
+def test_replay_vs_brute(LiveKalmanWindow, live_prefix_signal, replay_live_integrity):
+    px = _series(1)
+    dates = [d.strftime("%Y-%m-%d") for d in px.index]
+    prices = px.tolist()
+    for alpha in (50.0, 200.0):
+        live = LiveKalmanWindow(px, alpha, 1.0)
+        signal_at = live_prefix_signal(px, alpha, 1.0)
+        for threshold, use_z_roc in ((-0.3, True), (0.0, False)):
+            ref = _brute_force(prices, dates, signal_at, threshold, use_z_roc, 504)
+            res = replay_live_integrity(prices, dates, live, signal_at, threshold, use_z_roc,
+                                        audit_every=0)
+            assert ref[1], "sanity: LIVE deve avere trade corrotti"
+            _assert_same(f"LIVE alpha={alpha} th={threshold} roc={use_z_roc}", res, ref)
+
+
+def test_short_window_falls_back(LiveKalmanWindow, live_prefix_signal, replay_live_integrity):
+    px = _series(2)
+    dates = [d.strftime("%Y-%m-%d") for d in px.index]
+    prices = px.tolist()
+    live = LiveKalmanWindow(px, 200.0, 1.0, window=25)
+    signal_at = live_prefix_signal(px, 200.0, 1.0)
+    ref = _brute_force(prices, dates, signal_at, -0.3, True, 504)
+    res = replay_live_integrity(prices, dates, live, signal_at, -0.3, True, audit_every=1)
+    assert res["divergent_steps"] > 0, "finestra di 25 barre: gli audit dovevano divergere"
+    _assert_same("LIVE finestra corta (fallback esatto)", res, ref)
+
+
+def main():
+    from integrity import (LiveKalmanWindow, live_prefix_signal,  # RED: non esiste ancora
+                           replay_live_integrity, _signal_slope)
+
+    test_window_signal(LiveKalmanWindow, live_prefix_signal, _signal_slope)
+    test_replay_vs_brute(LiveKalmanWindow, live_prefix_signal, replay_live_integrity)
+    test_short_window_falls_back(LiveKalmanWindow, live_prefix_signal, replay_live_integrity)
+    print("OK test_integrity_live — finestra Kalman/RTS == ActionPath sul prefisso, replay == brute-force")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Test per il replay incrementale di /verify-integrity (integrity.py).
+
+Il vecchio verificatore rieseguiva pipeline + backtest_strategy su ogni
+prefisso (O(n²)). Il replay calcola il segnale una volta e fa avanzare il
+backtest di una barra per passo. Proprietà verificate:
+
+1. StrategyStepper: dopo k passi i trade coincidono ESATTAMENTE con
+   backtest_strategy sul prefisso di k barre (anche con NaN nel segnale).
+2. FROZEN e SUM sintetici: stesso risultato del loop brute-force (copia
+   fedele del vecchio verificatore qui sotto), con audit ogni 21 giorni.
+3. Segnale NON causale (normalizzato sull'intero prefisso): con
+   audit_every=1 il replay ricade sul passo esatto e il risultato è
+   identico al brute-force, trade corrotti inclusi.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_integrity_replay.py
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+import pandas as pd
+
+
+def _brute_force(prices, dates, signal_at, threshold, use_z_roc, start_idx):
+    """Vecchio loop di verify_trade_integrity (regole di confronto incluse)."""
+    from logic import backtest_strategy
+
+    trade_history = {}
+    for end_idx in range(start_idx, len(dates)):
+        end_date_str = dates[end_idx]
+        z_signal = signal_at(end_idx)
+        if not z_signal:
+            continue
+        z_slope = (pd.Series(z_signal).diff(5) / 5).fillna(0).tolist()
+        res = backtest_strategy(prices=prices[:end_idx + 1], z_kinetic=z_signal,
+                                z_slope=z_slope, dates=dates[:end_idx + 1],
+                                threshold=threshold, use_z_roc=use_z_roc)
+        skipped = res.get('skipped_trades', [])
+        skipped_dates = {t['date'] for t in skipped}
+        skipped_idx = {t['index'] for t in skipped if 'index' in t}
+        date_to_idx = {d: i for i, d in enumerate(dates[:end_idx + 1])}
+        current = set()
+        for trade in res['trades']:
+            d = trade['entry_date']
+            current.add(d)
+            if d not in trade_history:
+                trade_history[d] = {'first_seen': trade.copy(), 'first_seen_at': end_date_str,
+                                    'changes': [], 'disappeared': False}
+                continue
+            rec = trade_history[d]
+            orig = rec['first_seen']
+            changes = []
+            if orig['direction'] != trade['direction']:
+                changes.append(f"Dir: {orig['direction']}→{trade['direction']}")
+            if orig['exit_date'] != trade['exit_date'] and orig['exit_date'] != 'OPEN':
+                changes.append(f"Exit: {orig['exit_date']}→{trade['exit_date']}")
+            if abs(orig['entry_price'] - trade['entry_price']) > 0.01:
+                changes.append(f"Price: {orig['entry_price']}→{trade['entry_price']}")
+            for c in changes:
+                if c not in rec['changes']:
+                    rec['changes'].append(c)
+        neg = ("❌ DISSOLTO", "⚠️ BLOCCATO (Slittato)", "⚠️ BLOCCATO (POS. APERTA)")
+        for d, rec in trade_history.items():
+            if d not in current:
+                if d <= end_date_str:
+                    blocked = d in skipped_dates
+                    if not blocked and d in date_to_idx and skipped_idx:
+                        blocked = any((date_to_idx[d] + o) in skipped_idx for o in range(-3, 4))
+                    if blocked:
+                        rec['disappeared'] = False
+                        for f in neg:
+                            if f in rec['changes']:
+                                rec['changes'].remove(f)
+                    elif not rec['disappeared']:
+                        rec['disappeared'] = True
+                        if "❌ DISSOLTO" not in rec['changes']:
+                            rec['changes'].append("❌ DISSOLTO")
+            elif rec['disappeared']:
+                rec['disappeared'] = False
+                for f in neg:
+                    if f in rec['changes']:
+                        rec['changes'].remove(f)
+                if "⚠️ INSTABILE" not in rec['changes']:
+                    rec['changes'].append("⚠️ INSTABILE")
+
+    out = [{'entry_date': d, 'original': r['first_seen'], 'first_seen_at': r['first_seen_at'],
+            'changes': sorted(set(r['changes']))}
+           for d, r in trade_history.items() if r['changes']]
+    out.sort(key=lambda x: x['entry_date'], reverse=True)
+    return len(trade_history), out
+
+
+def _normalize(corrupted):
+    return [dict(c, changes=sorted(c['changes'])) for c in corrupted]
+
+
+def _assert_same(label, res, ref):
+    total, corrupted = ref
+    assert res["total_trades"] == total, f"{label}: total {res['total_trades']} vs {total}"
+    got = _normalize(res["corrupted_trades"])
+    assert got == corrupted, f"{label}: corrotti diversi\n{got[:3]}\nvs\n{corrupted[:3]}"
+    print(f"  OK {label}: {total} trade, {len(corrupted)} corrotti, "
+          f"{res['audits']}/{res['steps']} audit")
+
+
+def test_stepper_parity(StrategyStepper):
+    from logic import backtest_strategy
+
+    rng = np.random.default_rng(11)
+    n = 300
+    prices = (50 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))).tolist()
+    dates = [d.strftime("%Y-%m-%d") for d in pd.date_range("2021-01-04", periods=n, freq="B")]
+    z = np.sin(np.linspace(0, 30, n)) + rng.normal(0, 0.4, n)
+    z[:30] = np.nan
+    z = z.tolist()
+    z_slope = (pd.Series(z).diff(5) / 5).fillna(0).tolist()
+
+    for use_z_roc in (True, False):
+        st = StrategyStepper(prices, dates, threshold=-0.3, use_z_roc=use_z_roc)
+        for k in range(1, n + 1):
+            st.step(z, z_slope)
+            if k % 7 and k != n:
+                continue
+            ref = backtest_strategy(prices=prices[:k], z_kinetic=z[:k], z_slope=z_slope[:k],
+                                    dates=dates[:k], threshold=-0.3, use_z_roc=use_z_roc)
+            assert st.trades() == ref["trades"], f"trade diversi al prefisso {k}"
+            assert st.skipped == ref["skipped_trades"], f"skipped diversi al prefisso {k}"
+    print(f"  OK StrategyStepper == backtest_strategy su ogni prefisso ({len(st.closed)} trade)")
+
+
+def test_frozen_and_sum(replay_integrity, frozen_prefix_signal):
+    from test_verify_integrity_cache import _build_synthetic_cache
+
+    px, frozen = _build_synthetic_cache(n=700, seed=5)
+    dates = [d.strftime("%Y-%m-%d") for d in px.index]
+    prices = px.tolist()
+    for strategy in ("FROZEN", "SUM"):
+        signal_at, cut = frozen_prefix_signal(strategy, dates, frozen)
+        ref = _brute_force(prices, dates, signal_at, -0.3, True, 504)
+        res = replay_integrity(prices, dates, signal_at, -0.3, True, start_idx=504,
+                               audit_every=21, force_audit=lambda e: 0 < cut(e) <= 15)
+        assert res["divergent_steps"] == 0, f"{strategy}: segnale causale ma audit divergente"
+        _assert_same(strategy, res, ref)
+
+    # frozen che parte DOPO start_idx: giorni senza segnale saltati, lowpass
+    # non applicato sui primi 15 punti (passi forzati esatti)
+    late = {k: (v[480:] if isinstance(v, list) else v) for k, v in frozen.items()}
+    signal_at, cut = frozen_prefix_signal("SUM", dates, late)
+    ref = _brute_force(prices, dates, signal_at, -0.3, True, 504)
+    res = replay_integrity(prices, dates, signal_at, -0.3, True, start_idx=504,
+                           audit_every=21, force_audit=lambda e: 0 < cut(e) <= 15)
+    _assert_same("SUM (frozen tardivo)", res, ref)
+
+
+def test_non_causal(replay_integrity):
+    # z-score sull'INTERO prefisso: ogni nuovo giorno riscrive il passato
+    rng = np.random.default_rng(9)
+    n = 620
+    prices = (80 * np.exp(np.cumsum(rng.normal(0, 0.012, n)))).tolist()
+    dates = [d.strftime("%Y-%m-%d") for d in pd.date_range("2020-03-02", periods=n, freq="B")]
+    raw = np.cumsum(rng.normal(0, 1, n)) + 4 * np.sin(np.linspace(0, 25, n))
+
+    def signal_at(e):
+        x = raw[:e + 1]
+        return ((x - x.mean()) / (x.std() + 1e-9)).tolist()
+
+    ref = _brute_force(prices, dates, signal_at, -0.3, True, 504)
+    res = replay_integrity(prices, dates, signal_at, -0.3, True, start_idx=504, audit_every=1)
+    assert res["divergent_steps"] > 0
+    assert ref[1], "sanity: il segnale non causale deve produrre trade corrotti"
+    _assert_same("non causale (audit ogni giorno)", res, ref)
+
+
+def main():
+    from integrity import StrategyStepper, replay_integrity, frozen_prefix_signal  # RED: non esiste ancora
+
+    test_stepper_parity(StrategyStepper)
+    test_frozen_and_sum(replay_integrity, frozen_prefix_signal)
+    test_non_causal(replay_integrity)
+    print("OK test_integrity_replay — replay incrementale identico al loop O(n²)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+"""
+Test per i job in background (jobs.py, /jobs).
+
+Proprietà verificate:
+1. JobManager: submit restituisce subito, stato queued -> running -> done,
+   avanzamento, parziali incrementali (since/next_partial), tempi; errore
+   del runner -> status "error" con detail; TTL: i job finiti scadono.
+2. Job "scan" (MarketScanner vero, download finti lenti): parziali mentre
+   gira; cancel -> status "cancelled" e i titoli in coda non vengono scaricati.
+3. Job "verify-integrity": risultato == /verify-integrity sincrono,
+   avanzamento "verify" fino al totale dei giorni.
+4. Scansione email annullata prima dello stadio email: nessuna email inviata.
+5. kind sconosciuto o params non validi -> 400, job inesistente -> 404.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_jobs.py
+"""
+import sys
+import os
+import json
+import time
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+
+def _wait(job, statuses=("done", "error", "cancelled"), timeout=30):
+    t0 = time.time()
+    while job.status not in statuses:
+        assert time.time() - t0 < timeout, job.snapshot()
+        time.sleep(0.01)
+    return job.snapshot()
+
+
+def _series(seed, n=300):
+    rng = np.random.default_rng(seed)
+    return pd.Series(30 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, n))),
+                     index=pd.date_range("2024-01-01", periods=n, freq="B"))
+
+
+def test_manager(jobs):
+    manager = jobs.JobManager(max_workers=2, ttl=3600)
+    gate = threading.Event()
+
+    def runner(job):
+        for i in range(5):
+            gate.wait()
+            job.add_partial({"i": i})
+            job.progress("work", i + 1, 5)
+        return {"status": "ok", "n": 5}
+
+    job = manager.submit("demo", runner, {"x": 1})
+    snap = job.snapshot()
+    assert snap["status"] in ("queued", "running") and snap["partial"] == []
+    gate.set()
+    snap = _wait(job)
+    assert snap["status"] == "done" and snap["result"] == {"status": "ok", "n": 5}
+    assert (snap["phase"], snap["done"], snap["total"], snap["progress"]) == ("work", 5, 5, 1.0)
+    assert snap["elapsed_s"] is not None and snap["finished_at"]
+    assert [p["i"] for p in job.snapshot(since=3)["partial"]] == [3, 4]
+    assert job.snapshot(since=3)["next_partial"] == 5
+
+    def broken(job):
+        raise ValueError("boom")
+    bad = manager.submit("demo", broken)
+    snap = _wait(bad)
+    assert snap["status"] == "error" and snap["detail"] == "boom"
+
+    # limit: al più n job dello stesso kind non finiti, i finiti non contano
+    hold = threading.Event()
+    busy = manager.submit("heavy", lambda j: hold.wait(), limit=1)
+    try:
+        manager.submit("heavy", lambda j: None, limit=1)
+    except jobs.JobLimitReached:
+        pass
+    else:
+        raise AssertionError("limite di job attivi ignorato")
+    assert manager.submit("demo", lambda j: None, limit=1) is not None
+    hold.set()
+    _wait(busy)
+    _wait(manager.submit("heavy", lambda j: None, limit=1))
+
+    manager.ttl = 0
+    time.sleep(0.01)
+    assert manager.list() == [] and manager.get(job.id) is None
+    manager.shutdown()
+    print("  OK submit/progress/parziali/tempi, errore, limite per kind, TTL")
+
+
+def _slow_market_data(fetched, delay):
+    class SlowMarketData:
+        def __init__(self, ticker, start_date=None, end_date=None):
+            self.ticker = ticker
+
+        def fetch(self):
+            fetched.append(self.ticker)
+            time.sleep(delay)
+            return _series(int(self.ticker[4:]))
+    return SlowMarketData
+
+
+def test_scan_cancel(backend_main):
+    import logic
+    from main import submit_job, get_job, cancel_job, JobRequest
+
+    fetched = []
+    real = logic.MarketData
+    logic.MarketData = _slow_market_data(fetched, 0.05)
+    tickers = [f"TJOB{i}" for i in range(60)]
+    try:
+        job_id = submit_job(JobRequest(kind="scan", params={"tickers": tickers}))["job_id"]
+        job = backend_main.JOBS.get(job_id)
+        t0 = time.time()
+        while job.snapshot(since=None)["partial_count"] < 3:
+            assert time.time() - t0 < 20
+            time.sleep(0.01)
+        mid = get_job(job_id, since=0)
+        assert mid["status"] == "running" and mid["phase"] == "scan" and len(mid["partial"]) >= 3
+        assert mid["total"] == len(tickers) and mid["result"] is None
+
+        assert cancel_job(job_id)["cancel_requested"]
+        snap = _wait(job)
+        n_fetched = len(fetched)
+        time.sleep(0.2)
+        assert snap["status"] == "cancelled" and snap["result"] is None
+        assert len(fetched) == n_fetched < len(tickers) // 2, len(fetched)
+    finally:
+        logic.MarketData = real
+    print(f"  OK scan: {mid['partial_count']} parziali in corsa, annullato dopo "
+          f"{n_fetched}/{len(tickers)} download")
+
+
+def test_verify(backend_main):
+    from logic import frozen_history
+    from main import submit_job, JobRequest, VerifyIntegrityRequest
+
+    px = _series(5, n=620)
+    backend_main.TICKER_CACHE["TESTJOBVI"] = {
+        "px": px, "frozen": frozen_history(px, alpha=200.0, beta=1.0, min_points=100, kin_lag=25)}
+    try:
+        params = {"ticker": "TESTJOBVI", "strategy": "SUM", "audit_every": 42}
+        job_id = submit_job(JobRequest(kind="verify-integrity", params=params))["job_id"]
+        snap = _wait(backend_main.JOBS.get(job_id))
+        ref = backend_main._verify_trade_integrity(VerifyIntegrityRequest(**params))
+        assert snap["status"] == "done" and snap["phase"] == "verify" and snap["done"] == snap["total"] > 0
+        assert json.dumps(snap["result"], sort_keys=True) == json.dumps(ref, sort_keys=True)
+    finally:
+        backend_main.TICKER_CACHE.pop("TESTJOBVI", None)
+    print(f"  OK verify-integrity: job == sincrono ({snap['done']}/{snap['total']} giorni)")
+
+
+def _FixedMarketData(series):
+    class FixedMarketData:
+        def __init__(self, ticker, start_date=None, end_date=None):
+            self.ticker, self.start = ticker, start_date
+
+        def fetch(self):
+            px = series[self.ticker]
+            return px[px.index >= pd.Timestamp(self.start)] if self.start else px
+    return FixedMarketData
+
+
+def test_email_cancel(backend_main):
+    import scanner
+    import jobs
+    import logic
+
+    sent = []
+    series = {f"TJEM{i}": _series(40 + i, n=200) for i in range(3)}
+    for t, px in series.items():
+        backend_main.PRICE_CACHE[f"{t}|2023-01-20"] = px
+    saved = (backend_main.PortfolioManager, scanner.load_tickers, scanner.NotificationManager,
+             logic.MarketData)
+    logic.MarketData = _FixedMarketData(series)            # aggiornamento dei prezzi senza rete
+    backend_main.PortfolioManager = type("PM", (), {"load": lambda self: {"positions": []}})
+    scanner.load_tickers = lambda: {t: "Tech" for t in series}
+    scanner.NotificationManager = type("NM", (), {"send_email": lambda self, *a: sent.append(a)})
+    phases = []
+
+    def on_progress(phase, done, total):
+        phases.append(phase)
+        if phase == "email":
+            raise jobs.JobCancelled("test")
+    try:
+        try:
+            scanner.run_market_scan(send_email=True, max_workers=1, on_progress=on_progress)
+        except jobs.JobCancelled:
+            pass
+        else:
+            raise AssertionError("JobCancelled non propagata")
+        assert sent == [] and "signals" in phases and phases[-1] == "email", phases
+        scanner.run_market_scan(send_email=True, max_workers=1)
+        assert len(sent) == 1
+    finally:
+        (backend_main.PortfolioManager, scanner.load_tickers, scanner.NotificationManager,
+         logic.MarketData) = saved
+        for t in series:
+            backend_main.PRICE_CACHE.pop(f"{t}|2023-01-20", None)
+    print("  OK scansione email annullata prima dello stadio email: nessun invio")
+
+
+def test_errors():
+    from fastapi import HTTPException
+    from main import submit_job, get_job, cancel_job, JobRequest
+
+    for req, code in ((JobRequest(kind="nope"), 400),
+                      (JobRequest(kind="scan", params={"tickers": "AAPL"}), 400)):
+        try:
+            submit_job(req)
+        except HTTPException as e:
+            assert e.status_code == code
+        else:
+            raise AssertionError(req)
+    for fn in (get_job, cancel_job):
+        try:
+            fn("missing")
+        except HTTPException as e:
+            assert e.status_code == 404
+        else:
+            raise AssertionError(fn)
+    print("  OK kind/params non validi -> 400, job inesistente -> 404")
+
+
+def main():
+    import main as backend_main
+    import jobs  # RED: non esiste ancora
+
+    test_manager(jobs)
+    test_scan_cancel(backend_main)
+    test_verify(backend_main)
+    test_email_cancel(backend_main)
+    test_errors()
+    print("OK test_jobs — job in background con avanzamento, parziali, cancellazione e TTL")
+
+
+if __name__ == "__main__":
+    main()
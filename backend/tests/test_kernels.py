@@ -0,0 +1,141 @@
+"""
+Test per i kernel compilati opzionali (kernels.py).
+
+Proprietà verificate:
+1. Backend "kernel" (stessi kernel, non compilati) == codice Python di
+   riferimento, valori identici: kalman_local_level, kalman_frozen_series,
+   kalman_llt_velocity, potential_discharge_onsets/positions,
+   combo_positions e backtest_stable (LONG/SHORT/BOTH, lag, costi, range,
+   prezzi/slope mancanti).
+2. Selezione del backend: auto/python/numba/kernel, valore non valido ->
+   ValueError, numba richiesto ma assente -> python.
+3. Con numba installato: backend "numba" == riferimento e più veloce
+   (altrimenti il passo viene saltato).
+
+Esecuzione: backend/venv/bin/python backend/tests/test_kernels.py
+"""
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+
+def _px(seed, n=600):
+    rng = np.random.default_rng(seed)
+    return pd.Series(50 * np.exp(np.cumsum(rng.normal(0.0002, 0.025, n))),
+                     index=pd.date_range("2022-01-03", periods=n, freq="B"))
+
+
+def _cases():
+    """(nome, funzione senza argomenti) su tutte le funzioni con kernel."""
+    from logic import kalman_local_level, kalman_frozen_series, kalman_llt_velocity
+    from walk_forward import prepare_series
+    from stable_strategy import (potential_discharge_onsets, potential_discharge_positions,
+                                 combo_positions, backtest_stable)
+
+    out = []
+    for seed in (1, 2):
+        px = _px(seed)
+        s = prepare_series(px, 200.0, "COMBO")
+        d, p, sl = s["dates"], s["prices"], s["slopes"]
+        holes = list(p)
+        holes[250] = None
+        sl_holes = list(sl)
+        sl_holes[300] = None
+        out += [
+            ("local_level", lambda px=px: [a.tolist() for a in kalman_local_level(px.values, 150.0, 2.0)]),
+            ("frozen", lambda px=px: kalman_frozen_series(px, alpha=150.0, min_points=80, kin_lag=20)),
+            ("llt", lambda px=px: kalman_llt_velocity(px, lam=1e-4)),
+            ("onsets", lambda s=s: potential_discharge_onsets(holes, s["pot"], s["F"], entry_z=1.5)),
+            ("positions", lambda s=s: potential_discharge_positions(s["prices"], s["pot"], s["F"],
+                                                                    entry_z=1.5, horizon=10)),
+            ("combo", lambda s=s: combo_positions(sl_holes, 0.01, -0.01, [1] * 40 + [0] * 100)),
+        ]
+        for kw in ({"mode": "LONG"}, {"mode": "SHORT", "entry_th": 0.01, "cost_pct": 0.1},
+                   {"mode": "BOTH", "execution_lag": 2, "start_date": d[100], "end_date": d[500]},
+                   {"mode": "BOTH", "entry_th": 0.02, "exit_th": -0.01, "execution_lag": 0}):
+            out.append((f"stable {kw}", lambda kw=kw, d=d, p=p, sl=sl: backtest_stable(d, p, sl, **kw)))
+        out.append(("stable buchi", lambda d=d: backtest_stable(d, holes, sl_holes, mode="BOTH",
+                                                                 cost_pct=0.05)))
+        out.append(("stable columnar", lambda d=d, p=p, sl=sl: backtest_stable(
+            d, p, sl, mode="BOTH", columnar=True)["trades"].to_dicts()))
+    return out
+
+
+def test_parity(kn, backend="kernel"):
+    cases = _cases()
+    prev = kn.set_backend("python")
+    try:
+        ref = [fn() for _, fn in cases]
+        kn.set_backend(backend)
+        assert kn.enabled()
+        for (name, fn), r in zip(cases, ref):
+            assert fn() == r, f"{backend}: {name} diverso dal riferimento"
+    finally:
+        kn.set_backend(prev)
+    print(f"  OK backend {backend} == riferimento Python su {len(cases)} casi")
+
+
+def test_selection(kn):
+    prev = kn.backend()
+    try:
+        assert kn.set_backend("python") == prev and not kn.enabled()
+        kn.set_backend("auto")
+        assert kn.backend() == ("numba" if kn.numba is not None else "python")
+        kn.set_backend(" Kernel ")
+        assert kn.backend() == "kernel" and kn.kernel("llt") is kn.llt
+        if kn.numba is None:
+            kn.set_backend("numba")
+            assert kn.backend() == "python"
+        try:
+            kn.set_backend("cuda")
+            raise AssertionError("backend non valido accettato")
+        except ValueError:
+            pass
+    finally:
+        kn.set_backend(prev)
+    print(f"  OK selezione backend (attivo all'import: {kn.backend()}, "
+          f"numba {'presente' if kn.numba is not None else 'assente'})")
+
+
+def test_numba(kn):
+    if kn.numba is None:
+        print("  -- numba non installato: parità/velocità compilata non verificate")
+        return
+    test_parity(kn, "numba")
+    from stable_strategy import backtest_stable
+    from walk_forward import prepare_series
+
+    s = prepare_series(_px(7, n=5000), 200.0)
+    args = (s["dates"], s["prices"], s["slopes"])
+    prev = kn.set_backend("numba")
+    try:
+        backtest_stable(*args, mode="BOTH")                     # compilazione
+        t0 = time.perf_counter()
+        backtest_stable(*args, mode="BOTH")
+        t_jit = time.perf_counter() - t0
+        kn.set_backend("python")
+        t0 = time.perf_counter()
+        backtest_stable(*args, mode="BOTH")
+        t_py = time.perf_counter() - t0
+    finally:
+        kn.set_backend(prev)
+    assert t_jit < t_py, f"numba {t_jit * 1000:.1f} ms vs python {t_py * 1000:.1f} ms"
+    print(f"  OK backtest_stable 5000 barre: numba {t_jit * 1000:.1f} ms vs python {t_py * 1000:.1f} ms")
+
+
+def main():
+    import kernels as kn  # RED: non esiste ancora
+
+    test_parity(kn)
+    test_selection(kn)
+    test_numba(kn)
+    print("OK test_kernels — kernel == riferimento Python, selezione backend, numba opzionale")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Test per la scansione email a stadi (scanner.run_market_scan).
+
+Proprietà verificate:
+1. splice_tail: coda accodata alla serie in cache; prezzi comuni diversi
+   (rettifica dividendi) o nessuna sovrapposizione -> None (storia completa).
+2. refresh_prices: ticker in cache -> solo la coda recente, entry di
+   TICKER_CACHE più vecchie scartate, ticker nuovo -> storia completa.
+3. run_market_scan: tutto l'universo (non solo il portafoglio) aggiornato
+   in modo incrementale, anche con PRICE_CACHE/TICKER_CACHE ferme a
+   giorni prima (nessun download completo dei ticker in cache), liste
+   BUY/SELL e azioni HOLD/SELL del portafoglio coerenti con l'ultimo trade
+   di analyze_stock, tempi dei tre stadi nel risultato.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_market_scan.py
+"""
+import sys
+import os
+import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+START = "2023-01-20"
+
+
+def _series(seed, idx):
+    rng = np.random.default_rng(seed)
+    return pd.Series(40 * np.exp(np.cumsum(rng.normal(0.0004, 0.02, len(idx)))), index=idx)
+
+
+class _FakeTicker:
+    fast_info = type("FI", (), {"market_cap": 1})()
+
+    def history(self, **kw):
+        return pd.DataFrame()
+
+
+def _fake_market_data(series, calls):
+    class FakeMarketData:
+        def __init__(self, ticker, start_date=None, end_date=None):
+            self.ticker, self.start = ticker, start_date
+            self.ticker_obj = _FakeTicker()
+
+        def fetch(self):
+            calls.append((self.ticker, self.start))
+            px = series[self.ticker]
+            if self.start:
+                px = px[px.index >= pd.Timestamp(self.start)]
+            self.df_full = pd.DataFrame({"Open": px, "Close": px, "Volume": 1})
+            return px
+    return FakeMarketData
+
+
+def _entry(px):
+    from logic import frozen_history
+
+    return {"px": px, "frozen": frozen_history(px, 200.0, 1.0, min_points=100, kin_lag=25),
+            "zigzag": pd.Series(0, index=px.index), "volume": pd.Series(0, index=px.index),
+            "mkt_cap": 1}
+
+
+def test_splice(ds):
+    idx = pd.date_range("2024-01-01", periods=40, freq="B")
+    px = _series(1, idx)
+    spliced = ds.splice_tail(px[:35], px[30:])
+    assert spliced.equals(px)
+    assert ds.splice_tail(px[:35], px[30:] * 0.99) is None
+    assert ds.splice_tail(px[:20], px[30:]) is None
+    print("  OK splice_tail: coda accodata, rettifica o buco -> None")
+
+
+def test_scan(ds, backend_main):
+    import scanner
+    import logic
+
+    today = datetime.date.today()
+    idx = pd.date_range(START, today, freq="B")
+    series = {f"TESTMS{i}": _series(500 + i, idx) for i in range(10)}
+    universe = list(series)[:8]
+    positions = [
+        {"ticker": "TESTMS1", "strategy": "Frozen Strategy", "status": "OPEN", "entry_price": 40,
+         "entry_date": "2026-01-02", "direction": "LONG"},
+        {"ticker": "TESTMS2", "strategy": "Sum Strategy", "status": "OPEN", "entry_price": 40,
+         "entry_date": "2026-01-02", "direction": "SHORT"},
+        {"ticker": "TESTMS9", "strategy": "Sum Strategy", "status": "OPEN", "entry_price": 40,
+         "entry_date": "2026-01-02", "direction": "LONG"},     # fuori universo, non in cache
+    ]
+    stale = {"TESTMS1": 3, "TESTMS4": 4}      # TICKER_CACHE vecchia di n barre (4: fuori portafoglio)
+    for t in universe:
+        px = series[t]
+        backend_main.TICKER_CACHE[t] = _entry(px[:-stale[t]] if t in stale else px)
+    # PRICE_CACHE della "prima scansione", mai svuotata dal server
+    backend_main.PRICE_CACHE[f"TESTMS5|{START}"] = series["TESTMS5"][:-5]
+
+    calls = []
+    fake = _fake_market_data(series, calls)
+    saved = (backend_main.MarketData, logic.MarketData, backend_main.PortfolioManager, scanner.load_tickers)
+    backend_main.MarketData = logic.MarketData = fake
+    backend_main.PortfolioManager = type("PM", (), {"load": lambda self: {"positions": positions}})
+    scanner.load_tickers = lambda: {t: "⭐ Tech" for t in universe}
+    try:
+        out = scanner.run_market_scan(send_email=False, max_workers=1)
+
+        # universo + portafoglio: coda recente per i ticker in cache, completo solo per il nuovo
+        starts = dict(calls)
+        recent = (today - datetime.timedelta(days=30)).strftime("%Y-%m-%d")
+        assert all(starts[t] >= recent for t in universe), calls
+        assert starts["TESTMS9"] == START and len(calls) == len(universe) + 1, calls
+        assert "TESTMS1" not in backend_main.TICKER_CACHE       # stale: /analyze riscarica
+        assert "TESTMS4" not in backend_main.TICKER_CACHE
+        assert "TESTMS2" in backend_main.TICKER_CACHE           # fresca: tenuta
+        for t in ("TESTMS1", "TESTMS4", "TESTMS5"):
+            assert backend_main.PRICE_CACHE[f"{t}|{START}"].equals(series[t]), t
+        assert set(out["timings"]) == {"prices", "signals", "email"}
+
+        from main import analyze_stock, AnalysisRequest
+        last = {}
+        for t in universe + ["TESTMS9"]:
+            backend_main.TICKER_CACHE[t] = _entry(series[t])
+            res = analyze_stock(AnalysisRequest(ticker=t, start_date=START, use_cache=True,
+                                                fields=["frozen_strategy", "frozen_sum_strategy"]))
+            for key, name in (("frozen_strategy", "Frozen Strategy"), ("frozen_sum_strategy", "Sum Strategy")):
+                trades = res[key]["trades"]
+                last[(t, name)] = trades[-1] if trades else None
+
+        today_s = today.strftime("%Y-%m-%d")
+        exp_buy = [(t, s) for (t, s), tr in last.items() if tr and tr["exit_date"] == "OPEN" and tr["entry_date"] == today_s]
+        exp_sell = [(t, s) for (t, s), tr in last.items() if tr and tr["exit_date"] == today_s]
+        assert sorted((b["ticker"], b["strategy"]) for b in out["buy_today"]) == sorted(exp_buy)
+        assert sorted((b["ticker"], b["strategy"]) for b in out["sell_today"]) == sorted(exp_sell)
+        for p in out["portfolio"]:
+            tr = last[(p["ticker"], p["strategy"])]
+            assert p["action"] == ("HOLD" if tr and tr["exit_date"] == "OPEN" else "SELL"), p
+            assert p["current_price"] == float(series[p["ticker"]].iloc[-1])
+    finally:
+        backend_main.MarketData, logic.MarketData, backend_main.PortfolioManager, scanner.load_tickers = saved
+        for t in series:
+            backend_main.TICKER_CACHE.pop(t, None)
+            backend_main.PRICE_CACHE.pop(f"{t}|{START}", None)
+    print(f"  OK scan a stadi: {len(calls)} download ({len(universe)} incrementali), liste e portafoglio == "
+          f"analyze_stock, tempi {out['timings']}")
+
+
+def main():
+    import main as backend_main
+    import daily_scan as ds
+    assert hasattr(ds, "refresh_prices")  # RED: non esiste ancora
+
+    test_splice(ds)
+    test_scan(ds, backend_main)
+    print("OK test_market_scan — prezzi incrementali, segnali in parallelo, email")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Test per il simulatore di portafoglio backend (portfolio_sim.simulate_sizing).
+
+Proprietà verificate:
+1. Parità con simulateSizing di frontend/stable_engine.js su trade casuali
+   (date sovrapposte, cluster nello stesso giorno, uscite prima delle
+   entrate a parità di data, OPEN ignorati) per tutti gli schemi.
+2. Input universo {ticker: [trade]} equivalente alla lista appiattita.
+3. Scala: 10k trade (tempo stampato; l'algoritmo non è O(eventi × aperte)).
+
+Esecuzione: backend/venv/bin/python backend/tests/test_portfolio_sim.py
+(richiede node nel PATH)
+"""
+import sys
+import os
+import json
+import subprocess
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+TOL = 0.011  # entrambi arrotondano a 2 decimali
+
+_JS = """
+const { simulateSizing } = require(process.argv[1]);
+const fx = JSON.parse(require('fs').readFileSync(process.argv[2], 'utf8'));
+process.stdout.write(JSON.stringify(fx.runs.map(r => simulateSizing(fx.trades,
+    { scheme: r.scheme, capital: r.capital, stakePct: r.stake_pct, cap: r.cap }))));
+"""
+
+
+def _random_trades(seed, n=400):
+    rng = np.random.default_rng(seed)
+    days = [d.strftime("%Y-%m-%d") for d in pd.date_range("2022-01-03", periods=500, freq="B")]
+    trades = []
+    for _ in range(n):
+        i = int(rng.integers(0, 480))
+        hold = int(rng.integers(0, 20))   # 0 = uscita lo stesso giorno dell'entrata
+        trades.append({"entry_date": days[i], "exit_date": days[min(i + hold, 499)],
+                       "pnl_pct": round(float(rng.normal(0.5, 6)), 2)})
+    trades.append({"entry_date": days[10], "exit_date": "OPEN", "pnl_pct": 3.0})
+    return trades
+
+
+def test_js_parity(simulate_sizing):
+    engine = os.path.join(os.path.dirname(__file__), "..", "..", "frontend", "stable_engine.js")
+    trades = _random_trades(5)
+    runs = [{"scheme": s, "capital": c, "stake_pct": p, "cap": cap}
+            for s in ("fixed", "fixed_unlimited", "compound")
+            for c, p, cap in ((10000, 10, 10), (1000, 25, 3))]
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        json.dump({"trades": trades, "runs": runs}, f)
+        path = f.name
+    try:
+        out = subprocess.run(["node", "-e", _JS, os.path.abspath(engine), path],
+                             capture_output=True, text=True, check=True).stdout
+    finally:
+        os.unlink(path)
+    js_all = json.loads(out)
+
+    for run, js in zip(runs, js_all):
+        py = simulate_sizing(trades, scheme=run["scheme"], capital=run["capital"],
+                             stake_pct=run["stake_pct"], cap=run["cap"])
+        label = f"{run['scheme']} cap={run['cap']}"
+        for a, b in (("final_capital", "finalCapital"), ("return_pct", "returnPct"),
+                     ("max_dd", "maxDD"), ("skipped", "skipped"),
+                     ("max_concurrent", "maxConcurrent"), ("n_trades", "nTrades")):
+            assert abs(py[a] - js[b]) <= TOL, f"{label}: {a} {py[a]} vs {js[b]}"
+        assert len(py["curve"]) == len(js["curve"]), f"{label}: punti curva"
+        for p, j in zip(py["curve"], js["curve"]):
+            assert p["date"] == j["date"], f"{label}: date curva"
+            for k in ("equity", "cash", "invested"):
+                assert abs(p[k] - j[k]) <= TOL, f"{label}: {k} {p[k]} vs {j[k]} ({p['date']})"
+        print(f"  OK parità JS {label}: capitale {py['final_capital']}, saltati {py['skipped']}")
+
+
+def test_universe_input(simulate_sizing):
+    a, b = _random_trades(1, 50), _random_trades(2, 50)
+    flat = simulate_sizing(a + b, scheme="compound", cap=5)
+    uni = simulate_sizing({"AAA": a, "BBB": b}, scheme="compound", cap=5)
+    assert flat == uni, "universo {ticker: trades} != lista appiattita"
+
+    from fastapi import HTTPException
+    from main import simulate_sizing_endpoint, SizingRequest
+    for bad in ({"capital": 0}, {"capital": -100}, {"capital": float("nan")}, {"stake_pct": 0},
+                {"stake_pct": 150}, {"cap": 0}):
+        try:
+            simulate_sizing_endpoint(SizingRequest(trades=a, **bad))
+        except HTTPException as e:
+            assert e.status_code == 400, (bad, e)
+        else:
+            raise AssertionError(f"parametri non validi accettati: {bad}")
+    print("  OK input universo == lista appiattita, capitale/stake/cap non validi -> 400")
+
+
+def test_scale(simulate_sizing):
+    trades = _random_trades(9, 10000)
+    t0 = time.perf_counter()
+    res = simulate_sizing(trades, scheme="compound", cap=50)
+    ms = (time.perf_counter() - t0) * 1000
+    assert res["n_trades"] == 10000
+    print(f"  OK 10k trade in {ms:.0f} ms")
+
+
+def main():
+    from portfolio_sim import simulate_sizing  # RED: non esiste ancora
+
+    test_js_parity(simulate_sizing)
+    test_universe_input(simulate_sizing)
+    test_scale(simulate_sizing)
+    print("OK test_portfolio_sim — parità con simulateSizing JS, heap O(E log E)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Test per i registri compatti di trade/eventi (records.py).
+
+Proprietà verificate:
+1. RecordLog: iterazione/indicizzazione/confronto nella forma dict storica,
+   colonne, filtri; le righe corte omettono le chiavi finali.
+2. backtest_stable / backtest_potential_discharge / backtest_combo e
+   backtest_strategy con columnar=True == default (liste di dict) una volta
+   materializzati, stats identiche; riga OPEN di backtest_strategy senza
+   snapshot z come prima.
+3. Memoria: i trade/eventi columnar occupano molto meno delle liste di
+   dict (tracemalloc).
+
+Esecuzione: backend/venv/bin/python backend/tests/test_records.py
+"""
+import sys
+import os
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+
+def _px(seed, n=900):
+    rng = np.random.default_rng(seed)
+    return pd.Series(50 * np.exp(np.cumsum(rng.normal(0.0002, 0.025, n))),
+                     index=pd.date_range("2021-01-04", periods=n, freq="B"))
+
+
+def test_record_log(rec):
+    log = rec.RecordLog(("a", "b", "c"))
+    log.append(1, "x", 0.5)
+    log.add((2, "y", 1.5))
+    log.append(3, "x")                       # riga corta: "c" assente
+    assert len(log) == 3 and log
+    assert log[0] == {"a": 1, "b": "x", "c": 0.5}
+    assert log[-1] == {"a": 3, "b": "x"}
+    assert log[1:] == [{"a": 2, "b": "y", "c": 1.5}, {"a": 3, "b": "x"}]
+    assert log == list(log) == log.to_dicts()
+    assert log.column("c") == [0.5, 1.5, None]
+    assert log.where(b="x") == [log[0], log[2]] == rec.select(log.to_dicts(), b="x")
+    assert log.where(c=1.5) == [log[1]] == rec.select(log.to_dicts(), c=1.5)
+    assert rec.column(log.to_dicts(), "a") == log.column("a") == [1, 2, 3]
+    res = rec.materialize({"trades": log, "stats": {}})
+    assert res["trades"] == log.to_dicts() and isinstance(res["trades"], list)
+    print("  OK RecordLog: dict storici, colonne, filtri, righe corte")
+
+
+def test_engines(rec):
+    from walk_forward import prepare_series
+    from stable_strategy import backtest_stable, backtest_potential_discharge, backtest_combo
+    from logic import backtest_strategy
+
+    n_rows = 0
+    for seed in (1, 2):
+        s = prepare_series(_px(seed), 200.0, "COMBO")
+        d, p = s["dates"], s["prices"]
+        runs = [
+            lambda **k: backtest_stable(d, p, s["slopes"], mode="BOTH", entry_th=0.01,
+                                        exit_th=-0.01, cost_pct=0.05, **k),
+            lambda **k: backtest_stable(d, p, s["slopes"], mode="SHORT", start_date=d[200], **k),
+            lambda **k: backtest_potential_discharge(d, p, s["pot"], s["F"], entry_z=1.5, **k),
+            lambda **k: backtest_combo(d, p, s["slopes"], s["pot"], s["F"], entry_z=1.5, **k),
+        ]
+        for run in runs:
+            a, b = run(), run(columnar=True)
+            assert isinstance(b["trades"], rec.RecordLog) and isinstance(a["trades"], list)
+            assert b["stats"] == a["stats"] and b["equity_curve"] == a["equity_curve"]
+            assert b["trades"].to_dicts() == a["trades"] and b["signal_events"] == a["signal_events"]
+            assert list(b["skipped_trades"]) == a["skipped_trades"] == []
+            n_rows += len(a["trades"]) + len(a["signal_events"])
+
+        z = pd.Series(s["slopes"]).rolling(30, min_periods=5).apply(
+            lambda w: (w[-1] - w.mean()) / (w.std() + 1e-9), raw=True).fillna(0).tolist()
+        for kw in ({}, {"use_z_roc": True, "threshold": 0.2}):
+            a = backtest_strategy(p, z, s["slopes"], d, **kw)
+            b = backtest_strategy(p, z, s["slopes"], d, columnar=True, **kw)
+            assert b["stats"] == a["stats"] and b["trade_pnl_curve"] == a["trade_pnl_curve"]
+            assert b["trades"] == a["trades"] and b["skipped_trades"] == a["skipped_trades"]
+            n_rows += len(a["trades"]) + len(a["skipped_trades"])
+            if a["trades"] and a["trades"][-1]["exit_date"] == "OPEN":
+                assert "entry_z_value" not in b["trades"][-1]
+    print(f"  OK motori columnar == liste di dict ({n_rows} righe confrontate)")
+
+
+def _retained(build):
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    size = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del obj
+    return size
+
+
+def test_memory(rec):
+    from stable_strategy import backtest_stable
+
+    rng = np.random.default_rng(7)
+    n = 20_000
+    dates = [f"B{k:06d}" for k in range(n)]                # ordinate come le date ISO
+    prices = (50 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))).tolist()
+    slopes = rng.normal(0, 1, n).tolist()                  # molti trade: caso peggiore
+
+    def keep(columnar):
+        r = backtest_stable(dates, prices, slopes, mode="BOTH", columnar=columnar)
+        return r["trades"], r["signal_events"]
+
+    m_dict, m_col = _retained(lambda: keep(False)), _retained(lambda: keep(True))
+    trades, events = keep(True)
+    assert m_col < 0.6 * m_dict, f"columnar {m_col / 1e6:.1f} MB vs dict {m_dict / 1e6:.1f} MB"
+    print(f"  OK memoria {len(trades)} trade + {len(events)} eventi: "
+          f"{m_col / 1e6:.1f} MB columnar vs {m_dict / 1e6:.1f} MB di dict")
+
+
+def main():
+    import records as rec  # RED: non esiste ancora
+
+    test_record_log(rec)
+    test_engines(rec)
+    test_memory(rec)
+    print("OK test_records — RecordLog, motori columnar == dict, memoria")
+
+
+if __name__ == "__main__":
+    main()
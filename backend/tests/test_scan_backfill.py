@@ -0,0 +1,114 @@
+"""
+Test per il backfill storico di /scan-daily (daily_scan.backfill_daily_scan).
+
+Proprietà verificate:
+1. Per ogni data dell'intervallo, le righe ricostruite dallo storico
+   (history_rows) == run_daily_scan(as_of_date=data): azioni, valori, trade
+   (anche quello aperto, chiuso "OPEN" al close del giorno), anche di sabato.
+2. Lo storico sopravvive a save/load (JSON) e un secondo backfill sostituisce
+   i record dei ticker rielaborati; parametri diversi -> storico nuovo.
+3. Un passaggio per ticker (tempo stampato accanto a quello delle
+   scansioni per data, senza soglia).
+
+Esecuzione: backend/venv/bin/python backend/tests/test_scan_backfill.py
+"""
+import sys
+import os
+import json
+import time
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+START = "2023-01-20"
+
+
+def _entry(seed, n=520):
+    from logic import frozen_history
+
+    rng = np.random.default_rng(seed)
+    px = pd.Series(30 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, n))),
+                   index=pd.date_range(START, periods=n, freq="B"))
+    return {
+        "px": px,
+        "frozen": frozen_history(px, alpha=200.0, beta=1.0, min_points=100, kin_lag=25),
+        "zigzag": pd.Series(0, index=px.index), "volume": pd.Series(0, index=px.index),
+        "mkt_cap": 1e9 * (seed % 5 + 1),
+    }
+
+
+def _dump(x):
+    return json.dumps(x, sort_keys=True, default=str)
+
+
+def test_parity(ds, backend_main, tickers, dates):
+    lo, hi = dates[110], dates[-1]
+    t0 = time.perf_counter()
+    store, summary = ds.backfill_daily_scan(tickers, lo, hi, max_workers=1)
+    t_fill = time.perf_counter() - t0
+    assert summary["tickers"] == tickers and not summary["failed"]
+    assert summary["from_date"] == dates[115]      # prime barre: SUM non ancora filtrato
+    seen = {"frozen": set(), "sum": set()}
+    t0 = time.perf_counter()
+    days = dates[115:]
+    for d in days:
+        ref = ds.run_daily_scan(tickers, as_of_date=d, max_workers=1)
+        got = ds.history_rows(store, d)
+        assert _dump(got) == _dump(ref), d
+        for r in got:
+            seen["frozen"].add(r["frozen"]["action"])
+            seen["sum"].add(r["sum"]["action"])
+    t_scan = time.perf_counter() - t0
+    assert seen["frozen"] | seen["sum"] >= {"BUY", "HOLD", "SELL", "WAIT"}, seen
+
+    saturday = next(d for d in pd.date_range(days[5], periods=7).strftime("%Y-%m-%d")
+                    if pd.Timestamp(d).dayofweek == 5)
+    assert _dump(ds.history_rows(store, saturday)) == _dump(ds.run_daily_scan(tickers, as_of_date=saturday, max_workers=1))
+    assert ds.history_rows(store, "2020-01-01") == [] and ds.history_rows(store, "2099-01-01") == []
+    print(f"  OK {len(days)} date x {len(tickers)} ticker == run_daily_scan(as_of_date); "
+          f"backfill {t_fill * 1000:.0f} ms vs {t_scan:.1f} s di scansioni")
+    return store
+
+
+def test_store(ds, store, tickers, dates):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "hist.json")
+        ds.save_backfill(store, path)
+        sig = ds.backfill_signature()
+        loaded = ds.load_backfill(path, signature=sig)
+        d = dates[300]
+        assert _dump(ds.history_rows(loaded, d)) == _dump(ds.history_rows(store, d))
+
+        loaded, summary = ds.backfill_daily_scan(tickers[:1], dates[400], max_workers=1, store=loaded)
+        assert loaded["tickers"][tickers[0]]["dates"][0] == dates[400]
+        assert loaded["tickers"][tickers[1]]["dates"][0] == dates[115]
+        assert [r["ticker"] for r in ds.history_rows(loaded, dates[300])] == [
+            r["ticker"] for r in ds.history_rows(store, dates[300]) if r["ticker"] != tickers[0]]
+        assert ds.load_backfill(path, signature=ds.backfill_signature(alpha=100.0))["tickers"] == {}
+    print("  OK save/load, sostituzione per ticker, firma dei parametri")
+
+
+def main():
+    import main as backend_main
+    import daily_scan as ds
+    assert hasattr(ds, "backfill_daily_scan")  # RED: non esiste ancora
+
+    tickers = [f"TESTBF{i}" for i in range(4)]
+    for i, t in enumerate(tickers):
+        backend_main.TICKER_CACHE[t] = _entry(40 + i)
+    dates = backend_main.TICKER_CACHE[tickers[0]]["px"].index.strftime("%Y-%m-%d").tolist()
+    try:
+        store = test_parity(ds, backend_main, tickers, dates)
+        test_store(ds, store, tickers, dates)
+    finally:
+        for t in tickers:
+            backend_main.TICKER_CACHE.pop(t, None)
+            backend_main.PRICE_CACHE.pop(f"{t}|{START}", None)
+    print("OK test_scan_backfill — stato di ogni giorno da un passaggio per ticker")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Test per lo stato persistente della scansione incrementale (signal_state.py).
+
+Proprietà verificate:
+1. Stato costruito su un prefisso e fatto avanzare barra per barra (con
+   round-trip JSON a ogni "sera") == replay completo: signal_events delle
+   ultime TAIL barre e trade OPEN identici a backtest_stable /
+   backtest_potential_discharge / backtest_combo, per STABLE (LONG/BOTH),
+   ARANCIONE e COMBO; eventi e onset salvati restano limitati alla coda.
+2. analyze_ticker_signals con state_store == senza (entries/active; lo z
+   del potenziale riportato può differire di ~1e-12).
+3. Prezzi storici cambiati (rettifica), parametri diversi o prima barra
+   diversa (finestra mobile) -> replay completo; tempo dell'aggiornamento
+   di una barra stampato accanto a quello del replay.
+4. Finestra mobile come la scansione normale: con state_store il report
+   resta == analyze_ticker_signals senza stato; run_stable_scan con
+   incremental_state scarica dall'ancora fissa start_date della config.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_signal_state.py
+"""
+import sys
+import os
+import json
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+CONFIGS = [("STABLE", "LONG"), ("STABLE", "BOTH"), ("ARANCIONE", "LONG"), ("COMBO", "LONG")]
+
+
+def _px(seed, n=560):
+    rng = np.random.default_rng(seed)
+    return pd.Series(50 * np.exp(np.cumsum(rng.normal(0.0002, 0.025, n))),
+                     index=pd.date_range("2023-01-02", periods=n, freq="B"))
+
+
+def _params(strategy, mode):
+    return dict(strategy=strategy, alpha=200, mode=mode, entry_threshold=0.01,
+                exit_threshold=-0.01, entry_z=1.5, horizon=10)
+
+
+def _full_replay(px, p):
+    from stable_strategy import backtest_stable, backtest_potential_discharge, backtest_combo
+    from walk_forward import prepare_series
+
+    s = prepare_series(px, p["alpha"], p["strategy"])
+    if p["strategy"] == "STABLE":
+        return backtest_stable(s["dates"], s["prices"], s["slopes"], mode=p["mode"],
+                               entry_th=p["entry_threshold"], exit_th=p["exit_threshold"])
+    if p["strategy"] == "ARANCIONE":
+        return backtest_potential_discharge(s["dates"], s["prices"], s["pot"], s["F"],
+                                            entry_z=p["entry_z"], horizon=p["horizon"])
+    return backtest_combo(s["dates"], s["prices"], s["slopes"], s["pot"], s["F"],
+                          entry_th=p["entry_threshold"], exit_th=p["exit_threshold"],
+                          entry_z=p["entry_z"], horizon=p["horizon"])
+
+
+def test_incremental_equals_replay(ss):
+    for strategy, mode in CONFIGS:
+        p = _params(strategy, mode)
+        for seed in (0, 1):
+            px = _px(seed)
+            st = ss.build_state(px.iloc[:400], **p)
+            for end in range(401, len(px) + 1, 1 + seed):   # seed 1: due barre per sera
+                st = json.loads(json.dumps(st))          # persistenza tra una sera e l'altra
+                st = ss.advance_state(st, px.iloc[:end])
+                assert st is not None and st["n"] == end
+                assert len(st["exec"]["events"]) <= 2 * ss.TAIL and "trades" not in st["exec"]
+                assert all(o >= end - ss.TAIL - p["horizon"] for o in st["onsets"])
+                if end % 40 == 0 or end >= len(px) - 1:
+                    ref = _full_replay(px.iloc[:end], p)
+                    view = ss.state_view(st)["res"]
+                    recent = [e for e in ref["signal_events"] if e["signal_index"] >= end - ss.TAIL]
+                    assert view["signal_events"] == recent, f"{strategy}/{mode} eventi @ {end}"
+                    assert view["trades"] == [t for t in ref["trades"] if t["exit_date"] == "OPEN"], \
+                        f"{strategy}/{mode} trade @ {end}"
+        print(f"  OK {strategy}/{mode}: stato incrementale == replay completo "
+              f"({len(view['signal_events'])} eventi recenti, {len(view['trades'])} trade aperti)")
+
+
+def _same_report(a, b):
+    assert len(a["entries"]) == len(b["entries"]) and a["active"] == b["active"]
+    for x, y in zip(a["entries"], b["entries"]):
+        assert abs(x.pop("slope") - y.pop("slope")) < 1e-9
+        assert x == y
+
+
+def test_analyze_ticker(ss):
+    from stable_scanner import analyze_ticker_signals
+
+    for strategy, mode in CONFIGS:
+        p = _params(strategy, mode)
+        px = _px(3)
+        store = {}
+        for end in list(range(450, len(px), 3)) + [len(px)]:
+            sub = px.iloc[:end]
+            today = sub.index[-1].date()
+            store = json.loads(json.dumps(store))
+            a = analyze_ticker_signals("X", sub, today, state_store=store, **p)
+            b = analyze_ticker_signals("X", sub, today, **p)
+            _same_report(a, b)
+        assert store["X"]["n"] == len(px)
+    print("  OK analyze_ticker_signals con state_store == replay completo")
+
+
+def test_rebuild_and_speed(ss):
+    p = _params("COMBO", "LONG")
+    px = _px(4)
+    st = ss.build_state(px.iloc[:-1], **p)
+    adjusted = px * 0.98                                  # rettifica dividendi: storia cambiata
+    assert ss.advance_state(json.loads(json.dumps(st)), adjusted) is None
+    rebuilt = ss.resume_or_build(json.loads(json.dumps(st)), adjusted, **p)
+    assert rebuilt["last_price"] == float(adjusted.iloc[-1]) and rebuilt["n"] == len(px)
+    other = ss.resume_or_build(json.loads(json.dumps(st)), px, **{**p, "horizon": 21})
+    assert other["params"]["horizon"] == 21
+    assert ss.advance_state(json.loads(json.dumps(st)), px.iloc[1:]) is None, "finestra spostata ripresa"
+    assert ss.advance_state(json.loads(json.dumps(st)), px) is not None
+
+    t0 = time.perf_counter()
+    for _ in range(5):
+        ss.resume_or_build(json.loads(json.dumps(st)), px, **p)
+    t_inc = (time.perf_counter() - t0) / 5
+    t0 = time.perf_counter()
+    _full_replay(px, p)
+    t_full = time.perf_counter() - t0
+    print(f"  OK rettifica/parametri -> replay; 1 barra nuova {t_inc * 1000:.1f} ms "
+          f"vs replay {t_full * 1000:.1f} ms")
+
+
+def test_rolling_window(ss):
+    import stable_scanner
+    import signal_state
+    from stable_scanner import analyze_ticker_signals
+
+    px = _px(5, n=700)
+    window = 450
+    for strategy, mode in CONFIGS:
+        p = _params(strategy, mode)
+        store = {}
+        for end in range(window, len(px) + 1, 7):
+            sub = px.iloc[end - window:end]                  # finestra mobile: l'inizio avanza
+            today = sub.index[-1].date()
+            store = json.loads(json.dumps(store))
+            a = analyze_ticker_signals("X", sub, today, state_store=store, **p)
+            b = analyze_ticker_signals("X", sub, today, **p)
+            _same_report(a, b)
+            # anche lo stato == replay della finestra (trade aperti, capitale, eventi)
+            ref = _full_replay(sub, p)
+            view = ss.state_view(store["X"])["res"]
+            assert view["trades"] == [t for t in ref["trades"] if t["exit_date"] == "OPEN"], end
+            assert view["signal_events"] == [e for e in ref["signal_events"]
+                                             if e["signal_index"] >= window - ss.TAIL], end
+
+    # run_stable_scan incrementale: start_date fisso della config, non la finestra mobile
+    seen = {}
+
+    def fake_compute(**kw):
+        seen.update(kw)
+        return {"entries_today": [], "entries_recent": [], "active": [], "errors": []}
+
+    real = (stable_scanner.load_config, stable_scanner.compute_stable_signals,
+            signal_state.load_states, signal_state.save_states)
+    cfg = {**stable_scanner.DEFAULT_CONFIG, "tickers": ["X"], "forward_test": False,
+           "start_date": "2021-06-01"}
+    stable_scanner.load_config = lambda: dict(cfg)
+    stable_scanner.compute_stable_signals = fake_compute
+    signal_state.load_states = lambda path=None: {}
+    signal_state.save_states = lambda states, path=None: None
+    try:
+        stable_scanner.run_stable_scan(send_email=False)
+        assert seen["start_date"] is None and seen["state_store"] is None
+        cfg["incremental_state"] = True
+        stable_scanner.run_stable_scan(send_email=False)
+        assert seen["start_date"] == "2021-06-01" and seen["state_store"] == {}
+    finally:
+        (stable_scanner.load_config, stable_scanner.compute_stable_signals,
+         signal_state.load_states, signal_state.save_states) = real
+    print("  OK finestra mobile: report con stato == senza; incrementale ancorato a start_date")
+
+
+def main():
+    import signal_state as ss  # RED: non esiste ancora
+
+    test_incremental_equals_replay(ss)
+    test_analyze_ticker(ss)
+    test_rebuild_and_speed(ss)
+    test_rolling_window(ss)
+    print("OK test_signal_state — stato incrementale == replay, persistenza JSON, ricostruzione")
+
+
+if __name__ == "__main__":
+    main()
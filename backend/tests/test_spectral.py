@@ -0,0 +1,118 @@
+"""
+Test per lo spettro a finestra mobile (spectral.py).
+
+Proprietà verificate:
+1. SlidingSpectrum: dopo centinaia di push (con ancoraggi) trend e DFT del
+   residuo == polyfit + rfft sulla finestra; engine() dà le stesse
+   componenti e gli stessi scenari di FourierEngine.
+2. spectrum_history == FourierEngine(px[:t+1]).get_components() per ogni
+   data (stesse frequenze, ampiezze/fasi entro 1e-9), anche con finestra
+   incompleta e range start/end.
+3. Argomenti non validi -> ValueError. I tempi (storico vs un
+   FourierEngine per giorno) sono solo stampati: nessun assert sul clock.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_spectral.py
+"""
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+
+def _px(seed=1, n=1300):
+    rng = np.random.default_rng(seed)
+    t = np.arange(n)
+    lp = np.cumsum(rng.normal(0.0002, 0.015, n)) + 0.05 * np.sin(2 * np.pi * t / 63)
+    return pd.Series(50 * np.exp(lp), index=pd.date_range("2019-01-01", periods=n, freq="B"))
+
+
+def _same_components(ref, got, tol=1e-9):
+    assert [c["frequency"] for c in ref] == [c["frequency"] for c in got]
+    assert [c["period"] for c in ref] == [c["period"] for c in got]
+    for a, b in zip(ref, got):
+        assert abs(a["amplitude"] - b["amplitude"]) < tol
+        assert abs(np.angle(np.exp(1j * (a["phase"] - b["phase"])))) < tol
+
+
+def test_sliding(sp):
+    from logic import FourierEngine
+
+    px = _px()
+    lp = np.log(px.values)
+    N = 252
+    s = sp.SlidingSpectrum(N, anchor_every=100)
+    s.reset(lp[:N])
+    for t in range(N, len(px)):
+        s.push(lp[t])
+        if t % 97 == 0 or t == len(px) - 1:
+            win = px.iloc[t - N + 1:t + 1]
+            ref = FourierEngine(win, top_k=5, window_size=N)
+            eng = s.engine(win, top_k=5)
+            assert np.allclose(eng.coef, ref.coef, rtol=0, atol=1e-12)
+            assert np.allclose(eng.F, ref.F, rtol=0, atol=1e-9)
+            _same_components(ref.get_components(), eng.get_components())
+            a, b = ref.reconstruct_scenario(30)[1], eng.reconstruct_scenario(30)[1]
+            assert np.allclose(a, b, rtol=1e-10, atol=0)
+    print(f"  OK SlidingSpectrum: {len(px) - N} push == polyfit + rfft, engine == FourierEngine")
+
+
+def test_history(sp):
+    from logic import FourierEngine
+
+    px = _px(seed=2)
+    N, K = 504, 5
+    t0 = time.perf_counter()
+    h = sp.spectrum_history(px, window=N, top_k=K)
+    t_hist = time.perf_counter() - t0
+    assert h["dates"][0] == px.index[N - 1].strftime("%Y-%m-%d")
+    assert len(h["dates"]) == len(h["components"]) == len(px) - N + 1
+
+    checked = 0
+    t0 = time.perf_counter()
+    for i in range(0, len(h["dates"]), 3):
+        t = N - 1 + i
+        ref = FourierEngine(px.iloc[:t + 1], top_k=K, window_size=N).get_components()
+        _same_components(ref, h["components"][i])
+        assert h["dominant_period"][i] == ref[0]["period"]
+        checked += 1
+    t_direct = (time.perf_counter() - t0) * 3
+
+    # range esplicito che parte con la finestra incompleta
+    dates = px.index.strftime("%Y-%m-%d").tolist()
+    h2 = sp.spectrum_history(px, window=N, top_k=3, start_date=dates[480], end_date=dates[560])
+    assert h2["dates"] == dates[480:561]
+    for i, d in enumerate(h2["dates"]):
+        t = 480 + i
+        _same_components(FourierEngine(px.iloc[:t + 1], top_k=3, window_size=N).get_components(),
+                         h2["components"][i])
+    print(f"  OK storico {len(h['dates'])} date == FourierEngine per giorno ({checked} controllate): "
+          f"{t_hist * 1000:.0f} ms vs ~{t_direct * 1000:.0f} ms")
+
+
+def test_errors(sp):
+    for call in (lambda: sp.SlidingSpectrum(2), lambda: sp.SlidingSpectrum(10).push(1.0),
+                 lambda: sp.SlidingSpectrum(10).reset(np.zeros(5)),
+                 lambda: sp.spectrum_history(_px(n=50), window=10, top_k=0)):
+        try:
+            call()
+        except ValueError:
+            continue
+        raise AssertionError("atteso ValueError")
+    print("  OK argomenti non validi -> ValueError")
+
+
+def main():
+    import spectral as sp  # RED: non esiste ancora
+
+    test_sliding(sp)
+    test_history(sp)
+    test_errors(sp)
+    print("OK test_spectral — sliding DFT == polyfit + rfft, storico delle componenti")
+
+
+if __name__ == "__main__":
+    main()
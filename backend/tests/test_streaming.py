@@ -0,0 +1,179 @@
+"""
+Test per le risposte in streaming (streaming.py, /scan/stream,
+/analyze-batch-stable/stream).
+
+Proprietà verificate:
+1. /scan/stream NDJSON: un evento "result" per titolo con lo stesso oggetto
+   di /scan, poi "end" col conteggio; SSE con Accept: text/event-stream;
+   format non valido -> 400.
+2. Progressivo: il primo risultato arriva molto prima della fine della
+   scansione; con progress=True anche gli eventi "progress".
+3. Client che chiude lo stream: il motore si ferma (titoli in coda non
+   scaricati).
+4. /analyze-batch-stable/stream: righe == results[ticker] della risposta
+   unica, "end" con count_ok/count_err; collect=False non accumula.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_streaming.py
+"""
+import sys
+import os
+import json
+import time
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+import httpx
+
+
+def _series(seed, n=320):
+    rng = np.random.default_rng(seed)
+    return pd.Series(30 * np.exp(np.cumsum(rng.normal(0.0003, 0.02, n))),
+                     index=pd.date_range("2024-01-01", periods=n, freq="B"))
+
+
+def _fake_market_data(fetched, delay=0.0):
+    class FakeMarketData:
+        def __init__(self, ticker, start_date=None, end_date=None):
+            self.ticker, self.start = ticker, start_date
+
+        def fetch(self):
+            fetched.append(self.ticker)
+            time.sleep(delay)
+            px = _series(int(self.ticker[4:]))
+            if self.start:
+                px = px[px.index >= pd.Timestamp(self.start)]
+            return px
+    return FakeMarketData
+
+
+async def _post(app, path, body, headers=None):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=60) as c:
+        return await c.post(path, json=body, headers=headers or {})
+
+
+def _sse(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append({"type": lines["event"], "data": json.loads(lines["data"])})
+    return events
+
+
+def _key(row):
+    import fastjson
+    return json.dumps(json.loads(fastjson.dumps(row)), sort_keys=True)
+
+
+def test_scan_stream(backend_main):
+    tickers = [f"TSTR{i}" for i in range(8)]
+    ref = asyncio.run(_post(backend_main.app, "/scan", {"tickers": tickers})).json()
+    assert ref["status"] == "ok" and len(ref["results"]) == len(tickers)
+
+    res = asyncio.run(_post(backend_main.app, "/scan/stream", {"tickers": tickers}))
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in res.text.splitlines()]
+    rows = [e["data"] for e in events if e["type"] == "result"]
+    assert sorted(map(_key, rows)) == sorted(map(_key, ref["results"]))
+    assert events[-1] == {"type": "end", "data": {"status": "ok", "count": len(tickers), "requested": len(tickers)}}
+
+    res = asyncio.run(_post(backend_main.app, "/scan/stream", {"tickers": tickers[:3]},
+                            headers={"Accept": "text/event-stream"}))
+    assert res.headers["content-type"].startswith("text/event-stream")
+    events = _sse(res.text)
+    assert [e["type"] for e in events] == ["result"] * 3 + ["end"]
+
+    res = asyncio.run(_post(backend_main.app, "/scan/stream?format=xml", {"tickers": tickers}))
+    assert res.status_code == 400
+    print(f"  OK /scan/stream NDJSON e SSE == /scan ({len(rows)} titoli), format errato -> 400")
+
+
+def _scan_body(tickers):
+    from logic import MarketScanner
+
+    def body(stream):
+        MarketScanner(tickers).scan(on_result=stream.result, on_progress=stream.progress, collect=False)
+        return {}
+    return body
+
+
+async def _consume(gen, stop_after=None):
+    t0 = time.perf_counter()
+    first, events = None, []
+    async for chunk in gen:
+        ev = json.loads(chunk)
+        events.append(ev)
+        if ev["type"] == "result" and first is None:
+            first = time.perf_counter() - t0
+        if stop_after and sum(e["type"] == "result" for e in events) >= stop_after:
+            await gen.aclose()
+            break
+    return first, time.perf_counter() - t0, events
+
+
+def test_progressive(streaming, logic, fetched):
+    tickers = [f"TSTR{i}" for i in range(20)]
+    logic.MarketData = _fake_market_data(fetched, delay=0.05)
+    first, total, events = asyncio.run(_consume(
+        streaming.event_stream("scan", _scan_body(tickers), progress=True)))
+    kinds = [e["type"] for e in events]
+    assert kinds.count("result") == 20 and kinds.count("progress") == 20 and kinds[-1] == "end"
+    assert first < total / 2, (first, total)
+    print(f"  OK primo risultato dopo {first * 1000:.0f} ms su {total * 1000:.0f} ms, eventi progress")
+
+    fetched.clear()
+    tickers = [f"TSTR{i}" for i in range(60)]
+    _, _, events = asyncio.run(_consume(streaming.event_stream("scan", _scan_body(tickers)), stop_after=2))
+    time.sleep(0.5)
+    n = len(fetched)
+    time.sleep(0.3)
+    assert len(fetched) == n < 20, len(fetched)
+    print(f"  OK client chiuso dopo 2 risultati: motore fermo a {n}/60 download")
+
+
+def test_batch_stream(backend_main):
+    from main import analyze_batch_stable, _analyze_batch_stable, BatchStableRequest
+
+    tickers = [f"TSTR{i}" for i in range(6)]
+    body = {"tickers": tickers, "start_date": "2024-01-01", "max_workers": 3}
+    ref = analyze_batch_stable(BatchStableRequest(**body))
+    res = asyncio.run(_post(backend_main.app, "/analyze-batch-stable/stream", body))
+    events = [json.loads(line) for line in res.text.splitlines()]
+    rows = {e["data"]["ticker"]: e["data"] for e in events if e["type"] == "result"}
+    assert set(rows) == set(tickers)
+    for t in tickers:
+        assert _key({"ticker": t, **ref["results"][t]}) == _key(rows[t]), t
+    end = events[-1]["data"]
+    assert events[-1]["type"] == "end" and end["count_ok"] == 6 and end["count_err"] == 0
+
+    seen = []
+    out = _analyze_batch_stable(BatchStableRequest(**body), collect=False, on_result=lambda t, r: seen.append(t))
+    assert out["results"] == {} and out["count_ok"] == 6 and sorted(seen) == sorted(tickers)
+    for t in tickers:
+        backend_main.PRICE_CACHE.pop(f"{t}|2024-01-01", None)
+    print("  OK /analyze-batch-stable/stream == risposta unica, collect=False non accumula")
+
+
+def main():
+    import main as backend_main
+    import logic
+    import streaming  # RED: non esiste ancora
+
+    fetched = []
+    real = (logic.MarketData, backend_main.MarketData)
+    logic.MarketData = backend_main.MarketData = _fake_market_data(fetched)
+    try:
+        test_scan_stream(backend_main)
+        test_progressive(streaming, logic, fetched)
+        logic.MarketData = backend_main.MarketData = _fake_market_data(fetched)
+        test_batch_stream(backend_main)
+    finally:
+        logic.MarketData, backend_main.MarketData = real
+    print("OK test_streaming — risultati per ticker appena pronti, NDJSON/SSE, stop alla disconnessione")
+
+
+if __name__ == "__main__":
+    main()
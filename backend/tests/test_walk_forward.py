@@ -0,0 +1,140 @@
+"""
+Test per il motore walk-forward (walk_forward.py).
+
+Proprietà verificate:
+1. run_segment (serie tagliata sul segmento) == motore unificato con
+   start_date/end_date sull'intera serie, per STABLE, ARANCIONE e COMBO.
+2. Fold rolling/anchored: test contigui e mai sovrapposti al train.
+3. Selezione in-sample == argmax brute-force della media dell'obiettivo;
+   process pool == sequenziale; equity OOS concatenata coerente.
+4. Richieste sequenziali concorrenti (thread del server) con universi
+   diversi: ognuna == eseguita da sola, nessun dato lasciato in globali.
+
+Esecuzione: backend/venv/bin/python backend/tests/test_walk_forward.py
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np
+import pandas as pd
+
+
+def _universe(n_tickers=3, n=900):
+    out = {}
+    for k in range(n_tickers):
+        rng = np.random.default_rng(20 + k)
+        vals = 50 * np.exp(np.cumsum(rng.normal(0.0003, 0.016, n)))
+        # ticker con storia più corta: calendario unione non uniforme
+        start = 40 * k
+        out[f"WF{k}"] = pd.Series(vals[start:], index=pd.date_range("2020-01-01", periods=n, freq="B")[start:])
+    return out
+
+
+def test_segment_equivalence(wf):
+    from stable_strategy import backtest_stable, backtest_potential_discharge, backtest_combo
+
+    px = _universe(1)["WF0"]
+    start, end = "2021-03-01", "2022-06-30"
+    for strategy in ("STABLE", "ARANCIONE", "COMBO"):
+        s = wf.prepare_series(px, 200.0, strategy)
+        params = {"alpha": 200.0, "entry": 0.02, "exit": -0.01, "entry_z": 1.5, "horizon": 15}
+        _, seg = wf.run_segment("WF0", s, strategy, params, start, end)
+        if strategy == "STABLE":
+            ref = backtest_stable(s["dates"], s["prices"], s["slopes"], entry_th=0.02, exit_th=-0.01,
+                                  start_date=start, end_date=end)
+        elif strategy == "ARANCIONE":
+            ref = backtest_potential_discharge(s["dates"], s["prices"], s["pot"], s["F"], entry_z=1.5,
+                                               horizon=15, start_date=start, end_date=end)
+        else:
+            ref = backtest_combo(s["dates"], s["prices"], s["slopes"], s["pot"], s["F"],
+                                 entry_th=0.02, exit_th=-0.01, entry_z=1.5, horizon=15,
+                                 start_date=start, end_date=end)
+        assert seg["trades"] == ref["trades"], f"{strategy}: trade diversi"
+        assert seg["stats"] == ref["stats"], f"{strategy}: stats diverse"
+        print(f"  OK {strategy}: segmento == start/end_date ({len(seg['trades'])} trade)")
+
+
+def test_folds(wf):
+    cal = [f"d{i:04d}" for i in range(1000)]
+    rolling = wf.make_folds(cal, train_bars=500, test_bars=100)
+    anchored = wf.make_folds(cal, train_bars=500, test_bars=100, anchored=True)
+    assert len(rolling) == 5
+    for a, b in zip(rolling, rolling[1:]):
+        assert cal.index(b["test_start"]) == cal.index(a["test_end"]) + 1, "test non contigui"
+    for f in rolling + anchored:
+        assert f["train_end"] < f["test_start"], "train sovrapposto al test"
+    assert all(f["train_start"] == cal[0] for f in anchored)
+    assert rolling[2]["train_start"] == cal[200]
+    overlap = wf.make_folds(cal, train_bars=500, test_bars=100, step_bars=50)
+    assert len(overlap) == 10 and overlap[1]["test_start"] == cal[550]
+    for bad in ({"train_bars": 0}, {"test_bars": -5}, {"step_bars": -1}, {"step_bars": 0}):
+        try:
+            wf.make_folds(cal, **{"train_bars": 500, "test_bars": 100, **bad})
+        except ValueError:
+            continue
+        raise AssertionError(f"fold non validi accettati: {bad}")
+    print(f"  OK fold: {len(rolling)} rolling / anchored, test contigui, barre <= 0 -> ValueError")
+
+
+def test_selection_and_pool(wf):
+    prices = _universe()
+    grid = {"alpha": [100.0, 200.0], "entry": [0.0, 0.03], "exit": [0.0, -0.02]}
+    kw = dict(strategy="STABLE", grid=grid, train_bars=300, test_bars=150)
+    seq = wf.walk_forward(prices, max_workers=1, **kw)
+    pooled = wf.walk_forward(prices, max_workers=2, **kw)
+    assert seq == pooled, "process pool != sequenziale"
+
+    combos = wf.param_grid("STABLE", grid)
+    data = {a: {t: wf.prepare_series(px, a) for t, px in prices.items()} for a in (100.0, 200.0)}
+    for f in seq["folds"]:
+        scores = []
+        for p in combos:
+            vals = [wf.run_segment(t, s, "STABLE", p, f["train_start"], f["train_end"])[1]["stats"]["total_return"]
+                    for t, s in data[p["alpha"]].items()
+                    if wf.run_segment(t, s, "STABLE", p, f["train_start"], f["train_end"]) is not None]
+            scores.append(np.mean(vals))
+        assert f["params"] == combos[int(np.argmax(scores))], f"fold {f['fold']}: selezione IS errata"
+
+    n_test = sum(1 for d in sorted({d for s in data[200.0].values() for d in s["dates"]})
+                 if d >= seq["folds"][0]["test_start"])
+    assert len(seq["stitched_oos"]) == n_test, "equity OOS concatenata incompleta"
+    assert seq["stitched_oos"][-1]["equity"] == seq["oos_total_return"]
+
+    # test sovrapposti (step < test): ogni data OOS una sola volta, in ordine
+    over = wf.walk_forward(prices, max_workers=1, step_bars=50, **kw)
+    dates = [p["date"] for p in over["stitched_oos"]]
+    assert dates == sorted(set(dates)) and len(dates) == n_test, "date OOS ripetute"
+    assert over["stitched_oos"][-1]["equity"] == over["oos_total_return"]
+    print(f"  OK {len(seq['folds'])} fold, selezione IS == brute-force, pool == seq, "
+          f"OOS {seq['oos_total_return']}%, cambi parametri {seq['stability']['changes']}")
+
+
+def test_concurrent_requests(wf):
+    import concurrent.futures
+
+    kw = dict(strategy="ARANCIONE", grid={"entry_z": [1.5, 2.0], "horizon": [10]},
+              train_bars=300, test_bars=150, max_workers=1)
+    universes = [_universe(2), {t: px * 1.5 + 20 for t, px in _universe(3, n=800).items()}]
+    alone = [wf.walk_forward(u, **kw) for u in universes]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as ex:
+        futures = [ex.submit(wf.walk_forward, universes[k % 2], **kw) for k in range(8)]
+        for k, fut in enumerate(futures):
+            assert fut.result() == alone[k % 2], f"richiesta {k}: risultato di un altro universo"
+    assert wf._WF_DATA is None and not wf._POS_CACHE, "universo rimasto nelle globali del server"
+    print("  OK 8 richieste sequenziali concorrenti == singole, globali del server vuote")
+
+
+def main():
+    import walk_forward as wf  # RED: non esiste ancora
+
+    test_segment_equivalence(wf)
+    test_folds(wf)
+    test_selection_and_pool(wf)
+    test_concurrent_requests(wf)
+    print("OK test_walk_forward — segmenti esatti, fold, selezione IS, stitching OOS")
+
+
+if __name__ == "__main__":
+    main()
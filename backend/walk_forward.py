@@ -0,0 +1,299 @@
+"""
+Walk-forward optimization (robustezza dei parametri) lato backend.
+
+Il Lab fa un solo split train/OOS (getTrainFrac, splitDate). Qui la storia
+comune del paniere viene divisa in FOLD successivi:
+
+    rolling : |--- train ---|-- test --|
+                  |--- train ---|-- test --|
+    anchored: |--- train -------|-- test --|   (train parte sempre dall'inizio)
+
+Per ogni fold: la griglia di parametri si valuta SOLO sul train (media
+sui ticker dell'obiettivo, come runGridSearch del Lab), il migliore viene
+eseguito sul test successivo, mai visto. Le curve OOS dei fold si
+concatenano (stitched) in un'unica equity out-of-sample, e per ogni fold si
+riporta il parametro scelto: se cambia a ogni fold la configurazione non è
+robusta.
+
+Tutto è causale: slope (EMA), potenziale (Kalman point-in-time) e
+posizioni ARANCIONE/COMBO si calcolano una volta sull'intera serie, poi il
+backtest gira solo sulla finestra del segmento (backtest_stable con il
+segmento tagliato == backtest_stable con start_date/end_date). I fold sono
+distribuiti su un ProcessPool; i dati dei ticker arrivano ai worker una
+volta sola (initializer), non a ogni fold.
+"""
+import itertools
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+import pandas as pd
+
+STRATEGIES = ("STABLE", "ARANCIONE", "COMBO")
+# statistiche di backtest_stable usabili come criterio di selezione in-sample
+OBJECTIVES = ("total_return", "sharpe", "profit_factor", "win_rate", "avg_trade_pct")
+
+# griglia usata quando un asse non viene specificato
+DEFAULT_GRID = {
+    "alpha": [200.0],
+    "entry": [0.0],
+    "exit": [0.0],
+    "entry_z": [2.0],
+    "horizon": [21],
+}
+
+# Solo nei processi worker del pool (initializer): il percorso sequenziale
+# passa dati e cache esplicitamente, così richieste concorrenti nel server
+# non si sovrascrivono e l'universo non resta vivo dopo la richiesta.
+_WF_DATA = None     # {alpha: {ticker: serie preparata}}
+_POS_CACHE = {}     # cache posizioni ARANCIONE per (ticker, alpha, entry_z, horizon)
+
+
+def prepare_series(px, alpha, strategy="STABLE"):
+    """
+    Serie causali per un ticker, come in analyze_ticker_signals
+    (stable_scanner): slope STABLE per l'alpha, e per ARANCIONE/COMBO
+    potenziale Kalman point-in-time (NaN nei primi 100) + fondamentale EMA20.
+    """
+    from logic import kalman_frozen_series
+
+    ema_span = max(5, int(alpha / 10))
+    F_alpha = px.ewm(span=ema_span, adjust=False).mean()
+    slopes = F_alpha.diff().fillna(0).ewm(span=14, adjust=False).mean()
+    out = {
+        "dates": [d.strftime("%Y-%m-%d") for d in px.index],
+        "prices": [float(v) for v in px.values],
+        "slopes": [float(v) for v in slopes.values],
+    }
+    if strategy in ("ARANCIONE", "COMBO") and len(px) > 110:
+        fr = kalman_frozen_series(px, alpha=alpha, beta=1.0, min_points=100, kin_lag=25)
+        out["pot"] = ([float("nan")] * 100 + list(fr["pot_last"]))[:len(px)]
+        out["F"] = px.ewm(span=20, adjust=False).mean().values.tolist()
+    return out
+
+
+def param_grid(strategy, grid):
+    """Combinazioni di parametri rilevanti per la strategia (lista di dict)."""
+    keys = {"STABLE": ("alpha", "entry", "exit"),
+            "ARANCIONE": ("alpha", "entry_z", "horizon"),
+            "COMBO": ("alpha", "entry", "exit", "entry_z", "horizon")}[strategy]
+    axes = [list((grid or {}).get(k) or DEFAULT_GRID[k]) for k in keys]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*axes)]
+
+
+def check_fold_sizes(train_bars, test_bars, step_bars=None):
+    """ValueError se train/test/step (None = test_bars) non sono barre > 0."""
+    sizes = {"train_bars": train_bars, "test_bars": test_bars,
+             "step_bars": test_bars if step_bars is None else step_bars}
+    bad = {k: v for k, v in sizes.items() if int(v) < 1}
+    if bad:
+        raise ValueError(f"train_bars, test_bars e step_bars devono essere >= 1: {bad}")
+
+
+def make_folds(calendar, train_bars=504, test_bars=126, step_bars=None, anchored=False):
+    """
+    Fold sul calendario (date ordinate). Returns: lista di dict con
+    train_start, train_end, test_start, test_end (date incluse). Con
+    step_bars < test_bars i test dei fold si sovrappongono (lo stitching
+    usa di ciascuno solo le date fino al test_start del successivo).
+    """
+    check_fold_sizes(train_bars, test_bars, step_bars)
+    step = int(test_bars if step_bars is None else step_bars)
+    folds = []
+    split = int(train_bars)
+    while split < len(calendar):
+        test_end = min(split + int(test_bars), len(calendar)) - 1
+        train_start = 0 if anchored else split - int(train_bars)
+        folds.append({
+            "fold": len(folds),
+            "train_start": calendar[train_start],
+            "train_end": calendar[split - 1],
+            "test_start": calendar[split],
+            "test_end": calendar[test_end],
+        })
+        split += step
+    return folds
+
+
+def _positions_signal(ticker, series, strategy, params, pos_cache=None):
+    """
+    Pseudo-slope (pos-0.5) ARANCIONE/COMBO sull'intera serie (causale).
+    pos_cache: dict della richiesta per riusare le posizioni arancione
+    tra fold e combinazioni (None = nessuna cache).
+    """
+    from stable_strategy import potential_discharge_positions, combo_positions
+
+    key = (ticker, params["alpha"], params["entry_z"], params["horizon"])
+    d_pos = pos_cache.get(key) if pos_cache is not None else None
+    if d_pos is None:
+        d_pos, _ = potential_discharge_positions(series["prices"], series["pot"], series["F"],
+                                                 entry_z=params["entry_z"],
+                                                 horizon=params["horizon"])
+        if pos_cache is not None:
+            pos_cache[key] = d_pos
+    pos = d_pos if strategy == "ARANCIONE" else combo_positions(
+        series["slopes"], params["entry"], params["exit"], d_pos)
+    return [p - 0.5 for p in pos]
+
+
+def run_segment(ticker, series, strategy, params, start, end, mode="LONG", cost_pct=0.0,
+                pos_cache=None):
+    """
+    backtest_stable del ticker sul segmento [start, end] (date incluse).
+    Returns: (dates del segmento, risultato backtest) oppure None se il
+    ticker non ha barre nel segmento. Trade ed eventi restano RecordLog
+    (columnar): il walk-forward legge solo stats ed equity.
+    """
+    from stable_strategy import backtest_stable
+
+    dates = series["dates"]
+    lo, hi = bisect_left(dates, start), bisect_right(dates, end)
+    if hi - lo < 2:
+        return None
+    if strategy == "STABLE":
+        slopes, seg_mode = series["slopes"], mode
+        entry_th, exit_th = params["entry"], params["exit"]
+    else:
+        if "pot" not in series:
+            return None
+        slopes, seg_mode, entry_th, exit_th = (
+            _positions_signal(ticker, series, strategy, params, pos_cache), "LONG", 0.4, 0.0)
+    res = backtest_stable(dates[lo:hi], series["prices"][lo:hi], slopes[lo:hi],
+                          mode=seg_mode, entry_th=entry_th, exit_th=exit_th,
+                          execution_lag=1, cost_pct=cost_pct, columnar=True)
+    return dates[lo:hi], res
+
+
+def _init_worker(data):
+    global _WF_DATA
+    _WF_DATA = data
+    _POS_CACHE.clear()
+
+
+def _run_fold(fold, strategy, grid, objective, mode, cost_pct, data=None, pos_cache=None):
+    """Un fold; data/pos_cache None = globali del processo worker (_init_worker)."""
+    if data is None:
+        data, pos_cache = _WF_DATA, _POS_CACHE
+    # --- IN-SAMPLE: migliore combinazione per media dell'obiettivo ---
+    best, best_score, is_table = None, None, []
+    for params in grid:
+        scores = []
+        for ticker, series in data[params["alpha"]].items():
+            r = run_segment(ticker, series, strategy, params,
+                            fold["train_start"], fold["train_end"], mode, cost_pct, pos_cache)
+            if r is not None:
+                scores.append(r[1]["stats"][objective])
+        if not scores:
+            continue
+        score = float(np.mean(scores))
+        is_table.append({**params, "score": round(score, 4)})
+        if best_score is None or score > best_score:
+            best, best_score = params, score
+    if best is None:
+        return {**fold, "params": None}
+
+    # --- OUT-OF-SAMPLE: il migliore sul test mai visto ---
+    curves, oos = [], {}
+    for ticker, series in data[best["alpha"]].items():
+        r = run_segment(ticker, series, strategy, best,
+                        fold["test_start"], fold["test_end"], mode, cost_pct, pos_cache)
+        if r is None:
+            continue
+        seg_dates, res = r
+        oos[ticker] = res["stats"]
+        curves.append(pd.Series(res["equity_curve"], index=seg_dates, name=ticker))
+
+    # portafoglio equipesato: media delle equity % dei ticker (ffill sui buchi)
+    port = pd.concat(curves, axis=1).sort_index().ffill().fillna(0.0).mean(axis=1) if curves else None
+    is_table.sort(key=lambda r: -r["score"])
+    return {
+        **fold,
+        "params": best,
+        "is_score": round(best_score, 4),
+        "oos_score": round(float(np.mean([s[objective] for s in oos.values()])), 4) if oos else None,
+        "oos_return": round(float(port.iloc[-1]), 2) if port is not None else None,
+        "oos_positive": sum(1 for s in oos.values() if s["total_return"] > 0),
+        "n_tickers": len(oos),
+        "is_rank": is_table[:10],
+        "_curve": ([(d, float(v)) for d, v in port.items()] if port is not None else []),
+    }
+
+
+def _stability(folds, keys):
+    """Quanto sono stabili i parametri scelti tra un fold e l'altro."""
+    chosen = [f["params"] for f in folds if f.get("params")]
+    out = {"changes": sum(1 for a, b in zip(chosen, chosen[1:]) if a != b), "by_param": {}}
+    for k in keys:
+        vals = [p[k] for p in chosen]
+        counts = pd.Series(vals).value_counts() if vals else pd.Series(dtype=int)
+        mode = counts.index[0] if len(counts) else None
+        out["by_param"][k] = {
+            "values": vals,
+            "mode": mode.item() if hasattr(mode, "item") else mode,
+            "mode_share": round(float(counts.iloc[0]) / len(vals), 2) if len(counts) else 0.0,
+        }
+    decay = [f["is_score"] - f["oos_score"] for f in folds
+             if f.get("params") and f.get("oos_score") is not None]
+    out["avg_is_oos_decay"] = round(float(np.mean(decay)), 4) if decay else None
+    return out
+
+
+def walk_forward(prices, strategy="STABLE", grid=None, train_bars=504, test_bars=126,
+                 step_bars=None, anchored=False, objective="total_return",
+                 mode="LONG", cost_pct=0.0, max_workers=4):
+    """
+    prices : {ticker: pd.Series prezzi}
+    grid   : {"alpha": [...], "entry": [...], "exit": [...],
+              "entry_z": [...], "horizon": [...]} (assi mancanti = default)
+
+    Returns dict: folds (parametri scelti, score IS/OOS, ritorno OOS e
+    classifica IS per fold), stitched_oos [{date, equity}] (equity % del
+    portafoglio equipesato, fold concatenati), oos_total_return, stability.
+    """
+    import concurrent.futures
+
+    if strategy not in STRATEGIES:
+        raise ValueError(f"strategy non valida: {strategy} (attese {STRATEGIES})")
+    if objective not in OBJECTIVES:
+        raise ValueError(f"objective non valido: {objective} (attesi {OBJECTIVES})")
+    combos = param_grid(strategy, grid)
+    alphas = sorted({p["alpha"] for p in combos})
+    data = {a: {t: prepare_series(px, a, strategy) for t, px in prices.items() if len(px) > 30}
+            for a in alphas}
+    calendar = sorted({d for series in data[alphas[0]].values() for d in series["dates"]})
+    folds = make_folds(calendar, train_bars, test_bars, step_bars, anchored)
+
+    if max_workers <= 1 or len(folds) <= 1:
+        pos_cache = {}
+        results = [_run_fold(f, strategy, combos, objective, mode, cost_pct, data, pos_cache)
+                   for f in folds]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers, initializer=_init_worker, initargs=(data,)) as executor:
+            results = list(executor.map(_run_fold, folds, itertools.repeat(strategy),
+                                        itertools.repeat(combos), itertools.repeat(objective),
+                                        itertools.repeat(mode), itertools.repeat(cost_pct)))
+
+    # --- Equity OOS concatenata: ogni fold riparte dal capitale del precedente ---
+    # (test sovrapposti, step < test: del fold solo le date prima del test_start
+    #  del successivo, così ogni data compare una volta sola)
+    stitched, level = [], 1.0
+    for k, f in enumerate(results):
+        curve = f.pop("_curve", [])
+        if k + 1 < len(results):
+            curve = [(d, eq) for d, eq in curve if d < results[k + 1]["test_start"]]
+        for d, eq in curve:
+            stitched.append({"date": d, "equity": round((level * (1 + eq / 100.0) - 1) * 100, 2)})
+        if curve:
+            level *= 1 + curve[-1][1] / 100.0
+
+    return {
+        "strategy": strategy,
+        "objective": objective,
+        "anchored": anchored,
+        "n_tickers": len(data[alphas[0]]),
+        "n_combos": len(combos),
+        "folds": results,
+        "stitched_oos": stitched,
+        "oos_total_return": round((level - 1) * 100, 2),
+        "stability": _stability(results, list(combos[0].keys()) if combos else []),
+    }
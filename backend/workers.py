@@ -0,0 +1,114 @@
+"""
+Pool di lavoro per gli endpoint async (event loop libero).
+
+`/scan` e `/verify-integrity` sono `async def`: il loro corpo sincrono
+(download, MarketScanner.scan, replay di integrity.py) girava direttamente
+sull'event loop e bloccava ogni altra richiesta, file statici e /health
+compresi. Qui ogni endpoint ha un proprio ThreadPoolExecutor di `limit`
+thread (= richieste eseguite in parallelo) e una coda limitata: oltre
+`limit + max_queued` richieste in corso la chiamata fallisce subito con
+EndpointBusy invece di accodarsi all'infinito.
+
+Thread e non processi: i corpi leggono e scrivono TICKER_CACHE del
+processo server e passano quasi tutto il tempo in rete o in numpy/pandas;
+il parallelismo a processi resta dentro i motori (integrity batch,
+daily_scan). Limiti sovrascrivibili con FPR_POOL_<NOME> (es.
+FPR_POOL_SCAN=1).
+"""
+import os
+import asyncio
+import threading
+import functools
+import concurrent.futures
+
+# endpoint -> richieste eseguite in parallelo
+ENDPOINT_LIMITS = {
+    "scan": 2,                   # MarketScanner ha già 5 thread di download
+    "verify-integrity": 2,
+    "analyze-batch-stable": 2,   # solo /analyze-batch-stable/stream (streaming.py)
+}
+DEFAULT_LIMIT = 2
+MAX_QUEUED = 8  # richieste in attesa oltre il limite, poi EndpointBusy
+
+
+class EndpointBusy(RuntimeError):
+    """Troppe richieste in corso per l'endpoint (in esecuzione + in coda)."""
+
+
+def _env_limit(name, default):
+    value = os.getenv("FPR_POOL_" + name.upper().replace("-", "_"))
+    try:
+        return max(1, int(value)) if value else default
+    except ValueError:
+        print(f"⚠️ FPR_POOL_{name}={value!r} non valido: uso {default}")
+        return default
+
+
+class EndpointPool:
+    """Executor dedicato a un endpoint, con conteggio delle richieste in corso."""
+
+    def __init__(self, name, limit, max_queued=MAX_QUEUED):
+        self.name = name
+        self.limit = limit
+        self.max_queued = max_queued
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=limit, thread_name_prefix=f"pool-{name}")
+        self._lock = threading.Lock()
+        self.pending = 0      # in esecuzione + in coda
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args, **kwargs):
+        """Esegue fn(*args, **kwargs) nel pool e ne attende il risultato senza bloccare il loop."""
+        with self._lock:
+            if self.pending >= self.limit + self.max_queued:
+                self.rejected += 1
+                raise EndpointBusy(
+                    f"{self.name}: {self.pending} richieste già in corso, riprova tra poco")
+            self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    def stats(self):
+        with self._lock:
+            return {"limit": self.limit, "max_queued": self.max_queued, "pending": self.pending,
+                    "running": min(self.pending, self.limit), "completed": self.completed,
+                    "rejected": self.rejected}
+
+
+_POOLS = {}
+_pools_lock = threading.Lock()
+
+
+def endpoint_pool(name):
+    """Pool dell'endpoint `name`, creato al primo uso."""
+    with _pools_lock:
+        pool = _POOLS.get(name)
+        if pool is None:
+            pool = _POOLS[name] = EndpointPool(name, _env_limit(name, ENDPOINT_LIMITS.get(name, DEFAULT_LIMIT)))
+        return pool
+
+
+async def run_in_pool(name, fn, *args, **kwargs):
+    """Scorciatoia: endpoint_pool(name).run(fn, *args, **kwargs)."""
+    return await endpoint_pool(name).run(fn, *args, **kwargs)
+
+
+def pool_stats():
+    with _pools_lock:
+        pools = list(_POOLS.values())
+    return {p.name: p.stats() for p in pools}
+
+
+def shutdown_pools(wait=False):
+    """Chiude gli executor (shutdown del server); i pool si ricreano al primo uso."""
+    with _pools_lock:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for p in pools:
+        p.executor.shutdown(wait=wait, cancel_futures=True)
@@ -49,7 +49,13 @@ async function runAnalysis() {
                 fourier_days: fourierDays,
                 start_date: startDate,
                 end_date: endDate,
-                use_cache: useCache
+                use_cache: useCache,
+                // Time Machine: frame per barra in cache + prefetch delle barre vicine
+                use_frame_cache: useCache && !!endDate,
+                prefetch: (useCache && endDate) ? 3 : 0,
+                // Fourier: percentili dell'ensemble calcolati dal backend
+                forecast_mode: 'bands',
+                n_scenarios: 200
             })
         });
 
@@ -174,7 +180,36 @@ function renderCharts(data) {
     // [MODIFIED] Check Global Fourier Toggle
     const showFourier = (typeof window.SHOW_FOURIER === 'undefined') ? true : window.SHOW_FOURIER;
 
-    if (showFourier && data.forecast.scenarios && Array.isArray(data.forecast.scenarios)) {
+    if (showFourier && data.forecast.mode === 'bands' && data.forecast.bands) {
+        // Ventaglio di percentili: 5-95 e 25-75 riempiti, mediana tratteggiata
+        const b = data.forecast.bands;
+        const band = (lo, hi, name, fill) => {
+            if (!b[lo] || !b[hi]) return;
+            traceForecasts.push({
+                x: data.forecast.dates, y: b[lo], type: 'scatter', mode: 'lines',
+                line: { width: 0 }, hoverinfo: 'skip', showlegend: false, xaxis: 'x', yaxis: 'y'
+            });
+            traceForecasts.push({
+                x: data.forecast.dates, y: b[hi], name: name, type: 'scatter', mode: 'lines',
+                line: { width: 0 }, fill: 'tonexty', fillcolor: fill, xaxis: 'x', yaxis: 'y'
+            });
+        };
+        band('p5', 'p95', 'Fourier 5-95%', 'rgba(171, 99, 250, 0.15)');
+        band('p25', 'p75', 'Fourier 25-75%', 'rgba(171, 99, 250, 0.30)');
+        if (b.p50) {
+            traceForecasts.push({
+                x: data.forecast.dates, y: b.p50, name: 'Fourier mediana', type: 'scatter',
+                line: { color: '#ab63fa', width: 2, dash: 'dot' }, xaxis: 'x', yaxis: 'y'
+            });
+        }
+        if (data.forecast.fit) {
+            traceForecasts.push({
+                x: data.forecast.fit.dates, y: data.forecast.fit.values, name: 'Fit Fourier',
+                type: 'scatter', line: { color: '#19d3f3', width: 1.5, dash: 'dot' },
+                opacity: 0.8, xaxis: 'x', yaxis: 'y'
+            });
+        }
+    } else if (showFourier && data.forecast.scenarios && Array.isArray(data.forecast.scenarios)) {
         data.forecast.scenarios.forEach((scenario, i) => {
             const color = scenarioColors[i % scenarioColors.length];
             traceForecasts.push({
@@ -1386,17 +1421,15 @@ async function runRadarScan() {
     }, 500);
 
     try {
-        const response = await fetch(`${API_URL}/scan`, {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ tickers: tickersToScan })
-        });
+        // formato colonnare binario (columnar.js): stesso contenuto del JSON,
+        // payload molto più piccolo; riportato ad array normali perché il
+        // radar usa null nel padding e la cache va in localStorage
+        const data = columnarToPlain(await fetchColumnar(`${API_URL}/scan`, { tickers: tickersToScan }));
 
         clearInterval(progressInterval);
         if (progressBar) progressBar.style.width = '100%';
         if (progressText) progressText.innerText = 'Elaborazione completata!';
 
-        const data = await response.json();
         if (data.status !== "ok") throw new Error(data.detail);
 
         // SALVA CACHE
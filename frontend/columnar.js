@@ -0,0 +1,94 @@
+// ============================================================
+//  Decoder del formato colonnare binario (backend/columnar.py)
+//
+//  Opt-in su /scan e /analyze-batch-stable con
+//  `Accept: application/vnd.fpr.columnar`: le serie arrivano come buffer
+//  tipizzati (delta int8/int16/int32 quantizzati o float64) e le date come
+//  fette di un asse condiviso. decodeColumnar restituisce la stessa
+//  struttura del JSON con le serie come Float64Array (NaN = null).
+//  columnarToPlain converte in array normali (es. per localStorage).
+// ============================================================
+
+const COLUMNAR_MEDIA_TYPE = 'application/vnd.fpr.columnar';
+
+const _COLUMNAR_DELTA_TYPES = { d8: Int8Array, d16: Int16Array, d32: Int32Array };
+
+function _decodeColumnarColumn(buffer, body, c) {
+    const out = new Float64Array(c.lead + c.n + c.trail);
+    out.fill(NaN, 0, c.lead);
+    out.fill(NaN, c.lead + c.n);
+    if (c.enc === 'f64') {
+        out.set(new Float64Array(buffer, body + c.offset, c.n), c.lead);
+        return out;
+    }
+    const Type = _COLUMNAR_DELTA_TYPES[c.enc];
+    if (!Type) throw new Error(`Codifica colonna sconosciuta: ${c.enc}`);
+    const deltas = new Type(buffer, body + c.offset, c.n);
+    let acc = c.base;
+    for (let i = 0; i < c.n; i++) {
+        acc += deltas[i];
+        out[c.lead + i] = acc / c.scale;
+    }
+    return out;
+}
+
+function decodeColumnar(buffer) {
+    const view = new DataView(buffer);
+    const magic = String.fromCharCode(view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3));
+    const version = view.getUint16(4, true);
+    if (magic !== 'FPRC' || version !== 1) {
+        throw new Error(`Formato colonnare non valido (${magic} v${version})`);
+    }
+    const headerLen = view.getUint32(8, true);
+    const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 12, headerLen)));
+    const body = 12 + headerLen;
+    const axis = header.axis;
+    const cols = new Map();
+
+    const col = (i) => {
+        if (!cols.has(i)) cols.set(i, _decodeColumnarColumn(buffer, body, header.columns[i]));
+        return cols.get(i);
+    };
+    const walk = (obj) => {
+        if (Array.isArray(obj)) return obj.map(walk);
+        if (obj === null || typeof obj !== 'object') return obj;
+        if ('$col' in obj) return col(obj.$col);
+        if ('$dates' in obj) {
+            const [lead, start, count] = obj.$dates;
+            return new Array(lead).fill(null).concat(axis.slice(start, start + count));
+        }
+        if ('$datecol' in obj) {
+            return Array.from(col(obj.$datecol), (i) => (Number.isNaN(i) ? null : axis[i]));
+        }
+        const out = {};
+        for (const k of Object.keys(obj)) out[k] = walk(obj[k]);
+        return out;
+    };
+    return walk(header.data);
+}
+
+// Float64Array -> array con null al posto di NaN (stessa forma del JSON)
+function columnarToPlain(obj) {
+    if (obj instanceof Float64Array) return Array.from(obj, (v) => (Number.isNaN(v) ? null : v));
+    if (Array.isArray(obj)) return obj.map(columnarToPlain);
+    if (obj === null || typeof obj !== 'object') return obj;
+    const out = {};
+    for (const k of Object.keys(obj)) out[k] = columnarToPlain(obj[k]);
+    return out;
+}
+
+// fetch POST con negoziazione: risposta colonnare decodificata o JSON
+async function fetchColumnar(url, payload) {
+    const response = await fetch(url, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', 'Accept': `${COLUMNAR_MEDIA_TYPE}, application/json` },
+        body: JSON.stringify(payload)
+    });
+    const type = response.headers.get('content-type') || '';
+    if (type.startsWith(COLUMNAR_MEDIA_TYPE)) return decodeColumnar(await response.arrayBuffer());
+    return response.json();
+}
+
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = { COLUMNAR_MEDIA_TYPE, decodeColumnar, columnarToPlain, fetchColumnar };
+}